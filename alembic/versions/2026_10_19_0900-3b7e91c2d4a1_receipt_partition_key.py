@@ -0,0 +1,46 @@
+"""Receipt partition key and date indexes
+
+Revision ID: 3b7e91c2d4a1
+Revises: d74a0c640552
+Create Date: 2026-10-19 09:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e91c2d4a1'
+down_revision = 'd74a0c640552'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.execute("UPDATE receipts SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    with op.batch_alter_table('receipts') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    with op.batch_alter_table('receipt_items') as batch_op:
+        batch_op.add_column(sa.Column('receipt_created_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute(
+        "UPDATE receipt_items SET receipt_created_at = COALESCE("
+        "(SELECT receipts.created_at FROM receipts WHERE receipts.id = receipt_items.receipt_id), "
+        "CURRENT_TIMESTAMP)"
+    )
+    with op.batch_alter_table('receipt_items') as batch_op:
+        batch_op.alter_column('receipt_created_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    op.create_index('ix_receipts_user_id_created_at', 'receipts', ['user_id', 'created_at'], unique=False)
+    op.create_index(op.f('ix_receipt_items_receipt_id'), 'receipt_items', ['receipt_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index(op.f('ix_receipt_items_receipt_id'), table_name='receipt_items')
+    op.drop_index('ix_receipts_user_id_created_at', table_name='receipts')
+    with op.batch_alter_table('receipt_items') as batch_op:
+        batch_op.drop_column('receipt_created_at')
+    with op.batch_alter_table('receipts') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), nullable=True)
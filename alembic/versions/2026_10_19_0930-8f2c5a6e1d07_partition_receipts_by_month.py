@@ -0,0 +1,121 @@
+"""Partition receipts by month
+
+Revision ID: 8f2c5a6e1d07
+Revises: 3b7e91c2d4a1
+Create Date: 2026-10-19 09:30:00.000000+00:00
+
+Postgres only: receipts and receipt_items become RANGE partitioned by
+created_at / receipt_created_at with one partition per month plus a default
+partition. SQLite keeps the plain tables.
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import get_settings
+from app.database.partitions import add_months, month_start, months_between, partition_ddl
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2c5a6e1d07'
+down_revision = '3b7e91c2d4a1'
+branch_labels = None
+depends_on = None
+
+RECEIPT_COLUMNS = "id, user_id, payment_type, payment_amount, total, rest, created_at"
+ITEM_COLUMNS = "id, receipt_id, name, price, quantity, total, receipt_created_at"
+
+
+def _sequence(table: str) -> str:
+    return op.get_bind().execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+
+
+def _create_tables(receipts_seq: str, items_seq: str, partitioned: bool) -> None:
+    receipts_key, items_key, receipts_by, items_by = "id", "id", "", ""
+    items_fk = ", CONSTRAINT receipt_items_receipt_id_fkey FOREIGN KEY (receipt_id) REFERENCES receipts (id)"
+    if partitioned:
+        receipts_key, items_key = "id, created_at", "id, receipt_created_at"
+        receipts_by, items_by = " PARTITION BY RANGE (created_at)", " PARTITION BY RANGE (receipt_created_at)"
+        # a foreign key must reference a unique key, and receipts is now unique on (id, created_at)
+        items_fk = ""
+    op.execute(
+        f"""CREATE TABLE receipts (
+            id INTEGER NOT NULL DEFAULT nextval('{receipts_seq}'::regclass),
+            user_id INTEGER NOT NULL,
+            payment_type VARCHAR NOT NULL,
+            payment_amount NUMERIC(10, 2) NOT NULL,
+            total NUMERIC(10, 2) NOT NULL,
+            rest NUMERIC(10, 2) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT receipts_pkey PRIMARY KEY ({receipts_key}),
+            CONSTRAINT receipts_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)
+        ){receipts_by}"""
+    )
+    op.execute(
+        f"""CREATE TABLE receipt_items (
+            id INTEGER NOT NULL DEFAULT nextval('{items_seq}'::regclass),
+            receipt_id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            price NUMERIC(10, 2) NOT NULL,
+            quantity NUMERIC(10, 3) NOT NULL,
+            total NUMERIC(10, 2) NOT NULL,
+            receipt_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            CONSTRAINT receipt_items_pkey PRIMARY KEY ({items_key}){items_fk}
+        ){items_by}"""
+    )
+
+
+def _swap_tables(partitioned: bool) -> None:
+    receipts_seq, items_seq = _sequence('receipts'), _sequence('receipt_items')
+    for table in ('receipt_items', 'receipts'):
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+    op.execute("ALTER TABLE receipt_items_old DROP CONSTRAINT IF EXISTS receipt_items_receipt_id_fkey")
+    for index in ('ix_receipts_id', 'ix_receipts_user_id_created_at', 'ix_receipt_items_id', 'ix_receipt_items_receipt_id'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    _create_tables(receipts_seq, items_seq, partitioned)
+    if partitioned:
+        bind = op.get_bind()
+        first = bind.execute(sa.text("SELECT min(created_at) FROM receipts_old")).scalar()
+        last = bind.execute(sa.text("SELECT max(created_at) FROM receipts_old")).scalar()
+        today = datetime.now(timezone.utc).date()
+        upcoming = add_months(month_start(today), get_settings().partition_months_ahead)
+        months = months_between(
+            first.astimezone(timezone.utc).date() if first else today,
+            max(last.astimezone(timezone.utc).date(), upcoming) if last else upcoming,
+        )
+        for table, key in (('receipts', 'created_at'), ('receipt_items', 'receipt_created_at')):
+            op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+            for month in months:
+                for statement in partition_ddl(table, key, month):
+                    op.execute(statement)
+
+    op.execute(f"INSERT INTO receipts ({RECEIPT_COLUMNS}) SELECT {RECEIPT_COLUMNS} FROM receipts_old")
+    op.execute(f"INSERT INTO receipt_items ({ITEM_COLUMNS}) SELECT {ITEM_COLUMNS} FROM receipt_items_old")
+    op.execute(f"ALTER SEQUENCE {receipts_seq} OWNED BY receipts.id")
+    op.execute(f"ALTER SEQUENCE {items_seq} OWNED BY receipt_items.id")
+    op.execute("DROP TABLE receipt_items_old")
+    op.execute("DROP TABLE receipts_old")
+
+    op.execute("CREATE INDEX ix_receipts_id ON receipts (id)")
+    op.execute("CREATE INDEX ix_receipts_user_id_created_at ON receipts (user_id, created_at)")
+    op.execute("CREATE INDEX ix_receipt_items_id ON receipt_items (id)")
+    op.execute("CREATE INDEX ix_receipt_items_receipt_id ON receipt_items (receipt_id)")
+    op.execute("ANALYZE receipts")
+    op.execute("ANALYZE receipt_items")
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _swap_tables(partitioned=True)
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    _swap_tables(partitioned=False)
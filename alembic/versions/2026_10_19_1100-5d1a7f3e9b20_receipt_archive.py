@@ -0,0 +1,49 @@
+"""Receipt archive segments and totals
+
+Revision ID: 5d1a7f3e9b20
+Revises: 8f2c5a6e1d07
+Create Date: 2026-10-19 11:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1a7f3e9b20'
+down_revision = '8f2c5a6e1d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table('receipt_archive_segments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('first_receipt_id', sa.Integer(), nullable=False),
+    sa.Column('last_receipt_id', sa.Integer(), nullable=False),
+    sa.Column('receipt_count', sa.Integer(), nullable=False),
+    sa.Column('first_created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_receipt_archive_segments_last_receipt_id'), 'receipt_archive_segments', ['last_receipt_id'], unique=True)
+    op.create_table('receipt_archive_totals',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('payment_type', sa.String(), nullable=False),
+    sa.Column('receipt_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('min_total', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('max_total', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'payment_type')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_table('receipt_archive_totals')
+    op.drop_index(op.f('ix_receipt_archive_segments_last_receipt_id'), table_name='receipt_archive_segments')
+    op.drop_table('receipt_archive_segments')
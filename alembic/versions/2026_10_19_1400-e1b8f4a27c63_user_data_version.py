@@ -0,0 +1,28 @@
+"""Per-user data version for conditional GETs
+
+Revision ID: e1b8f4a27c63
+Revises: c7e3d91a5f42
+Create Date: 2026-10-19 14:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b8f4a27c63'
+down_revision = 'c7e3d91a5f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('data_version')
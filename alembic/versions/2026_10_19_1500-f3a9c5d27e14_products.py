@@ -0,0 +1,80 @@
+"""Product catalog and receipt_items.product_id
+
+Revision ID: f3a9c5d27e14
+Revises: e1b8f4a27c63
+Create Date: 2026-10-19 15:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c5d27e14'
+down_revision = 'e1b8f4a27c63'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _normalize(name: str) -> str:
+    # frozen copy of app.services.products.normalize_product_name
+    return " ".join(name.split()).casefold()
+
+
+def _backfill() -> None:
+    """Products for every distinct item name, then product_id for every item
+    in one UPDATE driven by a temporary name -> id table."""
+    bind = op.get_bind()
+    names = [row[0] for row in bind.execute(sa.text("SELECT DISTINCT name FROM receipt_items"))]
+    if not names:
+        return
+    spelled = {}
+    for name in sorted(names):
+        spelled.setdefault(_normalize(name), " ".join(name.split()))
+    products = sa.table('products', sa.column('name'), sa.column('normalized_name'))
+    rows = [{'name': name, 'normalized_name': normalized} for normalized, name in spelled.items()]
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(products.insert(), rows[start:start + BATCH_SIZE])
+    ids = dict(bind.execute(sa.text("SELECT normalized_name, id FROM products")).all())
+
+    bind.execute(sa.text("CREATE TEMPORARY TABLE product_names (name VARCHAR PRIMARY KEY, product_id INTEGER NOT NULL)"))
+    mapping = [{'name': name, 'product_id': ids[_normalize(name)]} for name in names]
+    for start in range(0, len(mapping), BATCH_SIZE):
+        bind.execute(
+            sa.text("INSERT INTO product_names (name, product_id) VALUES (:name, :product_id)"),
+            mapping[start:start + BATCH_SIZE],
+        )
+    bind.execute(sa.text(
+        "UPDATE receipt_items SET product_id = "
+        "(SELECT product_id FROM product_names WHERE product_names.name = receipt_items.name)"
+    ))
+    bind.execute(sa.text("DROP TABLE product_names"))
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    op.create_table('products',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('normalized_name', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_products_normalized_name'), 'products', ['normalized_name'], unique=True)
+    with op.batch_alter_table('receipt_items') as batch_op:
+        batch_op.add_column(sa.Column('product_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_receipt_items_product_id', 'products', ['product_id'], ['id'])
+    _backfill()
+    op.create_index(op.f('ix_receipt_items_product_id'), 'receipt_items', ['product_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index(op.f('ix_receipt_items_product_id'), table_name='receipt_items')
+    with op.batch_alter_table('receipt_items') as batch_op:
+        batch_op.drop_constraint('fk_receipt_items_product_id', type_='foreignkey')
+        batch_op.drop_column('product_id')
+    op.drop_index(op.f('ix_products_normalized_name'), table_name='products')
+    op.drop_table('products')
@@ -0,0 +1,56 @@
+"""Per-user daily product counters and heavy-hitter sketches
+
+Revision ID: 9b4d2e7a6c18
+Revises: f3a9c5d27e14
+Create Date: 2026-10-19 16:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4d2e7a6c18'
+down_revision = 'f3a9c5d27e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema.
+
+    The tables start empty; fill them with
+    ``python -m app.services.product_stats``.
+    """
+    op.create_table('product_counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('lines', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'day', 'product_id', name='uq_product_counters_user_id_day_product_id')
+    )
+    op.create_table('product_heavy_hitters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('metric', sa.String(length=16), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.Column('error', sa.Numeric(precision=14, scale=3), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'day', 'metric', 'product_id', name='uq_product_heavy_hitters_user_id_day_metric_product_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_table('product_heavy_hitters')
+    op.drop_table('product_counters')
@@ -0,0 +1,68 @@
+"""Shard receipts by user
+
+Revision ID: 2c8e6b1f4a95
+Revises: 9b4d2e7a6c18
+Create Date: 2026-10-19 17:00:00.000000+00:00
+
+users.shard_id says which shard holds a user's receipts and
+receipt_relocations where receipts went after their user moved. Receipt ids
+carry their shard in the bits above SHARD_ID_SHIFT, so every column holding
+one becomes BIGINT. On SQLite, where INTEGER keys are 64 bit already,
+receipts is rebuilt with AUTOINCREMENT so a shard's ids can start at its
+base.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8e6b1f4a95'
+down_revision = '9b4d2e7a6c18'
+branch_labels = None
+depends_on = None
+
+RECEIPT_ID_COLUMNS = (
+    ('receipts', 'id'),
+    ('receipt_items', 'receipt_id'),
+    ('idempotency_keys', 'receipt_id'),
+    ('receipt_archive_segments', 'first_receipt_id'),
+    ('receipt_archive_segments', 'last_receipt_id'),
+)
+
+
+def _set_receipt_id_type(big: bool) -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('receipts', recreate='always', table_kwargs={'sqlite_autoincrement': big}):
+            pass
+        for table, column in RECEIPT_ID_COLUMNS[1:]:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column(
+                    column, type_=sa.BigInteger() if big else sa.Integer(), existing_nullable=False
+                )
+        return
+    type_ = 'BIGINT' if big else 'INTEGER'
+    for table, column in RECEIPT_ID_COLUMNS:
+        op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE {type_}')
+    sequence = op.get_bind().execute(sa.text("SELECT pg_get_serial_sequence('receipts', 'id')")).scalar()
+    op.execute(f'ALTER SEQUENCE {sequence} AS {type_}')
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('shard_id', sa.Integer(), server_default='0', nullable=False))
+    op.create_table(
+        'receipt_relocations',
+        sa.Column('receipt_id', sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column('shard_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('receipt_id'),
+    )
+    _set_receipt_id_type(True)
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    _set_receipt_id_type(False)
+    op.drop_table('receipt_relocations')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('shard_id')
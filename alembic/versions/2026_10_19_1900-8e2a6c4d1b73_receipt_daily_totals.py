@@ -0,0 +1,115 @@
+"""Daily receipt totals per user and payment type
+
+Revision ID: 8e2a6c4d1b73
+Revises: 5d7f3a9c2e61
+Create Date: 2026-10-19 19:00:00.000000+00:00
+
+"""
+import json
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2a6c4d1b73'
+down_revision = '5d7f3a9c2e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema.
+
+    The table is filled from the hot receipts in SQL, then the archived ones
+    are added from the segments, one segment at a time.
+    """
+    op.create_table('receipt_daily_totals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('payment_type', sa.String(), nullable=False),
+    sa.Column('receipt_count', sa.Integer(), nullable=False),
+    sa.Column('total_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('min_total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('max_total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'day', 'payment_type', name='uq_receipt_daily_totals_user_id_day_payment_type')
+    )
+    if op.get_bind().dialect.name == 'sqlite':
+        # timestamps are stored as naive UTC text
+        day = 'date(created_at)'
+    else:
+        day = "(created_at AT TIME ZONE 'UTC')::date"
+    op.execute(
+        'INSERT INTO receipt_daily_totals '
+        '(user_id, day, payment_type, receipt_count, total_amount, min_total, max_total) '
+        f'SELECT user_id, {day}, payment_type, count(*), sum(total), min(total), max(total) '
+        f'FROM receipts GROUP BY user_id, {day}, payment_type'
+    )
+    _add_archived_receipts(op.get_bind())
+
+
+def _add_archived_receipts(bind) -> None:
+    days = {}
+    segment_ids = bind.execute(sa.text('SELECT id FROM receipt_archive_segments ORDER BY id')).scalars().all()
+    for segment_id in segment_ids:
+        payload = bind.execute(
+            sa.text('SELECT payload FROM receipt_archive_segments WHERE id = :id'), {'id': segment_id}
+        ).scalar()
+        # records as written by app.services.receipt_archive._record
+        for _, user_id, payment_type, _, total, _, created_at, _ in json.loads(zlib.decompress(payload)):
+            created = datetime.fromisoformat(created_at)
+            if created.tzinfo is not None:
+                created = created.astimezone(timezone.utc)
+            total = Decimal(total)
+            entry = days.setdefault((user_id, created.date(), payment_type), [0, Decimal('0'), total, total])
+            entry[0] += 1
+            entry[1] += total
+            entry[2] = min(entry[2], total)
+            entry[3] = max(entry[3], total)
+    totals = sa.table(
+        'receipt_daily_totals',
+        sa.column('user_id', sa.Integer()),
+        sa.column('day', sa.Date()),
+        sa.column('payment_type', sa.String()),
+        sa.column('receipt_count', sa.Integer()),
+        sa.column('total_amount', sa.Numeric(14, 2)),
+        sa.column('min_total', sa.Numeric(10, 2)),
+        sa.column('max_total', sa.Numeric(10, 2)),
+    )
+    for (user_id, day, payment_type), (count, amount, low, high) in sorted(days.items()):
+        key = sa.and_(totals.c.user_id == user_id, totals.c.day == day, totals.c.payment_type == payment_type)
+        row = bind.execute(sa.select(totals.c.min_total, totals.c.max_total).where(key)).first()
+        if row is None:
+            bind.execute(
+                totals.insert().values(
+                    user_id=user_id,
+                    day=day,
+                    payment_type=payment_type,
+                    receipt_count=count,
+                    total_amount=amount,
+                    min_total=low,
+                    max_total=high,
+                )
+            )
+        else:
+            bind.execute(
+                totals.update()
+                .where(key)
+                .values(
+                    receipt_count=totals.c.receipt_count + count,
+                    total_amount=totals.c.total_amount + amount,
+                    min_total=min(Decimal(str(row.min_total)), low),
+                    max_total=max(Decimal(str(row.max_total)), high),
+                )
+            )
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_table('receipt_daily_totals')
@@ -0,0 +1,28 @@
+"""Admin flag on users
+
+Revision ID: 3f9b7d2e6a48
+Revises: 8e2a6c4d1b73
+Create Date: 2026-10-19 20:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9b7d2e6a48'
+down_revision = '8e2a6c4d1b73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('is_admin', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('is_admin')
@@ -0,0 +1,67 @@
+"""Archived receipt entries by user
+
+Revision ID: 6a3e8c1f5b97
+Revises: 3f9b7d2e6a48
+Create Date: 2026-10-19 21:00:00.000000+00:00
+
+"""
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3e8c1f5b97'
+down_revision = '3f9b7d2e6a48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema.
+
+    The entries are filled from the existing segments, one segment at a time.
+    """
+    entries = op.create_table('receipt_archive_entries',
+    sa.Column('receipt_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('segment_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('payment_type', sa.String(), nullable=False),
+    sa.Column('total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['segment_id'], ['receipt_archive_segments.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('receipt_id')
+    )
+    op.create_index('ix_receipt_archive_entries_user_id_created_at', 'receipt_archive_entries', ['user_id', 'created_at'], unique=False)
+
+    bind = op.get_bind()
+    segment_ids = bind.execute(sa.text('SELECT id FROM receipt_archive_segments ORDER BY id')).scalars().all()
+    for segment_id in segment_ids:
+        payload = bind.execute(
+            sa.text('SELECT payload FROM receipt_archive_segments WHERE id = :id'), {'id': segment_id}
+        ).scalar()
+        # records as written by app.services.receipt_archive._record
+        rows = [
+            {
+                'receipt_id': rid,
+                'user_id': user_id,
+                'segment_id': segment_id,
+                'created_at': datetime.fromisoformat(created_at),
+                'payment_type': payment_type,
+                'total': Decimal(total),
+            }
+            for rid, user_id, payment_type, _, total, _, created_at, _ in json.loads(zlib.decompress(payload))
+        ]
+        if rows:
+            op.bulk_insert(entries, rows)
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    op.drop_index('ix_receipt_archive_entries_user_id_created_at', table_name='receipt_archive_entries')
+    op.drop_table('receipt_archive_entries')
@@ -0,0 +1,33 @@
+"""Job owner and heartbeat
+
+Revision ID: b5d2f9a4e871
+Revises: 6a3e8c1f5b97
+Create Date: 2026-10-19 22:00:00.000000+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2f9a4e871'
+down_revision = '6a3e8c1f5b97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Upgrade database schema.
+
+    Running jobs get no heartbeat, so the first runner to start queues them again.
+    """
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.add_column(sa.Column('worker_id', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade database schema."""
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('worker_id')
@@ -0,0 +1,45 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.compression import compression
+from app.auth.dependencies import get_admin_user
+from app.config import get_settings
+from app.database.connection import get_session, read_engine
+from app.database.models import UserModel
+from app.domain.schemas.report import ReportKind
+from app.services.admin_reports import ReportParams, ndjson, report_engines, run_report
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/reports/{kind}", response_class=StreamingResponse)
+@compression(False)
+async def get_report(
+    kind: ReportKind,
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    inactive_days: int = Query(90, ge=1),
+    admin: UserModel = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_session),
+) -> StreamingResponse:
+    """NDJSON: a ``partial`` line per range of user ids as its query
+    finishes, with progress, then a ``total`` line. Disconnecting cancels
+    the queries still running. Not compressed, so that a line is not held
+    back until enough of them fill a compressed block."""
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(status_code=422, detail="date_to is before date_from")
+    settings = get_settings()
+    # the request's session is closed before the body is sent, so every
+    # range query opens its own
+    lines = run_report(
+        report_engines(read_engine(session)),
+        kind.value,
+        ReportParams(date_from, date_to, inactive_days),
+        settings.admin_report_concurrency,
+        settings.admin_report_range_size,
+    )
+    return StreamingResponse(ndjson(lines), media_type="application/x-ndjson")
@@ -0,0 +1,204 @@
+"""Response compression with gzip and, when ``zstandard`` is installed, zstd.
+
+``CompressionMiddleware`` picks the encoding from ``Accept-Encoding`` (zstd
+over gzip when both are acceptable), leaves bodies below
+``COMPRESSION_MINIMUM_SIZE`` alone and compresses streamed responses chunk
+by chunk, flushing after each so clients still receive data as it is
+produced. A streamed body is only compressed once its first chunks add up
+to the minimum size. Routes opt out with ``@compression(False)``, and
+responses that already carry a ``Content-Encoding`` or have a
+non-compressible content type pass through unchanged.
+"""
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+
+try:
+    import zstandard
+except ImportError:  # optional; without it only gzip is offered
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def compression(enabled: bool) -> Callable:
+    """Turn compression on or off for one endpoint; put it below the route
+    decorator."""
+
+    def mark(endpoint: Callable) -> Callable:
+        endpoint.compress_response = enabled
+        return endpoint
+
+    return mark
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str, offered: Tuple[str, ...]) -> Optional[str]:
+    """The first of ``offered`` the client accepts with q > 0."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    for encoding in offered:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, zstd_level: int):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self._sync = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._sync = zlib.Z_SYNC_FLUSH
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._obj.compress(data) + self._obj.flush(self._sync)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._obj.compress(data) + self._obj.flush()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, zstd_level: int = 3) -> bytes:
+    return _Compressor(encoding, gzip_level, zstd_level).finish(data)
+
+
+class CompressionMiddleware:
+    """Settings left as None are read from the app settings on the first
+    request, so building the app does not load the environment."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        zstd_level: Optional[int] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    def _resolve(self) -> None:
+        settings = get_settings()
+        if self.minimum_size is None:
+            self.minimum_size = settings.compression_minimum_size
+        if self.gzip_level is None:
+            self.gzip_level = settings.compression_gzip_level
+        if self.zstd_level is None:
+            self.zstd_level = settings.compression_zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), available_encodings())
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        if None in (self.minimum_size, self.gzip_level, self.zstd_level):
+            self._resolve()
+        await _CompressedResponse(self, scope, encoding, send).run(receive)
+
+
+class _CompressedResponse:
+    def __init__(self, middleware: CompressionMiddleware, scope: Scope, encoding: str, send: Send):
+        self.middleware = middleware
+        self.scope = scope
+        self.encoding = encoding
+        self.send = send
+        self.start: Optional[Message] = None
+        self.buffered: List[bytes] = []
+        self.buffered_size = 0
+        # None until decided, then True (compressing) or False (passing through)
+        self.compressing: Optional[bool] = None
+        self.compressor: Optional[_Compressor] = None
+
+    async def run(self, receive: Receive) -> None:
+        await self.middleware.app(self.scope, receive, self.on_send)
+
+    def _eligible(self) -> bool:
+        headers = Headers(raw=self.start["headers"])
+        if self.start["status"] < 200 or self.start["status"] in (204, 304):
+            return False
+        if "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        # the router has filled in the endpoint by the time the response starts
+        return getattr(self.scope.get("endpoint"), "compress_response", True)
+
+    async def on_send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.compressing is False:
+            await self.send(message)
+            return
+        if self.compressing is None and not self._eligible():
+            self.compressing = False
+            await self.send(self.start)
+            await self.send(message)
+            return
+
+        body, more = message.get("body", b""), message.get("more_body", False)
+        if self.compressing is None:
+            self.buffered.append(body)
+            self.buffered_size += len(body)
+            if more and self.buffered_size < self.middleware.minimum_size:
+                return
+            body, self.buffered = b"".join(self.buffered), []
+            if self.buffered_size < self.middleware.minimum_size:
+                self.compressing = False
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            self.compressing = True
+            self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.zstd_level)
+            if not more:
+                compressed = self.compressor.finish(body)
+                await self._send_start(len(compressed))
+                await self.send({"type": "http.response.body", "body": compressed, "more_body": False})
+                return
+            await self._send_start(None)
+
+        data = self.compressor.chunk(body) if more else self.compressor.finish(body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more})
+
+    async def _send_start(self, length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            # the bytes differ from the identity representation
+            headers["ETag"] = "W/" + etag
+        if length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(length)
+        await self.send(self.start)
@@ -0,0 +1,41 @@
+"""ETags for per-user read endpoints.
+
+A tag is a digest of the endpoint, the user, the user's ``data_version``
+and the parsed query parameters, so it changes with every receipt write
+and equivalent URLs (``?page=1`` and no page) share one. ``data_version``
+comes with the user row that authentication loads anyway, so answering
+``If-None-Match`` with 304 costs no query beyond the auth lookup.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Response, status
+
+from app.database.models import UserModel
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def user_etag(endpoint: str, user: UserModel, params: Optional[Dict[str, Any]] = None) -> str:
+    normalized = "&".join(f"{k}={'' if v is None else v}" for k, v in sorted((params or {}).items()))
+    digest = hashlib.sha1(f"{endpoint}|{user.id}|{user.data_version}|{normalized}".encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires; the compression
+    middleware weakens tags of compressed responses."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,105 @@
+import os
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.dependencies import get_current_user
+from app.database.connection import get_session
+from app.database.models import JobModel, UserModel
+from app.domain.schemas.job import JobCreate, JobResponse, JobStatus
+from app.services.jobs import cancel_job, enqueue_job
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def _to_schema(job: JobModel) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        priority=job.priority,
+        params=job.params,
+        processed=job.processed,
+        total=job.total,
+        cancel_requested=job.cancel_requested,
+        error=job.error,
+        artifact_url=f"/jobs/{job.id}/artifact" if job.artifact else None,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+async def _get_job(job_id: int, user: UserModel, session: AsyncSession) -> JobModel:
+    job = await session.get(JobModel, job_id)
+    if job is None or job.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    job_data: JobCreate,
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> JobResponse:
+    try:
+        job = await enqueue_job(session, current_user.id, job_data.kind, job_data.params, job_data.priority)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False, include_context=False))
+    await session.refresh(job)
+    return _to_schema(job)
+
+
+@router.get("", response_model=List[JobResponse])
+async def list_jobs(
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> List[JobResponse]:
+    jobs = (
+        await session.execute(
+            select(JobModel).where(JobModel.user_id == current_user.id).order_by(JobModel.id.desc()).limit(50)
+        )
+    ).scalars()
+    return [_to_schema(job) for job in jobs]
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> JobResponse:
+    job = await _get_job(job_id, current_user, session)
+    # progress is written by the runner's own sessions
+    await session.refresh(job)
+    return _to_schema(job)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel(
+    job_id: int,
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> JobResponse:
+    job = await _get_job(job_id, current_user, session)
+    return _to_schema(await cancel_job(session, job))
+
+
+@router.get("/{job_id}/artifact")
+async def get_artifact(
+    job_id: int,
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> FileResponse:
+    job = await _get_job(job_id, current_user, session)
+    await session.refresh(job)
+    if job.status != JobStatus.SUCCEEDED.value or not job.artifact:
+        raise HTTPException(status_code=409, detail="Job has no result yet")
+    if not os.path.exists(job.artifact):
+        raise HTTPException(status_code=410, detail="Job result is no longer available")
+    return FileResponse(job.artifact, filename=os.path.basename(job.artifact))
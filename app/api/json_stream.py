@@ -0,0 +1,63 @@
+"""Receipt list pages written as JSON one receipt at a time.
+
+Returning a ``ReceiptListResponse`` makes FastAPI hold the page several
+times over: the ORM rows, the pydantic tree, the dict it serializes to, the
+copy ``jsonable_encoder`` makes of that and the final string. ``stream_receipt_list``
+renders each receipt straight from its row into fixed key fragments and
+yields the body in chunks. A row is released once written, so past the first
+chunk only the rows still to come and one receipt's JSON are held.
+
+The bytes are the ones FastAPI's ``JSONResponse`` writes for the model:
+compact separators, non-ASCII left as is, Decimals as strings and datetimes
+as pydantic renders them (``Z`` for UTC).
+"""
+import json
+from datetime import datetime
+from json.encoder import encode_basestring  # quotes strings like json.dumps(ensure_ascii=False)
+from typing import Any, AsyncIterator, Dict, List
+
+from pydantic import TypeAdapter
+
+from app.domain.schemas.receipt import PaymentType, ReceiptListResponse
+
+CHUNK_SIZE = 64 * 1024
+
+_datetime = TypeAdapter(datetime)
+# the fields after "items", in schema order
+_TAIL_FIELDS = tuple(name for name in ReceiptListResponse.model_fields if name != "items")
+
+
+def _item_json(item: Any) -> str:
+    return (
+        f'{{"name":{encode_basestring(item.name)},"price":"{item.price}",'
+        f'"quantity":"{item.quantity}","total":"{item.total}"}}'
+    )
+
+
+def receipt_json(r: Any) -> str:
+    """``ReceiptResponse.from_model(r)`` as FastAPI would write it."""
+    products = ",".join(_item_json(i) for i in r.items)
+    return (
+        f'{{"id":{int(r.id)},"products":[{products}],'
+        f'"payment":{{"type":{encode_basestring(PaymentType(r.payment_type).value)},"amount":"{r.payment_amount}"}},'
+        f'"total":"{r.total}","rest":"{r.rest}","created_at":"{_datetime.dump_python(r.created_at, mode="json")}"}}'
+    )
+
+
+async def stream_receipt_list(receipts: List[Any], **page: Any) -> AsyncIterator[bytes]:
+    """The ``ReceiptListResponse`` of ``receipts`` (with items loaded) and
+    the paging fields in ``page``. Empties ``receipts`` as it goes."""
+    tail: Dict[str, Any] = {name: page[name] for name in _TAIL_FIELDS}
+    chunk = bytearray(b'{"items":[')
+    receipts.reverse()
+    first = True
+    while receipts:
+        if not first:
+            chunk += b","
+        first = False
+        chunk += receipt_json(receipts.pop()).encode()
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += b"]," + json.dumps(tail, separators=(",", ":"))[1:].encode()
+    yield bytes(chunk)
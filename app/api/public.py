@@ -1,27 +1,37 @@
 from fastapi import APIRouter, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 from fastapi import Depends
 from app.database.connection import get_session
-from app.database.models import ReceiptModel
-from app.domain.schemas.receipt import ReceiptResponse, ReceiptItemResponse, PaymentResponse
+from app.domain.schemas.receipt import (
+    ReceiptResponse,
+    ReceiptItemResponse,
+    PaymentResponse,
+    ReceiptLookupRequest,
+    ReceiptLookupResponse,
+)
 from app.services.receipt_formatter import ReceiptFormatter
+from app.services.receipt_lookup import find_receipt_anywhere, lookup_receipts_anywhere
 from fastapi.responses import PlainTextResponse
 
 router = APIRouter(prefix="/public", tags=["Public"])
 
+@router.post("/receipts/lookup", response_model=ReceiptLookupResponse)
+async def lookup_public_receipts(
+    body: ReceiptLookupRequest,
+    session: AsyncSession = Depends(get_session)
+):
+    receipts, missing = await lookup_receipts_anywhere(session, body.ids)
+    return ReceiptLookupResponse(
+        receipts=[ReceiptResponse.from_model(receipt) for receipt in receipts],
+        missing=missing
+    )
+
 @router.get("/receipts/{receipt_id}", response_model=ReceiptResponse)
 async def get_public_receipt(
     receipt_id: int,
     session: AsyncSession = Depends(get_session)
 ):
-    stmt = select(ReceiptModel).options(
-        selectinload(ReceiptModel.items)
-    ).where(ReceiptModel.id == receipt_id)
-    
-    result = await session.execute(stmt)
-    receipt = result.scalar()
+    receipt = await find_receipt_anywhere(session, receipt_id)
     
     if not receipt:
         raise HTTPException(
@@ -54,12 +64,7 @@ async def get_public_receipt_text(
     receipt_id: int,
     session: AsyncSession = Depends(get_session)
 ):
-    stmt = select(ReceiptModel).options(
-        selectinload(ReceiptModel.items)
-    ).where(ReceiptModel.id == receipt_id)
-    
-    result = await session.execute(stmt)
-    receipt = result.scalar()
+    receipt = await find_receipt_anywhere(session, receipt_id)
     
     if not receipt:
         raise HTTPException(
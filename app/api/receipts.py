@@ -1,43 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from dataclasses import asdict
 from decimal import Decimal
-from datetime import date
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 
-from app.database.connection import get_session
-from app.database.models import ReceiptModel, ReceiptItemModel, UserModel
+from app.config import get_settings
+from app.database.connection import read_engine
+from app.database.models import ReceiptModel, UserModel
+from app.database.shards import session_shard
+from app.database.queries import (
+    SORT_COLUMNS,
+    SORT_ORDERS,
+    ReceiptFilters,
+    receipt_with_items,
+)
 from app.domain.schemas.receipt import (
     ReceiptCreate,
     ReceiptResponse,
     ReceiptListResponse,
-    ReceiptItemResponse,
-    PaymentResponse,
+    ReceiptLookupRequest,
+    ReceiptLookupResponse,
     ReceiptStatsResponse,
+    ProductMetric,
+    ProductStatsResponse,
+    StatsPeriod,
+    ReceiptSummaryResponse,
+    PaymentResponse,
+    SparseReceiptListResponse,
 )
-from app.auth.dependencies import get_current_user
+from app.auth.dependencies import get_current_user, get_user_session
+from app.api.compression import compression
+from app.api.etags import etag_matches, not_modified, set_etag, user_etag
+from app.api.json_stream import stream_receipt_list
+from app.services.idempotency import StoredKey, find_key, key_cache, key_row, request_hash
+from app.services.outbox import wake_outbox
+from app.services.product_stats import period_bounds, top_products
+from app.services.receipt_events import publish_receipt, stream_receipts
+from app.services.receipt_archive import archived_totals, find_archived_receipt
+from app.services.receipt_ingest import get_group_writer, insert_receipts, pending_receipt
+from app.services.receipt_formatter import PAPER_WIDTHS, compile_layout
+from app.services.receipt_list import fetch_receipt_page
+from app.services.receipt_lookup import lookup_receipts
+from app.services.receipt_stats import StatsTotals, filtered_stats
+from app.services.receipt_statement import stream_statement
 
 router = APIRouter(prefix="/receipts", tags=["Receipts"])
 
+RECEIPT_FIELDS = ("id", "products", "payment", "total", "rest", "created_at", "item_count")
+SUMMARY_FIELDS = frozenset(RECEIPT_FIELDS) - {"products"}
+
 
 def _to_schema(r: ReceiptModel) -> ReceiptResponse:
-    return ReceiptResponse(
-        id=r.id,
-        products=[
-            ReceiptItemResponse(
-                name=i.name,
-                price=i.price,
-                quantity=i.quantity,
-                total=i.total,
-            )
-            for i in r.items
-        ],
-        payment=PaymentResponse(type=r.payment_type, amount=r.payment_amount),
-        total=r.total,
-        rest=r.rest,
-        created_at=r.created_at,
-    )
+    return ReceiptResponse.from_model(r)
 
 
 @router.post(
@@ -52,136 +70,235 @@ def _to_schema(r: ReceiptModel) -> ReceiptResponse:
 )
 async def create_receipt(
     receipt_data: ReceiptCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
     current_user: UserModel = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_user_session),
 ) -> ReceiptResponse:
-    total = sum(
-        Decimal(str(i.price)) * Decimal(str(i.quantity)) for i in receipt_data.products
-    )
-    rest = Decimal(str(receipt_data.payment.amount)) - total
-    if rest < 0:
+    fingerprint = None
+    if idempotency_key is not None:
+        fingerprint = request_hash(receipt_data)
+        stored = await find_key(session, current_user.id, idempotency_key)
+        if stored is not None:
+            return await _replay(session, response, current_user.id, idempotency_key, stored, fingerprint)
+
+    pending = pending_receipt(current_user.id, receipt_data)
+    if pending.receipt["rest"] < 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Payment amount is insufficient",
         )
+    if idempotency_key is not None:
+        ttl = timedelta(hours=get_settings().idempotency_key_ttl_hours)
+        pending.idempotency = key_row(current_user.id, idempotency_key, fingerprint, ttl)
 
-    db_receipt = ReceiptModel(
-        user_id=current_user.id,
-        payment_type=receipt_data.payment.type.value,
-        payment_amount=receipt_data.payment.amount,
-        total=total,
-        rest=rest,
-    )
-    session.add(db_receipt)
-    await session.flush()
-
-    for p in receipt_data.products:
-        session.add(
-            ReceiptItemModel(
-                receipt_id=db_receipt.id,
-                name=p.name,
-                price=p.price,
-                quantity=p.quantity,
-                total=Decimal(str(p.price)) * Decimal(str(p.quantity)),
-            )
+    try:
+        # the group writer commits to shard 0 only
+        writer = get_group_writer() if session_shard(session) == 0 else None
+        if writer is not None:
+            # hand the pooled connection back; the writer needs one to commit
+            await session.close()
+            receipt = await writer.submit(pending)
+        else:
+            receipt = (await insert_receipts(session, [pending]))[0]
+            await session.commit()
+    except IntegrityError:
+        if idempotency_key is None:
+            raise
+        # a concurrent request with the same key committed first
+        await session.rollback()
+        stored = await find_key(session, current_user.id, idempotency_key)
+        if stored is None:
+            raise
+        return await _replay(session, response, current_user.id, idempotency_key, stored, fingerprint)
+
+    result = _to_schema(receipt)
+    if idempotency_key is not None:
+        key_cache.put(
+            current_user.id,
+            idempotency_key,
+            StoredKey(fingerprint, receipt.id, pending.idempotency["expires_at"], result),
         )
+    publish_receipt(current_user.id, result)
+    wake_outbox()
+    return result
 
-    await session.commit()
-    await session.refresh(db_receipt)
 
-    stmt = (
-        select(ReceiptModel)
-        .options(selectinload(ReceiptModel.items))
-        .where(ReceiptModel.id == db_receipt.id)
-    )
-    receipt = (await session.execute(stmt)).scalar()
-    return _to_schema(receipt)
+async def _replay(
+    session: AsyncSession, response: Response, user_id: int, key: str, stored: StoredKey, fingerprint: str
+) -> ReceiptResponse:
+    if stored.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    if stored.response is None:
+        receipt = (await session.execute(receipt_with_items(stored.receipt_id, user_id))).scalar()
+        if not receipt:
+            receipt = await find_archived_receipt(session, stored.receipt_id, user_id)
+        if not receipt:
+            raise HTTPException(status_code=404, detail="Receipt not found")
+        stored.response = _to_schema(receipt)
+        key_cache.put(user_id, key, stored)
+    response.headers["Idempotent-Replayed"] = "true"
+    return stored.response
 
 
-@router.get("")
-@router.get("/")
-async def get_receipts(
-    page: int = Query(1, ge=1),
-    size: int = Query(10, ge=1, le=100),
+def receipt_filters(
     date_from: Optional[date] = Query(None),
     date_to: Optional[date] = Query(None),
     min_total: Optional[Decimal] = Query(None, ge=0),
     max_total: Optional[Decimal] = Query(None, ge=0),
     payment_type: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
+) -> ReceiptFilters:
+    """The filter parameters shared by the list and the stats."""
+    return ReceiptFilters(
+        date_from=date_from,
+        date_to=date_to,
+        min_total=min_total,
+        max_total=max_total,
+        payment_type=payment_type,
+        search=search,
+    )
+
+
+@router.get("")
+@router.get("/")
+async def get_receipts(
+    response: Response,
+    page: int = Query(1, ge=1),
+    size: int = Query(10, ge=1, le=100),
+    filters: ReceiptFilters = Depends(receipt_filters),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
+    include_items: bool = Query(True, description="false returns summaries with item_count and no products"),
+    fields: Optional[str] = Query(None, description=f"comma-separated subset of {', '.join(RECEIPT_FIELDS)}"),
+    if_none_match: Optional[str] = Header(None),
     current_user: UserModel = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_user_session),
 ) -> ReceiptListResponse:
-    valid_sort_fields, valid_sort_orders = {"created_at", "total", "payment_amount"}, {
-        "asc",
-        "desc",
-    }
-    if sort_by not in valid_sort_fields or sort_order not in valid_sort_orders:
+    if sort_by not in SORT_COLUMNS or sort_order not in SORT_ORDERS:
         raise HTTPException(status_code=422, detail="Invalid sorting parameters")
+    selected = _parse_fields(fields)
+    if selected is None and not include_items:
+        selected = SUMMARY_FIELDS
+    if selected is not None and "products" in selected and not include_items:
+        raise HTTPException(status_code=422, detail="products cannot be selected with include_items=false")
+    with_items = selected is None or "products" in selected
 
-    offset = (page - 1) * size
-    stmt = select(ReceiptModel).where(ReceiptModel.user_id == current_user.id)
-    cnt = select(func.count(ReceiptModel.id)).where(ReceiptModel.user_id == current_user.id)
-
-    if date_from:
-        stmt = stmt.where(ReceiptModel.created_at >= date_from)
-        cnt = cnt.where(ReceiptModel.created_at >= date_from)
-    if date_to:
-        stmt = stmt.where(ReceiptModel.created_at <= date_to)
-        cnt = cnt.where(ReceiptModel.created_at <= date_to)
-    if min_total is not None:
-        stmt = stmt.where(ReceiptModel.total >= min_total)
-        cnt = cnt.where(ReceiptModel.total >= min_total)
-    if max_total is not None:
-        stmt = stmt.where(ReceiptModel.total <= max_total)
-        cnt = cnt.where(ReceiptModel.total <= max_total)
-    if payment_type:
-        stmt = stmt.where(ReceiptModel.payment_type == payment_type)
-        cnt = cnt.where(ReceiptModel.payment_type == payment_type)
-    if search:
-        subq = select(ReceiptItemModel.receipt_id).where(ReceiptItemModel.name.ilike(f"%{search}%"))
-        stmt = stmt.where(ReceiptModel.id.in_(subq))
-        cnt = cnt.where(ReceiptModel.id.in_(subq))
-
-    col = (
-        ReceiptModel.created_at
-        if sort_by == "created_at"
-        else ReceiptModel.total
-        if sort_by == "total"
-        else ReceiptModel.payment_amount
+    etag = user_etag(
+        "receipts",
+        current_user,
+        {
+            "page": page,
+            "size": size,
+            **asdict(filters),
+            "sort_by": sort_by,
+            "sort_order": sort_order,
+            "fields": ",".join(sorted(selected)) if selected is not None else None,
+        },
     )
-    stmt = stmt.order_by(desc(col) if sort_order == "desc" else col)
-    stmt = stmt.options(selectinload(ReceiptModel.items)).offset(offset).limit(size)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
 
-    total = (await session.execute(cnt)).scalar()
-    receipts = (await session.execute(stmt)).scalars().all()
-
-    items = [_to_schema(r) for r in receipts]
+    result = await fetch_receipt_page(
+        session, current_user.id, filters, sort_by, sort_order, with_items, (page - 1) * size, size
+    )
+    total = result.total
     total_pages = (total + size - 1) // size
-    return ReceiptListResponse(
-        items=items,
+    # an estimated total only sizes the pager; a full page is what says more may follow
+    has_next = len(result.rows) == size if result.estimated else page < total_pages
+    if selected is not None:
+        if with_items:
+            items = [_sparse_receipt(r, selected) for r in result.rows]
+        else:
+            items = [_summary(row, selected) for row in result.rows]
+        sparse = Response(
+            SparseReceiptListResponse(
+                items=items,
+                total=total,
+                page=page,
+                size=size,
+                total_pages=total_pages,
+                has_next=has_next,
+                has_prev=page > 1,
+                total_estimated=result.estimated,
+            ).model_dump_json(),
+            media_type="application/json",
+        )
+        set_etag(sparse, etag)
+        return sparse
+
+    # same bytes as returning ReceiptListResponse, without building it
+    body = stream_receipt_list(
+        result.rows,
         total=total,
         page=page,
         size=size,
         total_pages=total_pages,
-        has_next=page < total_pages,
+        has_next=has_next,
         has_prev=page > 1,
+        total_estimated=result.estimated,
     )
+    streamed = StreamingResponse(body, media_type="application/json")
+    set_etag(streamed, etag)
+    return streamed
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[frozenset]:
+    if fields is None:
+        return None
+    selected = frozenset(f.strip() for f in fields.split(",") if f.strip())
+    unknown = selected.difference(RECEIPT_FIELDS)
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}" if unknown else "No fields selected",
+        )
+    return selected
+
+
+def _sparse_receipt(r: ReceiptModel, selected: frozenset) -> Dict[str, Any]:
+    data = _to_schema(r).model_dump(mode="json", include=selected)
+    if "item_count" in selected:
+        data["item_count"] = len(r.items)
+    return data
+
+
+def _summary(row, selected: frozenset) -> Dict[str, Any]:
+    return ReceiptSummaryResponse(
+        id=row.id,
+        payment=PaymentResponse(type=row.payment_type, amount=row.payment_amount),
+        total=row.total,
+        rest=row.rest,
+        created_at=row.created_at,
+        item_count=row.item_count,
+    ).model_dump(mode="json", include=selected)
 
 
 @router.get("/stats")
 async def get_stats(
+    response: Response,
+    filters: ReceiptFilters = Depends(receipt_filters),
+    if_none_match: Optional[str] = Header(None),
     current_user: UserModel = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_user_session),
 ) -> ReceiptStatsResponse:
+    etag = user_etag("stats", current_user, asdict(filters) if filters.active() else None)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
+    if filters.active():
+        return _from_totals(await filtered_stats(session, current_user.id, filters))
+
     s = (
         await session.execute(
             select(
                 func.count(ReceiptModel.id),
                 func.sum(ReceiptModel.total),
-                func.avg(ReceiptModel.total),
                 func.max(ReceiptModel.total),
                 func.min(ReceiptModel.total),
             ).where(ReceiptModel.user_id == current_user.id)
@@ -200,13 +317,130 @@ async def get_stats(
         )
     ).all()
 
+    return _with_archived_totals(s, p_rows, await archived_totals(session, current_user.id))
+
+
+def _from_totals(totals: StatsTotals) -> ReceiptStatsResponse:
+    by_type = sorted(totals.by_type.items())
+    count = sum(c for _, (c, _, _, _) in by_type)
+    amount = sum((a for _, (_, a, _, _) in by_type), Decimal("0"))
     return ReceiptStatsResponse(
-        total_receipts=s[0] or 0,
-        total_amount=s[1] or Decimal("0"),
-        average_amount=s[2] or Decimal("0"),
-        max_amount=s[3] or Decimal("0"),
-        min_amount=s[4] or Decimal("0"),
-        payment_type_stats=[{"type": t, "count": c, "total": ttl} for t, c, ttl in p_rows],
+        total_receipts=count,
+        total_amount=amount,
+        average_amount=(amount / count).quantize(Decimal("0.01")) if count else Decimal("0"),
+        max_amount=max((high for _, (_, _, _, high) in by_type), default=Decimal("0")),
+        min_amount=min((low for _, (_, _, low, _) in by_type), default=Decimal("0")),
+        payment_type_stats=[{"type": t, "count": c, "total": a} for t, (c, a, _, _) in by_type],
+    )
+
+
+def _with_archived_totals(s, p_rows, archived) -> ReceiptStatsResponse:
+    # the average is rounded to cents here as in _from_totals, archive or not
+    count = (s[0] or 0) + sum(a.receipt_count for a in archived)
+    amount = Decimal(str(s[1] or 0)) + sum((a.total_amount for a in archived), Decimal("0"))
+    highs = [Decimal(str(v)) for v in [s[2]] + [a.max_total for a in archived] if v is not None]
+    lows = [Decimal(str(v)) for v in [s[3]] + [a.min_total for a in archived] if v is not None]
+
+    by_type: Dict[str, List[Any]] = {t: [c, Decimal(str(ttl or 0))] for t, c, ttl in p_rows}
+    for a in archived:
+        entry = by_type.setdefault(a.payment_type, [0, Decimal("0")])
+        entry[0] += a.receipt_count
+        entry[1] += a.total_amount
+
+    return ReceiptStatsResponse(
+        total_receipts=count,
+        total_amount=amount,
+        average_amount=(amount / count).quantize(Decimal("0.01")) if count else Decimal("0"),
+        max_amount=max(highs, default=Decimal("0")),
+        min_amount=min(lows, default=Decimal("0")),
+        payment_type_stats=[{"type": t, "count": c, "total": ttl} for t, (c, ttl) in by_type.items()],
+    )
+
+
+@router.get("/stats/products")
+async def get_product_stats(
+    response: Response,
+    period: StatsPeriod = Query(StatsPeriod.DAY),
+    day: Optional[date] = Query(None, alias="date", description="Any day in the period; defaults to today (UTC)"),
+    by: ProductMetric = Query(ProductMetric.REVENUE),
+    limit: int = Query(10, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None),
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_user_session),
+) -> ProductStatsResponse:
+    date_from, date_to = period_bounds(period.value, day or datetime.now(timezone.utc).date())
+    etag = user_etag(
+        "product_stats", current_user, {"from": date_from, "to": date_to, "by": by.value, "limit": limit}
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
+    exact, products = await top_products(session, current_user.id, date_from, date_to, by.value, limit)
+    return ProductStatsResponse(
+        period=period, date_from=date_from, date_to=date_to, by=by, exact=exact, products=products
+    )
+
+
+@router.post("/lookup")
+async def lookup_receipts_by_id(
+    body: ReceiptLookupRequest,
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_user_session),
+) -> ReceiptLookupResponse:
+    receipts, missing = await lookup_receipts(session, body.ids, current_user.id)
+    return ReceiptLookupResponse(receipts=[_to_schema(r) for r in receipts], missing=missing)
+
+
+@router.get("/statement", response_class=StreamingResponse)
+async def get_statement(
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    paper: Optional[str] = Query(None, description=f"one of {', '.join(PAPER_WIDTHS)}; overrides line_width"),
+    line_width: int = Query(40, ge=20, le=120),
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_user_session),
+) -> StreamingResponse:
+    """Every receipt from date_from to date_to (both included) as printed
+    text, followed by a summary; streamed in chunks."""
+    if date_to < date_from:
+        raise HTTPException(status_code=422, detail="date_to is before date_from")
+    if paper is not None and paper not in PAPER_WIDTHS:
+        raise HTTPException(status_code=422, detail=f"paper must be one of {', '.join(PAPER_WIDTHS)}")
+    layout = compile_layout(PAPER_WIDTHS[paper] if paper is not None else line_width)
+    # the request's session is closed before the body is sent, so the stream
+    # opens its own on the engine that serves reads
+    body = stream_statement(read_engine(session), layout, current_user.id, current_user.fullname, date_from, date_to)
+    return StreamingResponse(
+        body,
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f'inline; filename="statement-{date_from}-{date_to}.txt"'},
+    )
+
+
+@router.get("/stream", response_class=StreamingResponse)
+@compression(False)
+async def stream_new_receipts(
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID", ge=0),
+    current_user: UserModel = Depends(get_current_user),
+    session: AsyncSession = Depends(get_user_session),
+) -> StreamingResponse:
+    """Server-Sent Events: a ``receipt`` event (id = receipt id, data = the
+    receipt) for each receipt you create while connected. Reconnecting with
+    Last-Event-ID first sends those created in between, and may repeat a
+    few from just before; skip ids you already have."""
+    settings = get_settings()
+    body = stream_receipts(
+        read_engine(session),
+        current_user.id,
+        last_event_id,
+        settings.receipt_stream_buffer,
+        settings.receipt_stream_heartbeat_seconds,
+        settings.receipt_stream_replay_limit,
+        settings.receipt_stream_replay_overlap_seconds,
+    )
+    return StreamingResponse(
+        body, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -214,14 +448,11 @@ async def get_stats(
 async def get_receipt(
     receipt_id: int,
     current_user: UserModel = Depends(get_current_user),
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_user_session),
 ) -> ReceiptResponse:
-    stmt = (
-        select(ReceiptModel)
-        .options(selectinload(ReceiptModel.items))
-        .where(ReceiptModel.id == receipt_id, ReceiptModel.user_id == current_user.id)
-    )
-    receipt = (await session.execute(stmt)).scalar()
+    receipt = (await session.execute(receipt_with_items(receipt_id, current_user.id))).scalar()
+    if not receipt:
+        receipt = await find_archived_receipt(session, receipt_id, current_user.id)
     if not receipt:
         raise HTTPException(status_code=404, detail="Receipt not found")
     return _to_schema(receipt)
@@ -1,41 +1,75 @@
+from typing import AsyncIterator
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.database.connection import get_session
 from app.database.models import UserModel
+from app.database.queries import user_by_id
+from app.database.shards import shard_sessionmaker, user_shard
 from app.auth.security import verify_token
 
 security = HTTPBearer()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: AsyncSession = Depends(get_session)
-) -> UserModel:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+async def current_user_id(credentials: HTTPAuthorizationCredentials = Depends(security)) -> int:
     try:
         token = credentials.credentials
         payload = verify_token(token)
         if payload is None:
-            raise credentials_exception
-        
+            raise _credentials_exception()
+
         user_id: int = int(payload.get("user_id"))
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except Exception:
-        raise credentials_exception
-    
-    stmt = select(UserModel).where(UserModel.id == user_id)
-    result = await session.execute(stmt)
+        raise _credentials_exception()
+    return user_id
+
+async def get_user_session(
+    user_id: int = Depends(current_user_id),
+    session: AsyncSession = Depends(get_session)
+) -> AsyncIterator[AsyncSession]:
+    """A session on the shard holding the user's receipts: the request's own
+    session unless the user lives on another shard."""
+    shard_id = await user_shard(session, user_id)
+    if shard_id == 0:
+        yield session
+        return
+    async with shard_sessionmaker(shard_id)() as data_session:
+        yield data_session
+
+async def get_current_user(
+    user_id: int = Depends(current_user_id),
+    session: AsyncSession = Depends(get_user_session)
+) -> UserModel:
+    # the shard's copy of the user, whose data_version follows the receipts there
+    result = await session.execute(user_by_id(user_id))
     user = result.scalar()
-    
+
+    if user is None:
+        raise _credentials_exception()
+
+    return user
+
+async def get_admin_user(
+    user_id: int = Depends(current_user_id),
+    session: AsyncSession = Depends(get_session)
+) -> UserModel:
+    # admin rights live in the directory, whatever shard the user's receipts are on
+    result = await session.execute(user_by_id(user_id))
+    user = result.scalar()
+
     if user is None:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+    if not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+
     return user
@@ -1,21 +1,27 @@
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Optional, Union
-from jose import jwt, JWTError
-from passlib.context import CryptContext
-from app.config import settings
+from app.config import get_settings
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# jose and passlib are imported on first use to keep application import light.
+
+@lru_cache(maxsize=None)
+def get_password_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def hash_password(password: str) -> str:
-    return password_context.hash(password)
+    return get_password_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_context.verify(plain_password, hashed_password)
+    return get_password_context().verify(plain_password, hashed_password)
 
 def create_access_token(data: dict = None, expires_delta: Optional[timedelta] = None, user_id: int = None, username: str = None) -> str:
+    from jose import jwt
+
     if data is None:
         data = {}
     
@@ -32,18 +38,22 @@ def create_access_token(data: dict = None, expires_delta: Optional[timedelta] =
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, get_settings().secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
 def create_refresh_token(data: dict) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=7)
     to_encode.update({"exp": expire, "type": "refresh"})
-    return jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, get_settings().secret_key, algorithm=ALGORITHM)
 
 def verify_token(token: str) -> Optional[dict]:
+    from jose import jwt, JWTError
+
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, get_settings().secret_key, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
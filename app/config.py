@@ -1,3 +1,5 @@
+from typing import Dict, Optional
+
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
 
@@ -14,6 +16,56 @@ class Settings(BaseSettings):
     postgres_password: str = "password"
     postgres_db: str = "mydb"
     pg_host_port: int = 5432
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_warmup_connections: int = 2
+    sqlite_profile: str = "default"
+    sqlite_readers: int = 4
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 64 * 1024
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    partition_months_ahead: int = 3
+    partition_maintenance_interval: int = 6 * 60 * 60
+    archive_after_days: int = 180
+    archive_segment_size: int = 500
+    group_commit_enabled: bool = False
+    group_commit_max_batch: int = 100
+    group_commit_max_delay_ms: float = 2.0
+    idempotency_key_ttl_hours: int = 24
+    idempotency_cleanup_interval: int = 60 * 60
+    jobs_concurrency: int = 1
+    # above 0 and at most 1
+    jobs_duty_cycle: float = 0.25
+    jobs_heartbeat_seconds: float = 10.0
+    jobs_artifact_dir: str = "var/jobs"
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_zstd_level: int = 3
+    product_stats_mode: str = "exact"
+    product_stats_capacity: int = 200
+    # shard id -> database URL; shard 0 is database_url, which also holds the directory of users
+    shards: Dict[int, str] = {}
+    shard_map_ttl_seconds: float = 30.0
+    receipt_events_backend: str = "local"
+    receipt_stream_buffer: int = 100
+    receipt_stream_heartbeat_seconds: float = 15.0
+    receipt_stream_replay_limit: int = 1000
+    # a resume replays from this long before the Last-Event-ID receipt, for receipts that committed late
+    receipt_stream_replay_overlap_seconds: float = 5.0
+    outbox_enabled: bool = False
+    # http(s):// URL or file path the outbox is dispatched to from this process; empty dispatches nothing here
+    outbox_sink: str = ""
+    outbox_batch_size: int = 100
+    outbox_poll_interval_seconds: float = 1.0
+    outbox_retry_base_seconds: float = 1.0
+    outbox_retry_max_seconds: float = 300.0
+    outbox_http_timeout_seconds: float = 10.0
+    # window: page and total in one query; separate: a count query, then the page; auto: window for searches
+    receipt_list_count: str = "auto"
+    # lists are counted exactly up to this many matches and estimated past it; 0 counts every match
+    receipt_list_count_limit: int = 0
+    admin_report_concurrency: int = 4
+    admin_report_range_size: int = 1000
 
     model_config = ConfigDict(
         env_file=".env",
@@ -21,4 +73,22 @@ class Settings(BaseSettings):
         case_sensitive=False
     )
 
-settings = Settings()
+_settings: Optional[Settings] = None
+
+def get_settings() -> Settings:
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+def configure_settings(settings: Settings) -> Settings:
+    global _settings
+    _settings = settings
+    return settings
+
+def __getattr__(name: str):
+    # `from app.config import settings` keeps working, but the environment is
+    # only read on first use instead of at import time.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,20 +1,178 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config import settings
+import asyncio
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import CompoundSelect, Select, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug
-)
+_engine: Optional[AsyncEngine] = None
+_reader_engine: Optional[AsyncEngine] = None
+_session_factory: Optional[sessionmaker] = None
+
+def is_sqlite_file(database_url: str) -> bool:
+    url = make_url(database_url)
+    return (
+        url.get_backend_name() == "sqlite"
+        and url.database not in (None, "", ":memory:")
+        and url.query.get("mode") != "memory"
+    )
+
+def sqlite_production(settings: Settings) -> bool:
+    # in-memory databases are private to each connection, so they keep one engine
+    return settings.sqlite_profile == "production" and is_sqlite_file(settings.database_url)
+
+def sqlite_pragmas(settings: Settings, read_only: bool = False) -> List[str]:
+    pragmas = [
+        # journal_mode is stored in the file, the rest are per connection
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+def _set_pragmas_on_connect(engine: AsyncEngine, pragmas: List[str]) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+def create_engine_from_settings(settings: Settings, read_only: bool = False) -> AsyncEngine:
+    options = {"echo": settings.debug}
+    if make_url(settings.database_url).get_backend_name() != "sqlite":
+        options.update(pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow)
+    elif sqlite_production(settings):
+        # SQLite takes one writer at a time: a single write connection makes
+        # writers queue on the pool instead of failing with "database is locked"
+        options.update(pool_size=settings.sqlite_readers if read_only else 1, max_overflow=0)
+    engine = create_async_engine(settings.database_url, **options)
+    if sqlite_production(settings):
+        _set_pragmas_on_connect(engine, sqlite_pragmas(settings, read_only))
+    return engine
+
+def create_engines(settings: Settings) -> Tuple[AsyncEngine, AsyncEngine]:
+    """``(writer, reader)``; the same engine twice unless the SQLite
+    production profile applies."""
+    engine = create_engine_from_settings(settings)
+    if not sqlite_production(settings):
+        return engine, engine
+    return engine, create_engine_from_settings(settings, read_only=True)
+
+class RoutingSession(Session):
+    """Reads go to the reader engine until the transaction writes anything;
+    from then on every statement uses the writer, so the transaction reads
+    its own writes. The next transaction starts on the reader again."""
+
+    def __init__(self, *args, reader: AsyncEngine, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reader = reader
+        self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._writing and not self._flushing and isinstance(clause, (Select, CompoundSelect)):
+            return self.reader.sync_engine
+        self._writing = True
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _back_to_reader(session: RoutingSession, transaction) -> None:
+    if transaction.parent is None:
+        session._writing = False
 
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+def create_sessionmaker(
+    engine: AsyncEngine, reader: Optional[AsyncEngine] = None, info: Optional[dict] = None
+) -> sessionmaker:
+    options = {"info": info} if info else {}
+    if reader is not None and reader is not engine:
+        options.update(sync_session_class=RoutingSession, reader=reader)
+    return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, **options)
+
+def read_engine(session: AsyncSession) -> AsyncEngine:
+    """The engine for work that only reads, outside ``session``."""
+    return getattr(session.sync_session, "reader", None) or session.bind
+
+def _create_engines() -> None:
+    global _engine, _reader_engine
+    _engine, _reader_engine = create_engines(get_settings())
+
+def get_engine() -> AsyncEngine:
+    if _engine is None:
+        _create_engines()
+    return _engine
+
+def get_reader_engine() -> AsyncEngine:
+    if _reader_engine is None:
+        _create_engines()
+    return _reader_engine
+
+def get_sessionmaker() -> sessionmaker:
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = create_sessionmaker(get_engine(), get_reader_engine())
+    return _session_factory
+
+def reset_engine() -> None:
+    # the next get_engine() call builds fresh engines from the current settings
+    global _engine, _reader_engine, _session_factory
+    _engine = None
+    _reader_engine = None
+    _session_factory = None
+
+async def dispose_engine() -> None:
+    if _reader_engine is not None and _reader_engine is not _engine:
+        await _reader_engine.dispose()
+    if _engine is not None:
+        await _engine.dispose()
+    reset_engine()
+
+async def warm_up_pool(engine: AsyncEngine, connections: int) -> None:
+    size = getattr(engine.pool, "size", None)
+    # single-connection pools (in-memory SQLite) have nothing to spread over,
+    # and overflow connections would be closed again as soon as they are returned
+    connections = min(connections, size() if callable(size) else 1)
+    if connections <= 0:
+        return
+    # every ping holds its connection until all of them are open, so the pool
+    # ends up with N distinct established connections
+    barrier = asyncio.Barrier(connections)
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await barrier.wait()
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+async def prime_statements(engine: AsyncEngine, statements: Iterable) -> None:
+    async with engine.connect() as conn:
+        async with AsyncSession(bind=conn) as session:
+            for stmt, params in statements:
+                try:
+                    await session.execute(stmt, params)
+                except SQLAlchemyError as exc:
+                    logger.warning("Could not prime statement cache: %s", exc)
+                    await session.rollback()
 
 async def get_session() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
+    async with get_sessionmaker()() as session:
         yield session
+
+def __getattr__(name: str):
+    if name == "engine":
+        return get_engine()
+    if name == "AsyncSessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,100 @@
+"""Receipt filters shared by the list, the stats and anything else that
+selects a user's receipts by the ``get_receipts`` query parameters.
+
+``date_to`` is the UTC midnight starting that day, so a receipt stamped
+exactly then is the only one of the day that still matches.
+"""
+from dataclasses import dataclass, fields
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, select
+
+from app.database.models import ReceiptItemModel, ReceiptModel
+
+
+def _search_clause(active: Tuple[str, ...]):
+    items = select(ReceiptItemModel.receipt_id).where(ReceiptItemModel.name.ilike(bindparam("search")))
+    # repeat the date range on the items' own partition key so Postgres
+    # prunes receipt_items partitions as well
+    if "date_from" in active:
+        items = items.where(ReceiptItemModel.receipt_created_at >= bindparam("date_from"))
+    if "date_to" in active:
+        items = items.where(ReceiptItemModel.receipt_created_at <= bindparam("date_to"))
+    return ReceiptModel.id.in_(items)
+
+
+_FILTER_CLAUSES = {
+    "date_from": lambda active: ReceiptModel.created_at >= bindparam("date_from"),
+    "date_to": lambda active: ReceiptModel.created_at <= bindparam("date_to"),
+    "min_total": lambda active: ReceiptModel.total >= bindparam("min_total"),
+    "max_total": lambda active: ReceiptModel.total <= bindparam("max_total"),
+    "payment_type": lambda active: ReceiptModel.payment_type == bindparam("payment_type"),
+    "search": _search_clause,
+}
+
+
+def day_start(value: date) -> datetime:
+    """Dates become UTC timestamps of the same type as the partition key, which
+    Postgres needs to prune partitions when the plan starts."""
+    return datetime.combine(value, time.min, tzinfo=timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps that are already UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class ReceiptFilters:
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    min_total: Optional[Decimal] = None
+    max_total: Optional[Decimal] = None
+    payment_type: Optional[str] = None
+    search: Optional[str] = None
+
+    def active(self) -> Tuple[str, ...]:
+        active = []
+        for f in fields(self):
+            value = getattr(self, f.name)
+            # a 0 amount is still a filter; empty dates and strings are not
+            if value is not None if f.name in ("min_total", "max_total") else value:
+                active.append(f.name)
+        return tuple(active)
+
+    def params(self) -> Dict[str, Any]:
+        values = {name: getattr(self, name) for name in self.active()}
+        for name in ("date_from", "date_to"):
+            if name in values:
+                values[name] = day_start(values[name])
+        if "search" in values:
+            values["search"] = f"%{values['search']}%"
+        return values
+
+    def matches(self, receipt: ReceiptModel) -> bool:
+        """The SQL filters applied to a receipt in memory, such as one read
+        back from the archive."""
+        params = self.params()
+        created_at = _as_utc(receipt.created_at)
+        if "date_from" in params and created_at < params["date_from"]:
+            return False
+        if "date_to" in params and created_at > params["date_to"]:
+            return False
+        if "min_total" in params and receipt.total < params["min_total"]:
+            return False
+        if "max_total" in params and receipt.total > params["max_total"]:
+            return False
+        if "payment_type" in params and receipt.payment_type != params["payment_type"]:
+            return False
+        if "search" in params:
+            needle = self.search.lower()
+            return any(needle in item.name.lower() for item in receipt.items)
+        return True
+
+
+def apply_receipt_filters(stmt, active: Tuple[str, ...]):
+    for name in active:
+        stmt = stmt.where(_FILTER_CLAUSES[name](active))
+    return stmt
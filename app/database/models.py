@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Numeric, ForeignKey
+from sqlalchemy import JSON, BigInteger, Column, Integer, String, Text, Boolean, Date, DateTime, Numeric, ForeignKey, Index, LargeBinary, UniqueConstraint, event, false, select
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .connection import Base
@@ -14,31 +14,254 @@ class UserModel(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # bumped with every write to the user's receipts; drives list/stats ETags
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # where the user's receipts live; see app.database.shards
+    shard_id = Column(Integer, nullable=False, default=0, server_default="0")
+    # may read the platform-wide reports under /admin; checked in the directory
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=false())
     
     receipts = relationship("ReceiptModel", back_populates="user")
 
 class ReceiptModel(Base):
     __tablename__ = "receipts"
     
-    id = Column(Integer, primary_key=True, index=True)
+    # the top bits name the shard that issued the id; SQLite needs AUTOINCREMENT
+    # (and a plain INTEGER key) to start a shard's ids at its base
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     payment_type = Column(String, nullable=False)
     payment_amount = Column(Numeric(10, 2), nullable=False)
     total = Column(Numeric(10, 2), nullable=False)
     rest = Column(Numeric(10, 2), nullable=False, default=0)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     
     user = relationship("UserModel", back_populates="receipts")
     items = relationship("ReceiptItemModel", back_populates="receipt", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_receipts_user_id_created_at", "user_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+class ProductModel(Base):
+    """One row per distinct item name; see app.services.products."""
+
+    __tablename__ = "products"
+
+    id = Column(Integer, primary_key=True)
+    # first spelling seen
+    name = Column(String, nullable=False)
+    normalized_name = Column(String, nullable=False, unique=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class ReceiptItemModel(Base):
     __tablename__ = "receipt_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    receipt_id = Column(Integer, ForeignKey("receipts.id"), nullable=False)
+    # not enforced by Postgres once receipts is partitioned (its key is (id, created_at))
+    receipt_id = Column(BigInteger, ForeignKey("receipts.id"), nullable=False, index=True)
+    # the name as written on the receipt; product_id groups lines by product
     name = Column(String, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True, index=True)
     price = Column(Numeric(10, 2), nullable=False)
     quantity = Column(Numeric(10, 3), nullable=False)
     total = Column(Numeric(10, 2), nullable=False)
+    # copy of receipts.created_at, the partition key of receipt_items
+    receipt_created_at = Column(DateTime(timezone=True), nullable=False)
     
     receipt = relationship("ReceiptModel", back_populates="items")
+
+
+class ProductCounterModel(Base):
+    """Exact per-user, per-day sales of one product, kept up to date by
+    receipt writes; see app.services.product_stats."""
+
+    __tablename__ = "product_counters"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Numeric(14, 3), nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    lines = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "product_id", name="uq_product_counters_user_id_day_product_id"),
+    )
+
+
+class ProductHeavyHitterModel(Base):
+    """Space-Saving counters: at most PRODUCT_STATS_CAPACITY rows per user,
+    day and metric. ``count`` overestimates the product's true value by at
+    most ``error``."""
+
+    __tablename__ = "product_heavy_hitters"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    metric = Column(String(16), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    count = Column(Numeric(14, 3), nullable=False)
+    error = Column(Numeric(14, 3), nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "day", "metric", "product_id", name="uq_product_heavy_hitters_user_id_day_metric_product_id"
+        ),
+    )
+
+
+class ReceiptDailyTotalModel(Base):
+    """Receipts of one user, UTC day and payment type, hot and archived,
+    kept up to date by receipt writes; see app.services.receipt_stats."""
+
+    __tablename__ = "receipt_daily_totals"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    payment_type = Column(String, nullable=False)
+    receipt_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    min_total = Column(Numeric(10, 2), nullable=False)
+    max_total = Column(Numeric(10, 2), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "payment_type", name="uq_receipt_daily_totals_user_id_day_payment_type"),
+    )
+
+
+class ReceiptArchiveSegmentModel(Base):
+    """Compressed receipts moved out of the hot tables. Segments cover
+    disjoint id ranges, so one index probe on last_receipt_id finds the
+    only segment that can hold a given id."""
+
+    __tablename__ = "receipt_archive_segments"
+
+    id = Column(Integer, primary_key=True)
+    first_receipt_id = Column(BigInteger, nullable=False)
+    last_receipt_id = Column(BigInteger, nullable=False, unique=True, index=True)
+    receipt_count = Column(Integer, nullable=False)
+    first_created_at = Column(DateTime(timezone=True), nullable=False)
+    last_created_at = Column(DateTime(timezone=True), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ReceiptArchiveEntryModel(Base):
+    """One row per archived receipt naming its segment, so a user's readers
+    fetch only the segments holding their receipts, and amounts and dates
+    can be aggregated without decompressing anything."""
+
+    __tablename__ = "receipt_archive_entries"
+
+    receipt_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    segment_id = Column(Integer, ForeignKey("receipt_archive_segments.id"), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    payment_type = Column(String, nullable=False)
+    total = Column(Numeric(10, 2), nullable=False)
+
+    __table_args__ = (Index("ix_receipt_archive_entries_user_id_created_at", "user_id", "created_at"),)
+
+
+class ReceiptArchiveTotalModel(Base):
+    """Per user and payment type aggregates of archived receipts, so stats
+    stay complete without reading the segments."""
+
+    __tablename__ = "receipt_archive_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    payment_type = Column(String, primary_key=True)
+    receipt_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    min_total = Column(Numeric(10, 2), nullable=True)
+    max_total = Column(Numeric(10, 2), nullable=True)
+
+
+class IdempotencyKeyModel(Base):
+    """Idempotency-Key of a POST /receipts and the receipt it created. Inserted
+    in the same transaction as the receipt, so a key never outlives or
+    precedes its receipt."""
+
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    # no FK: receipts may be partitioned or archived
+    receipt_id = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_id_key"),)
+
+
+class ReceiptRelocationModel(Base):
+    """Receipts living on another shard than the one their id names, after
+    their user moved; kept in the directory (shard 0)."""
+
+    __tablename__ = "receipt_relocations"
+
+    receipt_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    shard_id = Column(Integer, nullable=False)
+
+
+class ReceiptOutboxModel(Base):
+    """A receipt waiting to go to the downstream sink, inserted in the same
+    transaction as the receipt and deleted once delivered; see
+    app.services.outbox."""
+
+    __tablename__ = "receipt_outbox"
+
+    id = Column(Integer, primary_key=True)
+    # no FK: a user moving shards leaves undelivered events behind on the old one
+    user_id = Column(Integer, nullable=False)
+    receipt_id = Column(BigInteger, nullable=False)
+    # the receipt as ReceiptResponse JSON
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # not retried before this; a user with an event waiting here gets nothing newer either
+    available_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    last_error = Column(Text, nullable=True)
+
+
+class JobModel(Base):
+    """Background job run by app.services.jobs; artifact is a path under
+    JOBS_ARTIFACT_DIR."""
+
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False, default="queued")
+    priority = Column(Integer, nullable=False, default=10)
+    params = Column(JSON, nullable=False, default=dict)
+    processed = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # the runner that claimed the job and when it last said it was alive
+    worker_id = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+    artifact = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_jobs_status_priority", "status", "priority", "id"),)
+
+
+@event.listens_for(ReceiptItemModel, "before_insert")
+def _copy_receipt_created_at(mapper, connection, target):
+    if target.receipt_created_at is None:
+        target.receipt_created_at = connection.execute(
+            select(ReceiptModel.created_at).where(ReceiptModel.id == target.receipt_id)
+        ).scalar()
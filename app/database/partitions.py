@@ -0,0 +1,143 @@
+"""Monthly range partitions for ``receipts`` and ``receipt_items`` on Postgres.
+
+The tables are converted by the ``partition_receipts_by_month`` migration.
+Each table keeps a ``<table>_default`` partition so rows outside the known
+months are never rejected; creating a month later moves its rows out of the
+default partition before attaching. SQLite keeps plain tables and every
+function here is a no-op there.
+
+    python -m app.database.partitions --months-ahead 3
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# table -> partition key column
+PARTITIONED_TABLES = (
+    ("receipts", "created_at"),
+    ("receipt_items", "receipt_created_at"),
+)
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def months_between(first: date, last: date) -> List[date]:
+    months, month = [], month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def partition_ddl(table: str, key: str, month: date) -> List[str]:
+    """Statements that create one month and attach it, moving any rows the
+    default partition already holds for that range."""
+    name, lower, upper = partition_name(table, month), _bound(month), _bound(add_months(month, 1))
+    return [
+        f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        f"WITH moved AS (DELETE FROM {table}_default WHERE {key} >= {lower} AND {key} < {upper} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})",
+    ]
+
+
+def supports_partitioning(engine: AsyncEngine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+async def ensure_partitions(engine: AsyncEngine, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """Create any missing partitions from the current month to ``months_ahead``
+    months ahead. Returns the names of the partitions created."""
+    if not supports_partitioning(engine):
+        return []
+    current = month_start(today or datetime.now(timezone.utc).date())
+    wanted = months_between(current, add_months(current, months_ahead))
+    created = []
+    async with engine.begin() as conn:
+        # several app processes may start at once
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('receipt_partitions'))"))
+        for table, key in PARTITIONED_TABLES:
+            existing = set(
+                (
+                    await conn.execute(
+                        text(
+                            "SELECT c.relname FROM pg_inherits i "
+                            "JOIN pg_class c ON c.oid = i.inhrelid "
+                            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :table"
+                        ),
+                        {"table": table},
+                    )
+                ).scalars()
+            )
+            if f"{table}_default" not in existing:
+                # the migration has not partitioned this table
+                continue
+            for month in wanted:
+                if partition_name(table, month) in existing:
+                    continue
+                for statement in partition_ddl(table, key, month):
+                    await conn.execute(text(statement))
+                created.append(partition_name(table, month))
+    if created:
+        logger.info("Created partitions: %s", ", ".join(created))
+    return created
+
+
+async def maintain_partitions(engine: AsyncEngine, months_ahead: int, interval: float) -> None:
+    """Keep future months created for as long as the app runs; the first
+    check is expected to have happened at startup."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await ensure_partitions(engine, months_ahead)
+        except Exception:
+            logger.exception("Partition maintenance failed")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Create upcoming monthly receipt partitions")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--months-ahead", type=int, default=settings.partition_months_ahead)
+    args = parser.parse_args(argv)
+
+    async def run() -> Tuple[str, List[str]]:
+        engine = create_async_engine(args.database_url)
+        try:
+            return engine.dialect.name, await ensure_partitions(engine, args.months_ahead)
+        finally:
+            await engine.dispose()
+
+    dialect, created = asyncio.run(run())
+    if dialect != "postgresql":
+        print(f"{dialect} does not use partitions; nothing to do")
+    else:
+        print(f"created {len(created)} partitions" + (f": {', '.join(created)}" if created else ""))
+
+
+if __name__ == "__main__":
+    main()
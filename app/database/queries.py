@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, desc, func, select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.config import get_settings
+from app.database.filters import ReceiptFilters, apply_receipt_filters
+from app.database.models import ReceiptItemModel, ReceiptModel, UserModel
+
+
+def user_by_id(user_id: int):
+    return select(UserModel).where(UserModel.id == user_id)
+
+
+def bump_data_versions(user_ids: Iterable[int]):
+    """Run in the same transaction as the receipt write it accounts for."""
+    return (
+        update(UserModel)
+        .where(UserModel.id.in_(sorted(set(user_ids))))
+        .values(data_version=UserModel.data_version + 1)
+    )
+
+
+def dialect_insert(session: AsyncSession):
+    """``insert`` with ``on_conflict_do_*`` for the session's database."""
+    return postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def receipt_with_items(receipt_id: int, user_id: Optional[int] = None):
+    stmt = select(ReceiptModel).options(selectinload(ReceiptModel.items))
+    if user_id is None:
+        return stmt.where(ReceiptModel.id == receipt_id)
+    return stmt.where(ReceiptModel.id == receipt_id, ReceiptModel.user_id == user_id)
+
+
+def receipts_with_items(receipt_ids: Iterable[int], user_id: Optional[int] = None):
+    """One query for the receipts, one (selectinload) for all their items."""
+    stmt = select(ReceiptModel).options(selectinload(ReceiptModel.items)).where(ReceiptModel.id.in_(receipt_ids))
+    if user_id is None:
+        return stmt
+    return stmt.where(ReceiptModel.user_id == user_id)
+
+
+class StatementCache:
+    """Small LRU of prebuilt statements keyed by query shape.
+
+    Reusing the same statement object lets SQLAlchemy skip rebuilding the
+    construct and recomputing its cache key, so each shape is compiled once.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry
+            self.misses += 1
+        entry = build()
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def info(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+SORT_COLUMNS = {
+    "created_at": ReceiptModel.created_at,
+    "total": ReceiptModel.total,
+    "payment_amount": ReceiptModel.payment_amount,
+}
+SORT_ORDERS = {"asc", "desc"}
+
+
+def item_count_column():
+    return (
+        select(func.count(ReceiptItemModel.id))
+        .where(ReceiptItemModel.receipt_id == ReceiptModel.id)
+        .scalar_subquery()
+        .label("item_count")
+    )
+
+
+SUMMARY_COLUMNS = (
+    ReceiptModel.id,
+    ReceiptModel.payment_type,
+    ReceiptModel.payment_amount,
+    ReceiptModel.total,
+    ReceiptModel.rest,
+    ReceiptModel.created_at,
+)
+
+
+def _build_count(active: Tuple[str, ...], capped: bool):
+    if not capped:
+        return apply_receipt_filters(
+            select(func.count(ReceiptModel.id)).where(ReceiptModel.user_id == bindparam("user_id")), active
+        )
+    matches = apply_receipt_filters(
+        select(ReceiptModel.id).where(ReceiptModel.user_id == bindparam("user_id")), active
+    )
+    return select(func.count()).select_from(matches.limit(bindparam("count_limit")).subquery())
+
+
+def _build_list_statements(
+    active: Tuple[str, ...],
+    sort_by: str,
+    sort_order: str,
+    with_items: bool = True,
+    windowed: bool = False,
+    capped: bool = False,
+):
+    col = SORT_COLUMNS[sort_by]
+    count = _build_count(active, capped)
+    columns = (ReceiptModel,) if with_items else SUMMARY_COLUMNS + (item_count_column(),)
+    if windowed:
+        # every row carries the total: a window over all matches, or the
+        # capped count, which is uncorrelated and so evaluated once
+        total = count.scalar_subquery() if capped else func.count().over()
+        columns += (total.label("total_count"),)
+    page = apply_receipt_filters(
+        select(*columns).where(ReceiptModel.user_id == bindparam("user_id")), active
+    )
+    page = page.order_by(desc(col) if sort_order == "desc" else col)
+    if with_items:
+        page = page.options(selectinload(ReceiptModel.items))
+    page = page.offset(bindparam("offset")).limit(bindparam("limit"))
+    return page, count
+
+
+def _build_count_estimate(active: Tuple[str, ...]):
+    def sample(order):
+        rows = (
+            apply_receipt_filters(
+                select(ReceiptModel.created_at).where(ReceiptModel.user_id == bindparam("user_id")), active
+            )
+            .order_by(order)
+            .limit(bindparam("count_limit"))
+            .subquery()
+        )
+        return select(func.min(rows.c.created_at).label("first"), func.max(rows.c.created_at).label("last")).subquery()
+
+    newest, oldest = sample(desc(ReceiptModel.created_at)), sample(ReceiptModel.created_at)
+    return select(newest.c.first, newest.c.last, oldest.c.first, oldest.c.last).select_from(newest.join(oldest, true()))
+
+
+receipt_list_cache = StatementCache()
+
+
+def receipt_list_statements(
+    filters: ReceiptFilters,
+    sort_by: str,
+    sort_order: str,
+    with_items: bool = True,
+    windowed: bool = False,
+    capped: bool = False,
+):
+    """Page and count statements for one filter shape; values go in
+    receipt_list_params. Without items the page yields summary rows
+    (SUMMARY_COLUMNS plus item_count) and loads no receipt_items rows.
+    ``windowed`` adds the total to every page row as ``total_count``;
+    ``capped`` stops counting at the ``count_limit`` parameter."""
+    key = (filters.active(), sort_by, sort_order, with_items, windowed, capped)
+    return receipt_list_cache.get(key, lambda: _build_list_statements(*key))
+
+
+def receipt_count_estimate_statement(filters: ReceiptFilters):
+    """First and last created_at of the newest ``count_limit`` matches,
+    then of the oldest ``count_limit``."""
+    active = filters.active()
+    return receipt_list_cache.get(("estimate", active), lambda: _build_count_estimate(active))
+
+
+def receipt_list_params(
+    user_id: int, filters: ReceiptFilters, offset: int, limit: int, count_limit: int = 0
+) -> Dict[str, Any]:
+    params = {"user_id": user_id, "offset": offset, "limit": limit, **filters.params()}
+    if count_limit:
+        # one past the limit tells whether it was passed
+        params["count_limit"] = count_limit + 1
+    return params
+
+
+def statement_cache_info() -> Dict[str, Dict[str, int]]:
+    return {"receipt_list": receipt_list_cache.info()}
+
+
+def hot_statements() -> List[Tuple[Any, Dict[str, Any]]]:
+    """Statements run on almost every request, executed once at startup so
+    their compiled forms are already in the engine's cache."""
+    settings = get_settings()
+    count_limit = settings.receipt_list_count_limit
+    page, count = receipt_list_statements(
+        ReceiptFilters(), "created_at", "desc", True, settings.receipt_list_count == "window", bool(count_limit)
+    )
+    list_params = receipt_list_params(0, ReceiptFilters(), 0, 10, count_limit)
+    return [
+        (user_by_id(0), {}),
+        (receipt_with_items(0), {}),
+        (receipt_with_items(0, user_id=0), {}),
+        (count, list_params),
+        (page, list_params),
+    ]
@@ -0,0 +1,170 @@
+"""Receipts sharded by user across databases.
+
+Shard 0 is ``DATABASE_URL``. It is also the directory: every user is
+registered there, with ``users.shard_id`` naming the shard that holds their
+receipts, stats and idempotency keys. ``SHARDS`` maps the other shard ids to
+database URLs; each has the full schema and its own copy of the users row of
+every user it holds, for the foreign keys and ``data_version``.
+
+Receipt ids are unique across shards: shard N issues ids from
+``N << SHARD_ID_SHIFT`` on (``prepare_shard`` moves its id sequence there),
+so the shard that created a receipt can be read off its id. A receipt keeps
+its id when its user moves; ``receipt_relocations`` in the directory then
+says where it went.
+"""
+import time
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.connection import create_engines, create_sessionmaker, get_sessionmaker
+from app.database.models import ReceiptRelocationModel, UserModel
+
+# 2**40 receipts per shard before its ids run into the next one
+SHARD_ID_SHIFT = 40
+
+_shard_engines: Dict[int, Tuple[AsyncEngine, AsyncEngine]] = {}
+_shard_factories: Dict[int, sessionmaker] = {}
+
+
+def receipt_id_base(shard_id: int) -> int:
+    return shard_id << SHARD_ID_SHIFT
+
+
+def home_shard(receipt_id: int) -> int:
+    """The shard that issued ``receipt_id``."""
+    return receipt_id >> SHARD_ID_SHIFT
+
+
+def sharding_enabled() -> bool:
+    return bool(get_settings().shards)
+
+
+def shard_ids() -> List[int]:
+    return [0, *sorted(get_settings().shards)]
+
+
+def get_shard_engines(shard_id: int) -> Tuple[AsyncEngine, AsyncEngine]:
+    """``(writer, reader)`` of a shard other than 0. Raises KeyError for a
+    shard missing from ``SHARDS``."""
+    if shard_id not in _shard_engines:
+        settings = get_settings()
+        url = settings.shards[shard_id]
+        _shard_engines[shard_id] = create_engines(settings.model_copy(update={"database_url": url}))
+    return _shard_engines[shard_id]
+
+
+def shard_sessionmaker(shard_id: int, directory: Optional[sessionmaker] = None) -> sessionmaker:
+    """Sessions on ``shard_id``; for shard 0, ``directory`` when given (so
+    callers holding their own factory keep using it)."""
+    if shard_id == 0:
+        return directory or get_sessionmaker()
+    if shard_id not in _shard_factories:
+        writer, reader = get_shard_engines(shard_id)
+        _shard_factories[shard_id] = create_sessionmaker(writer, reader, info={"shard_id": shard_id})
+    return _shard_factories[shard_id]
+
+
+def session_shard(session: AsyncSession) -> int:
+    """The shard a session from ``shard_sessionmaker`` works on."""
+    return session.info.get("shard_id", 0)
+
+
+async def dispose_shards() -> None:
+    for writer, reader in _shard_engines.values():
+        if reader is not writer:
+            await reader.dispose()
+        await writer.dispose()
+    _shard_engines.clear()
+    _shard_factories.clear()
+
+
+class ShardMap:
+    """user id -> shard, cached for ``SHARD_MAP_TTL_SECONDS``. After a move
+    other processes keep writing to the old shard for at most that long,
+    which is why the move tool waits that long before its catch-up copy."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[int, Tuple[int, float]] = {}
+        self._lock = Lock()
+
+    def get(self, user_id: int) -> Optional[int]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def put(self, user_id: int, shard_id: int, ttl: float) -> None:
+        with self._lock:
+            self._entries[user_id] = (shard_id, time.monotonic() + ttl)
+
+    def forget(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+shard_map = ShardMap()
+
+
+async def user_shard(directory: AsyncSession, user_id: int) -> int:
+    """The shard holding ``user_id``'s receipts; 0 without a query when
+    sharding is off."""
+    settings = get_settings()
+    if not settings.shards:
+        return 0
+    shard_id = shard_map.get(user_id)
+    if shard_id is None:
+        row = await directory.execute(select(UserModel.shard_id).where(UserModel.id == user_id))
+        shard_id = row.scalar() or 0
+        shard_map.put(user_id, shard_id, settings.shard_map_ttl_seconds)
+    return shard_id
+
+
+async def relocated_shards(directory: AsyncSession, receipt_ids: List[int]) -> Dict[int, int]:
+    """receipt id -> shard for those of ``receipt_ids`` that moved away from
+    their home shard."""
+    if not receipt_ids or not sharding_enabled():
+        return {}
+    rows = await directory.execute(
+        select(ReceiptRelocationModel.receipt_id, ReceiptRelocationModel.shard_id).where(
+            ReceiptRelocationModel.receipt_id.in_(receipt_ids)
+        )
+    )
+    return dict(rows.all())
+
+
+async def prepare_shard(engine: AsyncEngine, shard_id: int) -> None:
+    """Move the receipt id sequence of ``shard_id`` up to its base; a no-op
+    once it is there."""
+    base = receipt_id_base(shard_id)
+    if base == 0:
+        return
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            sequence = (await conn.execute(text("SELECT pg_get_serial_sequence('receipts', 'id')"))).scalar()
+            last = (await conn.execute(text(f"SELECT last_value FROM {sequence}"))).scalar()
+            if last < base:
+                await conn.execute(text("SELECT setval(:sequence, :base, false)"), {"sequence": sequence, "base": base})
+        else:
+            # receipts is AUTOINCREMENT, so the next id follows sqlite_sequence
+            seq = (await conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'receipts'"))).scalar()
+            if seq is None:
+                stmt = "INSERT INTO sqlite_sequence (name, seq) VALUES ('receipts', :seq)"
+            elif seq < base - 1:
+                stmt = "UPDATE sqlite_sequence SET seq = :seq WHERE name = 'receipts'"
+            else:
+                return
+            await conn.execute(text(stmt), {"seq": base - 1})
+
+
+async def prepare_shards() -> None:
+    for shard_id in get_settings().shards:
+        await prepare_shard(get_shard_engines(shard_id)[0], shard_id)
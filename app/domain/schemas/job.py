@@ -0,0 +1,47 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any
+from datetime import date, datetime
+from enum import Enum
+
+class JobKind(str, Enum):
+    RECEIPT_EXPORT = "receipt_export"
+    STATS_REBUILD = "stats_rebuild"
+    TEXT_RENDER = "text_render"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class ReceiptExportParams(BaseModel):
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+class TextRenderParams(ReceiptExportParams):
+    line_width: int = Field(40, ge=20, le=120)
+
+class StatsRebuildParams(BaseModel):
+    pass
+
+class JobCreate(BaseModel):
+    kind: JobKind
+    params: Dict[str, Any] = Field(default_factory=dict)
+    # lower runs first; defaults per kind
+    priority: Optional[int] = Field(None, ge=0, le=100)
+
+class JobResponse(BaseModel):
+    id: int
+    kind: JobKind
+    status: JobStatus
+    priority: int
+    params: Dict[str, Any]
+    processed: int
+    total: Optional[int]
+    cancel_requested: bool
+    error: Optional[str]
+    artifact_url: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 class PaymentType(str, Enum):
@@ -39,6 +39,31 @@ class ReceiptResponse(BaseModel):
     rest: Decimal
     created_at: datetime
 
+    @classmethod
+    def from_model(cls, r: Any) -> "ReceiptResponse":
+        """Build from a ReceiptModel (hot or archived) with items loaded."""
+        return cls(
+            id=r.id,
+            products=[
+                ReceiptItemResponse(name=i.name, price=i.price, quantity=i.quantity, total=i.total)
+                for i in r.items
+            ],
+            payment=PaymentResponse(type=r.payment_type, amount=r.payment_amount),
+            total=r.total,
+            rest=r.rest,
+            created_at=r.created_at,
+        )
+
+MAX_LOOKUP_IDS = 500
+
+class ReceiptLookupRequest(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_LOOKUP_IDS)
+
+class ReceiptLookupResponse(BaseModel):
+    # in the order requested; ids that match no receipt are in missing
+    receipts: List[ReceiptResponse]
+    missing: List[int]
+
 class ReceiptListResponse(BaseModel):
     items: List[ReceiptResponse]
     total: int
@@ -47,6 +72,28 @@ class ReceiptListResponse(BaseModel):
     total_pages: int
     has_next: bool
     has_prev: bool
+    # total is extrapolated past RECEIPT_LIST_COUNT_LIMIT matches
+    total_estimated: bool = False
+
+class ReceiptSummaryResponse(BaseModel):
+    id: int
+    payment: PaymentResponse
+    total: Decimal
+    rest: Decimal
+    created_at: datetime
+    item_count: int
+
+class SparseReceiptListResponse(BaseModel):
+    """A list page with only the requested receipt fields."""
+    items: List[Dict[str, Any]]
+    total: int
+    page: int
+    size: int
+    total_pages: int
+    has_next: bool
+    has_prev: bool
+    # total is extrapolated past RECEIPT_LIST_COUNT_LIMIT matches
+    total_estimated: bool = False
 
 class ReceiptStatsResponse(BaseModel):
     total_receipts: int
@@ -55,3 +102,29 @@ class ReceiptStatsResponse(BaseModel):
     max_amount: Decimal
     min_amount: Decimal
     payment_type_stats: List[Dict[str, Any]]
+
+class StatsPeriod(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class ProductMetric(str, Enum):
+    REVENUE = "revenue"
+    QUANTITY = "quantity"
+
+class ProductStat(BaseModel):
+    product_id: int
+    name: str
+    revenue: Optional[Decimal] = None
+    quantity: Optional[Decimal] = None
+    lines: Optional[int] = None
+    # the ranked value may overestimate the true one by up to this much
+    error: Decimal = Decimal("0")
+
+class ProductStatsResponse(BaseModel):
+    period: StatsPeriod
+    date_from: date
+    date_to: date
+    by: ProductMetric
+    exact: bool
+    products: List[ProductStat]
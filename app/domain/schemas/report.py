@@ -0,0 +1,6 @@
+from enum import Enum
+
+class ReportKind(str, Enum):
+    REVENUE = "revenue"
+    INACTIVE = "inactive"
+    PAYMENT_MIX = "payment_mix"
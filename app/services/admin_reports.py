@@ -0,0 +1,269 @@
+"""Platform-wide reports for operations: revenue per user, inactive accounts
+and the payment mix.
+
+Every other query serves one user. A report cuts each shard's user ids into
+ranges of ``ADMIN_REPORT_RANGE_SIZE`` and runs one grouped query per range
+over ``receipt_daily_totals``, so archived receipts count too (see
+app.services.receipt_stats). Range queries run concurrently, each in its own
+session on its own pooled connection, at most ``ADMIN_REPORT_CONCURRENCY`` at
+a time across all shards; keep that within the pool size.
+
+``run_report`` yields a ``partial`` line for each range as it finishes,
+with that range's rows and how many ranges are done, then one ``total`` line
+merging them. Closing the generator, as a client hanging up does, cancels
+the range queries still running. A report without its ``total`` line is
+incomplete.
+
+``python -m app.services.admin_reports revenue --date-from 2026-01-01``
+prints a report as NDJSON.
+"""
+import argparse
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.config import get_settings
+from app.database.connection import dispose_engine, get_reader_engine
+from app.database.filters import day_start
+from app.database.models import ReceiptDailyTotalModel, UserModel
+from app.database.shards import dispose_shards, get_shard_engines, shard_ids
+from app.domain.schemas.report import ReportKind
+
+Rows = List[Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class ReportParams:
+    # UTC days, both included
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    # inactive: no receipt on this many days up to today
+    inactive_days: int = 90
+
+
+@dataclass
+class ReportSpec:
+    rows: Callable[[AsyncSession, int, int, int, ReportParams], Awaitable[Rows]]
+    summary: Callable[[], Dict[str, Any]]
+    merge: Callable[[Dict[str, Any], Rows], None]
+
+
+REPORTS: Dict[str, ReportSpec] = {}
+
+
+def report(kind: ReportKind, summary: Callable[[], Dict[str, Any]], merge: Callable[[Dict[str, Any], Rows], None]):
+    def register(rows: Callable[[AsyncSession, int, int, int, ReportParams], Awaitable[Rows]]):
+        REPORTS[kind.value] = ReportSpec(rows, summary, merge)
+        return rows
+
+    return register
+
+
+def _users_in_range(shard_id: int, first: int, last: int) -> tuple:
+    # shard 0 also lists every user of the other shards, as the directory
+    return UserModel.shard_id == shard_id, UserModel.id >= first, UserModel.id < last
+
+
+def _days_in_period(params: ReportParams) -> tuple:
+    clauses = ()
+    if params.date_from:
+        clauses += (ReceiptDailyTotalModel.day >= params.date_from,)
+    if params.date_to:
+        clauses += (ReceiptDailyTotalModel.day <= params.date_to,)
+    return clauses
+
+
+def _merge_revenue(summary: Dict[str, Any], rows: Rows) -> None:
+    summary["users"] += len(rows)
+    for row in rows:
+        summary["receipts"] += row["receipts"]
+        summary["revenue"] += row["revenue"]
+
+
+@report(
+    ReportKind.REVENUE,
+    summary=lambda: {"users": 0, "receipts": 0, "revenue": Decimal("0")},
+    merge=_merge_revenue,
+)
+async def _revenue(session: AsyncSession, shard_id: int, first: int, last: int, params: ReportParams) -> Rows:
+    """Receipts and revenue of each user with receipts in the period."""
+    result = await session.execute(
+        select(
+            UserModel.id,
+            UserModel.username,
+            func.sum(ReceiptDailyTotalModel.receipt_count),
+            func.sum(ReceiptDailyTotalModel.total_amount),
+        )
+        .join(ReceiptDailyTotalModel, ReceiptDailyTotalModel.user_id == UserModel.id)
+        .where(*_users_in_range(shard_id, first, last), *_days_in_period(params))
+        .group_by(UserModel.id, UserModel.username)
+        .order_by(UserModel.id)
+    )
+    return [
+        {"user_id": user_id, "username": username, "receipts": count, "revenue": Decimal(str(amount))}
+        for user_id, username, count, amount in result
+    ]
+
+
+def _merge_inactive(summary: Dict[str, Any], rows: Rows) -> None:
+    summary["users"] += len(rows)
+
+
+@report(ReportKind.INACTIVE, summary=lambda: {"users": 0}, merge=_merge_inactive)
+async def _inactive(session: AsyncSession, shard_id: int, first: int, last: int, params: ReportParams) -> Rows:
+    """Active accounts older than ``inactive_days`` without a receipt in
+    that many days."""
+    since = datetime.now(timezone.utc).date() - timedelta(days=params.inactive_days)
+    last_day = (
+        select(ReceiptDailyTotalModel.user_id, func.max(ReceiptDailyTotalModel.day).label("day"))
+        .where(ReceiptDailyTotalModel.user_id >= first, ReceiptDailyTotalModel.user_id < last)
+        .group_by(ReceiptDailyTotalModel.user_id)
+        .subquery()
+    )
+    result = await session.execute(
+        select(UserModel.id, UserModel.username, UserModel.created_at, last_day.c.day)
+        .outerjoin(last_day, last_day.c.user_id == UserModel.id)
+        .where(
+            *_users_in_range(shard_id, first, last),
+            UserModel.is_active.is_(True),
+            UserModel.created_at < day_start(since),
+            or_(last_day.c.day.is_(None), last_day.c.day < since),
+        )
+        .order_by(UserModel.id)
+    )
+    return [
+        {"user_id": user_id, "username": username, "created_at": created_at, "last_receipt_day": day}
+        for user_id, username, created_at, day in result
+    ]
+
+
+def _merge_payment_mix(summary: Dict[str, Any], rows: Rows) -> None:
+    for row in rows:
+        entry = summary["payment_types"].setdefault(row["payment_type"], {"receipts": 0, "revenue": Decimal("0")})
+        entry["receipts"] += row["receipts"]
+        entry["revenue"] += row["revenue"]
+
+
+@report(ReportKind.PAYMENT_MIX, summary=lambda: {"payment_types": {}}, merge=_merge_payment_mix)
+async def _payment_mix(session: AsyncSession, shard_id: int, first: int, last: int, params: ReportParams) -> Rows:
+    """Receipts and revenue per payment type in the period."""
+    result = await session.execute(
+        select(
+            ReceiptDailyTotalModel.payment_type,
+            func.sum(ReceiptDailyTotalModel.receipt_count),
+            func.sum(ReceiptDailyTotalModel.total_amount),
+        )
+        .join(UserModel, UserModel.id == ReceiptDailyTotalModel.user_id)
+        .where(*_users_in_range(shard_id, first, last), *_days_in_period(params))
+        .group_by(ReceiptDailyTotalModel.payment_type)
+        .order_by(ReceiptDailyTotalModel.payment_type)
+    )
+    return [
+        {"payment_type": payment_type, "receipts": count, "revenue": Decimal(str(amount))}
+        for payment_type, count, amount in result
+    ]
+
+
+def report_engines(directory: AsyncEngine) -> Dict[int, AsyncEngine]:
+    """shard id -> engine to read it with; ``directory`` serves shard 0."""
+    return {shard_id: get_shard_engines(shard_id)[1] if shard_id else directory for shard_id in shard_ids()}
+
+
+async def user_id_ranges(engine: AsyncEngine, shard_id: int, size: int) -> List[Tuple[int, int]]:
+    """``[first, last)`` ranges of ``size`` ids covering the shard's users."""
+    async with AsyncSession(bind=engine) as session:
+        low, high = (
+            await session.execute(
+                select(func.min(UserModel.id), func.max(UserModel.id)).where(UserModel.shard_id == shard_id)
+            )
+        ).one()
+    if low is None:
+        return []
+    return [(first, min(first + size, high + 1)) for first in range(low, high + 1, size)]
+
+
+async def run_report(
+    engines: Dict[int, AsyncEngine], kind: str, params: ReportParams, concurrency: int, range_size: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """A ``partial`` line per range in the order they finish, then the
+    ``total``."""
+    spec = REPORTS[kind]
+    ranges = [
+        (shard_id, first, last)
+        for shard_id, engine in engines.items()
+        for first, last in await user_id_ranges(engine, shard_id, range_size)
+    ]
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_range(shard_id: int, first: int, last: int):
+        async with slots:
+            async with AsyncSession(bind=engines[shard_id]) as session:
+                return shard_id, first, last, await spec.rows(session, shard_id, first, last, params)
+
+    tasks = [asyncio.create_task(run_range(*r)) for r in ranges]
+    summary = spec.summary()
+    try:
+        pending = set(tasks)
+        done = 0
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                shard_id, first, last, rows = task.result()
+                spec.merge(summary, rows)
+                done += 1
+                yield {
+                    "type": "partial",
+                    "shard": shard_id,
+                    "user_ids": [first, last - 1],
+                    "done": done,
+                    "total": len(ranges),
+                    "rows": rows,
+                }
+        yield {"type": "total", "done": done, "total": len(ranges), **summary}
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def ndjson(lines: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Report lines as the API's JSON, one per line."""
+    async for line in lines:
+        yield json.dumps(jsonable_encoder(line)) + "\n"
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Print a platform-wide report as NDJSON")
+    parser.add_argument("kind", choices=[kind.value for kind in ReportKind])
+    parser.add_argument("--date-from", type=date.fromisoformat)
+    parser.add_argument("--date-to", type=date.fromisoformat)
+    parser.add_argument("--inactive-days", type=int, default=90)
+    parser.add_argument("--concurrency", type=int, default=settings.admin_report_concurrency)
+    parser.add_argument("--range-size", type=int, default=settings.admin_report_range_size)
+    args = parser.parse_args(argv)
+    params = ReportParams(args.date_from, args.date_to, args.inactive_days)
+
+    async def run() -> None:
+        try:
+            lines = run_report(
+                report_engines(get_reader_engine()), args.kind, params, args.concurrency, args.range_size
+            )
+            async for line in ndjson(lines):
+                print(line, end="", flush=True)
+        finally:
+            await dispose_shards()
+            await dispose_engine()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Idempotency-Key support for POST /receipts.
+
+A key is stored per user in ``idempotency_keys`` with a SHA-256 of the
+request body and the id of the receipt it created. The row is inserted in
+the same transaction as the receipt, so a retry either finds it and replays
+the original receipt or creates the receipt itself. Two concurrent requests
+with one key race on the ``(user_id, key)`` unique constraint and the loser
+replays the winner's receipt. Receipts never change after creation, so
+rendering the stored receipt again reproduces the original response.
+
+Completed keys are also kept in an in-process LRU together with the
+rendered response, so a replay served from it does not touch the database.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import IdempotencyKeyModel
+from app.domain.schemas.receipt import ReceiptCreate
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredKey:
+    request_hash: str
+    receipt_id: int
+    expires_at: datetime
+    response: Optional[Any] = None
+
+    @property
+    def expired(self) -> bool:
+        return _as_utc(self.expires_at) <= datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps that are already UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def request_hash(receipt_data: ReceiptCreate) -> str:
+    body = json.dumps(receipt_data.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def key_row(user_id: int, key: str, fingerprint: str, ttl: timedelta) -> Dict[str, Any]:
+    """Values for the ``idempotency_keys`` row; the receipt id is added by
+    the insert that creates the receipt."""
+    return {
+        "user_id": user_id,
+        "key": key,
+        "request_hash": fingerprint,
+        "expires_at": datetime.now(timezone.utc) + ttl,
+    }
+
+
+class KeyCache:
+    """Completed keys by (user id, key), dropped once expired."""
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[int, str], StoredKey]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id: int, key: str) -> Optional[StoredKey]:
+        with self._lock:
+            stored = self._entries.get((user_id, key))
+            if stored is None:
+                return None
+            if stored.expired:
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return stored
+
+    def put(self, user_id: int, key: str, stored: StoredKey) -> None:
+        with self._lock:
+            self._entries[(user_id, key)] = stored
+            self._entries.move_to_end((user_id, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+key_cache = KeyCache()
+
+
+async def find_key(session: AsyncSession, user_id: int, key: str) -> Optional[StoredKey]:
+    stored = key_cache.get(user_id, key)
+    if stored is not None:
+        return stored
+    row = (
+        await session.execute(
+            select(IdempotencyKeyModel).where(IdempotencyKeyModel.user_id == user_id, IdempotencyKeyModel.key == key)
+        )
+    ).scalar()
+    if row is None:
+        return None
+    stored = StoredKey(row.request_hash, row.receipt_id, row.expires_at)
+    if stored.expired:
+        # not purged yet; free the key so it can be used again
+        await session.delete(row)
+        await session.commit()
+        return None
+    return stored
+
+
+async def purge_expired_keys(session_factory: sessionmaker) -> int:
+    async with session_factory() as session:
+        result = await session.execute(
+            delete(IdempotencyKeyModel).where(IdempotencyKeyModel.expires_at <= datetime.now(timezone.utc))
+        )
+        await session.commit()
+    return result.rowcount
+
+
+async def maintain_idempotency_keys(session_factory: sessionmaker, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await purge_expired_keys(session_factory)
+            if purged:
+                logger.info("Purged %d expired idempotency keys", purged)
+        except Exception:
+            logger.exception("Idempotency key cleanup failed")
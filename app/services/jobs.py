@@ -0,0 +1,541 @@
+"""Background jobs: receipt exports, stats rebuilds and text re-rendering.
+
+Jobs are rows in ``jobs``. ``enqueue_job`` stores one and hands it to the
+runner, whose ``JOBS_CONCURRENCY`` workers take queued jobs lowest
+``priority`` first. Jobs read in chunks of ``CHUNK_SIZE`` receipts and
+pause after each one so that a job works at most ``JOBS_DUTY_CYCLE`` of the
+time. At most ``JOBS_CONCURRENCY`` pooled connections go to background work,
+and the event loop keeps serving requests during the pauses. Progress is
+written back at most every ``PROGRESS_INTERVAL`` seconds, and each write
+reads back ``cancel_requested``, so a cancel reaches the job whichever
+process runs it, at the next chunk boundary. Results are files under
+``JOBS_ARTIFACT_DIR``.
+
+Several processes can run jobs off one database. A runner claims a job with
+a conditional update from ``queued`` to ``running`` and stamps its
+``worker_id`` on it, and stamps ``heartbeat_at`` on its running jobs every
+``JOBS_HEARTBEAT_SECONDS``. A running job whose heartbeat is
+``STALE_HEARTBEATS`` intervals old lost its runner and is queued again by
+whichever runner notices first, at start or on a heartbeat; its old runner,
+if still alive, drops it at the next progress write. Jobs still running
+when a runner stops are queued again at once. Every kind rewrites its
+artifact from scratch, so a rerun is safe.
+"""
+import asyncio
+import csv
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Type
+
+from pydantic import BaseModel
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.database.filters import day_start
+from app.database.models import JobModel, ReceiptArchiveTotalModel, ReceiptModel
+from app.database.queries import bump_data_versions
+from app.database.shards import shard_sessionmaker, user_shard
+from app.domain.schemas.job import (
+    JobKind,
+    JobStatus,
+    ReceiptExportParams,
+    StatsRebuildParams,
+    TextRenderParams,
+)
+from app.services.receipt_archive import archived_totals, iter_archived_segments
+from app.services.receipt_formatter import ReceiptFormatter
+from app.services.receipt_stats import recompute_daily_totals
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 100
+PROGRESS_INTERVAL = 0.5
+STALE_HEARTBEATS = 3
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLost(Exception):
+    """The job was queued again by another runner after its heartbeat went stale."""
+
+
+class JobContext:
+    def __init__(self, runner: "JobRunner", job: JobModel, params: Optional[BaseModel]):
+        self.runner = runner
+        self.job_id = job.id
+        self.user_id = job.user_id
+        self.kind = job.kind
+        self.params = params
+        # the user's shard, for everything but the job row
+        self.data_factory: sessionmaker = runner.session_factory
+        self.processed = 0
+        self.total: Optional[int] = None
+        self._flushed_at = 0.0
+        self._resumed_at = time.monotonic()
+
+    def session(self) -> AsyncSession:
+        return self.data_factory()
+
+    def artifact_path(self, suffix: str) -> str:
+        os.makedirs(self.runner.artifact_dir, exist_ok=True)
+        return os.path.join(self.runner.artifact_dir, f"job-{self.job_id}-{self.kind}{suffix}")
+
+    async def checkpoint(self, processed: Optional[int] = None) -> None:
+        """Call between chunks: records progress, raises JobCancelled if the
+        job was cancelled (JobLost if another runner took it over) and
+        yields to foreground work."""
+        if processed is not None:
+            self.processed = processed
+        if self.job_id in self.runner.cancel_requested:
+            raise JobCancelled()
+        if time.monotonic() - self._flushed_at >= PROGRESS_INTERVAL:
+            await self.flush_progress()
+        worked = time.monotonic() - self._resumed_at
+        duty_cycle = self.runner.duty_cycle
+        await asyncio.sleep(worked * (1 - duty_cycle) / duty_cycle)
+        self._resumed_at = time.monotonic()
+
+    async def flush_progress(self) -> None:
+        self._flushed_at = time.monotonic()
+        async with self.runner.session_factory() as session:
+            cancel_requested = (
+                await session.execute(
+                    update(JobModel)
+                    .where(JobModel.id == self.job_id, JobModel.worker_id == self.runner.worker_id)
+                    .values(processed=self.processed, total=self.total, heartbeat_at=_now())
+                    .returning(JobModel.cancel_requested)
+                )
+            ).scalar()
+            await session.commit()
+        if cancel_requested is None:
+            raise JobLost()
+        if cancel_requested:
+            raise JobCancelled()
+
+
+@dataclass
+class JobKindSpec:
+    run: Callable[[JobContext], Awaitable[Optional[str]]]
+    params: Type[BaseModel]
+    priority: int
+
+
+JOB_KINDS: Dict[str, JobKindSpec] = {}
+
+
+def job_kind(kind: JobKind, params: Type[BaseModel], priority: int):
+    def register(run: Callable[[JobContext], Awaitable[Optional[str]]]):
+        JOB_KINDS[kind.value] = JobKindSpec(run, params, priority)
+        return run
+
+    return register
+
+
+def _bounds(params: ReceiptExportParams):
+    return (
+        day_start(params.date_from) if params.date_from else None,
+        day_start(params.date_to) if params.date_to else None,
+    )
+
+
+async def _count_receipts(ctx: JobContext, date_from: Optional[datetime], date_to: Optional[datetime]) -> int:
+    stmt = select(func.count(ReceiptModel.id)).where(ReceiptModel.user_id == ctx.user_id)
+    if date_from is not None:
+        stmt = stmt.where(ReceiptModel.created_at >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(ReceiptModel.created_at <= date_to)
+    async with ctx.session() as session:
+        hot = (await session.execute(stmt)).scalar()
+        archived = 0
+        if date_from is None and date_to is None:
+            archived = sum(t.receipt_count for t in await archived_totals(session, ctx.user_id))
+    return hot + archived
+
+
+async def _archived_chunks(ctx: JobContext, date_from: Optional[datetime], date_to: Optional[datetime]):
+    # a session per segment, so no connection is held across checkpoints
+    async for receipts in iter_archived_segments(ctx.data_factory, ctx.user_id, date_from, date_to):
+        for start in range(0, len(receipts), CHUNK_SIZE):
+            yield receipts[start : start + CHUNK_SIZE]
+
+
+async def _hot_chunks(ctx: JobContext, date_from: Optional[datetime], date_to: Optional[datetime]):
+    last_id = 0
+    while True:
+        stmt = (
+            select(ReceiptModel)
+            .where(ReceiptModel.user_id == ctx.user_id, ReceiptModel.id > last_id)
+            .order_by(ReceiptModel.id)
+            .limit(CHUNK_SIZE)
+            .options(selectinload(ReceiptModel.items))
+        )
+        if date_from is not None:
+            stmt = stmt.where(ReceiptModel.created_at >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(ReceiptModel.created_at <= date_to)
+        # a session per chunk, so no connection is held across checkpoints
+        async with ctx.session() as session:
+            chunk = list((await session.execute(stmt)).scalars())
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+async def _iter_user_receipts(ctx: JobContext, params: ReceiptExportParams):
+    """The user's receipts in id order, archived ones first, in chunks; a
+    checkpoint runs after every chunk."""
+    date_from, date_to = _bounds(params)
+    ctx.total = await _count_receipts(ctx, date_from, date_to)
+    done = 0
+    for chunks in (_archived_chunks(ctx, date_from, date_to), _hot_chunks(ctx, date_from, date_to)):
+        async for chunk in chunks:
+            yield chunk
+            done += len(chunk)
+            await ctx.checkpoint(done)
+    # with a date range archived receipts are not counted up front
+    ctx.total = done
+
+
+EXPORT_COLUMNS = [
+    "receipt_id",
+    "created_at",
+    "payment_type",
+    "payment_amount",
+    "receipt_total",
+    "rest",
+    "item_name",
+    "item_price",
+    "item_quantity",
+    "item_total",
+]
+
+
+@job_kind(JobKind.RECEIPT_EXPORT, ReceiptExportParams, priority=10)
+async def export_receipts(ctx: JobContext) -> str:
+    """CSV with one row per receipt item."""
+    path = ctx.artifact_path(".csv")
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_COLUMNS)
+        async for chunk in _iter_user_receipts(ctx, ctx.params):
+            for r in chunk:
+                for i in r.items:
+                    writer.writerow(
+                        [
+                            r.id,
+                            r.created_at.isoformat(),
+                            r.payment_type,
+                            r.payment_amount,
+                            r.total,
+                            r.rest,
+                            i.name,
+                            i.price,
+                            i.quantity,
+                            i.total,
+                        ]
+                    )
+    return path
+
+
+@job_kind(JobKind.TEXT_RENDER, TextRenderParams, priority=20)
+async def render_receipts(ctx: JobContext) -> str:
+    """Every receipt in the printed text layout, separated by blank lines."""
+    formatter = ReceiptFormatter(line_width=ctx.params.line_width)
+    path = ctx.artifact_path(".txt")
+    with open(path, "w", encoding="utf-8") as out:
+        async for chunk in _iter_user_receipts(ctx, ctx.params):
+            out.write(formatter.format_many(chunk))
+    return path
+
+
+@job_kind(JobKind.STATS_REBUILD, StatsRebuildParams, priority=5)
+async def rebuild_archive_totals(ctx: JobContext) -> None:
+    """Recompute the user's receipt_archive_totals from the segments, then
+    their daily totals."""
+    async with ctx.session() as session:
+        ctx.total = sum(t.receipt_count for t in await archived_totals(session, ctx.user_id))
+    totals: Dict[str, list] = {}
+    done = 0
+    async for chunk in _archived_chunks(ctx, None, None):
+        for r in chunk:
+            entry = totals.setdefault(r.payment_type, [0, Decimal("0"), r.total, r.total])
+            entry[0] += 1
+            entry[1] += r.total
+            entry[2] = min(entry[2], r.total)
+            entry[3] = max(entry[3], r.total)
+        done += len(chunk)
+        await ctx.checkpoint(done)
+    ctx.total = done
+    async with ctx.session() as session:
+        await session.execute(delete(ReceiptArchiveTotalModel).where(ReceiptArchiveTotalModel.user_id == ctx.user_id))
+        await session.execute(bump_data_versions([ctx.user_id]))
+        for payment_type, (count, amount, low, high) in totals.items():
+            session.add(
+                ReceiptArchiveTotalModel(
+                    user_id=ctx.user_id,
+                    payment_type=payment_type,
+                    receipt_count=count,
+                    total_amount=amount,
+                    min_total=low,
+                    max_total=high,
+                )
+            )
+        await session.commit()
+    await recompute_daily_totals(ctx.data_factory, [ctx.user_id])
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobRunner:
+    """``concurrency`` workers over a priority queue of job ids."""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        artifact_dir: str,
+        concurrency: int = 1,
+        duty_cycle: float = 1.0,
+        heartbeat_seconds: float = 10.0,
+    ):
+        if not 0 < duty_cycle <= 1:
+            raise ValueError(f"duty_cycle must be above 0 and at most 1, got {duty_cycle}")
+        self.session_factory = session_factory
+        self.artifact_dir = artifact_dir
+        self.concurrency = concurrency
+        self.duty_cycle = duty_cycle
+        self.heartbeat_seconds = heartbeat_seconds
+        self.worker_id = f"{socket.gethostname()[:32]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.cancel_requested: Set[int] = set()
+        self._queue: "asyncio.PriorityQueue[tuple]" = asyncio.PriorityQueue()
+        self._workers: List[asyncio.Task] = []
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return any(not w.done() for w in self._workers)
+
+    async def start(self) -> None:
+        queued = []
+        try:
+            async with self.session_factory() as session:
+                # running jobs whose runner died; the requeued ones are picked up below
+                await self._requeue_stale(session)
+                queued = (
+                    await session.execute(
+                        select(JobModel.priority, JobModel.id).where(JobModel.status == JobStatus.QUEUED.value)
+                    )
+                ).all()
+        except SQLAlchemyError as exc:
+            logger.warning("Could not recover queued jobs: %s", exc)
+        for priority, job_id in queued:
+            self.schedule(job_id, priority)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._heartbeat = asyncio.create_task(self._beat())
+
+    async def stop(self) -> None:
+        """Stop the workers; a job cut short goes back to ``queued``."""
+        tasks = self._workers + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
+
+    async def _requeue_stale(self, session: AsyncSession) -> List[tuple]:
+        """Queue running jobs with a stale heartbeat again; commits and
+        returns their (priority, id)."""
+        stale_before = _now() - timedelta(seconds=self.heartbeat_seconds * STALE_HEARTBEATS)
+        requeued = (
+            await session.execute(
+                update(JobModel)
+                .where(
+                    JobModel.status == JobStatus.RUNNING.value,
+                    or_(JobModel.heartbeat_at.is_(None), JobModel.heartbeat_at < stale_before),
+                )
+                .values(status=JobStatus.QUEUED.value, worker_id=None, heartbeat_at=None, processed=0, total=None)
+                .returning(JobModel.priority, JobModel.id)
+            )
+        ).all()
+        await session.commit()
+        for _, job_id in requeued:
+            logger.warning("Job %s lost its runner and was queued again", job_id)
+        return requeued
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(
+                        update(JobModel)
+                        .where(JobModel.worker_id == self.worker_id, JobModel.status == JobStatus.RUNNING.value)
+                        .values(heartbeat_at=_now())
+                    )
+                    await session.commit()
+                    requeued = await self._requeue_stale(session)
+            except SQLAlchemyError as exc:
+                logger.warning("Job heartbeat failed: %s", exc)
+                continue
+            for priority, job_id in requeued:
+                self.schedule(job_id, priority)
+
+    async def join(self) -> None:
+        """Wait until every scheduled job has finished."""
+        await self._queue.join()
+
+    def schedule(self, job_id: int, priority: int) -> None:
+        self._queue.put_nowait((priority, job_id))
+
+    async def _work(self) -> None:
+        while True:
+            _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job %s could not be run", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _finish(self, job_id: int, **values: Any) -> None:
+        # a job another runner took over is left to it
+        async with self.session_factory() as session:
+            await session.execute(
+                update(JobModel).where(JobModel.id == job_id, JobModel.worker_id == self.worker_id).values(**values)
+            )
+            await session.commit()
+
+    async def _run(self, job_id: int) -> None:
+        async with self.session_factory() as session:
+            now = _now()
+            # conditional, so of two runners holding the same id only one gets the job
+            claimed = await session.execute(
+                update(JobModel)
+                .where(JobModel.id == job_id, JobModel.status == JobStatus.QUEUED.value)
+                .values(status=JobStatus.RUNNING.value, started_at=now, heartbeat_at=now, worker_id=self.worker_id)
+            )
+            await session.commit()
+            if claimed.rowcount != 1:
+                return
+            job = await session.get(JobModel, job_id)
+            shard_id = await user_shard(session, job.user_id)
+        ctx = JobContext(self, job, None)
+        ctx.data_factory = shard_sessionmaker(shard_id, self.session_factory)
+        try:
+            spec = JOB_KINDS[job.kind]
+            ctx.params = spec.params.model_validate(job.params)
+            artifact = await spec.run(ctx)
+        except JobCancelled:
+            await self._finish(job_id, status=JobStatus.CANCELLED.value, finished_at=_now(), processed=ctx.processed)
+        except JobLost:
+            logger.warning("Job %s was taken over by another runner", job_id)
+        except asyncio.CancelledError:
+            await asyncio.shield(
+                self._finish(
+                    job_id, status=JobStatus.QUEUED.value, processed=0, total=None, worker_id=None, heartbeat_at=None
+                )
+            )
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job_id, job.kind)
+            await self._finish(job_id, status=JobStatus.FAILED.value, finished_at=_now(), error=str(exc) or repr(exc))
+        else:
+            await self._finish(
+                job_id,
+                status=JobStatus.SUCCEEDED.value,
+                finished_at=_now(),
+                artifact=artifact,
+                processed=ctx.processed,
+                total=ctx.total,
+            )
+        finally:
+            self.cancel_requested.discard(job_id)
+
+
+_runner: Optional[JobRunner] = None
+
+
+def get_job_runner() -> Optional[JobRunner]:
+    return _runner if _runner is not None and _runner.running else None
+
+
+async def start_job_runner(
+    session_factory: sessionmaker,
+    artifact_dir: str,
+    concurrency: int,
+    duty_cycle: float,
+    heartbeat_seconds: float = 10.0,
+) -> JobRunner:
+    global _runner
+    _runner = JobRunner(session_factory, artifact_dir, concurrency, duty_cycle, heartbeat_seconds)
+    await _runner.start()
+    return _runner
+
+
+async def stop_job_runner() -> None:
+    global _runner
+    if _runner is not None:
+        await _runner.stop()
+    _runner = None
+
+
+async def enqueue_job(
+    session: AsyncSession, user_id: int, kind: JobKind, params: Dict[str, Any], priority: Optional[int] = None
+) -> JobModel:
+    """Store a queued job and hand it to the runner if one is running;
+    otherwise it is picked up when the runner starts. Raises
+    pydantic.ValidationError for bad params."""
+    spec = JOB_KINDS[kind.value]
+    validated = spec.params.model_validate(params)
+    job = JobModel(
+        user_id=user_id,
+        kind=kind.value,
+        status=JobStatus.QUEUED.value,
+        priority=spec.priority if priority is None else priority,
+        params=validated.model_dump(mode="json"),
+        processed=0,
+        cancel_requested=False,
+    )
+    session.add(job)
+    await session.commit()
+    runner = get_job_runner()
+    if runner is not None:
+        runner.schedule(job.id, job.priority)
+    return job
+
+
+async def cancel_job(session: AsyncSession, job: JobModel) -> JobModel:
+    """A queued job is cancelled at once, a running one at its next
+    checkpoint; finished jobs are left alone."""
+    # conditional, so a worker picking the job up at the same time wins or loses cleanly
+    cancelled = await session.execute(
+        update(JobModel)
+        .where(JobModel.id == job.id, JobModel.status == JobStatus.QUEUED.value)
+        .values(status=JobStatus.CANCELLED.value, finished_at=_now(), cancel_requested=True)
+    )
+    if not cancelled.rowcount:
+        running = await session.execute(
+            update(JobModel)
+            .where(JobModel.id == job.id, JobModel.status == JobStatus.RUNNING.value)
+            .values(cancel_requested=True)
+        )
+        runner = get_job_runner()
+        if running.rowcount and runner is not None:
+            runner.cancel_requested.add(job.id)
+    await session.commit()
+    await session.refresh(job)
+    return job
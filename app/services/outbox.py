@@ -0,0 +1,353 @@
+"""Transactional outbox for downstream systems (fiscal registrar, loyalty,
+ERP).
+
+With ``OUTBOX_ENABLED`` every receipt insert also writes a
+``receipt_outbox`` row carrying the receipt JSON, in the same transaction,
+so an event exists exactly when its receipt does and the sale never waits
+on a downstream call. ``OutboxDispatcher`` drains the table in id order,
+``OUTBOX_BATCH_SIZE`` events per call to the sink, and deletes what was
+delivered. A failed batch is retried per user; the events of a user whose
+delivery failed wait ``OUTBOX_RETRY_BASE_SECONDS``, doubling with every
+attempt up to ``OUTBOX_RETRY_MAX_SECONDS``, and none of that user's later
+events are sent before them. Events are never given up on.
+
+Delivery is at least once: a crash between the sink call and the delete
+sends the batch again, so sinks should drop repeated ``receipt_id``s. The
+batch is read in one short transaction and deleted or rescheduled in
+another, so no transaction is open while the sink is called, however long
+a failing sink takes. Each shard has its own outbox and dispatcher. On
+Postgres a session-level advisory lock, held on a connection outside any
+transaction, keeps a single dispatcher per database active; on SQLite
+dispatch from one process only. Events a user left on the old shard when moving are still
+delivered from there.
+
+Sinks take a list of events, each one line of JSON::
+
+    {"type": "receipt.created", "user_id": 1, "receipt_id": 7, "receipt": {...}}
+
+``OUTBOX_SINK`` picks one: an ``http(s)://`` URL gets each batch POSTed as
+``application/x-ndjson``, anything else is a file the lines are appended to.
+"""
+import argparse
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.connection import dispose_engine
+from app.database.models import ReceiptModel, ReceiptOutboxModel
+from app.database.shards import dispose_shards, shard_ids, shard_sessionmaker
+from app.domain.schemas.receipt import ReceiptResponse
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key held by the active dispatcher of a database
+DISPATCH_LOCK = 0x6F7574626F78
+# past this many doublings the delay is at OUTBOX_RETRY_MAX_SECONDS anyway
+MAX_BACKOFF_DOUBLINGS = 32
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def outbox_rows(receipts: Sequence[ReceiptModel]) -> List[Dict[str, Any]]:
+    """``receipt_outbox`` rows for freshly inserted receipts, ``items``
+    loaded."""
+    now = _now()
+    return [
+        {
+            "user_id": receipt.user_id,
+            "receipt_id": receipt.id,
+            "payload": ReceiptResponse.from_model(receipt).model_dump_json(),
+            "created_at": now,
+            "available_at": now,
+        }
+        for receipt in receipts
+    ]
+
+
+def event_line(row: ReceiptOutboxModel) -> str:
+    # the payload is JSON already; splice it in rather than parse it again
+    return (
+        f'{{"type":"receipt.created","user_id":{row.user_id},"receipt_id":{row.receipt_id},'
+        f'"receipt":{row.payload}}}'
+    )
+
+
+class FileSink:
+    """Appends events to a file, one per line, and syncs it before the
+    batch counts as delivered."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = asyncio.Lock()
+
+    def _append(self, lines: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as sink:
+            sink.write("".join(f"{line}\n" for line in lines))
+            sink.flush()
+            os.fsync(sink.fileno())
+
+    async def send(self, lines: List[str]) -> None:
+        # dispatchers of several shards may share the sink
+        async with self._lock:
+            await asyncio.to_thread(self._append, lines)
+
+    async def close(self) -> None:
+        pass
+
+
+class HttpSink:
+    """POSTs each batch as NDJSON; any status but 2xx fails the batch."""
+
+    def __init__(self, url: str, timeout: float):
+        # imported here so the app starts without it
+        import httpx
+
+        self.url = url
+        self._client = httpx.AsyncClient(timeout=timeout)
+
+    async def send(self, lines: List[str]) -> None:
+        response = await self._client.post(
+            self.url,
+            content="".join(f"{line}\n" for line in lines),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        response.raise_for_status()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def open_sink(target: str, http_timeout: float = 10.0):
+    if target.startswith(("http://", "https://")):
+        return HttpSink(target, http_timeout)
+    if not target:
+        raise ValueError("OUTBOX_SINK is empty")
+    return FileSink(target.removeprefix("file://"))
+
+
+class OutboxDispatcher:
+    """Drains one database's outbox into ``sink``."""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        sink,
+        batch_size: int = 100,
+        poll_interval: float = 1.0,
+        retry_base: float = 1.0,
+        retry_max: float = 300.0,
+    ):
+        self.session_factory = session_factory
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.delivered = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """New events were committed; look without waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                sent = await self.dispatch_once()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                sent = 0
+            if sent < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _backoff(self, attempts: int) -> timedelta:
+        doublings = min(attempts - 1, MAX_BACKOFF_DOUBLINGS)
+        return timedelta(seconds=min(self.retry_max, self.retry_base * 2**doublings))
+
+    async def _send(self, rows: List[ReceiptOutboxModel]) -> Dict[int, str]:
+        """Deliver ``rows``; returns the error of every user whose events
+        could not be delivered."""
+        try:
+            await self.sink.send([event_line(row) for row in rows])
+            return {}
+        except Exception as exc:
+            users = list(dict.fromkeys(row.user_id for row in rows))
+            if len(users) == 1:
+                return {users[0]: str(exc) or repr(exc)}
+            logger.warning("Outbox batch of %d events failed, retrying per user", len(rows), exc_info=True)
+        errors = {}
+        for user_id in users:
+            errors.update(await self._send([row for row in rows if row.user_id == user_id]))
+        return errors
+
+    @asynccontextmanager
+    async def _dispatch_lock(self) -> AsyncIterator[bool]:
+        """Whether this dispatcher is the active one of its database. The
+        lock is held on its own connection, which stays outside any
+        transaction while the batch is out."""
+        async with self.session_factory() as session:
+            engine = session.bind
+        if engine.dialect.name != "postgresql":
+            yield True
+            return
+        async with engine.connect() as conn:
+            locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": DISPATCH_LOCK})).scalar()
+            await conn.commit()
+            try:
+                yield bool(locked)
+            finally:
+                if locked:
+                    await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": DISPATCH_LOCK})
+                    await conn.commit()
+
+    async def dispatch_once(self) -> int:
+        """Send one batch; returns the number of events delivered."""
+        async with self._dispatch_lock() as locked:
+            if not locked:
+                return 0
+            return await self._dispatch_batch()
+
+    async def _dispatch_batch(self) -> int:
+        now = _now()
+        async with self.session_factory() as session:
+            waiting = select(ReceiptOutboxModel.user_id).where(ReceiptOutboxModel.available_at > now)
+            rows = (
+                await session.execute(
+                    select(ReceiptOutboxModel)
+                    .where(ReceiptOutboxModel.user_id.not_in(waiting))
+                    .order_by(ReceiptOutboxModel.id)
+                    .limit(self.batch_size)
+                )
+            ).scalars().all()
+            # closing the session ends the read transaction before the sink is called
+            session.expunge_all()
+        if not rows:
+            return 0
+        errors = await self._send(rows)
+        done = [row.id for row in rows if row.user_id not in errors]
+        async with self.session_factory() as session:
+            if done:
+                await session.execute(delete(ReceiptOutboxModel).where(ReceiptOutboxModel.id.in_(done)))
+            for row in rows:
+                if row.user_id in errors:
+                    await session.execute(
+                        update(ReceiptOutboxModel)
+                        .where(ReceiptOutboxModel.id == row.id)
+                        .values(
+                            attempts=row.attempts + 1,
+                            available_at=_now() + self._backoff(row.attempts + 1),
+                            last_error=errors[row.user_id],
+                        )
+                    )
+            await session.commit()
+        self.delivered += len(done)
+        self.failed += len(rows) - len(done)
+        return len(done)
+
+    async def drain(self) -> int:
+        """Dispatch until nothing is ready; returns the events delivered."""
+        delivered = 0
+        while True:
+            sent = await self.dispatch_once()
+            delivered += sent
+            if sent == 0:
+                return delivered
+
+
+_dispatchers: List[OutboxDispatcher] = []
+_sink = None
+
+
+def wake_outbox() -> None:
+    for dispatcher in _dispatchers:
+        dispatcher.wake()
+
+
+def start_outbox(target: str, run: bool = True) -> List[OutboxDispatcher]:
+    """One dispatcher per shard, all sending to ``target``; with ``run``
+    false they only dispatch when called."""
+    global _sink
+    settings = get_settings()
+    _sink = open_sink(target, settings.outbox_http_timeout_seconds)
+    for shard_id in shard_ids():
+        dispatcher = OutboxDispatcher(
+            shard_sessionmaker(shard_id),
+            _sink,
+            settings.outbox_batch_size,
+            settings.outbox_poll_interval_seconds,
+            settings.outbox_retry_base_seconds,
+            settings.outbox_retry_max_seconds,
+        )
+        if run:
+            dispatcher.start()
+        _dispatchers.append(dispatcher)
+    return list(_dispatchers)
+
+
+async def stop_outbox() -> None:
+    global _sink
+    for dispatcher in _dispatchers:
+        await dispatcher.stop()
+    _dispatchers.clear()
+    if _sink is not None:
+        await _sink.close()
+    _sink = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Send outbox events of every shard to a sink")
+    parser.add_argument("--sink", default=settings.outbox_sink, help="http(s):// URL or file path")
+    parser.add_argument("--drain", action="store_true", help="exit once no event is ready instead of polling")
+    args = parser.parse_args(argv)
+
+    async def run() -> int:
+        dispatchers = start_outbox(args.sink, run=not args.drain)
+        try:
+            if not args.drain:
+                # until interrupted
+                await asyncio.Event().wait()
+            return sum([await d.drain() for d in dispatchers])
+        finally:
+            await stop_outbox()
+            await dispose_shards()
+            await dispose_engine()
+
+    print(f"delivered {asyncio.run(run())} events")
+
+
+if __name__ == "__main__":
+    main()
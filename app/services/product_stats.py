@@ -0,0 +1,369 @@
+"""Per-user product sales by day, kept up to date as receipts are written.
+
+With ``PRODUCT_STATS_MODE=exact`` every (user, day, product) has a
+``product_counters`` row, upserted in the receipt's transaction. With
+``heavy_hitters`` each (user, day, metric) keeps at most
+``PRODUCT_STATS_CAPACITY`` Space-Saving counters instead, so storage and the
+work per write stay bounded however large the catalog grows. A reported
+value then overestimates the truth by at most its ``error``, and any
+product selling more than the smallest tracked count is always tracked.
+
+Week and month windows are summed from the daily rows when read.
+``python -m app.services.product_stats`` recomputes everything exactly from
+hot and archived receipts; run it after switching modes.
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, desc, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.models import (
+    ProductCounterModel,
+    ProductHeavyHitterModel,
+    ProductModel,
+    ReceiptItemModel,
+    ReceiptModel,
+    UserModel,
+)
+from app.database.queries import bump_data_versions, dialect_insert
+from app.services.products import intern_products, normalize_product_name
+from app.services.receipt_archive import iter_archived_receipts
+
+EXACT = "exact"
+HEAVY_HITTERS = "heavy_hitters"
+RECOMPUTE_CHUNK = 5_000
+
+# (user id, created_at, product id, quantity, line total)
+Sale = Tuple[int, datetime, int, Decimal, Decimal]
+
+
+class SpaceSaving:
+    """Weighted Space-Saving summary (Metwally, Agrawal and El Abbadi, 2005)
+    holding at most ``capacity`` counters of ``[count, error]``. A tracked
+    key's true total lies in ``[count - error, count]``; an untracked key's
+    is at most ``floor``."""
+
+    def __init__(self, capacity: int, counters: Optional[Dict[Hashable, List[Decimal]]] = None):
+        self.capacity = capacity
+        self.counters: Dict[Hashable, List[Decimal]] = {k: list(v) for k, v in (counters or {}).items()}
+
+    def add(self, key: Hashable, weight: Decimal) -> None:
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [weight, Decimal(0)]
+        else:
+            evicted = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(evicted)[0]
+            self.counters[key] = [floor + weight, floor]
+
+    @property
+    def floor(self) -> Decimal:
+        if len(self.counters) < self.capacity:
+            return Decimal(0)
+        return min(count for count, _ in self.counters.values())
+
+    def top(self, n: int) -> List[Tuple[Hashable, Decimal, Decimal]]:
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+
+def utc_day(value: datetime) -> date:
+    # SQLite hands back naive timestamps that are already UTC
+    return (value if value.tzinfo is None else value.astimezone(timezone.utc)).date()
+
+
+def period_bounds(period: str, day: date) -> Tuple[date, date]:
+    """First and last day of the day, ISO week or month containing ``day``."""
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == "month":
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return day, day
+
+
+def _by_bucket(sales: Iterable[Sale], buckets=None) -> Dict[Tuple[int, date], Dict[int, List[Any]]]:
+    """quantity, revenue and line count per (user, day) and product, added
+    to ``buckets`` if given."""
+    buckets = buckets if buckets is not None else defaultdict(dict)
+    for user_id, created_at, product_id, quantity, total in sales:
+        totals = buckets[(user_id, utc_day(created_at))].setdefault(product_id, [Decimal(0), Decimal(0), 0])
+        totals[0] += Decimal(str(quantity))
+        totals[1] += Decimal(str(total))
+        totals[2] += 1
+    return buckets
+
+
+def _counter_rows(buckets) -> List[Dict[str, Any]]:
+    return [
+        {"user_id": user_id, "day": day, "product_id": product_id, "quantity": q, "revenue": r, "lines": n}
+        for (user_id, day), products in sorted(buckets.items())
+        for product_id, (q, r, n) in sorted(products.items())
+    ]
+
+
+async def _add_to_counters(session: AsyncSession, buckets) -> None:
+    rows = _counter_rows(buckets)
+    if not rows:
+        return
+    stmt = dialect_insert(session)(ProductCounterModel).values(rows)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id", "day", "product_id"],
+            set_={
+                "quantity": ProductCounterModel.quantity + stmt.excluded.quantity,
+                "revenue": ProductCounterModel.revenue + stmt.excluded.revenue,
+                "lines": ProductCounterModel.lines + stmt.excluded.lines,
+            },
+        )
+    )
+
+
+async def _add_to_sketches(session: AsyncSession, buckets, capacity: int) -> None:
+    for (user_id, day), products in sorted(buckets.items()):
+        for position, metric in ((1, "revenue"), (0, "quantity")):
+            rows = (
+                await session.execute(
+                    select(
+                        ProductHeavyHitterModel.id,
+                        ProductHeavyHitterModel.product_id,
+                        ProductHeavyHitterModel.count,
+                        ProductHeavyHitterModel.error,
+                    ).where(
+                        ProductHeavyHitterModel.user_id == user_id,
+                        ProductHeavyHitterModel.day == day,
+                        ProductHeavyHitterModel.metric == metric,
+                    )
+                )
+            ).all()
+            before = {product_id: (row_id, count, error) for row_id, product_id, count, error in rows}
+            sketch = SpaceSaving(capacity, {p: [Decimal(c), Decimal(e)] for p, (_, c, e) in before.items()})
+            for product_id, totals in sorted(products.items()):
+                sketch.add(product_id, totals[position])
+            await _store_sketch(session, user_id, day, metric, before, sketch)
+
+
+async def _store_sketch(session: AsyncSession, user_id: int, day: date, metric: str, before, sketch: SpaceSaving):
+    # an evicted product's row is reused for the product that replaced it
+    freed = [row_id for product_id, (row_id, _, _) in before.items() if product_id not in sketch.counters]
+    changed, added = [], []
+    for product_id, (count, error) in sketch.counters.items():
+        old = before.get(product_id)
+        if old is not None:
+            if (Decimal(old[1]), Decimal(old[2])) != (count, error):
+                changed.append({"id": old[0], "product_id": product_id, "count": count, "error": error})
+        elif freed:
+            changed.append({"id": freed.pop(), "product_id": product_id, "count": count, "error": error})
+        else:
+            added.append(
+                {"user_id": user_id, "day": day, "metric": metric, "product_id": product_id, "count": count, "error": error}
+            )
+    if changed:
+        await session.execute(update(ProductHeavyHitterModel), changed)
+    if added:
+        await session.execute(insert(ProductHeavyHitterModel), added)
+
+
+async def record_sales(session: AsyncSession, sales: Iterable[Sale]) -> None:
+    """Add item lines to the product stats in the caller's transaction. Run
+    it after ``bump_data_versions``: on Postgres that row lock serializes a
+    user's writers, so two transactions never rewrite the same sketch."""
+    buckets = _by_bucket(sales)
+    settings = get_settings()
+    if settings.product_stats_mode == HEAVY_HITTERS:
+        await _add_to_sketches(session, buckets, settings.product_stats_capacity)
+    else:
+        await _add_to_counters(session, buckets)
+
+
+async def top_products(
+    session: AsyncSession, user_id: int, date_from: date, date_to: date, by: str, limit: int
+) -> Tuple[bool, List[Dict[str, Any]]]:
+    """``(exact, products)`` for the days ``date_from``..``date_to``,
+    ranked by ``by`` (revenue or quantity)."""
+    settings = get_settings()
+    if settings.product_stats_mode == HEAVY_HITTERS:
+        capacity = settings.product_stats_capacity
+        ranked = await _top_from_sketches(session, user_id, date_from, date_to, by, limit, capacity)
+        exact = False
+    else:
+        ranked = await _top_from_counters(session, user_id, date_from, date_to, by, limit)
+        exact = True
+    names = {}
+    if ranked:
+        ids = [r["product_id"] for r in ranked]
+        names = dict((await session.execute(select(ProductModel.id, ProductModel.name).where(ProductModel.id.in_(ids)))).all())
+    return exact, [{**r, "name": names.get(r["product_id"], "")} for r in ranked]
+
+
+async def _top_from_counters(session: AsyncSession, user_id: int, date_from: date, date_to: date, by: str, limit: int):
+    quantity = func.sum(ProductCounterModel.quantity).label("quantity")
+    revenue = func.sum(ProductCounterModel.revenue).label("revenue")
+    lines = func.sum(ProductCounterModel.lines).label("lines")
+    rows = await session.execute(
+        select(ProductCounterModel.product_id, quantity, revenue, lines)
+        .where(
+            ProductCounterModel.user_id == user_id,
+            ProductCounterModel.day >= date_from,
+            ProductCounterModel.day <= date_to,
+        )
+        .group_by(ProductCounterModel.product_id)
+        .order_by(desc(revenue if by == "revenue" else quantity), ProductCounterModel.product_id)
+        .limit(limit)
+    )
+    return [
+        {"product_id": p, "quantity": Decimal(str(q)), "revenue": Decimal(str(r)), "lines": n, "error": Decimal(0)}
+        for p, q, r, n in rows
+    ]
+
+
+async def _top_from_sketches(
+    session: AsyncSession, user_id: int, date_from: date, date_to: date, by: str, limit: int, capacity: int
+):
+    rows = (
+        await session.execute(
+            select(
+                ProductHeavyHitterModel.day,
+                ProductHeavyHitterModel.product_id,
+                ProductHeavyHitterModel.count,
+                ProductHeavyHitterModel.error,
+            )
+            .where(
+                ProductHeavyHitterModel.user_id == user_id,
+                ProductHeavyHitterModel.metric == by,
+                ProductHeavyHitterModel.day >= date_from,
+                ProductHeavyHitterModel.day <= date_to,
+            )
+        )
+    ).all()
+    days: Dict[date, SpaceSaving] = {}
+    for day, product_id, count, error in rows:
+        days.setdefault(day, SpaceSaving(capacity)).counters[product_id] = [Decimal(count), Decimal(error)]
+    # merged summary: a product missing from a full day may still have sold
+    # up to that day's floor there
+    merged: Dict[int, List[Decimal]] = {}
+    for sketch in days.values():
+        for product_id, (count, error) in sketch.counters.items():
+            totals = merged.setdefault(product_id, [Decimal(0), Decimal(0)])
+            totals[0] += count
+            totals[1] += error
+    for sketch in days.values():
+        floor = sketch.floor
+        if floor:
+            for product_id, totals in merged.items():
+                if product_id not in sketch.counters:
+                    totals[0] += floor
+                    totals[1] += floor
+    ranked = sorted(merged.items(), key=lambda kv: (-kv[1][0], kv[0]))[:limit]
+    # sketches share one column for both metrics; report each at its own scale
+    scale = Decimal("0.01") if by == "revenue" else Decimal("0.001")
+    return [
+        {"product_id": p, by: count.quantize(scale), "error": error.quantize(scale)} for p, (count, error) in ranked
+    ]
+
+
+async def _user_sales(session: AsyncSession, user_id: int):
+    """Every item line of one user, archived and hot, as ``Sale`` tuples."""
+    async for receipt in iter_archived_receipts(session, user_id):
+        ids = await intern_products(session, (item.name for item in receipt.items))
+        yield [
+            (user_id, receipt.created_at, ids[normalize_product_name(i.name)], i.quantity, i.total)
+            for i in receipt.items
+        ]
+    last_id = 0
+    while True:
+        rows = (
+            await session.execute(
+                select(
+                    ReceiptItemModel.id,
+                    ReceiptItemModel.product_id,
+                    ReceiptItemModel.name,
+                    ReceiptItemModel.quantity,
+                    ReceiptItemModel.total,
+                    ReceiptModel.created_at,
+                )
+                .join(ReceiptModel, ReceiptModel.id == ReceiptItemModel.receipt_id)
+                .where(ReceiptModel.user_id == user_id, ReceiptItemModel.id > last_id)
+                .order_by(ReceiptItemModel.id)
+                .limit(RECOMPUTE_CHUNK)
+            )
+        ).all()
+        if not rows:
+            return
+        # items written before the catalog existed may lack a product
+        ids = await intern_products(session, (r.name for r in rows if r.product_id is None))
+        yield [
+            (user_id, r.created_at, r.product_id or ids[normalize_product_name(r.name)], r.quantity, r.total)
+            for r in rows
+        ]
+        last_id = rows[-1].id
+
+
+async def recompute_product_stats(session_factory: sessionmaker, user_ids: Optional[Sequence[int]] = None) -> int:
+    """Rebuild the stats of ``user_ids`` (default: everyone) from their
+    receipts, one transaction per user. Heavy-hitter sketches are rebuilt
+    as the exact top ``PRODUCT_STATS_CAPACITY`` of each day. Returns the
+    number of users rebuilt."""
+    settings = get_settings()
+    async with session_factory() as session:
+        if user_ids is None:
+            user_ids = (await session.execute(select(UserModel.id).order_by(UserModel.id))).scalars().all()
+        for user_id in user_ids:
+            buckets = defaultdict(dict)
+            async for sales in _user_sales(session, user_id):
+                _by_bucket(sales, buckets)
+            await session.execute(delete(ProductCounterModel).where(ProductCounterModel.user_id == user_id))
+            await session.execute(delete(ProductHeavyHitterModel).where(ProductHeavyHitterModel.user_id == user_id))
+            if settings.product_stats_mode == HEAVY_HITTERS:
+                await _store_top(session, buckets, settings.product_stats_capacity)
+            elif buckets:
+                await session.execute(insert(ProductCounterModel), _counter_rows(buckets))
+            await session.execute(bump_data_versions([user_id]))
+            await session.commit()
+    return len(user_ids)
+
+
+async def _store_top(session: AsyncSession, buckets, capacity: int) -> None:
+    rows = []
+    for (user_id, day), products in sorted(buckets.items()):
+        for position, metric in ((1, "revenue"), (0, "quantity")):
+            ranked = sorted(products.items(), key=lambda kv: (-kv[1][position], kv[0]))[:capacity]
+            rows.extend(
+                {"user_id": user_id, "day": day, "metric": metric, "product_id": p, "count": totals[position], "error": 0}
+                for p, totals in ranked
+            )
+    if rows:
+        await session.execute(insert(ProductHeavyHitterModel), rows)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Recompute per-product sales stats from receipts")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids")
+    args = parser.parse_args(argv)
+
+    async def run() -> int:
+        engine = create_async_engine(args.database_url)
+        try:
+            factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            return await recompute_product_stats(factory, args.user_ids)
+        finally:
+            await engine.dispose()
+
+    users = asyncio.run(run())
+    print(f"recomputed product stats ({settings.product_stats_mode}) for {users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Product catalog: receipt item names interned to ``products`` rows.
+
+Names match on a normalized form (whitespace collapsed, casefolded), so
+"Milk 1L" and " milk  1l" are one product. Items keep the name as written,
+so responses do not change; ``product_id`` is what grouping by product uses.
+
+``product_cache`` holds normalized name -> id for the write path, one per
+shard since each has its own catalog. Only ids read back from rows another
+transaction committed are cached, so a product inserted by a transaction
+that later rolls back never reaches it.
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import ProductModel
+from app.database.queries import dialect_insert
+from app.database.shards import session_shard
+
+
+def normalize_product_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class ProductCache:
+    def __init__(self, maxsize: int = 50_000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = Lock()
+
+    def get_many(self, names: Iterable[str]) -> Dict[str, int]:
+        found = {}
+        with self._lock:
+            for name in names:
+                product_id = self._entries.get(name)
+                if product_id is not None:
+                    self._entries.move_to_end(name)
+                    found[name] = product_id
+        return found
+
+    def put_many(self, ids: Dict[str, int]) -> None:
+        with self._lock:
+            for name, product_id in ids.items():
+                self._entries[name] = product_id
+                self._entries.move_to_end(name)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+product_cache = ProductCache()
+_shard_caches: Dict[int, ProductCache] = {}
+
+
+def cache_for(session: AsyncSession) -> ProductCache:
+    shard_id = session_shard(session)
+    if shard_id == 0:
+        return product_cache
+    return _shard_caches.setdefault(shard_id, ProductCache())
+
+
+def _lookup(names: Iterable[str]):
+    return select(ProductModel.normalized_name, ProductModel.id).where(ProductModel.normalized_name.in_(names))
+
+
+def _insert_missing(session: AsyncSession, rows: list):
+    return (
+        dialect_insert(session)(ProductModel)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=["normalized_name"])
+        .returning(ProductModel.normalized_name, ProductModel.id)
+    )
+
+
+async def intern_products(session: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+    """Product ids keyed by normalized name for every name given. Unknown
+    names are inserted in the session's transaction; the caller commits."""
+    spelled: Dict[str, str] = {}
+    for name in names:
+        spelled.setdefault(normalize_product_name(name), " ".join(name.split()))
+    cache = cache_for(session)
+    ids = cache.get_many(spelled)
+    missing = [n for n in spelled if n not in ids]
+    if missing:
+        found = dict((await session.execute(_lookup(missing))).all())
+        cache.put_many(found)
+        ids.update(found)
+        missing = [n for n in missing if n not in found]
+    if missing:
+        rows = [{"name": spelled[n], "normalized_name": n} for n in missing]
+        ids.update((await session.execute(_insert_missing(session, rows))).all())
+        missing = [n for n in missing if n not in ids]
+    if missing:
+        # inserted and committed by a concurrent transaction since the lookup
+        found = dict((await session.execute(_lookup(missing))).all())
+        cache.put_many(found)
+        ids.update(found)
+    return ids
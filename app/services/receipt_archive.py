@@ -0,0 +1,532 @@
+"""Cold-storage tier for old receipts.
+
+``archive_receipts`` moves receipts older than a cutoff out of ``receipts``
+and ``receipt_items`` into zlib-compressed segments in
+``receipt_archive_segments``. Segments cover disjoint id ranges; receipts
+that fall inside an existing segment's range on a later run are merged into
+it. ``receipt_archive_entries`` keeps a row per archived receipt with its
+user, segment, date, payment type and total, so per-user readers fetch only
+the segments holding that user's receipts. Archived receipts are read back
+as detached ``ReceiptModel`` objects, so the endpoints format them exactly
+like hot ones.
+
+    python -m app.services.receipt_archive --older-than-days 180
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import zlib
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from threading import Lock
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.config import get_settings
+from app.database.models import (
+    ReceiptArchiveEntryModel,
+    ReceiptArchiveSegmentModel,
+    ReceiptArchiveTotalModel,
+    ReceiptItemModel,
+    ReceiptModel,
+)
+from app.database.queries import bump_data_versions
+
+COMPRESSION_LEVEL = 6
+
+
+@dataclass
+class ArchiveStats:
+    receipts: int = 0
+    items: int = 0
+    segments_created: int = 0
+    segments_merged: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+
+
+def _record(receipt: ReceiptModel) -> list:
+    return [
+        receipt.id,
+        receipt.user_id,
+        receipt.payment_type,
+        str(receipt.payment_amount),
+        str(receipt.total),
+        str(receipt.rest),
+        receipt.created_at.isoformat(),
+        [[i.name, str(i.price), str(i.quantity), str(i.total)] for i in receipt.items],
+    ]
+
+
+def _entries(segment_id: int, receipts: Sequence[ReceiptModel]) -> List[dict]:
+    return [
+        {
+            "receipt_id": r.id,
+            "user_id": r.user_id,
+            "segment_id": segment_id,
+            "created_at": r.created_at,
+            "payment_type": r.payment_type,
+            "total": r.total,
+        }
+        for r in receipts
+    ]
+
+
+def pack_records(records: Sequence[list]) -> bytes:
+    raw = json.dumps(sorted(records, key=lambda r: r[0]), separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(raw.encode(), COMPRESSION_LEVEL)
+
+
+def unpack_records(payload: bytes) -> Dict[int, list]:
+    return {record[0]: record for record in json.loads(zlib.decompress(payload))}
+
+
+def to_model(record: list) -> ReceiptModel:
+    rid, user_id, payment_type, amount, total, rest, created_at, items = record
+    created = datetime.fromisoformat(created_at)
+    return ReceiptModel(
+        id=rid,
+        user_id=user_id,
+        payment_type=payment_type,
+        payment_amount=Decimal(amount),
+        total=Decimal(total),
+        rest=Decimal(rest),
+        created_at=created,
+        items=[
+            ReceiptItemModel(
+                receipt_id=rid,
+                name=name,
+                price=Decimal(price),
+                quantity=Decimal(quantity),
+                total=Decimal(line_total),
+                receipt_created_at=created,
+            )
+            for name, price, quantity, line_total in items
+        ],
+    )
+
+
+class SegmentCache:
+    """Decoded segments keyed by (first id, last id, receipt count): receipt
+    ids are unique across shards where segment ids are not, and a merge
+    changes the count, so a rewritten segment is never served stale."""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[tuple, Dict[int, list]]" = OrderedDict()
+        self._lock = Lock()
+
+    def peek(self, first_receipt_id: int, last_receipt_id: int, receipt_count: int) -> Optional[Dict[int, list]]:
+        key = (first_receipt_id, last_receipt_id, receipt_count)
+        with self._lock:
+            records = self._entries.get(key)
+            if records is not None:
+                self._entries.move_to_end(key)
+            return records
+
+    def get(self, segment: ReceiptArchiveSegmentModel) -> Dict[int, list]:
+        key = (segment.first_receipt_id, segment.last_receipt_id, segment.receipt_count)
+        records = self.peek(*key)
+        if records is not None:
+            return records
+        records = unpack_records(segment.payload)
+        with self._lock:
+            self._entries[key] = records
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return records
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+segment_cache = SegmentCache()
+
+
+async def find_archived_receipt(
+    session: AsyncSession, receipt_id: int, user_id: Optional[int] = None
+) -> Optional[ReceiptModel]:
+    segment = (
+        await session.execute(
+            select(ReceiptArchiveSegmentModel)
+            .where(ReceiptArchiveSegmentModel.last_receipt_id >= receipt_id)
+            .order_by(ReceiptArchiveSegmentModel.last_receipt_id)
+            .limit(1)
+        )
+    ).scalar()
+    if segment is None or segment.first_receipt_id > receipt_id:
+        return None
+    record = segment_cache.get(segment).get(receipt_id)
+    if record is None or (user_id is not None and record[1] != user_id):
+        return None
+    return to_model(record)
+
+
+async def find_archived_receipts(
+    session: AsyncSession, receipt_ids: Sequence[int], user_id: Optional[int] = None
+) -> Dict[int, ReceiptModel]:
+    """Archived receipts among ``receipt_ids`` by id. One query reads the
+    ranges of the segments spanning the ids, one more the payloads of those
+    holding any of them that are not already decoded."""
+    if not receipt_ids:
+        return {}
+    ranges = (
+        await session.execute(
+            select(
+                ReceiptArchiveSegmentModel.id,
+                ReceiptArchiveSegmentModel.first_receipt_id,
+                ReceiptArchiveSegmentModel.last_receipt_id,
+                ReceiptArchiveSegmentModel.receipt_count,
+            )
+            .where(
+                ReceiptArchiveSegmentModel.last_receipt_id >= min(receipt_ids),
+                ReceiptArchiveSegmentModel.first_receipt_id <= max(receipt_ids),
+            )
+            .order_by(ReceiptArchiveSegmentModel.last_receipt_id)
+        )
+    ).all()
+    lasts = [r.last_receipt_id for r in ranges]
+    wanted: Dict[int, list] = defaultdict(list)
+    for receipt_id in receipt_ids:
+        position = bisect.bisect_left(lasts, receipt_id)
+        if position < len(ranges) and ranges[position].first_receipt_id <= receipt_id:
+            wanted[position].append(receipt_id)
+
+    decoded: Dict[int, Dict[int, list]] = {}
+    for position in wanted:
+        r = ranges[position]
+        records = segment_cache.peek(r.first_receipt_id, r.last_receipt_id, r.receipt_count)
+        if records is not None:
+            decoded[position] = records
+    missing = {ranges[p].id: p for p in wanted if p not in decoded}
+    if missing:
+        segments = await session.execute(
+            select(ReceiptArchiveSegmentModel).where(ReceiptArchiveSegmentModel.id.in_(list(missing)))
+        )
+        for segment in segments.scalars():
+            decoded[missing[segment.id]] = segment_cache.get(segment)
+            session.expunge(segment)
+
+    found = {}
+    for position, ids in wanted.items():
+        for receipt_id in ids:
+            record = decoded[position].get(receipt_id)
+            if record is not None and (user_id is None or record[1] == user_id):
+                found[receipt_id] = to_model(record)
+    return found
+
+
+async def _segment_receipts(
+    session: AsyncSession,
+    segment_id: int,
+    user_id: int,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+) -> List[ReceiptModel]:
+    segment = await session.get(ReceiptArchiveSegmentModel, segment_id)
+    if segment is None:
+        # dropped since the segments were listed
+        return []
+    receipts = []
+    for record in unpack_records(segment.payload).values():
+        if record[1] != user_id:
+            continue
+        receipt = to_model(record)
+        if date_from is not None and _as_utc(receipt.created_at) < _as_utc(date_from):
+            continue
+        if date_to is not None and _as_utc(receipt.created_at) > _as_utc(date_to):
+            continue
+        receipts.append(receipt)
+    session.expunge(segment)
+    return receipts
+
+
+async def iter_archived_receipts(
+    session: AsyncSession,
+    user_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> AsyncIterator[ReceiptModel]:
+    """Archived receipts of one user in id order, for exports. Only the
+    segments holding the user's receipts in the range are read."""
+    for segment_id in await _user_segment_ids(session, user_id, date_from, date_to):
+        # one payload in memory at a time
+        for receipt in await _segment_receipts(session, segment_id, user_id, date_from, date_to):
+            yield receipt
+
+
+async def iter_archived_segments(
+    session_factory: sessionmaker,
+    user_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> AsyncIterator[List[ReceiptModel]]:
+    """``iter_archived_receipts`` a segment at a time, with a session per
+    segment, so no connection is held while the caller works on a batch."""
+    async with session_factory() as session:
+        segment_ids = await _user_segment_ids(session, user_id, date_from, date_to)
+    for segment_id in segment_ids:
+        async with session_factory() as session:
+            receipts = await _segment_receipts(session, segment_id, user_id, date_from, date_to)
+        if receipts:
+            yield receipts
+
+
+async def drop_archived_receipts(session: AsyncSession, user_id: int) -> int:
+    """Cut one user's receipts out of the archive, deleting segments left
+    empty, along with their entries and totals; the caller commits. Reads
+    only the segments holding the user's receipts. Returns the number
+    dropped."""
+    dropped = 0
+    segment_ids = await _user_segment_ids(session, user_id)
+    await session.execute(delete(ReceiptArchiveEntryModel).where(ReceiptArchiveEntryModel.user_id == user_id))
+    for segment_id in segment_ids:
+        segment = await session.get(ReceiptArchiveSegmentModel, segment_id)
+        records = unpack_records(segment.payload)
+        kept = [record for record in records.values() if record[1] != user_id]
+        if len(kept) == len(records):
+            session.expunge(segment)
+            continue
+        dropped += len(records) - len(kept)
+        if not kept:
+            await session.delete(segment)
+        else:
+            # a narrower id range stays disjoint from its neighbours
+            created = [datetime.fromisoformat(record[6]) for record in kept]
+            segment.payload = pack_records(kept)
+            segment.receipt_count = len(kept)
+            segment.first_receipt_id = min(record[0] for record in kept)
+            segment.last_receipt_id = max(record[0] for record in kept)
+            segment.first_created_at = min(created, key=_as_utc)
+            segment.last_created_at = max(created, key=_as_utc)
+        await session.flush()
+    await session.execute(delete(ReceiptArchiveTotalModel).where(ReceiptArchiveTotalModel.user_id == user_id))
+    return dropped
+
+
+async def _user_segment_ids(
+    session: AsyncSession, user_id: int, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None
+) -> List[int]:
+    """Segments holding receipts of ``user_id`` created in the range, in id order."""
+    entries = select(ReceiptArchiveEntryModel.segment_id).where(ReceiptArchiveEntryModel.user_id == user_id)
+    if date_from is not None:
+        entries = entries.where(ReceiptArchiveEntryModel.created_at >= date_from)
+    if date_to is not None:
+        entries = entries.where(ReceiptArchiveEntryModel.created_at <= date_to)
+    stmt = (
+        select(ReceiptArchiveSegmentModel.id)
+        .where(ReceiptArchiveSegmentModel.id.in_(entries))
+        .order_by(ReceiptArchiveSegmentModel.first_receipt_id)
+    )
+    return list((await session.execute(stmt)).scalars())
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps that are already UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def archived_totals(session: AsyncSession, user_id: int) -> List[ReceiptArchiveTotalModel]:
+    return list(
+        (
+            await session.execute(
+                select(ReceiptArchiveTotalModel).where(ReceiptArchiveTotalModel.user_id == user_id)
+            )
+        ).scalars()
+    )
+
+
+def _split_into_segments(receipts: List[ReceiptModel], existing: List[ReceiptArchiveSegmentModel]):
+    """Receipts inside an existing segment's id range go to that segment; the
+    rest form new groups that never span an existing segment."""
+    merges: Dict[int, List[ReceiptModel]] = defaultdict(list)
+    groups: List[List[ReceiptModel]] = []
+    current: List[ReceiptModel] = []
+    current_index = position = 0
+    for receipt in receipts:
+        while position < len(existing) and existing[position].last_receipt_id < receipt.id:
+            position += 1
+        if position < len(existing) and existing[position].first_receipt_id <= receipt.id:
+            merges[position].append(receipt)
+            continue
+        if current and current_index != position:
+            groups.append(current)
+            current = []
+        if not current:
+            current_index = position
+        current.append(receipt)
+    if current:
+        groups.append(current)
+    return {existing[i]: found for i, found in merges.items()}, groups
+
+
+async def _add_totals(session: AsyncSession, receipts: List[ReceiptModel]) -> None:
+    totals: Dict[tuple, list] = {}
+    for r in receipts:
+        entry = totals.setdefault((r.user_id, r.payment_type), [0, Decimal("0"), r.total, r.total])
+        entry[0] += 1
+        entry[1] += r.total
+        entry[2] = min(entry[2], r.total)
+        entry[3] = max(entry[3], r.total)
+    for (user_id, payment_type), (count, amount, low, high) in totals.items():
+        row = await session.get(ReceiptArchiveTotalModel, (user_id, payment_type))
+        if row is None:
+            session.add(
+                ReceiptArchiveTotalModel(
+                    user_id=user_id,
+                    payment_type=payment_type,
+                    receipt_count=count,
+                    total_amount=amount,
+                    min_total=low,
+                    max_total=high,
+                )
+            )
+        else:
+            row.receipt_count += count
+            row.total_amount += amount
+            row.min_total = low if row.min_total is None else min(row.min_total, low)
+            row.max_total = high if row.max_total is None else max(row.max_total, high)
+
+
+async def _archive_chunk(session: AsyncSession, cutoff: datetime, segment_size: int, stats: ArchiveStats) -> int:
+    receipts = list(
+        (
+            await session.execute(
+                select(ReceiptModel)
+                .where(ReceiptModel.created_at < cutoff)
+                .order_by(ReceiptModel.id)
+                .limit(segment_size)
+                .options(selectinload(ReceiptModel.items))
+            )
+        ).scalars()
+    )
+    if not receipts:
+        return 0
+    existing = list(
+        (
+            await session.execute(
+                select(ReceiptArchiveSegmentModel)
+                .where(
+                    ReceiptArchiveSegmentModel.last_receipt_id >= receipts[0].id,
+                    ReceiptArchiveSegmentModel.first_receipt_id <= receipts[-1].id,
+                )
+                .order_by(ReceiptArchiveSegmentModel.first_receipt_id)
+            )
+        ).scalars()
+    )
+    merges, groups = _split_into_segments(receipts, existing)
+
+    entries = []
+    for segment, found in merges.items():
+        records = unpack_records(segment.payload)
+        stats.stored_bytes -= len(segment.payload)
+        records.update((r.id, _record(r)) for r in found)
+        segment.payload = pack_records(list(records.values()))
+        segment.receipt_count = len(records)
+        segment.first_created_at = min([segment.first_created_at] + [r.created_at for r in found], key=_as_utc)
+        segment.last_created_at = max([segment.last_created_at] + [r.created_at for r in found], key=_as_utc)
+        stats.stored_bytes += len(segment.payload)
+        stats.segments_merged += 1
+        entries += _entries(segment.id, found)
+    created = []
+    for group in groups:
+        records = [_record(r) for r in group]
+        payload = pack_records(records)
+        segment = ReceiptArchiveSegmentModel(
+            first_receipt_id=group[0].id,
+            last_receipt_id=group[-1].id,
+            receipt_count=len(group),
+            first_created_at=min((r.created_at for r in group), key=_as_utc),
+            last_created_at=max((r.created_at for r in group), key=_as_utc),
+            payload=payload,
+        )
+        session.add(segment)
+        created.append((segment, group))
+        stats.stored_bytes += len(payload)
+        stats.segments_created += 1
+    if created:
+        # the entries need the new segments' ids
+        await session.flush()
+    for segment, group in created:
+        entries += _entries(segment.id, group)
+
+    await session.execute(insert(ReceiptArchiveEntryModel), entries)
+    await _add_totals(session, receipts)
+    await session.execute(bump_data_versions(r.user_id for r in receipts))
+    ids = [r.id for r in receipts]
+    stats.raw_bytes += sum(len(json.dumps(_record(r), separators=(",", ":"))) for r in receipts)
+    stats.items += sum(len(r.items) for r in receipts)
+    stats.receipts += len(receipts)
+    # the created_at bounds let Postgres prune partitions
+    await session.execute(
+        delete(ReceiptItemModel)
+        .where(ReceiptItemModel.receipt_id.in_(ids), ReceiptItemModel.receipt_created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        delete(ReceiptModel)
+        .where(ReceiptModel.id.in_(ids), ReceiptModel.created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    session.expunge_all()
+    return len(receipts)
+
+
+async def archive_receipts(
+    session_factory: sessionmaker,
+    older_than: datetime,
+    segment_size: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> ArchiveStats:
+    """Move receipts created before ``older_than`` into the archive, one
+    segment-sized transaction at a time. Meant to run as a single job."""
+    segment_size = segment_size or get_settings().archive_segment_size
+    stats = ArchiveStats()
+    async with session_factory() as session:
+        while limit is None or stats.receipts < limit:
+            size = segment_size if limit is None else min(segment_size, limit - stats.receipts)
+            if not await _archive_chunk(session, older_than, size, stats):
+                break
+    return stats
+
+
+def archive_cutoff(days: int, today: Optional[date] = None) -> datetime:
+    today = today or datetime.now(timezone.utc).date()
+    return datetime.combine(today - timedelta(days=days), datetime.min.time(), tzinfo=timezone.utc)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Move old receipts into the compressed archive")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--older-than-days", type=int, default=settings.archive_after_days)
+    parser.add_argument("--segment-size", type=int, default=settings.archive_segment_size)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    async def run() -> ArchiveStats:
+        engine = create_async_engine(args.database_url)
+        try:
+            factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            return await archive_receipts(factory, archive_cutoff(args.older_than_days), args.segment_size, args.limit)
+        finally:
+            await engine.dispose()
+
+    stats = asyncio.run(run())
+    ratio = stats.raw_bytes / stats.stored_bytes if stats.stored_bytes > 0 else 0
+    print(
+        f"archived {stats.receipts} receipts ({stats.items} items) into {stats.segments_created} new and "
+        f"{stats.segments_merged} merged segments, {stats.raw_bytes} -> {stats.stored_bytes} bytes ({ratio:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Live feed of newly created receipts, per user.
+
+``create_receipt`` publishes every receipt once it is committed. ``broker``
+hands it to the ``/receipts/stream`` subscriptions of its user in this
+process, each with a queue of at most ``RECEIPT_STREAM_BUFFER`` events. A
+subscriber that lets its queue fill up is dropped: it gets the events
+already queued, then a ``dropped`` event, and reconnects with
+``Last-Event-ID`` to catch up from the database.
+
+Receipts do not commit in id order: concurrent writers and group commit
+interleave, and a user moved between shards keeps receipt ids from another
+shard's range. So a resume does not ask for ids past ``Last-Event-ID``. It
+looks up that receipt's ``created_at`` and replays, by ``(created_at, id)``,
+everything from ``RECEIPT_STREAM_REPLAY_OVERLAP_SECONDS`` before it. A
+receipt that committed up to that long after a later one is still sent, at
+the price of resending the ones the client already had from the window;
+clients de-duplicate on the event id, which is the receipt id.
+
+The fan-out backend (``RECEIPT_EVENTS_BACKEND``) carries events to the
+other workers: ``local`` for a single process, ``postgres`` for
+LISTEN/NOTIFY on the receipts database.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.database.connection import get_sessionmaker
+from app.database.models import ReceiptModel
+from app.database.shards import shard_sessionmaker, user_shard
+from app.domain.schemas.receipt import ReceiptResponse
+from app.services.receipt_lookup import lookup_receipts
+
+logger = logging.getLogger(__name__)
+
+REPLAY_CHUNK = 500
+
+
+@dataclass
+class ReceiptEvent:
+    user_id: int
+    receipt_id: int
+    # the receipt as ReceiptResponse JSON
+    data: str
+
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    queue: "asyncio.Queue[ReceiptEvent]"
+    dropped: bool = False
+
+
+class ReceiptBroker:
+    """In-process pub/sub of receipt events keyed by user."""
+
+    def __init__(self) -> None:
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, user_id: int, buffer: int) -> Subscription:
+        subscription = Subscription(user_id, asyncio.Queue(maxsize=buffer))
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return user_id in self._subscriptions
+
+    def deliver(self, event: ReceiptEvent) -> None:
+        for subscription in list(self._subscriptions.get(event.user_id, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # never block the publisher on a slow reader
+                subscription.dropped = True
+                self.unsubscribe(subscription)
+
+
+broker = ReceiptBroker()
+
+
+class LocalFanout:
+    """One process: ``broker`` already reached every subscriber."""
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, event: ReceiptEvent) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresFanout:
+    """NOTIFY on publish, LISTEN on one connection held per worker. The
+    payload carries the receipt unless it would exceed Postgres' 8000 byte
+    limit; then receiving workers with subscribers for the user load it."""
+
+    CHANNEL = "receipt_events"
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.origin = uuid.uuid4().hex
+        self._conn = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self._conn = await self.engine.connect()
+        raw = (await self._conn.get_raw_connection()).driver_connection
+        await raw.add_listener(self.CHANNEL, self._on_notify)
+
+    async def publish(self, event: ReceiptEvent) -> None:
+        message = {"origin": self.origin, "user_id": event.user_id, "receipt_id": event.receipt_id}
+        payload = json.dumps({**message, "data": event.data})
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            payload = json.dumps({**message, "data": None})
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"), {"channel": self.CHANNEL, "payload": payload}
+            )
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        message = json.loads(payload)
+        if message["origin"] == self.origin or not broker.has_subscribers(message["user_id"]):
+            return
+        if message["data"] is not None:
+            broker.deliver(ReceiptEvent(message["user_id"], message["receipt_id"], message["data"]))
+        else:
+            task = asyncio.create_task(self._load(message["user_id"], message["receipt_id"]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load(self, user_id: int, receipt_id: int) -> None:
+        try:
+            data = await load_receipt_json(user_id, receipt_id)
+        except Exception:
+            logger.exception("Could not load receipt %s for its event", receipt_id)
+            return
+        if data is not None:
+            broker.deliver(ReceiptEvent(user_id, receipt_id, data))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+FANOUT_BACKENDS = ("local", "postgres")
+
+_fanout = None
+_publishing: Set[asyncio.Task] = set()
+
+
+async def load_receipt_json(user_id: int, receipt_id: int) -> Optional[str]:
+    async with get_sessionmaker()() as directory:
+        shard_id = await user_shard(directory, user_id)
+    async with shard_sessionmaker(shard_id)() as session:
+        receipts, _ = await lookup_receipts(session, [receipt_id], user_id)
+    return ReceiptResponse.from_model(receipts[0]).model_dump_json() if receipts else None
+
+
+async def start_receipt_events(backend: str, engine: AsyncEngine) -> None:
+    global _fanout
+    if backend not in FANOUT_BACKENDS:
+        raise ValueError(f"RECEIPT_EVENTS_BACKEND must be one of {', '.join(FANOUT_BACKENDS)}")
+    _fanout = PostgresFanout(engine) if backend == "postgres" else LocalFanout()
+    await _fanout.start()
+
+
+async def stop_receipt_events() -> None:
+    global _fanout
+    if _fanout is not None:
+        await _fanout.stop()
+    _fanout = None
+
+
+def publish_receipt(user_id: int, receipt: ReceiptResponse) -> None:
+    """Call after the receipt is committed; never waits on the fan-out."""
+    event = ReceiptEvent(user_id, receipt.id, receipt.model_dump_json())
+    broker.deliver(event)
+    if _fanout is not None and not isinstance(_fanout, LocalFanout):
+        task = asyncio.create_task(_fanout.publish(event))
+        _publishing.add(task)
+        task.add_done_callback(_publishing.discard)
+
+
+def sse(event: ReceiptEvent) -> str:
+    return f"id: {event.receipt_id}\nevent: receipt\ndata: {event.data}\n\n"
+
+
+async def _resume_from(engine: AsyncEngine, user_id: int, last_event_id: int, overlap: float) -> Optional[datetime]:
+    """Where a replay after ``last_event_id`` starts; None, for everything,
+    when that receipt is not found."""
+    async with AsyncSession(bind=engine, expire_on_commit=False) as session:
+        receipts, _ = await lookup_receipts(session, [last_event_id], user_id)
+    if not receipts:
+        return None
+    return receipts[0].created_at - timedelta(seconds=overlap)
+
+
+async def _replay(
+    engine: AsyncEngine, user_id: int, since: Optional[datetime], limit: int
+) -> AsyncIterator[ReceiptEvent]:
+    """Receipts of the user created at or after ``since``, oldest first: at
+    most ``limit`` + 1, so the caller can tell when there were more."""
+    sent = 0
+    after = None
+    while sent < limit:
+        stmt = (
+            select(ReceiptModel)
+            .options(selectinload(ReceiptModel.items))
+            .where(ReceiptModel.user_id == user_id)
+            .order_by(ReceiptModel.created_at, ReceiptModel.id)
+            .limit(min(REPLAY_CHUNK, limit - sent + 1))
+        )
+        if since is not None:
+            stmt = stmt.where(ReceiptModel.created_at >= since)
+        if after is not None:
+            stmt = stmt.where(tuple_(ReceiptModel.created_at, ReceiptModel.id) > after)
+        async with AsyncSession(bind=engine, expire_on_commit=False) as session:
+            chunk = list((await session.execute(stmt)).scalars())
+        for receipt in chunk:
+            yield ReceiptEvent(user_id, receipt.id, ReceiptResponse.from_model(receipt).model_dump_json())
+        if len(chunk) < REPLAY_CHUNK:
+            return
+        sent += len(chunk)
+        after = (chunk[-1].created_at, chunk[-1].id)
+
+
+async def stream_receipts(
+    engine: AsyncEngine,
+    user_id: int,
+    last_event_id: Optional[int],
+    buffer: int,
+    heartbeat: float,
+    replay_limit: int,
+    replay_overlap: float = 5.0,
+) -> AsyncIterator[str]:
+    """The SSE body of ``/receipts/stream``. With ``last_event_id`` the
+    receipts created since, less ``replay_overlap`` seconds, are sent
+    first, except that receipt itself; more than ``replay_limit`` of them
+    end the stream with a ``reset`` event, telling the client to reload its
+    list instead."""
+    # subscribe before reading the backlog, so nothing committed in between is missed
+    subscription = broker.subscribe(user_id, buffer)
+    try:
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        replayed: Set[int] = set()
+        if last_event_id is not None:
+            since = await _resume_from(engine, user_id, last_event_id, replay_overlap)
+            # the Last-Event-ID receipt itself comes back too, and is not sent
+            limit = replay_limit if since is None else replay_limit + 1
+            async for event in _replay(engine, user_id, since, limit):
+                if event.receipt_id == last_event_id:
+                    continue
+                if len(replayed) == replay_limit:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                replayed.add(event.receipt_id)
+                yield sse(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if subscription.dropped:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                # a comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if event.receipt_id not in replayed:
+                yield sse(event)
+            if subscription.dropped and subscription.queue.empty():
+                yield "event: dropped\ndata: {}\n\n"
+                return
+    finally:
+        broker.unsubscribe(subscription)
@@ -1,47 +1,171 @@
-from typing import List
-from decimal import Decimal
-from datetime import datetime
-from app.domain.entities.receipt import Receipt, ReceiptItem, Payment
+"""Printed receipt text, laid out for a fixed paper width.
+
+A ``ReceiptLayout`` is compiled once per (width, template) pair: the header,
+separators, footer and the padding around the date are built ahead of time,
+so rendering a receipt only formats its amounts and item names and appends
+fragments to one output list that is joined once. Amounts are formatted from
+the ``Decimal`` values (rounded half-up to cents) rather than through
+``float``, and the formatted strings are memoised since the same prices and
+totals recur across receipts. ``render_many`` writes a whole batch into a
+single buffer; it accepts API responses and ORM receipts alike.
+"""
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
 from app.domain.schemas.receipt import ReceiptResponse
 
+# columns in the printer's 12-dot font; 80mm heads print 576 dots, the
+# narrower ones 512
+PAPER_WIDTHS = {"58mm": 32, "80mm": 48, "80mm-narrow": 42}
+
+# item names were always cut here; narrower papers cut them further to fit
+# next to the line total
+NAME_WIDTH = 25
+
+CENT = Decimal("0.01")
+# the memo is dropped wholesale when it grows past this many amounts
+MONEY_CACHE_SIZE = 65_536
+# "MM/DD/YYYY HH:MM"
+DATE_WIDTH = 16
+TIMES = ["%02d:%02d" % (hour, minute) for hour in range(24) for minute in range(60)]
+
+_money: Dict[object, str] = {}
+_days: Dict[Tuple[int, int, int], str] = {}
+
+
+def format_money(value) -> str:
+    """``value`` with exactly two decimals, rounded half-up."""
+    text = _money.get(value)
+    if text is None:
+        if len(_money) >= MONEY_CACHE_SIZE:
+            _money.clear()
+        amount = value if isinstance(value, Decimal) else Decimal(str(value))
+        text = _money[value] = format(amount.quantize(CENT, rounding=ROUND_HALF_UP), "f")
+    return text
+
+
+def _day(moment) -> str:
+    key = (moment.year, moment.month, moment.day)
+    text = _days.get(key)
+    if text is None:
+        if len(_days) >= MONEY_CACHE_SIZE:
+            _days.clear()
+        text = _days[key] = "%02d/%02d/%04d " % (moment.month, moment.day, moment.year)
+    return text
+
+
+@dataclass(frozen=True)
+class ReceiptTemplate:
+    title: str = "RECEIPT"
+    store: str = "Store #1"
+    footer: str = "Thank you for your purchase!"
+
+
+DEFAULT_TEMPLATE = ReceiptTemplate()
+
+
+class ReceiptLayout:
+    """One template compiled for one line width; get it from
+    ``compile_layout``."""
+
+    def __init__(self, width: int, template: ReceiptTemplate):
+        self.width = width
+        self.template = template
+        separator = "-" * width
+        self.separator = separator
+        self._header = "\n".join([template.title.center(width), separator, template.store.center(width), separator])
+        self._rule = "\n" + separator + "\n"
+        centered = ("0" * DATE_WIDTH).center(width)
+        start = centered.index("0")
+        self._date_left = centered[:start]
+        self._date_right = centered[start + DATE_WIDTH :] + "\n"
+        self._footer = template.footer.center(width)
+
+    def center(self, text: str) -> str:
+        return text.center(self.width)
+
+    def render(self, receipt) -> str:
+        out: List[str] = []
+        self.render_into(receipt, out)
+        return "".join(out)
+
+    def render_many(self, receipts: Iterable, end: str = "\n\n") -> str:
+        """Every receipt followed by ``end``, as one string."""
+        out: List[str] = []
+        write = self.render_into
+        for receipt in receipts:
+            write(receipt, out)
+            out.append(end)
+        return "".join(out)
+
+    def render_into(self, receipt, out: List[str]) -> None:
+        """Append the fragments of one receipt to ``out``; accepts a
+        ``ReceiptResponse`` or a ``ReceiptModel`` with its items loaded."""
+        if isinstance(receipt, ReceiptResponse):
+            items, kind, amount = receipt.products, receipt.payment.type, receipt.payment.amount
+        else:
+            items, kind, amount = receipt.items, receipt.payment_type, receipt.payment_amount
+        money = _money.get
+        extend = out.extend
+        width = self.width
+        out.append(self._header)
+        for item in items:
+            quantity, price, total, name = item.quantity, item.price, item.total, item.name
+            total = "$" + (money(total) or format_money(total))
+            room = width - len(total) - 1
+            if len(name) > NAME_WIDTH or len(name) > room:
+                name = name[: max(min(room, NAME_WIDTH), 0)]
+            extend(
+                (
+                    "\n",
+                    money(quantity) or format_money(quantity),
+                    " x $",
+                    money(price) or format_money(price),
+                    "\n",
+                    name.ljust(room),
+                    " ",
+                    total,
+                )
+            )
+        total, rest, moment = receipt.total, receipt.rest, receipt.created_at
+        extend(
+            (
+                self._rule,
+                "TOTAL: $",
+                money(total) or format_money(total),
+                "\nCard: $" if kind == "cashless" else "\nCash: $",
+                money(amount) or format_money(amount),
+                "\nChange: $",
+                money(rest) or format_money(rest),
+                self._rule,
+                self._date_left,
+                _days.get((moment.year, moment.month, moment.day)) or _day(moment),
+                TIMES[moment.hour * 60 + moment.minute],
+                self._date_right,
+                self._footer,
+            )
+        )
+
+
+@lru_cache(maxsize=64)
+def compile_layout(width: int, template: ReceiptTemplate = DEFAULT_TEMPLATE) -> ReceiptLayout:
+    return ReceiptLayout(width, template)
+
+
 class ReceiptFormatter:
-    def __init__(self, line_width: int = 40):
-        self.line_width = line_width
-    
+    def __init__(
+        self, line_width: int = 40, template: ReceiptTemplate = DEFAULT_TEMPLATE, paper: Optional[str] = None
+    ):
+        self.line_width = PAPER_WIDTHS[paper] if paper is not None else line_width
+        self.layout = compile_layout(self.line_width, template)
+
     def format_receipt_text(self, receipt: ReceiptResponse) -> str:
-        lines = []
-        
-        lines.append(self._center("RECEIPT"))
-        lines.append("-" * self.line_width)
-        lines.append(self._center("Store #1"))
-        lines.append("-" * self.line_width)
-        
-        for item in receipt.products:
-            name = item.name[:25] if len(item.name) > 25 else item.name
-            price_line = f"{float(item.quantity):.2f} x ${float(item.price):.2f}"
-            lines.append(price_line)
-            
-            total_str = f"${float(item.total):.2f}"
-            spacing = " " * (self.line_width - len(name) - len(total_str))
-            lines.append(f"{name}{spacing}{total_str}")
-        
-        lines.append("-" * self.line_width)
-        
-        total_str = f"TOTAL: ${float(receipt.total):.2f}"
-        lines.append(total_str)
-        
-        payment_method = "Card" if receipt.payment.type == "cashless" else "Cash"
-        payment_str = f"{payment_method}: ${float(receipt.payment.amount):.2f}"
-        lines.append(payment_str)
-        
-        change_str = f"Change: ${float(receipt.rest):.2f}"
-        lines.append(change_str)
-        
-        lines.append("-" * self.line_width)
-        lines.append(self._center(receipt.created_at.strftime("%m/%d/%Y %H:%M")))
-        lines.append(self._center("Thank you for your purchase!"))
-        
-        return "\n".join(lines)
-    
+        return self.layout.render(receipt)
+
+    def format_many(self, receipts: Iterable, end: str = "\n\n") -> str:
+        return self.layout.render_many(receipts, end)
+
     def _center(self, text: str) -> str:
-        return text.center(self.line_width)
+        return self.layout.center(text)
@@ -0,0 +1,230 @@
+"""Receipt inserts, direct or group-committed.
+
+With ``GROUP_COMMIT_ENABLED`` the create endpoint hands receipts to a single
+writer task instead of committing them itself. The writer collects whatever
+arrives within ``GROUP_COMMIT_MAX_DELAY_MS`` (up to
+``GROUP_COMMIT_MAX_BATCH`` receipts), inserts them with multi-row
+``INSERT ... RETURNING`` statements and commits once for the whole group.
+
+A request only gets its receipt back once the transaction holding it has
+committed. If a group fails, it is rolled back and every receipt in it is
+retried in its own transaction, so each request ends with either its own
+committed receipt or its own exception and never depends on a neighbour.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import get_settings
+from app.database.models import IdempotencyKeyModel, ReceiptItemModel, ReceiptModel, ReceiptOutboxModel
+from app.database.queries import bump_data_versions
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services.outbox import outbox_rows
+from app.services.product_stats import record_sales
+from app.services.products import intern_products, normalize_product_name
+from app.services.receipt_stats import record_daily_totals
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingReceipt:
+    receipt: Dict[str, Any]
+    items: List[Dict[str, Any]] = field(default_factory=list)
+    # idempotency_keys row committed with the receipt, see app.services.idempotency
+    idempotency: Optional[Dict[str, Any]] = None
+
+
+def pending_receipt(user_id: int, receipt_data: ReceiptCreate) -> PendingReceipt:
+    lines = [Decimal(str(p.price)) * Decimal(str(p.quantity)) for p in receipt_data.products]
+    total = sum(lines)
+    return PendingReceipt(
+        receipt={
+            "user_id": user_id,
+            "payment_type": receipt_data.payment.type.value,
+            "payment_amount": receipt_data.payment.amount,
+            "total": total,
+            "rest": Decimal(str(receipt_data.payment.amount)) - total,
+            "created_at": datetime.now(timezone.utc),
+        },
+        items=[
+            {"name": p.name, "price": p.price, "quantity": p.quantity, "total": line}
+            for p, line in zip(receipt_data.products, lines)
+        ],
+    )
+
+
+async def insert_receipts(session: AsyncSession, pending: Sequence[PendingReceipt]) -> List[ReceiptModel]:
+    """Insert receipts, their items and idempotency keys with one statement
+    per table, interning item names to products first. The items go to the
+    product stats and the receipts to the daily totals and, with
+    ``OUTBOX_ENABLED``, to the outbox. The returned receipts have ``items``
+    loaded. The caller commits."""
+    receipts = (
+        await session.scalars(
+            insert(ReceiptModel).returning(ReceiptModel, sort_by_parameter_order=True),
+            [p.receipt for p in pending],
+        )
+    ).all()
+    product_ids = await intern_products(session, (item["name"] for p in pending for item in p.items))
+    rows = [
+        {
+            **item,
+            "receipt_id": receipt.id,
+            "receipt_created_at": receipt.created_at,
+            "product_id": product_ids[normalize_product_name(item["name"])],
+        }
+        for receipt, p in zip(receipts, pending)
+        for item in p.items
+    ]
+    items = []
+    if rows:
+        items = (
+            await session.scalars(
+                insert(ReceiptItemModel).returning(ReceiptItemModel, sort_by_parameter_order=True), rows
+            )
+        ).all()
+    position = 0
+    for receipt, p in zip(receipts, pending):
+        set_committed_value(receipt, "items", list(items[position:position + len(p.items)]))
+        position += len(p.items)
+    await session.execute(bump_data_versions(r.user_id for r in receipts))
+    await record_sales(
+        session,
+        (
+            (receipt.user_id, receipt.created_at, item.product_id, item.quantity, item.total)
+            for receipt in receipts
+            for item in receipt.items
+        ),
+    )
+    await record_daily_totals(session, receipts)
+    keys = [{**p.idempotency, "receipt_id": receipt.id} for receipt, p in zip(receipts, pending) if p.idempotency]
+    if keys:
+        await session.execute(insert(IdempotencyKeyModel), keys)
+    if get_settings().outbox_enabled:
+        await session.execute(insert(ReceiptOutboxModel), outbox_rows(receipts))
+    return list(receipts)
+
+
+@dataclass
+class _Submission:
+    pending: PendingReceipt
+    future: "asyncio.Future[ReceiptModel]"
+
+
+class GroupCommitWriter:
+    """``session_factory`` must not expire on commit: the receipts handed
+    back are read after their session has closed."""
+
+    def __init__(self, session_factory: sessionmaker, max_batch: int = 100, max_delay: float = 0.002):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.receipts = 0
+        self._queue: "asyncio.Queue[_Submission]" = asyncio.Queue(maxsize=max_batch * 8)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything already submitted, then stop the writer."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, pending: PendingReceipt) -> ReceiptModel:
+        if not self.running:
+            raise RuntimeError("group commit writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Submission(pending, future))
+        # a cancelled request must not cancel the write the others share
+        return await asyncio.shield(future)
+
+    async def _collect(self) -> List[_Submission]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(batch) < self.max_batch:
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            remaining = deadline - asyncio.get_running_loop().time()
+            if len(batch) >= self.max_batch or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[_Submission]) -> List[ReceiptModel]:
+        async with self.session_factory() as session:
+            receipts = await insert_receipts(session, [s.pending for s in batch])
+            await session.commit()
+        return receipts
+
+    async def _flush(self, batch: List[_Submission]) -> None:
+        try:
+            receipts = await self._write(batch)
+        except Exception as exc:
+            if len(batch) > 1:
+                logger.warning("Group commit of %d receipts failed, retrying one by one", len(batch), exc_info=True)
+                for submission in batch:
+                    await self._flush([submission])
+            elif not batch[0].future.done():
+                batch[0].future.set_exception(exc)
+            return
+        self.batches += 1
+        self.receipts += len(batch)
+        for submission, receipt in zip(batch, receipts):
+            if not submission.future.done():
+                submission.future.set_result(receipt)
+
+
+_writer: Optional[GroupCommitWriter] = None
+
+
+def get_group_writer() -> Optional[GroupCommitWriter]:
+    return _writer if _writer is not None and _writer.running else None
+
+
+def start_group_commit(session_factory: sessionmaker, max_batch: int, max_delay: float) -> GroupCommitWriter:
+    global _writer
+    _writer = GroupCommitWriter(session_factory, max_batch, max_delay)
+    _writer.start()
+    return _writer
+
+
+async def stop_group_commit() -> None:
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+    _writer = None
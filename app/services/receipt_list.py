@@ -0,0 +1,83 @@
+"""One page of ``GET /receipts`` and its total.
+
+``RECEIPT_LIST_COUNT`` picks how the total is found. ``window`` adds
+``count(*) OVER ()`` to the page query, so page and total come back in one
+round trip and the filters are evaluated once. ``separate`` runs a count
+query before the page. ``auto`` (the default) uses the window for searches
+only: their item subquery scans ``receipt_items``, and a separate count
+would scan it again. Other lists page along the ``(user_id, created_at)``
+index and stop after ``size`` rows, which a window over every match would
+not let them do. A page past the end has no row to carry the total, so it
+falls back to the count query.
+
+With ``RECEIPT_LIST_COUNT_LIMIT`` set, counting stops one match past the
+limit, and past it the total is an estimate. The newest and the oldest
+limit + 1 matches each give a rate, and their average is extrapolated over
+the time between the oldest and newest match, which is exact for a volume
+that grows steadily. ``auto`` counts searches exactly all the same, as the
+window count costs little next to their item scan.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database.filters import ReceiptFilters
+from app.database.queries import receipt_count_estimate_statement, receipt_list_params, receipt_list_statements
+
+
+@dataclass
+class ReceiptPage:
+    # receipts with items, or summary rows (see receipt_list_statements)
+    rows: List[Any]
+    total: int
+    estimated: bool = False
+
+
+def extrapolate_count(
+    sampled: int, newest_first: datetime, newest_last: datetime, oldest_first: datetime, oldest_last: datetime
+) -> int:
+    """Matches from ``oldest_first`` to ``newest_last``, given that the
+    newest and the oldest ``sampled`` of them span the two ranges."""
+    span = newest_last - oldest_first
+    # each sample's matches per span, from samples that took any time
+    rates = [sampled * (span / s) for s in (newest_last - newest_first, oldest_last - oldest_first) if s]
+    if not rates:
+        return sampled
+    return max(sampled, round(sum(rates) / len(rates)))
+
+
+async def fetch_receipt_page(
+    session: AsyncSession,
+    user_id: int,
+    filters: ReceiptFilters,
+    sort_by: str,
+    sort_order: str,
+    with_items: bool,
+    offset: int,
+    limit: int,
+) -> ReceiptPage:
+    settings = get_settings()
+    count_limit = settings.receipt_list_count_limit
+    if settings.receipt_list_count == "auto":
+        windowed = bool(filters.search)
+        if windowed:
+            count_limit = 0
+    else:
+        windowed = settings.receipt_list_count == "window"
+    page, count = receipt_list_statements(filters, sort_by, sort_order, with_items, windowed, bool(count_limit))
+    params = receipt_list_params(user_id, filters, offset, limit, count_limit)
+
+    if not windowed:
+        total = (await session.execute(count, params)).scalar()
+    rows = (await session.execute(page, params)).all()
+    if windowed:
+        total = rows[0].total_count if rows else (await session.execute(count, params)).scalar()
+    if with_items:
+        rows = [row[0] for row in rows]
+    if not count_limit or total <= count_limit:
+        return ReceiptPage(rows, total)
+    bounds = (await session.execute(receipt_count_estimate_statement(filters), params)).one()
+    return ReceiptPage(rows, extrapolate_count(params["count_limit"], *bounds), estimated=True)
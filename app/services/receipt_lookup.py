@@ -0,0 +1,77 @@
+"""Receipts by id in bulk.
+
+Hot receipts come from one query plus one for all their items, the rest
+from the archive in at most two more; results keep the order the ids were
+asked in, and ids that match nothing are reported back.
+
+``lookup_receipts_anywhere`` answers public lookups across shards: each id
+is looked up on the shard its top bits name, and only ids missing there go
+to ``receipt_relocations`` for a second round.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import ReceiptModel
+from app.database.queries import receipt_with_items, receipts_with_items
+from app.database.shards import home_shard, relocated_shards, shard_ids, shard_sessionmaker, sharding_enabled
+from app.services.receipt_archive import find_archived_receipt, find_archived_receipts
+
+
+async def lookup_receipts(
+    session: AsyncSession, receipt_ids: Iterable[int], user_id: Optional[int] = None
+) -> Tuple[List[ReceiptModel], List[int]]:
+    """``(receipts, missing ids)``; repeated ids are answered once."""
+    ids = list(dict.fromkeys(receipt_ids))
+    found = await _find(session, ids, user_id)
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+
+
+async def _find(session: AsyncSession, ids: List[int], user_id: Optional[int] = None) -> Dict[int, ReceiptModel]:
+    found = {r.id: r for r in (await session.execute(receipts_with_items(ids, user_id))).scalars()}
+    cold = [i for i in ids if i not in found]
+    if cold:
+        found.update(await find_archived_receipts(session, cold, user_id))
+    return found
+
+
+async def _find_on_shards(directory: AsyncSession, by_shard: Dict[int, List[int]]) -> Dict[int, ReceiptModel]:
+    found: Dict[int, ReceiptModel] = {}
+    configured = set(shard_ids())
+    for shard_id, ids in by_shard.items():
+        if shard_id == 0:
+            found.update(await _find(directory, ids))
+        elif shard_id in configured:
+            async with shard_sessionmaker(shard_id)() as session:
+                found.update(await _find(session, ids))
+    return found
+
+
+async def lookup_receipts_anywhere(
+    directory: AsyncSession, receipt_ids: Iterable[int]
+) -> Tuple[List[ReceiptModel], List[int]]:
+    """``lookup_receipts`` for any user's receipts, on whichever shard holds
+    them. ``directory`` is a session on shard 0."""
+    ids = list(dict.fromkeys(receipt_ids))
+    if not sharding_enabled():
+        return await lookup_receipts(directory, ids)
+    by_shard: Dict[int, List[int]] = defaultdict(list)
+    for receipt_id in ids:
+        by_shard[home_shard(receipt_id)].append(receipt_id)
+    found = await _find_on_shards(directory, by_shard)
+    moved = await relocated_shards(directory, [i for i in ids if i not in found])
+    if moved:
+        by_shard = defaultdict(list)
+        for receipt_id, shard_id in moved.items():
+            by_shard[shard_id].append(receipt_id)
+        found.update(await _find_on_shards(directory, by_shard))
+    return [found[i] for i in ids if i in found], [i for i in ids if i not in found]
+
+
+async def find_receipt_anywhere(directory: AsyncSession, receipt_id: int) -> Optional[ReceiptModel]:
+    if not sharding_enabled():
+        result = await directory.execute(receipt_with_items(receipt_id))
+        return result.scalar() or await find_archived_receipt(directory, receipt_id)
+    receipts, _ = await lookup_receipts_anywhere(directory, [receipt_id])
+    return receipts[0] if receipts else None
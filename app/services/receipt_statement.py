@@ -0,0 +1,98 @@
+"""Text statements: every receipt of a user in a date range, streamed.
+
+``stream_statement`` yields the text in pieces: a header, the archived
+receipts segment by segment, then the hot ones in keyset chunks of
+``STATEMENT_CHUNK`` receipts (their items come in one more query per chunk),
+and finally a summary footer with counts and totals per payment type. Each
+hot chunk and each archive segment uses its own short-lived session, so no
+connection is held while the client reads, and only one chunk or archive
+segment is held at a time, so memory does not grow with the size of the
+statement.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.database.filters import day_start
+from app.database.models import ReceiptModel
+from app.services.receipt_archive import iter_archived_segments
+from app.services.receipt_formatter import ReceiptLayout, format_money
+
+STATEMENT_CHUNK = 500
+
+
+def statement_bounds(date_from: date, date_to: date) -> Tuple[datetime, datetime]:
+    """Both days included, as the first and last representable instants."""
+    return day_start(date_from), day_start(date_to + timedelta(days=1)) - timedelta(microseconds=1)
+
+
+def statement_header(layout: ReceiptLayout, fullname: str, date_from: date, date_to: date) -> str:
+    period = f"{date_from:%m/%d/%Y} - {date_to:%m/%d/%Y}"
+    rule = "=" * layout.width
+    return "\n".join([layout.center("STATEMENT"), layout.center(fullname), layout.center(period), rule]) + "\n\n"
+
+
+def statement_footer(layout: ReceiptLayout, totals: Dict[str, List]) -> str:
+    rule = "=" * layout.width
+    lines = [rule, layout.center("STATEMENT SUMMARY"), rule]
+    count = sum(entry[0] for entry in totals.values())
+    lines.append(f"Receipts: {count}")
+    for payment_type, label in (("cash", "Cash"), ("cashless", "Card")):
+        if payment_type in totals:
+            receipts, amount = totals[payment_type]
+            lines.append(f"{label} ({receipts}): ${format_money(amount)}")
+    lines.append(f"TOTAL: ${format_money(sum((entry[1] for entry in totals.values()), Decimal('0')))}")
+    lines.append(rule)
+    return "\n".join(lines) + "\n"
+
+
+async def _hot_chunks(engine: AsyncEngine, user_id: int, start: datetime, end: datetime):
+    after = None
+    while True:
+        stmt = (
+            select(ReceiptModel)
+            .where(ReceiptModel.user_id == user_id, ReceiptModel.created_at >= start, ReceiptModel.created_at <= end)
+            .order_by(ReceiptModel.created_at, ReceiptModel.id)
+            .limit(STATEMENT_CHUNK)
+            .options(selectinload(ReceiptModel.items))
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(ReceiptModel.created_at, ReceiptModel.id) > after)
+        # a session per chunk, so no connection is held while the client reads
+        async with AsyncSession(bind=engine, expire_on_commit=False) as session:
+            chunk = list((await session.execute(stmt)).scalars())
+        if not chunk:
+            return
+        yield chunk
+        after = (chunk[-1].created_at, chunk[-1].id)
+
+
+async def _archived_chunks(engine: AsyncEngine, user_id: int, start: datetime, end: datetime):
+    # a session per segment, like _hot_chunks
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async for receipts in iter_archived_segments(factory, user_id, start, end):
+        for first in range(0, len(receipts), STATEMENT_CHUNK):
+            yield receipts[first : first + STATEMENT_CHUNK]
+
+
+async def stream_statement(
+    engine: AsyncEngine, layout: ReceiptLayout, user_id: int, fullname: str, date_from: date, date_to: date
+) -> AsyncIterator[str]:
+    """Archived receipts first, then hot ones oldest first, each followed by
+    a blank line."""
+    start, end = statement_bounds(date_from, date_to)
+    totals: Dict[str, List] = defaultdict(lambda: [0, Decimal("0")])
+    yield statement_header(layout, fullname, date_from, date_to)
+    for chunks in (_archived_chunks(engine, user_id, start, end), _hot_chunks(engine, user_id, start, end)):
+        async for chunk in chunks:
+            for receipt in chunk:
+                entry = totals[receipt.payment_type]
+                entry[0] += 1
+                entry[1] += receipt.total
+            yield layout.render_many(chunk)
+    yield statement_footer(layout, totals)
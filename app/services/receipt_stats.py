@@ -0,0 +1,275 @@
+"""Receipt totals behind ``/receipts/stats`` filters.
+
+``receipt_daily_totals`` keeps the count, sum, min and max of one user's
+receipts per UTC day and payment type. Rows are upserted in the receipt's
+transaction by ``record_daily_totals``. Archiving leaves them alone, so they
+cover hot and archived receipts alike.
+
+Filters on dates and payment type only cut along those rows, so they are
+answered from the rollup: the days from ``date_from`` up to the day before
+``date_to``, plus the receipts stamped exactly at ``date_to``'s midnight
+(see app.database.filters). Any other filter runs one aggregate over the hot
+receipts and one over the user's ``receipt_archive_entries``. Only
+``search`` needs the item names, which exist for archived receipts in
+their segments alone, so a search also reads the segments holding that
+user's receipts in the date range, and no others.
+
+``python -m app.services.receipt_stats`` rebuilds the rollup from hot and
+archived receipts.
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.filters import ReceiptFilters, apply_receipt_filters
+from app.database.models import ReceiptArchiveEntryModel, ReceiptDailyTotalModel, ReceiptModel, UserModel
+from app.database.queries import StatementCache, bump_data_versions, dialect_insert
+from app.services.product_stats import utc_day
+from app.services.receipt_archive import iter_archived_receipts
+
+ROLLUP_FILTERS = frozenset({"date_from", "date_to", "payment_type"})
+RECOMPUTE_CHUNK = 5_000
+
+
+def _accumulate(groups: Dict[Hashable, List], key: Hashable, count: int, amount, low, high) -> None:
+    """Merge a count, sum, min and max into ``groups[key]``."""
+    if not count:
+        return
+    amount, low, high = (Decimal(str(v)) for v in (amount, low, high))
+    entry = groups.get(key)
+    if entry is None:
+        groups[key] = [count, amount, low, high]
+    else:
+        entry[0] += count
+        entry[1] += amount
+        entry[2] = min(entry[2], low)
+        entry[3] = max(entry[3], high)
+
+
+@dataclass
+class StatsTotals:
+    # payment type -> [count, amount, min, max]
+    by_type: Dict[str, List] = field(default_factory=dict)
+
+    def add(self, payment_type: str, count: int, amount, low, high) -> None:
+        _accumulate(self.by_type, payment_type, count, amount, low, high)
+
+
+DailyGroups = Dict[Tuple[int, date, str], List]
+
+
+def _add_to_days(days: DailyGroups, receipts) -> DailyGroups:
+    for r in receipts:
+        _accumulate(days, (r.user_id, utc_day(r.created_at), r.payment_type), 1, r.total, r.total, r.total)
+    return days
+
+
+def _daily_rows(days: DailyGroups) -> List[Dict[str, Any]]:
+    return [
+        {
+            "user_id": user_id,
+            "day": day,
+            "payment_type": payment_type,
+            "receipt_count": count,
+            "total_amount": amount,
+            "min_total": low,
+            "max_total": high,
+        }
+        for (user_id, day, payment_type), (count, amount, low, high) in sorted(days.items())
+    ]
+
+
+_upserts: Dict[str, Any] = {}
+
+
+def _upsert(session: AsyncSession):
+    # built once per dialect and run with parameter lists, so it is compiled
+    # once instead of on every receipt write
+    dialect = session.get_bind().dialect.name
+    stmt = _upserts.get(dialect)
+    if stmt is None:
+        insert_ = dialect_insert(session)(ReceiptDailyTotalModel)
+        model, new = ReceiptDailyTotalModel, insert_.excluded
+        stmt = _upserts[dialect] = insert_.on_conflict_do_update(
+            index_elements=["user_id", "day", "payment_type"],
+            set_={
+                "receipt_count": model.receipt_count + new.receipt_count,
+                "total_amount": model.total_amount + new.total_amount,
+                "min_total": case((new.min_total < model.min_total, new.min_total), else_=model.min_total),
+                "max_total": case((new.max_total > model.max_total, new.max_total), else_=model.max_total),
+            },
+        )
+    return stmt
+
+
+async def record_daily_totals(session: AsyncSession, receipts: Sequence[ReceiptModel]) -> None:
+    """Add new receipts to the rollup in the caller's transaction."""
+    rows = _daily_rows(_add_to_days({}, receipts))
+    if rows:
+        await session.execute(_upsert(session), rows)
+
+
+def _build_scan(active: Tuple[str, ...]):
+    stmt = select(
+        ReceiptModel.payment_type,
+        func.count(ReceiptModel.id),
+        func.sum(ReceiptModel.total),
+        func.min(ReceiptModel.total),
+        func.max(ReceiptModel.total),
+    ).where(ReceiptModel.user_id == bindparam("user_id"))
+    return apply_receipt_filters(stmt, active).group_by(ReceiptModel.payment_type)
+
+
+_ARCHIVED_CLAUSES = {
+    "date_from": lambda: ReceiptArchiveEntryModel.created_at >= bindparam("date_from"),
+    "date_to": lambda: ReceiptArchiveEntryModel.created_at <= bindparam("date_to"),
+    "min_total": lambda: ReceiptArchiveEntryModel.total >= bindparam("min_total"),
+    "max_total": lambda: ReceiptArchiveEntryModel.total <= bindparam("max_total"),
+    "payment_type": lambda: ReceiptArchiveEntryModel.payment_type == bindparam("payment_type"),
+}
+
+
+def _build_archived_scan(active: Tuple[str, ...]):
+    """``_build_scan`` over the archive entries; ``active`` has no search."""
+    stmt = select(
+        ReceiptArchiveEntryModel.payment_type,
+        func.count(ReceiptArchiveEntryModel.receipt_id),
+        func.sum(ReceiptArchiveEntryModel.total),
+        func.min(ReceiptArchiveEntryModel.total),
+        func.max(ReceiptArchiveEntryModel.total),
+    ).where(ReceiptArchiveEntryModel.user_id == bindparam("user_id"))
+    for name in active:
+        stmt = stmt.where(_ARCHIVED_CLAUSES[name]())
+    return stmt.group_by(ReceiptArchiveEntryModel.payment_type)
+
+
+scan_cache = StatementCache()
+
+
+async def _scan(session: AsyncSession, user_id: int, filters: ReceiptFilters, totals: StatsTotals) -> None:
+    active = filters.active()
+    params = {"user_id": user_id, **filters.params()}
+    stmt = scan_cache.get(active, lambda: _build_scan(active))
+    for row in await session.execute(stmt, params):
+        totals.add(*row)
+    if "search" not in active:
+        archived = scan_cache.get(("archived", active), lambda: _build_archived_scan(active))
+        for row in await session.execute(archived, params):
+            totals.add(*row)
+        return
+    async for receipt in iter_archived_receipts(session, user_id, params.get("date_from"), params.get("date_to")):
+        if filters.matches(receipt):
+            totals.add(receipt.payment_type, 1, receipt.total, receipt.total, receipt.total)
+
+
+async def _from_rollup(session: AsyncSession, user_id: int, filters: ReceiptFilters, totals: StatsTotals) -> None:
+    if filters.date_from and filters.date_to and filters.date_from > filters.date_to:
+        return
+    stmt = select(
+        ReceiptDailyTotalModel.payment_type,
+        func.sum(ReceiptDailyTotalModel.receipt_count),
+        func.sum(ReceiptDailyTotalModel.total_amount),
+        func.min(ReceiptDailyTotalModel.min_total),
+        func.max(ReceiptDailyTotalModel.max_total),
+    ).where(ReceiptDailyTotalModel.user_id == user_id)
+    if filters.date_from:
+        stmt = stmt.where(ReceiptDailyTotalModel.day >= filters.date_from)
+    if filters.date_to:
+        stmt = stmt.where(ReceiptDailyTotalModel.day < filters.date_to)
+    if filters.payment_type:
+        stmt = stmt.where(ReceiptDailyTotalModel.payment_type == filters.payment_type)
+    for row in await session.execute(stmt.group_by(ReceiptDailyTotalModel.payment_type)):
+        totals.add(*row)
+    if filters.date_to:
+        midnight = ReceiptFilters(date_from=filters.date_to, date_to=filters.date_to, payment_type=filters.payment_type)
+        await _scan(session, user_id, midnight, totals)
+
+
+async def filtered_stats(session: AsyncSession, user_id: int, filters: ReceiptFilters) -> StatsTotals:
+    """Totals per payment type of the receipts, hot and archived, that
+    ``get_receipts`` would list with ``filters``."""
+    totals = StatsTotals()
+    if ROLLUP_FILTERS.issuperset(filters.active()):
+        await _from_rollup(session, user_id, filters, totals)
+    else:
+        await _scan(session, user_id, filters, totals)
+    return totals
+
+
+async def _user_receipts(session: AsyncSession, user_id: int):
+    """Every receipt of one user, archived and hot, in chunks of rows
+    without items; archived ones come from their entries."""
+    for model, id_column in (
+        (ReceiptArchiveEntryModel, ReceiptArchiveEntryModel.receipt_id),
+        (ReceiptModel, ReceiptModel.id),
+    ):
+        last_id = 0
+        while True:
+            rows = (
+                await session.execute(
+                    select(
+                        id_column.label("id"),
+                        model.user_id,
+                        model.created_at,
+                        model.payment_type,
+                        model.total,
+                    )
+                    .where(model.user_id == user_id, id_column > last_id)
+                    .order_by(id_column)
+                    .limit(RECOMPUTE_CHUNK)
+                )
+            ).all()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1].id
+
+
+async def recompute_daily_totals(session_factory: sessionmaker, user_ids: Optional[Sequence[int]] = None) -> int:
+    """Rebuild the rollup of ``user_ids`` (default: everyone), one
+    transaction per user. Returns the number of users rebuilt."""
+    async with session_factory() as session:
+        if user_ids is None:
+            user_ids = (await session.execute(select(UserModel.id).order_by(UserModel.id))).scalars().all()
+        for user_id in user_ids:
+            days: DailyGroups = {}
+            async for chunk in _user_receipts(session, user_id):
+                _add_to_days(days, chunk)
+            await session.execute(delete(ReceiptDailyTotalModel).where(ReceiptDailyTotalModel.user_id == user_id))
+            rows = _daily_rows(days)
+            if rows:
+                await session.execute(insert(ReceiptDailyTotalModel), rows)
+            await session.execute(bump_data_versions([user_id]))
+            await session.commit()
+    return len(user_ids)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Recompute the daily receipt totals from receipts")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids")
+    args = parser.parse_args(argv)
+
+    async def run() -> int:
+        engine = create_async_engine(args.database_url)
+        try:
+            factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            return await recompute_daily_totals(factory, args.user_ids)
+        finally:
+            await engine.dispose()
+
+    users = asyncio.run(run())
+    print(f"recomputed daily receipt totals for {users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Moving a user's receipts to another shard.
+
+1. The user's receipts (archived ones come back hot), unexpired idempotency
+   keys and a copy of the users row are written to the target shard; ids are
+   kept, product names are interned again in the target's catalog.
+2. In one directory transaction ``users.shard_id`` flips to the target and
+   ``receipt_relocations`` records every copied receipt whose id names
+   another shard.
+3. After ``SHARD_MAP_TTL_SECONDS``, when no process routes the user to the
+   old shard any more, receipts written there in the meantime are copied
+   too, stats are rebuilt on the target and the user's data is deleted from
+   the source, including their records in its archive segments.
+
+The move is not atomic across databases: a failure before step 2 leaves a
+stray copy on the target and the user where they were, so the move can be
+run again.
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.connection import dispose_engine, get_sessionmaker
+from app.database.models import (
+    IdempotencyKeyModel,
+    ProductCounterModel,
+    ProductHeavyHitterModel,
+    ReceiptDailyTotalModel,
+    ReceiptItemModel,
+    ReceiptModel,
+    ReceiptRelocationModel,
+    UserModel,
+)
+from app.database.queries import dialect_insert
+from app.database.shards import (
+    dispose_shards,
+    home_shard,
+    receipt_id_base,
+    session_shard,
+    shard_map,
+    shard_sessionmaker,
+)
+from app.services.product_stats import recompute_product_stats
+from app.services.products import intern_products, normalize_product_name
+from app.services.receipt_archive import drop_archived_receipts, iter_archived_receipts
+from app.services.receipt_stats import recompute_daily_totals
+
+MOVE_CHUNK = 500
+
+USER_COLUMNS = ("fullname", "username", "email", "password_hash", "is_active", "created_at", "updated_at")
+RECEIPT_COLUMNS = ("id", "user_id", "payment_type", "payment_amount", "total", "rest", "created_at")
+ITEM_COLUMNS = ("name", "price", "quantity", "total")
+KEY_COLUMNS = ("user_id", "key", "request_hash", "receipt_id", "created_at", "expires_at")
+
+
+@dataclass
+class MoveStats:
+    source: int = 0
+    target: int = 0
+    receipts: int = 0
+    archived: int = 0
+    caught_up: int = 0
+    relocated: int = 0
+
+
+async def _copy_user(
+    directory: sessionmaker, source: sessionmaker, target: sessionmaker, user_id: int, shard_id: int
+) -> None:
+    async with directory() as session:
+        user = await session.get(UserModel, user_id)
+    async with source() as session:
+        version = await session.execute(select(UserModel.data_version).where(UserModel.id == user_id))
+        version = version.scalar() or 0
+    async with target() as session:
+        existing = await session.get(UserModel, user_id)
+        values = {c: getattr(user, c) for c in USER_COLUMNS}
+        if existing is None:
+            session.add(UserModel(id=user_id, shard_id=shard_id, data_version=version + 1, **values))
+        else:
+            # past the source's, so no ETag handed out there matches the target's data
+            existing.data_version = max(existing.data_version, version) + 1
+            if target is not directory:
+                for column, value in values.items():
+                    setattr(existing, column, value)
+        await session.commit()
+
+
+def _rows(receipts: List[ReceiptModel]) -> Tuple[List[dict], List[dict]]:
+    return (
+        [{c: getattr(r, c) for c in RECEIPT_COLUMNS} for r in receipts],
+        [{"receipt_id": r.id, **{c: getattr(item, c) for c in ITEM_COLUMNS}} for r in receipts for item in r.items],
+    )
+
+
+async def _write_receipts(target: sessionmaker, receipts: List[dict], items: List[dict]) -> None:
+    async with target() as session:
+        shard_id = session_shard(session)
+        sqlite = session.get_bind().dialect.name == "sqlite"
+        if sqlite and max(r["id"] for r in receipts) >= receipt_id_base(shard_id + 1):
+            # SQLite's next AUTOINCREMENT id follows the largest id in the
+            # table, which would then lie in another shard's range
+            raise ValueError(f"SQLite shard {shard_id} cannot hold receipts issued by a later shard")
+        product_ids = await intern_products(session, (item["name"] for item in items))
+        created_at = {r["id"]: r["created_at"] for r in receipts}
+        for item in items:
+            item["product_id"] = product_ids[normalize_product_name(item["name"])]
+            item["receipt_created_at"] = created_at[item["receipt_id"]]
+        # Core inserts: no ORM instances for what is only copied
+        await session.execute(ReceiptModel.__table__.insert(), receipts)
+        if items:
+            await session.execute(ReceiptItemModel.__table__.insert(), items)
+        await session.commit()
+
+
+async def _copy_hot(source: sessionmaker, target: sessionmaker, user_id: int, copied: Set[int]) -> int:
+    """Copy the hot receipts of the user not in ``copied`` yet, adding their
+    ids to it."""
+    receipts_table, items_table = ReceiptModel.__table__, ReceiptItemModel.__table__
+    count, after = 0, None
+    while True:
+        # keyset in (user_id, created_at) index order, so no chunk sorts all the user's receipts
+        stmt = (
+            select(*(receipts_table.c[c] for c in RECEIPT_COLUMNS))
+            .where(receipts_table.c.user_id == user_id)
+            .order_by(receipts_table.c.created_at, receipts_table.c.id)
+            .limit(MOVE_CHUNK)
+        )
+        if after is not None:
+            stmt = stmt.where(tuple_(receipts_table.c.created_at, receipts_table.c.id) > after)
+        async with source() as session:
+            chunk = [dict(r) for r in (await session.execute(stmt)).mappings()]
+            fresh = [r for r in chunk if r["id"] not in copied]
+            items = []
+            if fresh:
+                items_stmt = select(items_table.c.receipt_id, *(items_table.c[c] for c in ITEM_COLUMNS)).where(
+                    items_table.c.receipt_id.in_([r["id"] for r in fresh])
+                )
+                items = [dict(i) for i in (await session.execute(items_stmt)).mappings()]
+        if not chunk:
+            return count
+        after = (chunk[-1]["created_at"], chunk[-1]["id"])
+        if fresh:
+            await _write_receipts(target, fresh, items)
+            copied.update(r["id"] for r in fresh)
+            count += len(fresh)
+
+
+async def _copy_archived(source: sessionmaker, target: sessionmaker, user_id: int, copied: Set[int]) -> int:
+    count = 0
+    async with source() as session:
+        chunk = []
+        async for receipt in iter_archived_receipts(session, user_id):
+            chunk.append(receipt)
+            if len(chunk) == MOVE_CHUNK:
+                await _write_receipts(target, *_rows(chunk))
+                copied.update(r.id for r in chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            await _write_receipts(target, *_rows(chunk))
+            copied.update(r.id for r in chunk)
+            count += len(chunk)
+    return count
+
+
+async def _copy_keys(source: sessionmaker, target: sessionmaker, user_id: int) -> None:
+    async with source() as session:
+        keys = (
+            await session.execute(
+                select(IdempotencyKeyModel).where(
+                    IdempotencyKeyModel.user_id == user_id,
+                    IdempotencyKeyModel.expires_at > datetime.now(timezone.utc),
+                )
+            )
+        ).scalars().all()
+    if not keys:
+        return
+    async with target() as session:
+        rows = [{c: getattr(k, c) for c in KEY_COLUMNS} for k in keys]
+        await session.execute(
+            dialect_insert(session)(IdempotencyKeyModel).values(rows).on_conflict_do_nothing(
+                index_elements=["user_id", "key"]
+            )
+        )
+        await session.commit()
+
+
+async def _relocate(session: AsyncSession, receipt_ids: List[int], shard_id: int) -> int:
+    """Point ``receipt_ids`` at ``shard_id``; ids issued by that shard need no
+    row. Returns the number of rows written."""
+    home = [i for i in receipt_ids if home_shard(i) == shard_id]
+    away = [i for i in receipt_ids if home_shard(i) != shard_id]
+    for start in range(0, len(home), MOVE_CHUNK):
+        chunk = home[start : start + MOVE_CHUNK]
+        await session.execute(delete(ReceiptRelocationModel).where(ReceiptRelocationModel.receipt_id.in_(chunk)))
+    for start in range(0, len(away), MOVE_CHUNK):
+        stmt = dialect_insert(session)(ReceiptRelocationModel).values(
+            [{"receipt_id": i, "shard_id": shard_id} for i in away[start : start + MOVE_CHUNK]]
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(index_elements=["receipt_id"], set_={"shard_id": stmt.excluded.shard_id})
+        )
+    return len(away)
+
+
+async def _delete_source_data(source: sessionmaker, user_id: int, delete_user: bool) -> None:
+    async with source() as session:
+        receipt_ids = select(ReceiptModel.id).where(ReceiptModel.user_id == user_id).scalar_subquery()
+        await session.execute(delete(ReceiptItemModel).where(ReceiptItemModel.receipt_id.in_(receipt_ids)))
+        for model in (
+            ReceiptModel,
+            ProductCounterModel,
+            ProductHeavyHitterModel,
+            ReceiptDailyTotalModel,
+            IdempotencyKeyModel,
+        ):
+            await session.execute(delete(model).where(model.user_id == user_id))
+        await drop_archived_receipts(session, user_id)
+        if delete_user:
+            await session.execute(delete(UserModel).where(UserModel.id == user_id))
+        await session.commit()
+
+
+async def move_user(
+    directory: sessionmaker, user_id: int, target_shard: int, settle_seconds: Optional[float] = None
+) -> MoveStats:
+    """Move ``user_id``'s receipts to ``target_shard``; ``directory`` is a
+    session factory on shard 0. Raises LookupError for an unknown user and
+    KeyError for a shard missing from ``SHARDS``."""
+    if settle_seconds is None:
+        settle_seconds = get_settings().shard_map_ttl_seconds
+    async with directory() as session:
+        source_shard = (await session.execute(select(UserModel.shard_id).where(UserModel.id == user_id))).scalar()
+    if source_shard is None:
+        raise LookupError(f"no user {user_id}")
+    stats = MoveStats(source=source_shard, target=target_shard)
+    if source_shard == target_shard:
+        return stats
+    source = shard_sessionmaker(source_shard, directory)
+    target = shard_sessionmaker(target_shard, directory)
+
+    await _copy_user(directory, source, target, user_id, target_shard)
+    copied: Set[int] = set()
+    stats.archived = await _copy_archived(source, target, user_id, copied)
+    stats.receipts = await _copy_hot(source, target, user_id, copied)
+    await _copy_keys(source, target, user_id)
+
+    async with directory() as session:
+        await session.execute(update(UserModel).where(UserModel.id == user_id).values(shard_id=target_shard))
+        stats.relocated = await _relocate(session, sorted(copied), target_shard)
+        await session.commit()
+    shard_map.forget(user_id)
+
+    await asyncio.sleep(settle_seconds)
+    before = set(copied)
+    stats.caught_up = await _copy_hot(source, target, user_id, copied)
+    if stats.caught_up:
+        await _copy_keys(source, target, user_id)
+        async with directory() as session:
+            stats.relocated += await _relocate(session, sorted(copied - before), target_shard)
+            await session.commit()
+    await recompute_product_stats(target, [user_id])
+    await recompute_daily_totals(target, [user_id])
+    await _delete_source_data(source, user_id, delete_user=source_shard != 0)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Move a user's receipts to another shard")
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--to-shard", type=int, required=True)
+    parser.add_argument("--settle-seconds", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    async def run() -> MoveStats:
+        try:
+            return await move_user(get_sessionmaker(), args.user_id, args.to_shard, args.settle_seconds)
+        finally:
+            await dispose_shards()
+            await dispose_engine()
+
+    stats = asyncio.run(run())
+    print(
+        f"moved user {args.user_id} from shard {stats.source} to {stats.target}: {stats.receipts} hot, "
+        f"{stats.archived} archived and {stats.caught_up} late receipts, {stats.relocated} relocations"
+    )
+
+
+if __name__ == "__main__":
+    main()
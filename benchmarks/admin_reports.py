@@ -0,0 +1,90 @@
+"""Platform-wide revenue report: one query per user against range queries
+over the daily rollup, sequentially and concurrently.
+
+Seeds a SQLite file (or ``--database-url``), builds the daily totals, then
+times the revenue of every user over the whole period three ways: a
+``/receipts/stats``-style aggregate per user run one after another, as a
+script would have to today; ``run_report`` with one range query at a time;
+and ``run_report`` with several at once. Reports the time to the first
+partial line as well.
+
+    python -m benchmarks.admin_reports --receipts 200000 --users 2000 --range-size 100
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import ReceiptModel, UserModel
+from app.services.admin_reports import ReportParams, run_report
+from app.services.receipt_stats import recompute_daily_totals
+from benchmarks.load_test import seed_dataset
+
+CONCURRENCY = (1, 4, 8)
+
+
+async def _per_user(factory: sessionmaker) -> Dict[str, object]:
+    started = time.perf_counter()
+    revenue = Decimal("0")
+    async with factory() as session:
+        user_ids = (await session.execute(select(UserModel.id).order_by(UserModel.id))).scalars().all()
+        for user_id in user_ids:
+            total = (
+                await session.execute(select(func.sum(ReceiptModel.total)).where(ReceiptModel.user_id == user_id))
+            ).scalar()
+            revenue += Decimal(str(total or 0))
+    return {"seconds": round(time.perf_counter() - started, 3), "revenue": str(revenue)}
+
+
+async def _report(engine, concurrency: int, range_size: int) -> Dict[str, object]:
+    started = time.perf_counter()
+    first_line = None
+    async for line in run_report({0: engine}, "revenue", ReportParams(), concurrency, range_size):
+        if first_line is None:
+            first_line = time.perf_counter() - started
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "first_partial_s": round(first_line, 3),
+        "ranges": line["total"],
+        "revenue": str(Decimal(str(line["revenue"]))),
+    }
+
+
+async def run_benchmark(receipts: int, users: int, range_size: int, database_url: Optional[str]) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/reports.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed_dataset(engine, users=users, receipts=receipts)
+        await recompute_daily_totals(factory)
+        results: Dict[str, object] = {
+            "receipts": receipts,
+            "users": users,
+            "per_user_queries": await _per_user(factory),
+        }
+        for concurrency in CONCURRENCY:
+            results[f"report_concurrency_{concurrency}"] = await _report(engine, concurrency, range_size)
+        return results
+    finally:
+        await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--range-size", type=int, default=100)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    results = asyncio.run(run_benchmark(args.receipts, args.users, args.range_size, args.database_url))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
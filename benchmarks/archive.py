@@ -0,0 +1,129 @@
+"""Hot-table size and read latency before and after archiving old receipts.
+
+Loads a synthetic dataset, measures the on-disk size of ``receipts`` and
+``receipt_items`` (tables and their indexes), archives everything older
+than ``--older-than-days`` and measures again, then times single-receipt
+reads from the hot tables and from the archive (cold and cached segment).
+
+    python -m benchmarks.archive --receipts 200000 --older-than-days 90
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import ReceiptArchiveSegmentModel, ReceiptModel
+from app.database.queries import receipt_with_items
+from app.services.receipt_archive import archive_cutoff, archive_receipts, find_archived_receipt, segment_cache
+from benchmarks.dataset import DatasetSpec, bulk_load
+
+HOT_TABLES = ("receipts", "receipt_items")
+
+
+async def table_bytes(engine: AsyncEngine, tables) -> int:
+    async with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            query = (
+                "SELECT coalesce(sum(pg_total_relation_size(relid)), 0) FROM ("
+                "SELECT relid FROM pg_partition_tree(:table) WHERE isleaf) parts"
+            )
+            return sum([(await conn.execute(text(query), {"table": t})).scalar() for t in tables])
+        await conn.execute(text("VACUUM"))
+        names = (
+            await conn.execute(
+                text("SELECT name FROM sqlite_master WHERE tbl_name IN (%s)" % ", ".join(f"'{t}'" for t in tables))
+            )
+        ).scalars().all()
+        size = 0
+        for name in names:
+            size += (await conn.execute(text("SELECT sum(pgsize) FROM dbstat WHERE name = :n"), {"n": name})).scalar() or 0
+        return size
+
+
+def _latency(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+    }
+
+
+async def time_reads(factory: sessionmaker, hot_ids: List[int], archived_ids: List[int]) -> Dict[str, Any]:
+    hot, cold, cached = [], [], []
+    async with factory() as session:
+        for rid in hot_ids:
+            started = time.perf_counter()
+            assert (await session.execute(receipt_with_items(rid))).scalar() is not None
+            hot.append((time.perf_counter() - started) * 1000)
+            session.expunge_all()
+        for rid in archived_ids:
+            segment_cache.clear()
+            started = time.perf_counter()
+            assert await find_archived_receipt(session, rid) is not None
+            cold.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            await find_archived_receipt(session, rid)
+            cached.append((time.perf_counter() - started) * 1000)
+            session.expunge_all()
+    return {"hot": _latency(hot), "archived_cold_segment": _latency(cold), "archived_cached_segment": _latency(cached)}
+
+
+async def run_benchmark(receipts: int, older_than_days: int, reads: int, database_url: Optional[str]) -> Dict[str, Any]:
+    database_url = database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/archive.db"
+    engine = create_async_engine(database_url)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await bulk_load(engine, DatasetSpec(receipts=receipts, users=50, days=365))
+        before = await table_bytes(engine, HOT_TABLES)
+        cutoff = archive_cutoff(older_than_days)
+        async with factory() as session:
+            old_ids = (await session.execute(select(ReceiptModel.id).where(ReceiptModel.created_at < cutoff))).scalars().all()
+            new_ids = (await session.execute(select(ReceiptModel.id).where(ReceiptModel.created_at >= cutoff))).scalars().all()
+
+        started = time.perf_counter()
+        stats = await archive_receipts(factory, cutoff)
+        seconds = time.perf_counter() - started
+        after = await table_bytes(engine, HOT_TABLES)
+        archive = await table_bytes(engine, ("receipt_archive_segments", "receipt_archive_totals"))
+        async with factory() as session:
+            segments = len((await session.execute(select(ReceiptArchiveSegmentModel.id))).scalars().all())
+
+        rng = random.Random(7)
+        latency = await time_reads(factory, rng.sample(new_ids, reads), rng.sample(old_ids, reads))
+    finally:
+        await engine.dispose()
+    return {
+        "receipts": receipts,
+        "archived_receipts": stats.receipts,
+        "archive_seconds": round(seconds, 1),
+        "segments": segments,
+        "compression_ratio": round(stats.raw_bytes / stats.stored_bytes, 1) if stats.stored_bytes else None,
+        "hot_bytes_before": before,
+        "hot_bytes_after": after,
+        "hot_reduction_pct": round((before - after) / before * 100, 1),
+        "archive_bytes": archive,
+        "reads": latency,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--older-than-days", type=int, default=90)
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    result = asyncio.run(run_benchmark(args.receipts, args.older_than_days, args.reads, args.database_url))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""CPU cost against bytes saved for response compression.
+
+Seeds a SQLite file, fetches ``--pages`` pages of ``/receipts?size=100``
+uncompressed, then compresses every page with gzip and zstd (if
+``zstandard`` is installed) at several levels and reports the ratio, bytes
+saved and CPU time per page. Finally it times the same requests end to end
+through ``CompressionMiddleware`` at the configured levels.
+
+    python -m benchmarks.compression --receipts 50000 --pages 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.compression import available_encodings, compress
+from app.auth.security import create_access_token
+from app.database.connection import get_session
+from benchmarks.load_test import seed_dataset
+from main import app
+
+LEVELS = {"gzip": (1, 3, 6, 9), "zstd": (1, 3, 6, 12, 19)}
+
+
+def codec_table(pages: List[bytes], repeats: int) -> List[Dict[str, object]]:
+    raw = sum(len(p) for p in pages)
+    rows = []
+    for encoding in available_encodings():
+        for level in LEVELS[encoding]:
+            kwargs = {"gzip_level": level} if encoding == "gzip" else {"zstd_level": level}
+            started = time.process_time()
+            for _ in range(repeats):
+                compressed = sum(len(compress(p, encoding, **kwargs)) for p in pages)
+            cpu = (time.process_time() - started) / repeats
+            rows.append(
+                {
+                    "encoding": encoding,
+                    "level": level,
+                    "ratio": round(raw / compressed, 2),
+                    "bytes_saved_pct": round((raw - compressed) / raw * 100, 1),
+                    "cpu_ms_per_page": round(cpu / len(pages) * 1000, 3),
+                    "mb_per_cpu_second": round(raw / cpu / 1e6, 1),
+                }
+            )
+    return rows
+
+
+async def _fetch(client: httpx.AsyncClient, headers: Dict[str, str], pages: int, encoding: str):
+    bodies, latencies, wire = [], [], 0
+    for page in range(1, pages + 1):
+        started = time.perf_counter()
+        async with client.stream(
+            "GET", "/receipts", params={"size": 100, "page": page}, headers={**headers, "Accept-Encoding": encoding}
+        ) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+        latencies.append((time.perf_counter() - started) * 1000)
+        wire += len(raw)
+        bodies.append(raw)
+    return bodies, {"median_ms": round(statistics.median(latencies), 2), "bytes_per_page": wire // pages}
+
+
+async def run_benchmark(receipts: int, pages: int, repeats: int, database_url: Optional[str]) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/compression.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed_dataset(engine, users=10, receipts=receipts)
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='user1')}"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            bodies, identity = await _fetch(client, headers, pages, "identity")
+            end_to_end = {"identity": identity}
+            for encoding in available_encodings():
+                end_to_end[encoding] = (await _fetch(client, headers, pages, encoding))[1]
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return {
+        "pages": pages,
+        "page_bytes": sum(len(b) for b in bodies) // len(bodies),
+        "codecs": codec_table(bodies, repeats),
+        "end_to_end": end_to_end,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=50_000)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.pages, args.repeats, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
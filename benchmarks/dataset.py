@@ -0,0 +1,430 @@
+"""Deterministic synthetic dataset generator and bulk loader.
+
+Generates users, receipts and receipt items with realistic distributions
+(Zipf product popularity, log-normal prices, skewed basket sizes, cash vs
+cashless mix, time-of-day and weekday seasonality) and loads them with
+``COPY`` on Postgres or batched ``executemany`` on SQLite, one large
+transaction per batch.
+
+    python -m benchmarks.dataset --receipts 1000000 --users 500 \
+        --database-url sqlite+aiosqlite:///./bench.db
+"""
+import argparse
+import asyncio
+import bisect
+import itertools
+import math
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from app.auth.security import hash_password
+from app.database.connection import Base
+from app.database.models import ReceiptModel, UserModel
+from app.services.products import intern_products, normalize_product_name
+
+PRODUCT_WORDS = [
+    "Milk", "Bread", "Coffee", "Apple", "Cheese", "Butter", "Eggs", "Tea",
+    "Banana", "Rice", "Pasta", "Chicken", "Yogurt", "Juice", "Water", "Sugar",
+    "Flour", "Tomato", "Potato", "Onion", "Salmon", "Beef", "Chocolate", "Cookies",
+]
+PRODUCT_VARIANTS = ["", " 1L", " 0.5L", " 500g", " 1kg", " Organic", " Premium", " Family Pack"]
+BASKET_WEIGHTS = [30, 22, 15, 10, 7, 5, 3, 2, 2, 1, 1, 1, 0.5, 0.5, 0.5]
+HOUR_WEIGHTS = [
+    0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 0.8, 1.5, 2.5, 3.0, 3.5, 4.0,
+    5.0, 4.5, 3.5, 3.5, 4.0, 5.5, 6.0, 5.0, 3.5, 2.0, 1.0, 0.4,
+]
+WEEKDAY_WEIGHTS = [1.0, 0.95, 1.0, 1.05, 1.3, 1.5, 0.9]
+CASHLESS_SHARE = 0.68
+CASH_NOTES = [100, 500, 1000, 2000, 5000, 10000, 20000, 50000]
+
+USER_COLUMNS = ("id", "fullname", "username", "email", "password_hash", "is_active", "created_at")
+RECEIPT_COLUMNS = ("id", "user_id", "payment_type", "payment_amount", "total", "rest", "created_at")
+ITEM_COLUMNS = ("receipt_id", "name", "product_id", "price", "quantity", "total", "receipt_created_at")
+PRODUCT_CHUNK = 1_000
+
+
+@dataclass
+class DatasetSpec:
+    receipts: int = 100_000
+    users: int = 100
+    products: int = 2_000
+    days: int = 365
+    seed: int = 42
+    end: Optional[datetime] = None
+
+
+@dataclass
+class Product:
+    name: str
+    price_cents: int
+    weighted: bool
+
+
+@dataclass
+class LoadStats:
+    users: int = 0
+    receipts: int = 0
+    items: int = 0
+    seconds: float = 0.0
+
+    @property
+    def receipts_per_second(self) -> float:
+        return self.receipts / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class Batch:
+    """Rows are kept as integer cents and epoch seconds; the loaders convert."""
+
+    receipts: List[Tuple]
+    items: List[Tuple]
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    acc = list(itertools.accumulate(weights))
+    return [w / acc[-1] for w in acc]
+
+
+class DatasetGenerator:
+    """Every batch is seeded from (seed, batch index) so batches can be built in any order or process."""
+
+    def __init__(self, spec: DatasetSpec, first_user_id: int = 1, first_receipt_id: int = 1):
+        self.spec = spec
+        self.first_user_id = first_user_id
+        self.first_receipt_id = first_receipt_id
+        self.catalog = self._build_catalog()
+        # catalog name -> products.id, filled in by bulk_load before loading
+        self.product_ids: Dict[str, int] = {}
+        self._product_cdf = _cumulative([1 / (rank + 1) for rank in range(len(self.catalog))])
+        self._basket_cdf = _cumulative(BASKET_WEIGHTS)
+        self._user_cdf = _cumulative([1 / math.sqrt(rank + 1) for rank in range(spec.users)])
+        self._day_starts, self._day_cdf = self._build_calendar()
+        self._hour_cdf = _cumulative(HOUR_WEIGHTS)
+
+    def _build_catalog(self) -> List[Product]:
+        rng = random.Random(self.spec.seed ^ 0x5EED)
+        names = [f"{w}{v}" for w in PRODUCT_WORDS for v in PRODUCT_VARIANTS]
+        catalog = []
+        for n in range(self.spec.products):
+            base = names[n % len(names)]
+            name = base if n < len(names) else f"{base} #{n // len(names)}"
+            price = max(19, int(rng.lognormvariate(5.6, 0.9)))
+            catalog.append(Product(name=name, price_cents=price, weighted=rng.random() < 0.12))
+        rng.shuffle(catalog)
+        return catalog
+
+    def _build_calendar(self) -> Tuple[List[int], List[float]]:
+        end = self.spec.end or datetime.now(timezone.utc)
+        end_day = end.replace(hour=0, minute=0, second=0, microsecond=0)
+        starts, weights = [], []
+        for offset in range(self.spec.days, 0, -1):
+            day = end_day - timedelta(days=offset - 1)
+            starts.append(int(day.timestamp()))
+            # slow growth over the period so recent days are busier
+            weights.append(WEEKDAY_WEIGHTS[day.weekday()] * (1 + (self.spec.days - offset) / self.spec.days))
+        return starts, _cumulative(weights)
+
+    def users(self) -> List[Tuple]:
+        password_hash = hash_password("synthetic-password")
+        created = int(self._day_starts[0]) - 86_400
+        return [
+            (
+                self.first_user_id + n,
+                f"Synthetic Store {n}",
+                f"store{self.first_user_id + n}",
+                f"store{self.first_user_id + n}@example.com",
+                password_hash,
+                True,
+                created,
+            )
+            for n in range(self.spec.users)
+        ]
+
+    def batch_count(self, batch_size: int) -> int:
+        return (self.spec.receipts + batch_size - 1) // batch_size
+
+    def batch(self, index: int, batch_size: int) -> Batch:
+        rng = random.Random(self.spec.seed * 1_000_003 + index)
+        rng_random, randint = rng.random, rng.randint
+        bisect_right = bisect.bisect_right
+        catalog = self.catalog
+        product_cdf, basket_cdf, user_cdf = self._product_cdf, self._basket_cdf, self._user_cdf
+        day_starts, day_cdf, hour_cdf = self._day_starts, self._day_cdf, self._hour_cdf
+        last_product = len(catalog) - 1
+        last_user = self.spec.users - 1
+        first_user_id = self.first_user_id
+
+        start = index * batch_size
+        receipt_id = self.first_receipt_id + start
+        receipts, items = [], []
+        for receipt_id in range(receipt_id, receipt_id + min(batch_size, self.spec.receipts - start)):
+            total = 0
+            for _ in range(bisect_right(basket_cdf, rng_random()) + 1):
+                product = catalog[min(bisect_right(product_cdf, rng_random()), last_product)]
+                if product.weighted:
+                    quantity_milli = randint(150, 2500)
+                elif rng_random() < 0.85:
+                    quantity_milli = 1000
+                else:
+                    quantity_milli = randint(2, 6) * 1000
+                line_total = (product.price_cents * quantity_milli + 500) // 1000
+                total += line_total
+                items.append((receipt_id, product.name, product.price_cents, quantity_milli, line_total))
+
+            if rng_random() < CASHLESS_SHARE:
+                payment_type, paid = "cashless", total
+            else:
+                payment_type = "cash"
+                paid = CASH_NOTES[-1] * (total // CASH_NOTES[-1] + 1)
+                for note in CASH_NOTES:
+                    if note >= total:
+                        paid = note
+                        break
+
+            day = day_starts[bisect_right(day_cdf, rng_random())]
+            created = day + bisect_right(hour_cdf, rng_random()) * 3600 + randint(0, 3599)
+            user_id = first_user_id + min(bisect_right(user_cdf, rng_random()), last_user)
+            receipts.append((receipt_id, user_id, payment_type, paid, total, paid - total, created))
+        return Batch(receipts=receipts, items=items)
+
+    def batches(self, batch_size: int = 50_000) -> Iterator[Batch]:
+        for index in range(self.batch_count(batch_size)):
+            yield self.batch(index, batch_size)
+
+
+_DAY_PREFIXES = {}
+
+
+def _sqlite_timestamp(epoch: int) -> str:
+    day, seconds = divmod(epoch, 86_400)
+    prefix = _DAY_PREFIXES.get(day)
+    if prefix is None:
+        prefix = _DAY_PREFIXES[day] = datetime.fromtimestamp(day * 86_400, timezone.utc).strftime("%Y-%m-%d")
+    hours, rem = divmod(seconds, 3600)
+    return f"{prefix} {hours:02d}:{rem // 60:02d}:{rem % 60:02d}.000000"
+
+
+def _cents(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+def _insert_sql(table: str, columns: Sequence[str]) -> str:
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+
+_WORKER_STATE = None
+
+
+def _init_worker(generator: DatasetGenerator, convert) -> None:
+    global _WORKER_STATE
+    _WORKER_STATE = (generator, convert)
+
+
+def _build_batch(index: int, batch_size: int) -> Tuple[int, int, Tuple[List[Tuple], List[Tuple]]]:
+    generator, convert = _WORKER_STATE
+    batch = generator.batch(index, batch_size)
+    return len(batch.receipts), len(batch.items), convert(batch, generator.product_ids)
+
+
+async def _pipeline(generator: DatasetGenerator, batch_size: int, workers: int, convert, write, stats: LoadStats) -> None:
+    """Build batches in worker processes (or one thread) while earlier batches are written in order."""
+    loop = asyncio.get_running_loop()
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(generator, convert))
+    else:
+        executor = ThreadPoolExecutor(1, initializer=_init_worker, initargs=(generator, convert))
+    with executor:
+        pending = deque()
+        indexes = iter(range(generator.batch_count(batch_size)))
+        for index in itertools.islice(indexes, workers + 1):
+            pending.append(loop.run_in_executor(executor, _build_batch, index, batch_size))
+        while pending:
+            receipts, items, rows = await pending.popleft()
+            index = next(indexes, None)
+            if index is not None:
+                pending.append(loop.run_in_executor(executor, _build_batch, index, batch_size))
+            await write(rows)
+            stats.receipts += receipts
+            stats.items += items
+
+
+def _sqlite_rows(batch: Batch, product_ids: Dict[str, int]) -> Tuple[List[Tuple], List[Tuple]]:
+    created_at = {row[0]: _sqlite_timestamp(row[6]) for row in batch.receipts}
+    return (
+        [
+            (rid, uid, ptype, paid / 100, total / 100, rest / 100, created_at[rid])
+            for rid, uid, ptype, paid, total, rest, _ in batch.receipts
+        ],
+        [
+            (rid, name, product_ids.get(name), price / 100, qty / 1000, total / 100, created_at[rid])
+            for rid, name, price, qty, total in batch.items
+        ],
+    )
+
+
+def _postgres_rows(batch: Batch, product_ids: Dict[str, int]) -> Tuple[List[Tuple], List[Tuple]]:
+    to_dt = datetime.fromtimestamp
+    utc = timezone.utc
+    created_at = {row[0]: to_dt(row[6], utc) for row in batch.receipts}
+    return (
+        [
+            (rid, uid, ptype, _cents(paid), _cents(total), _cents(rest), created_at[rid])
+            for rid, uid, ptype, paid, total, rest, _ in batch.receipts
+        ],
+        [
+            (rid, name, product_ids.get(name), _cents(price), Decimal(qty).scaleb(-3), _cents(total), created_at[rid])
+            for rid, name, price, qty, total in batch.items
+        ],
+    )
+
+
+async def _load_sqlite(driver, generator: DatasetGenerator, users: List[Tuple], batch_size: int, workers: int,
+                       stats: LoadStats, rebuild_indexes: bool) -> None:
+    receipts_sql = _insert_sql("receipts", RECEIPT_COLUMNS)
+    items_sql = _insert_sql("receipt_items", ITEM_COLUMNS)
+
+    async def write(rows):
+        await driver.execute("BEGIN")
+        await driver.executemany(receipts_sql, rows[0])
+        await driver.executemany(items_sql, rows[1])
+        await driver.commit()
+
+    # the connection goes back to the pool, so it is left as it was found
+    cursor = await driver.execute("PRAGMA synchronous")
+    (synchronous,) = await cursor.fetchone()
+    await driver.execute("PRAGMA synchronous = OFF")
+    try:
+        indexes = []
+        if rebuild_indexes:
+            cursor = await driver.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                "AND tbl_name IN ('receipts', 'receipt_items')"
+            )
+            indexes = await cursor.fetchall()
+            for name, _ in indexes:
+                await driver.execute(f"DROP INDEX {name}")
+
+        await driver.execute("BEGIN")
+        await driver.executemany(
+            _insert_sql("users", USER_COLUMNS),
+            [row[:6] + (_sqlite_timestamp(row[6]),) for row in users],
+        )
+        await driver.commit()
+        await _pipeline(generator, batch_size, workers, _sqlite_rows, write, stats)
+
+        for _, sql in indexes:
+            await driver.execute(sql)
+        await driver.commit()
+    finally:
+        await driver.execute(f"PRAGMA synchronous = {synchronous}")
+
+
+async def _load_postgres(driver, generator: DatasetGenerator, users: List[Tuple], batch_size: int, workers: int,
+                         stats: LoadStats, rebuild_indexes: bool) -> None:
+    async def write(rows):
+        async with driver.transaction():
+            await driver.copy_records_to_table("receipts", columns=RECEIPT_COLUMNS, records=rows[0])
+            await driver.copy_records_to_table("receipt_items", columns=ITEM_COLUMNS, records=rows[1])
+
+    indexes = []
+    if rebuild_indexes:
+        indexes = await driver.fetch(
+            "SELECT i.indexname, i.indexdef FROM pg_indexes i "
+            "JOIN pg_class c ON c.relname = i.indexname JOIN pg_index x ON x.indexrelid = c.oid "
+            "WHERE i.tablename IN ('receipts', 'receipt_items') AND NOT x.indisprimary AND NOT x.indisunique"
+        )
+        for row in indexes:
+            await driver.execute(f"DROP INDEX {row['indexname']}")
+
+    async with driver.transaction():
+        await driver.copy_records_to_table(
+            "users",
+            columns=USER_COLUMNS,
+            records=[row[:6] + (datetime.fromtimestamp(row[6], timezone.utc),) for row in users],
+        )
+    await _pipeline(generator, batch_size, workers, _postgres_rows, write, stats)
+
+    for row in indexes:
+        # a partitioned parent reports "ON ONLY", which would skip its partitions
+        await driver.execute(row["indexdef"].replace(" ON ONLY ", " ON ", 1))
+    for table in ("users", "receipts"):
+        await driver.execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+        )
+    await driver.execute("ANALYZE receipts")
+    await driver.execute("ANALYZE receipt_items")
+
+
+async def _intern_catalog(engine: AsyncEngine, generator: DatasetGenerator) -> None:
+    names = [product.name for product in generator.catalog]
+    async with AsyncSession(engine) as session:
+        for start in range(0, len(names), PRODUCT_CHUNK):
+            chunk = names[start:start + PRODUCT_CHUNK]
+            ids = await intern_products(session, chunk)
+            generator.product_ids.update((name, ids[normalize_product_name(name)]) for name in chunk)
+        await session.commit()
+
+
+async def bulk_load(engine: AsyncEngine, spec: DatasetSpec, batch_size: int = 50_000, workers: int = 1) -> LoadStats:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        first_user_id = ((await conn.execute(select(func.max(UserModel.id)))).scalar() or 0) + 1
+        first_receipt_id = ((await conn.execute(select(func.max(ReceiptModel.id)))).scalar() or 0) + 1
+
+    generator = DatasetGenerator(spec, first_user_id, first_receipt_id)
+    await _intern_catalog(engine, generator)
+    users = generator.users()
+    stats = LoadStats(users=len(users))
+
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        loader = _load_postgres if engine.dialect.name == "postgresql" else _load_sqlite
+        # secondary indexes are cheaper to build once over a freshly loaded table
+        await loader(raw.driver_connection, generator, users, batch_size, workers, stats, first_receipt_id == 1)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) - 1),
+                        help="processes generating batches while the loader writes")
+    args = parser.parse_args(argv)
+
+    async def run() -> LoadStats:
+        engine = create_async_engine(args.database_url)
+        try:
+            spec = DatasetSpec(
+                receipts=args.receipts, users=args.users, products=args.products, days=args.days, seed=args.seed
+            )
+            return await bulk_load(engine, spec, args.batch_size, args.workers)
+        finally:
+            await engine.dispose()
+
+    stats = asyncio.run(run())
+    print(
+        f"loaded {stats.users} users, {stats.receipts} receipts, {stats.items} items "
+        f"in {stats.seconds:.2f}s ({stats.receipts_per_second:,.0f} receipts/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Filtered ``/receipts/stats`` against paging the filtered list.
+
+Seeds a SQLite file, builds the daily totals, and for each filter times
+``/receipts/stats`` with it: date and payment type filters come from the
+rollup, the others from one aggregate query. It also times what clients
+did before: page through ``/receipts?include_items=false&size=100`` with
+the same filter and add the totals up. The range spans most of one
+user's history.
+
+    python -m benchmarks.filtered_stats --receipts 100000 --runs 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.database.connection import get_session
+from app.database.models import ReceiptModel
+from app.services.receipt_stats import recompute_daily_totals
+from benchmarks.load_test import seed_dataset
+from main import app
+
+
+def _filters(first: str, last: str) -> Dict[str, Dict[str, str]]:
+    return {
+        "rollup_range": {"date_from": first, "date_to": last},
+        # min_total=0 matches every receipt but forces the aggregate query
+        "scan_range": {"date_from": first, "date_to": last, "min_total": "0"},
+        "rollup_range_payment_type": {"date_from": first, "date_to": last, "payment_type": "cash"},
+        "scan_range_search": {"date_from": first, "date_to": last, "search": "milk"},
+    }
+
+
+async def _time(call, runs: int) -> float:
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(latencies), 2)
+
+
+async def _page_through(client: httpx.AsyncClient, headers, params) -> int:
+    page, count = 1, 0
+    while True:
+        body = (
+            await client.get(
+                "/receipts",
+                params={**params, "include_items": "false", "size": 100, "page": page},
+                headers=headers,
+            )
+        ).json()
+        count += len(body["items"])
+        if not body["has_next"]:
+            return count
+        page += 1
+
+
+async def run_benchmark(receipts: int, runs: int, database_url: Optional[str]) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/stats.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed_dataset(engine, users=10, receipts=receipts)
+        started = time.perf_counter()
+        await recompute_daily_totals(factory)
+        rebuild = time.perf_counter() - started
+        async with factory() as session:
+            oldest, newest = (
+                await session.execute(
+                    select(func.min(ReceiptModel.created_at), func.max(ReceiptModel.created_at)).where(
+                        ReceiptModel.user_id == 1
+                    )
+                )
+            ).one()
+        # the user's whole history, less its first and last week
+        first, last = (oldest + timedelta(days=7)).date(), (newest - timedelta(days=7)).date()
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='user1')}"}
+        results = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for name, params in _filters(first.isoformat(), last.isoformat()).items():
+                stats = (await client.get("/receipts/stats", params=params, headers=headers)).json()
+                assert stats["total_receipts"] == await _page_through(client, headers, params)
+                results[name] = {
+                    "receipts": stats["total_receipts"],
+                    "stats_ms": await _time(
+                        lambda: client.get("/receipts/stats", params=params, headers=headers), runs
+                    ),
+                    "paging_ms": await _time(lambda: _page_through(client, headers, params), max(1, runs // 5)),
+                }
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return {"receipts": receipts, "rollup_rebuild_s": round(rebuild, 2), "filters": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.runs, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""POST /receipts throughput and latency with and without group commit.
+
+Runs the load-test harness twice with a create-only mix against fresh
+copies of the same database, once committing per request and once through
+the group-commit writer, and prints both summaries side by side.
+
+    python -m benchmarks.group_commit --concurrency 64 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+from typing import Dict, List, Optional
+
+from benchmarks.load_test import LoadTestConfig, run_load_test
+
+
+async def compare(concurrency: int, requests: int, database_url: Optional[str], server: bool) -> Dict[str, object]:
+    results = {}
+    for mode, group_commit in (("per_request_commit", False), ("group_commit", True)):
+        url = database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/group_commit.db"
+        report = await run_load_test(
+            LoadTestConfig(
+                receipts=1_000,
+                users=10,
+                concurrency=concurrency,
+                requests=requests,
+                mix={"create": 1},
+                database_url=url,
+                server=server,
+                group_commit=group_commit,
+            )
+        )
+        results[mode] = {k: report[k] for k in ("requests", "errors", "throughput_rps", "latency_ms")}
+    before, after = results["per_request_commit"], results["group_commit"]
+    results["throughput_gain"] = round(after["throughput_rps"] / before["throughput_rps"], 2)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file per mode")
+    parser.add_argument("--server", action="store_true", help="drive a real uvicorn process")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(compare(args.concurrency, args.requests, args.database_url, args.server)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Foreground latency while a background export job runs.
+
+Seeds two users, then keeps ``--concurrency`` clients listing the second
+user's receipts while an export of the first user's receipts runs: once
+with no job (baseline), once with an unthrottled runner and once with the
+configured ``JOBS_DUTY_CYCLE``. Reports list latency and how long the job
+took in each case.
+
+    python -m benchmarks.jobs --receipts 100000 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.config import get_settings
+from app.database.connection import get_session
+from app.domain.schemas.job import JobKind
+from app.services.jobs import enqueue_job, start_job_runner, stop_job_runner
+from benchmarks.load_test import Sample, seed_dataset, summarize
+from main import app
+
+
+async def _list_until(client: httpx.AsyncClient, headers: Dict[str, str], done: asyncio.Event) -> List[Sample]:
+    samples = []
+    while not done.is_set():
+        started = time.perf_counter()
+        response = await client.get("/receipts", params={"size": 20}, headers=headers)
+        samples.append(Sample("list", time.perf_counter() - started, response.status_code))
+    return samples
+
+
+async def _scenario(
+    factory, client, headers, concurrency: int, duty_cycle: Optional[float], artifact_dir: str, seconds: float
+):
+    done = asyncio.Event()
+    workers = [asyncio.create_task(_list_until(client, headers, done)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    job_seconds = None
+    if duty_cycle is None:
+        await asyncio.sleep(seconds)
+    else:
+        runner = await start_job_runner(factory, artifact_dir, 1, duty_cycle)
+        async with factory() as session:
+            await enqueue_job(session, 1, JobKind.RECEIPT_EXPORT, {})
+        await runner.join()
+        job_seconds = round(time.perf_counter() - started, 2)
+        await stop_job_runner()
+    done.set()
+    samples = [s for batch in await asyncio.gather(*workers) for s in batch]
+    report = summarize(samples, time.perf_counter() - started)
+    report["job_seconds"] = job_seconds
+    return report
+
+
+async def run_benchmark(receipts: int, concurrency: int, database_url: Optional[str]) -> Dict[str, object]:
+    workdir = tempfile.mkdtemp()
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{workdir}/jobs.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed_dataset(engine, users=2, receipts=receipts)
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=2, username='user2')}"}
+        duty_cycle = get_settings().jobs_duty_cycle
+        results = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            results["no_job"] = await _scenario(factory, client, headers, concurrency, None, workdir, 5.0)
+            results["export_unthrottled"] = await _scenario(factory, client, headers, concurrency, 1.0, workdir, 0)
+            results["export_throttled"] = await _scenario(factory, client, headers, concurrency, duty_cycle, workdir, 0)
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.concurrency, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
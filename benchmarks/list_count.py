@@ -0,0 +1,101 @@
+"""``GET /receipts`` latency by count strategy: a count query then the page
+(``separate``), the total as a window on the page query (``window``), the
+window for searches only (``auto``), and ``auto`` with
+``RECEIPT_LIST_COUNT_LIMIT`` set.
+
+Seeds a SQLite file (or ``--database-url``) and times first pages and a deep
+page for common filter mixes through the app, median of ``--runs``.
+
+    python -m benchmarks.list_count --receipts 100000 --runs 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.config import get_settings
+from app.database.connection import get_session
+from benchmarks.load_test import seed_dataset
+from main import app
+
+QUERIES = {
+    "first_page": "/receipts?size=20",
+    "first_page_summaries": "/receipts?size=20&include_items=false",
+    "payment_type": "/receipts?size=20&payment_type=cash",
+    "search": "/receipts?size=20&search=milk",
+    "date_range": f"/receipts?size=20&date_from={date.today() - timedelta(days=30)}",
+    "amount_range": "/receipts?size=20&min_total=5&max_total=50",
+    "sort_by_total": "/receipts?size=20&sort_by=total",
+    "deep_page": "/receipts?size=20&page=200",
+}
+
+
+async def _median(client: httpx.AsyncClient, url: str, headers, runs: int) -> float:
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    return round(statistics.median(latencies), 2)
+
+
+async def run_benchmark(receipts: int, runs: int, count_limit: int, database_url: Optional[str]) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/list.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    settings = get_settings()
+    strategies = {
+        "separate": ("separate", 0),
+        "window": ("window", 0),
+        "auto": ("auto", 0),
+        f"auto_limit_{count_limit}": ("auto", count_limit),
+    }
+    try:
+        await seed_dataset(engine, users=10, receipts=receipts)
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='user1')}"}
+        results: Dict[str, Dict[str, object]] = {name: {} for name in QUERIES}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for strategy, (mode, limit) in strategies.items():
+                settings.receipt_list_count, settings.receipt_list_count_limit = mode, limit
+                for name, url in QUERIES.items():
+                    body = (await client.get(url, headers=headers)).json()
+                    results[name][strategy] = {
+                        "ms": await _median(client, url, headers, runs),
+                        "total": body["total"],
+                        "estimated": body["total_estimated"],
+                    }
+    finally:
+        settings.receipt_list_count, settings.receipt_list_count_limit = "auto", 0
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return {"receipts": receipts, "queries": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--count-limit", type=int, default=1000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    results = asyncio.run(run_benchmark(args.receipts, args.runs, args.count_limit, args.database_url))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Per-request CPU cost of the receipts list queries.
+
+Compares the original inline ``select()`` building (rebuilt on every call)
+with the shape-keyed statement cache in ``app.database.queries`` for the
+common filter mixes, measured with ``time.process_time``.
+
+    python -m benchmarks.list_queries --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.database.queries import (
+    SORT_COLUMNS,
+    ReceiptFilters,
+    receipt_list_cache,
+    receipt_list_params,
+    receipt_list_statements,
+)
+from benchmarks.dataset import DatasetSpec, bulk_load
+
+MIXES = {
+    "default": (ReceiptFilters(), "created_at", "desc"),
+    "payment_type": (ReceiptFilters(payment_type="cash"), "created_at", "desc"),
+    "date_range": (
+        ReceiptFilters(date_from=date.today() - timedelta(days=30), date_to=date.today()),
+        "created_at",
+        "desc",
+    ),
+    "amount_range_by_total": (ReceiptFilters(min_total=Decimal("5"), max_total=Decimal("50")), "total", "asc"),
+    "search": (ReceiptFilters(search="Milk", payment_type="cashless"), "total", "desc"),
+}
+
+
+def legacy_list_statements(user_id: int, filters: ReceiptFilters, sort_by: str, sort_order: str, offset: int, size: int):
+    stmt = select(ReceiptModel).where(ReceiptModel.user_id == user_id)
+    cnt = select(func.count(ReceiptModel.id)).where(ReceiptModel.user_id == user_id)
+    if filters.date_from:
+        stmt = stmt.where(ReceiptModel.created_at >= filters.date_from)
+        cnt = cnt.where(ReceiptModel.created_at >= filters.date_from)
+    if filters.date_to:
+        stmt = stmt.where(ReceiptModel.created_at <= filters.date_to)
+        cnt = cnt.where(ReceiptModel.created_at <= filters.date_to)
+    if filters.min_total is not None:
+        stmt = stmt.where(ReceiptModel.total >= filters.min_total)
+        cnt = cnt.where(ReceiptModel.total >= filters.min_total)
+    if filters.max_total is not None:
+        stmt = stmt.where(ReceiptModel.total <= filters.max_total)
+        cnt = cnt.where(ReceiptModel.total <= filters.max_total)
+    if filters.payment_type:
+        stmt = stmt.where(ReceiptModel.payment_type == filters.payment_type)
+        cnt = cnt.where(ReceiptModel.payment_type == filters.payment_type)
+    if filters.search:
+        subq = select(ReceiptItemModel.receipt_id).where(ReceiptItemModel.name.ilike(f"%{filters.search}%"))
+        stmt = stmt.where(ReceiptModel.id.in_(subq))
+        cnt = cnt.where(ReceiptModel.id.in_(subq))
+    col = SORT_COLUMNS[sort_by]
+    stmt = stmt.order_by(desc(col) if sort_order == "desc" else col)
+    stmt = stmt.options(selectinload(ReceiptModel.items)).offset(offset).limit(size)
+    return stmt, cnt
+
+
+async def _measure(session: AsyncSession, iterations: int, run_once) -> float:
+    await run_once()
+    started = time.process_time()
+    for _ in range(iterations):
+        await run_once()
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+async def run_benchmark(iterations: int, receipts: int, database_url: Optional[str] = None) -> Dict[str, object]:
+    database_url = database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/list_queries.db"
+    engine = create_async_engine(database_url)
+    await bulk_load(engine, DatasetSpec(receipts=receipts, users=20, days=60))
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    receipt_list_cache.clear()
+
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        async with session_factory() as session:
+            for name, (filters, sort_by, sort_order) in MIXES.items():
+                async def legacy():
+                    stmt, cnt = legacy_list_statements(1, filters, sort_by, sort_order, 0, 20)
+                    await session.execute(cnt)
+                    (await session.execute(stmt)).scalars().all()
+                    session.expunge_all()
+
+                async def cached():
+                    stmt, cnt = receipt_list_statements(filters, sort_by, sort_order)
+                    params = receipt_list_params(1, filters, 0, 20)
+                    await session.execute(cnt, params)
+                    (await session.execute(stmt, params)).scalars().all()
+                    session.expunge_all()
+
+                before = await _measure(session, iterations, legacy)
+                after = await _measure(session, iterations, cached)
+                results[name] = {
+                    "legacy_cpu_us": round(before, 1),
+                    "cached_cpu_us": round(after, 1),
+                    "saved_pct": round((before - after) / before * 100, 1),
+                }
+    finally:
+        await engine.dispose()
+    return {"iterations": iterations, "receipts": receipts, "mixes": results, "cache": receipt_list_cache.info()}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=1_000)
+    parser.add_argument("--receipts", type=int, default=20_000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.iterations, args.receipts, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Memory and time to write one ``GET /receipts`` page: FastAPI's
+``ReceiptListResponse`` path against ``stream_receipt_list``.
+
+Builds ``--size`` receipts of ``--items`` items each as loaded ORM rows,
+then writes the page both ways and reports the tracemalloc peak on top of
+the rows and the median time over ``--runs``. The old path is what the
+endpoint did before: ``ReceiptResponse.from_model`` per row, the model
+through ``serialize_response`` and the result through ``JSONResponse``.
+
+    python -m benchmarks.list_stream --size 100 --items 50 --runs 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.api.json_stream import stream_receipt_list
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.domain.schemas.receipt import ReceiptListResponse, ReceiptResponse
+
+_FIELD = create_model_field("response", ReceiptListResponse)
+
+
+def _rows(size: int, items: int) -> List[ReceiptModel]:
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(size):
+        receipt = ReceiptModel(
+            id=i + 1,
+            payment_type="cash",
+            payment_amount=Decimal("1000.00"),
+            total=Decimal("512.40"),
+            rest=Decimal("487.60"),
+            created_at=started + timedelta(minutes=i),
+        )
+        receipt.items = [
+            ReceiptItemModel(
+                name=f"Product {j} ({i})", price=Decimal("10.25"), quantity=Decimal("2.000"), total=Decimal("20.50")
+            )
+            for j in range(items)
+        ]
+        rows.append(receipt)
+    return rows
+
+
+def _page(size: int) -> Dict[str, Any]:
+    return {
+        "total": size * 10,
+        "page": 1,
+        "size": size,
+        "total_pages": 10,
+        "has_next": True,
+        "has_prev": False,
+        "total_estimated": False,
+    }
+
+
+async def _fastapi(rows: List[ReceiptModel], page: Dict[str, Any]) -> int:
+    model = ReceiptListResponse(items=[ReceiptResponse.from_model(r) for r in rows], **page)
+    return len(JSONResponse(await serialize_response(field=_FIELD, response_content=model)).body)
+
+
+async def _streamed(rows: List[ReceiptModel], page: Dict[str, Any]) -> int:
+    # like the server: each chunk is handed on and dropped
+    written = 0
+    async for chunk in stream_receipt_list(rows, **page):
+        written += len(chunk)
+    return written
+
+
+async def _measure(write: Callable, size: int, items: int, runs: int) -> Dict[str, object]:
+    page = _page(size)
+    timings = []
+    for _ in range(runs):
+        rows = _rows(size, items)
+        started = time.perf_counter()
+        written = await write(rows, page)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    rows = _rows(size, items)
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        await write(rows, page)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return {"ms": round(statistics.median(timings), 2), "peak_kib": round(peak / 1024, 1), "bytes": written}
+
+
+async def run_benchmark(size: int, items: int, runs: int) -> Dict[str, object]:
+    return {
+        "size": size,
+        "items_per_receipt": items,
+        "fastapi": await _measure(_fastapi, size, items, runs),
+        "streamed": await _measure(_streamed, size, items, runs),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.size, args.items, args.runs)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
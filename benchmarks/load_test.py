@@ -0,0 +1,337 @@
+"""Concurrent load-test harness for the receipts API.
+
+Drives the ASGI app in-process through ``httpx.ASGITransport`` (or a real
+uvicorn process with ``--server``) using a weighted mix of operations and
+writes a JSON report with throughput and latency percentiles.
+
+    python -m benchmarks.load_test --receipts 100000 --concurrency 32 \
+        --requests 20000 --mix create=1,list=5,search=2,stats=1,public=1 \
+        --output results/load.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, select
+
+from app.auth.security import create_access_token
+from app.config import get_settings
+from app.database.connection import Base, create_engines, create_sessionmaker, get_session
+from app.database.models import ReceiptModel, UserModel
+from app.services.receipt_ingest import start_group_commit, stop_group_commit
+from benchmarks.dataset import DatasetSpec, bulk_load
+
+DEFAULT_MIX = {"create": 1, "list": 5, "search": 2, "stats": 1, "public": 1}
+SEARCH_TERMS = ["Milk", "Bread", "Coffee", "Apple", "Cheese"]
+
+
+@dataclass
+class LoadTestConfig:
+    receipts: int = 10_000
+    users: int = 10
+    concurrency: int = 16
+    requests: int = 2_000
+    duration: Optional[float] = None
+    mix: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    database_url: Optional[str] = None
+    server: bool = False
+    group_commit: bool = False
+    sqlite_profile: str = "default"
+    seed: int = 42
+
+
+@dataclass
+class Sample:
+    operation: str
+    latency: float
+    status: int
+
+
+class _Context:
+    def __init__(self, headers: List[Dict[str, str]], max_receipt_id: int):
+        self.headers = headers
+        self.max_receipt_id = max_receipt_id
+
+
+async def seed_dataset(engine, users: int, receipts: int, seed: int = 42) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        existing = (await conn.execute(select(func.count(ReceiptModel.id)))).scalar()
+    if existing >= receipts:
+        return existing
+    stats = await bulk_load(engine, DatasetSpec(receipts=receipts - existing, users=users, seed=seed))
+    return existing + stats.receipts
+
+
+async def _op_create(client: httpx.AsyncClient, ctx: _Context, rng: random.Random) -> httpx.Response:
+    products = [
+        {
+            "name": f"{rng.choice(SEARCH_TERMS)} {rng.randint(1, 500)}",
+            "price": f"{rng.randint(50, 5000) / 100:.2f}",
+            "quantity": str(rng.randint(1, 3)),
+        }
+        for _ in range(rng.randint(1, 5))
+    ]
+    return await client.post(
+        "/receipts",
+        json={"products": products, "payment": {"type": "cashless", "amount": "100000.00"}},
+        headers=rng.choice(ctx.headers),
+    )
+
+
+async def _op_list(client: httpx.AsyncClient, ctx: _Context, rng: random.Random) -> httpx.Response:
+    return await client.get(
+        "/receipts",
+        params={"page": rng.randint(1, 5), "size": rng.choice((10, 20, 50))},
+        headers=rng.choice(ctx.headers),
+    )
+
+
+async def _op_search(client: httpx.AsyncClient, ctx: _Context, rng: random.Random) -> httpx.Response:
+    return await client.get(
+        "/receipts",
+        params={
+            "search": rng.choice(SEARCH_TERMS),
+            "payment_type": rng.choice(("cash", "cashless")),
+            "sort_by": "total",
+        },
+        headers=rng.choice(ctx.headers),
+    )
+
+
+async def _op_stats(client: httpx.AsyncClient, ctx: _Context, rng: random.Random) -> httpx.Response:
+    return await client.get("/receipts/stats", headers=rng.choice(ctx.headers))
+
+
+async def _op_public(client: httpx.AsyncClient, ctx: _Context, rng: random.Random) -> httpx.Response:
+    return await client.get(f"/public/receipts/{rng.randint(1, ctx.max_receipt_id)}")
+
+
+OPERATIONS = {
+    "create": _op_create,
+    "list": _op_list,
+    "search": _op_search,
+    "stats": _op_stats,
+    "public": _op_public,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, object]:
+    latencies = sorted(s.latency * 1000 for s in samples)
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s.status >= 400),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+async def _drive(client: httpx.AsyncClient, ctx: _Context, config: LoadTestConfig) -> List[Sample]:
+    names = [n for n, w in config.mix.items() if w > 0]
+    weights = [config.mix[n] for n in names]
+    samples: List[Sample] = []
+    remaining = [config.requests]
+    deadline = time.perf_counter() + config.duration if config.duration else None
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(config.seed * 1000 + worker_id)
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif remaining[0] <= 0:
+                return
+            else:
+                remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = (await OPERATIONS[name](client, ctx, rng)).status_code
+            except httpx.HTTPError:
+                status = 599
+            samples.append(Sample(name, time.perf_counter() - started, status))
+
+    await asyncio.gather(*(worker(n) for n in range(config.concurrency)))
+    return samples
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _start_server(database_url: str, group_commit: bool = False, sqlite_profile: str = "default") -> tuple:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        GROUP_COMMIT_ENABLED=str(group_commit).lower(),
+        SQLITE_PROFILE=sqlite_profile,
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base_url) as probe:
+        for _ in range(100):
+            try:
+                if (await probe.get("/")).status_code == 200:
+                    return process, base_url
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def run_load_test(config: LoadTestConfig) -> Dict[str, object]:
+    for name in config.mix:
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {name}")
+
+    database_url = config.database_url
+    if database_url is None:
+        database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/load_test.db"
+
+    engine, reader = create_engines(
+        get_settings().model_copy(update={"database_url": database_url, "sqlite_profile": config.sqlite_profile})
+    )
+    seed_started = time.perf_counter()
+    receipts = await seed_dataset(engine, config.users, config.receipts, config.seed)
+    seed_elapsed = time.perf_counter() - seed_started
+
+    async with engine.connect() as conn:
+        user_rows = (await conn.execute(select(UserModel.id, UserModel.username))).all()
+        max_receipt_id = (await conn.execute(select(func.max(ReceiptModel.id)))).scalar() or 1
+    ctx = _Context(
+        headers=[
+            {"Authorization": f"Bearer {create_access_token(user_id=uid, username=name)}"}
+            for uid, name in user_rows
+        ],
+        max_receipt_id=max_receipt_id,
+    )
+
+    process = None
+    if config.server:
+        await reader.dispose()
+        await engine.dispose()
+        process, base_url = await _start_server(database_url, config.group_commit, config.sqlite_profile)
+        client = httpx.AsyncClient(base_url=base_url, timeout=60)
+    else:
+        from main import app
+
+        session_factory = create_sessionmaker(engine, reader)
+
+        async def override_get_session():
+            async with session_factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        if config.group_commit:
+            settings = get_settings()
+            start_group_commit(
+                session_factory, settings.group_commit_max_batch, settings.group_commit_max_delay_ms / 1000
+            )
+        client = httpx.AsyncClient(
+            # app errors count as 500s, as they would behind a real server
+            transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+            base_url="http://loadtest",
+            timeout=60,
+        )
+
+    try:
+        started = time.perf_counter()
+        samples = await _drive(client, ctx, config)
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.aclose()
+        if process is not None:
+            process.terminate()
+            process.wait()
+        else:
+            await stop_group_commit()
+            app.dependency_overrides.pop(get_session, None)
+            await reader.dispose()
+            await engine.dispose()
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {**asdict(config), "database_url": database_url},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "dataset": {"users": len(user_rows), "receipts": receipts, "seed_seconds": round(seed_elapsed, 3)},
+        "duration_s": round(elapsed, 3),
+        **summarize(samples, elapsed),
+        "operations": {
+            name: summarize([s for s in samples if s.operation == name], elapsed)
+            for name in sorted({s.operation for s in samples})
+        },
+    }
+    return report
+
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--duration", type=float, default=None, help="run for N seconds instead of --requests")
+    parser.add_argument("--mix", type=_parse_mix, default=dict(DEFAULT_MIX))
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    parser.add_argument("--server", action="store_true", help="drive a real uvicorn process")
+    parser.add_argument("--group-commit", action="store_true", help="batch POST /receipts commits")
+    parser.add_argument("--sqlite-profile", default="default", choices=("default", "production"))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write the JSON report to this path")
+    args = parser.parse_args(argv)
+
+    output = args.output
+    config = LoadTestConfig(**{k: v for k, v in vars(args).items() if k != "output"})
+    report = asyncio.run(run_load_test(config))
+
+    text = json.dumps(report, indent=2)
+    if output:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        with open(output, "w") as fh:
+            fh.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
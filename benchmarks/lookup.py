@@ -0,0 +1,92 @@
+"""Fetching many receipts one GET at a time against one batch lookup.
+
+Seeds a SQLite file, picks ``--ids`` random receipt ids of user 1 and
+fetches them through ``GET /receipts/{id}`` in a loop and through
+``POST /receipts/lookup`` in batches of ``MAX_LOOKUP_IDS``, reporting wall
+time and SQL statements for each.
+
+    python -m benchmarks.lookup --receipts 100000 --ids 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.database.connection import get_session
+from app.database.models import ReceiptModel
+from app.domain.schemas.receipt import MAX_LOOKUP_IDS
+from benchmarks.load_test import seed_dataset
+from main import app
+
+
+async def _timed(engine, fetch) -> Dict[str, float]:
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        started = time.perf_counter()
+        await fetch()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+    return {"seconds": round(elapsed, 3), "statements": len(statements)}
+
+
+async def run_benchmark(receipts: int, ids: int, database_url: Optional[str]) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/lookup.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed_dataset(engine, users=10, receipts=receipts)
+        async with factory() as session:
+            owned = (await session.execute(select(ReceiptModel.id).where(ReceiptModel.user_id == 1))).scalars().all()
+        wanted = random.Random(1).sample(list(owned), min(ids, len(owned)))
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='user1')}"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+
+            async def one_by_one():
+                for receipt_id in wanted:
+                    assert (await client.get(f"/receipts/{receipt_id}", headers=headers)).status_code == 200
+
+            async def batched():
+                for start in range(0, len(wanted), MAX_LOOKUP_IDS):
+                    batch = wanted[start:start + MAX_LOOKUP_IDS]
+                    response = await client.post("/receipts/lookup", json={"ids": batch}, headers=headers)
+                    assert len(response.json()["receipts"]) == len(batch)
+
+            results = {"ids": len(wanted), "get_loop": await _timed(engine, one_by_one)}
+            results["lookup"] = await _timed(engine, batched)
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--ids", type=int, default=2_000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.ids, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Outbox cost on receipt inserts and dispatch throughput by batch size.
+
+Inserts ``--receipts`` receipts one transaction each into a SQLite file,
+with the outbox off and on, then drains the queued events with batches of
+1 to 500 into two local stand-ins for a downstream system: one that waits
+``--sink-latency-ms`` per call, like an HTTP round trip, and the file sink,
+which syncs the file once per batch.
+
+    python -m benchmarks.outbox --receipts 5000 --sink-latency-ms 5
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.models import ReceiptOutboxModel, UserModel
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services.outbox import FileSink, OutboxDispatcher
+from app.services.receipt_ingest import insert_receipts, pending_receipt
+from benchmarks.load_test import seed_dataset
+
+BATCH_SIZES = (1, 10, 100, 500)
+
+
+class StandInSink:
+    """Accepts every batch after ``latency`` seconds."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.events = 0
+
+    async def send(self, lines: List[str]) -> None:
+        await asyncio.sleep(self.latency)
+        self.events += len(lines)
+
+    async def close(self) -> None:
+        pass
+
+
+def _receipt(n: int) -> ReceiptCreate:
+    return ReceiptCreate(
+        products=[{"name": f"Product {n % 50 + i}", "price": "2.50", "quantity": 1} for i in range(3)],
+        payment={"type": "cash", "amount": 10},
+    )
+
+
+async def _insert(factory: sessionmaker, user_ids: List[int], receipts: int, outbox: bool) -> float:
+    get_settings().outbox_enabled = outbox
+    started = time.perf_counter()
+    for n in range(receipts):
+        async with factory() as session:
+            await insert_receipts(session, [pending_receipt(user_ids[n % len(user_ids)], _receipt(n))])
+            await session.commit()
+    return receipts / (time.perf_counter() - started)
+
+
+async def _drain(factory: sessionmaker, rows: List[dict], sink, batch_size: int) -> float:
+    async with factory() as session:
+        await session.execute(delete(ReceiptOutboxModel))
+        await session.execute(insert(ReceiptOutboxModel), rows)
+        await session.commit()
+    dispatcher = OutboxDispatcher(factory, sink, batch_size=batch_size)
+    started = time.perf_counter()
+    delivered = await dispatcher.drain()
+    assert delivered == len(rows)
+    return delivered / (time.perf_counter() - started)
+
+
+async def run_benchmark(receipts: int, sink_latency: float) -> Dict[str, object]:
+    directory = tempfile.mkdtemp()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/outbox.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed_dataset(engine, users=10, receipts=10)
+        async with factory() as session:
+            user_ids = list((await session.execute(select(UserModel.id))).scalars())
+        results: Dict[str, object] = {
+            "inserts_per_s": {
+                "outbox_off": round(await _insert(factory, user_ids, receipts, outbox=False)),
+                "outbox_on": round(await _insert(factory, user_ids, receipts, outbox=True)),
+            }
+        }
+        async with factory() as session:
+            columns = ("user_id", "receipt_id", "payload", "created_at", "available_at")
+            outbox = await session.execute(select(*(getattr(ReceiptOutboxModel, c) for c in columns)))
+            rows = [dict(zip(columns, row)) for row in outbox]
+        for name, sink in (
+            (f"stand_in_{sink_latency * 1000:g}ms", StandInSink(sink_latency)),
+            ("file", FileSink(f"{directory}/events.ndjson")),
+        ):
+            results[f"dispatch_per_s_{name}"] = {
+                str(size): round(await _drain(factory, rows, sink, size)) for size in BATCH_SIZES
+            }
+        return results
+    finally:
+        get_settings().outbox_enabled = False
+        await engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=5_000)
+    parser.add_argument("--sink-latency-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.sink_latency_ms / 1000)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Top-products reads from the counters against aggregating receipt items.
+
+Seeds a SQLite file, recomputes the product stats in both modes and, for
+each, times ``/receipts/stats/products`` over day, week and month windows
+next to the GROUP BY over ``receipt_items`` it replaces. Also reports the
+stored row count per mode and ``POST /receipts`` latency with counters on.
+
+    python -m benchmarks.product_stats --receipts 200000 --users 10 --capacity 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.config import get_settings
+from app.database.connection import get_session
+from app.database.models import ProductCounterModel, ProductHeavyHitterModel, ReceiptItemModel, ReceiptModel
+from app.services.product_stats import HEAVY_HITTERS, period_bounds, recompute_product_stats
+from benchmarks.dataset import DatasetSpec, bulk_load
+from main import app
+
+PERIODS = ("day", "week", "month")
+RECEIPT = {"products": [{"name": "Milk 1L", "price": 1.2, "quantity": 2}], "payment": {"type": "cash", "amount": 5}}
+
+
+def _median_ms(samples: List[float]) -> float:
+    return round(statistics.median(samples) * 1000, 2)
+
+
+async def _raw_top(factory, user_id: int, period: str, day, repeats: int) -> float:
+    date_from, date_to = period_bounds(period, day)
+    revenue = func.sum(ReceiptItemModel.total)
+    stmt = (
+        select(ReceiptItemModel.product_id, revenue)
+        .join(ReceiptModel, ReceiptModel.id == ReceiptItemModel.receipt_id)
+        .where(
+            ReceiptModel.user_id == user_id,
+            ReceiptModel.created_at >= datetime.combine(date_from, datetime.min.time()),
+            ReceiptModel.created_at < datetime.combine(date_to, datetime.max.time()),
+        )
+        .group_by(ReceiptItemModel.product_id)
+        .order_by(desc(revenue))
+        .limit(10)
+    )
+    samples = []
+    async with factory() as session:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            await session.execute(stmt)
+            samples.append(time.perf_counter() - started)
+    return _median_ms(samples)
+
+
+async def _endpoint(client, headers, period: str, day, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        response = await client.get("/receipts/stats/products", params={"period": period, "date": day.isoformat()}, headers=headers)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return _median_ms(samples)
+
+
+async def _creates(client, headers, count: int) -> float:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await client.post("/receipts", json=RECEIPT, headers=headers)
+        samples.append(time.perf_counter() - started)
+    return _median_ms(samples)
+
+
+async def run_benchmark(
+    receipts: int, users: int, capacity: int, repeats: int, database_url: Optional[str]
+) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/product_stats.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    settings = get_settings()
+    spec = DatasetSpec(receipts=receipts, users=users, days=90, end=datetime.now(timezone.utc))
+    results: Dict[str, object] = {}
+    try:
+        await bulk_load(engine, spec)
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='user1')}"}
+        # a day with complete data in a complete week
+        day = spec.end.date() - timedelta(days=10)
+        settings.product_stats_capacity = capacity
+        results["raw_group_by_ms"] = {p: await _raw_top(factory, 1, p, day, repeats) for p in PERIODS}
+        for mode, table in (("exact", ProductCounterModel), (HEAVY_HITTERS, ProductHeavyHitterModel)):
+            settings.product_stats_mode = mode
+            started = time.perf_counter()
+            await recompute_product_stats(factory)
+            report = {"recompute_seconds": round(time.perf_counter() - started, 2)}
+            async with factory() as session:
+                report["rows"] = (await session.execute(select(func.count(table.id)))).scalar()
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+                report["endpoint_ms"] = {p: await _endpoint(client, headers, p, day, repeats) for p in PERIODS}
+                report["create_ms"] = await _creates(client, headers, repeats)
+            results[mode] = report
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--capacity", type=int, default=get_settings().product_stats_capacity)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.users, args.capacity, args.repeats, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
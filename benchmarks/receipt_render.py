@@ -0,0 +1,88 @@
+"""Receipt text rendering throughput.
+
+Builds ``--receipts`` receipts in memory from the synthetic dataset (no
+database involved), as ORM models like the text-render job sees them and as
+``ReceiptResponse`` objects like the public endpoint, then renders the whole
+batch with ``ReceiptLayout.render_many`` at every paper width and reports the
+best of ``--repeats`` runs. ``per_receipt`` times the old job loop for
+comparison: a ``ReceiptResponse`` per receipt and one ``format_receipt_text``
+call each.
+
+    python -m benchmarks.receipt_render --receipts 100000
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.domain.schemas.receipt import ReceiptResponse
+from app.services.receipt_formatter import PAPER_WIDTHS, ReceiptFormatter
+from benchmarks.dataset import DatasetGenerator, DatasetSpec, _postgres_rows
+
+
+def build_receipts(count: int) -> List[ReceiptModel]:
+    batch = DatasetGenerator(DatasetSpec(receipts=count, users=10)).batch(0, count)
+    receipts, items = _postgres_rows(batch, {})
+    lines = defaultdict(list)
+    for rid, name, _, price, quantity, total, _ in items:
+        lines[rid].append(ReceiptItemModel(name=name, price=price, quantity=quantity, total=total))
+    return [
+        ReceiptModel(
+            id=rid,
+            user_id=uid,
+            payment_type=ptype,
+            payment_amount=paid,
+            total=total,
+            rest=rest,
+            created_at=created_at,
+            items=lines[rid],
+        )
+        for rid, uid, ptype, paid, total, rest, created_at in receipts
+    ]
+
+
+def _best(run: Callable[[], str], count: int, repeats: int) -> Dict[str, float]:
+    best, size = None, 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        size = len(run())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "seconds": round(best, 3),
+        "receipts_per_second": round(count / best),
+        "mb_per_second": round(size / best / 1e6, 1),
+    }
+
+
+def run_benchmark(receipts: int, repeats: int) -> Dict[str, object]:
+    models = build_receipts(receipts)
+    responses = [ReceiptResponse.from_model(r) for r in models]
+    results: Dict[str, object] = {"receipts": receipts}
+    for paper, width in sorted(PAPER_WIDTHS.items(), key=lambda p: p[1]):
+        formatter = ReceiptFormatter(paper=paper)
+        results[f"{paper} ({width} cols)"] = {
+            "models": _best(lambda: formatter.format_many(models), receipts, repeats),
+            "responses": _best(lambda: formatter.format_many(responses), receipts, repeats),
+        }
+    formatter = ReceiptFormatter()
+    results["per_receipt"] = _best(
+        lambda: "".join(formatter.format_receipt_text(ReceiptResponse.from_model(r)) + "\n\n" for r in models),
+        receipts,
+        repeats,
+    )
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+    print(json.dumps(run_benchmark(args.receipts, args.repeats), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Back-office screens polling the first list page against ``/receipts/stream``.
+
+Starts uvicorn on a seeded SQLite file (production profile), opens
+``--screens`` screens spread over the users and creates ``--rate`` receipts
+a second for ``--seconds``. Each screen either polls ``GET /receipts?page=1``
+every ``--interval`` seconds or holds one SSE connection. Reports the
+screens' requests, the server's CPU time and how long a receipt took from
+its POST to every screen of its user.
+
+    python -m benchmarks.receipt_stream --screens 20 --interval 2 --seconds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+
+from app.auth.security import create_access_token
+from app.config import get_settings
+from app.database.connection import create_engines
+from app.database.models import UserModel
+from benchmarks.load_test import _start_server, percentile, seed_dataset
+
+
+def _cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def _poll(client: httpx.AsyncClient, headers, seen: Dict[int, float], interval: float, counts: List[int]):
+    while True:
+        response = await client.get("/receipts", params={"page": 1, "size": 20}, headers=headers)
+        counts[0] += 1
+        now = time.perf_counter()
+        for item in response.json()["items"]:
+            seen.setdefault(item["id"], now)
+        await asyncio.sleep(interval)
+
+
+async def _listen(client: httpx.AsyncClient, headers, seen: Dict[int, float], counts: List[int]):
+    counts[0] += 1
+    async with client.stream("GET", "/receipts/stream", headers=headers, timeout=None) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("id: "):
+                seen.setdefault(int(line[4:]), time.perf_counter())
+
+
+async def _run(mode: str, base_url: str, tokens: List[dict], args) -> Dict[str, object]:
+    rng = random.Random(1)
+    screens = [(i % len(tokens), {}) for i in range(args.screens)]
+    counts = [0]
+    created: Dict[int, tuple] = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        # ids already on the first page are not news
+        for user, seen in screens:
+            page = await client.get("/receipts", params={"page": 1, "size": 20}, headers=tokens[user])
+            seen.update((item["id"], 0.0) for item in page.json()["items"])
+        if mode == "poll":
+            tasks = [
+                asyncio.create_task(_poll(client, tokens[user], seen, args.interval, counts)) for user, seen in screens
+            ]
+        else:
+            tasks = [asyncio.create_task(_listen(client, tokens[user], seen, counts)) for user, seen in screens]
+        await asyncio.sleep(0.5)
+        cpu_before = _cpu_seconds(args.pid)
+        started = time.perf_counter()
+        while time.perf_counter() - started < args.seconds:
+            user = rng.randrange(len(tokens))
+            sent = time.perf_counter()
+            response = await client.post(
+                "/receipts",
+                json={"products": [{"name": "Coffee", "price": "2.50", "quantity": 1}],
+                      "payment": {"type": "cash", "amount": "5"}},
+                headers=tokens[user],
+            )
+            created[response.json()["id"]] = (user, sent)
+            await asyncio.sleep(1 / args.rate)
+        # let the last receipts reach every screen
+        await asyncio.sleep(args.interval + 0.5 if mode == "poll" else 0.5)
+        cpu_after = _cpu_seconds(args.pid)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    delays, missed = [], 0
+    watching = defaultdict(list)
+    for user, seen in screens:
+        watching[user].append(seen)
+    for receipt_id, (user, sent) in created.items():
+        for seen in watching[user]:
+            if receipt_id in seen:
+                delays.append((seen[receipt_id] - sent) * 1000)
+            else:
+                missed += 1
+    delays.sort()
+    return {
+        "receipts": len(created),
+        "screen_requests": counts[0],
+        "server_cpu_seconds": None if cpu_before is None else round(cpu_after - cpu_before, 2),
+        "delay_ms": {"p50": round(percentile(delays, 50), 1), "p99": round(percentile(delays, 99), 1)},
+        "missed": missed,
+    }
+
+
+async def run_benchmark(args) -> Dict[str, object]:
+    results = {}
+    for mode in ("poll", "stream"):
+        database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/stream.db"
+        engine, reader = create_engines(get_settings().model_copy(update={"database_url": database_url}))
+        await seed_dataset(engine, users=args.users, receipts=args.receipts)
+        async with engine.connect() as conn:
+            users = (await conn.execute(select(UserModel.id, UserModel.username).order_by(UserModel.id))).all()
+        await reader.dispose()
+        await engine.dispose()
+        tokens = [
+            {"Authorization": f"Bearer {create_access_token(user_id=uid, username=name)}"} for uid, name in users
+        ]
+        process, base_url = await _start_server(database_url, sqlite_profile="production")
+        args.pid = process.pid
+        try:
+            results[mode] = await _run(mode, base_url, tokens, args)
+        finally:
+            process.terminate()
+            process.wait()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--screens", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between polls")
+    parser.add_argument("--rate", type=float, default=5.0, help="receipts created per second")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--receipts", type=int, default=20_000)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Moving a user between shards, and public reads across shards.
+
+Seeds shard 0 (a SQLite file) and an empty shard 1, times moving user 1 to
+shard 1 with ``move_user`` (no settle wait) and then the latency of ``GET
+/public/receipts/{id}`` for receipts still on their home shard, receipts
+found through ``receipt_relocations`` and, as the baseline, the same ids
+with sharding off.
+
+    python -m benchmarks.shards --receipts 100000 --users 10 --reads 500
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.connection import Base, get_session
+from app.database.models import ReceiptModel
+from app.database.shards import dispose_shards, get_shard_engines, prepare_shard, shard_map
+from app.services.shard_moves import move_user
+from benchmarks.load_test import seed_dataset
+from main import app
+
+
+async def _latencies(client: httpx.AsyncClient, ids: List[int]) -> Dict[str, float]:
+    samples = []
+    for receipt_id in ids:
+        started = time.perf_counter()
+        assert (await client.get(f"/public/receipts/{receipt_id}")).status_code == 200
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"mean_ms": round(statistics.fmean(samples), 3), "p95_ms": round(samples[int(len(samples) * 0.95)], 3)}
+
+
+async def _user_ids(factory, user_id: int, limit: int) -> List[int]:
+    async with factory() as session:
+        stmt = select(ReceiptModel.id).where(ReceiptModel.user_id == user_id).order_by(ReceiptModel.id).limit(limit)
+        return (await session.execute(stmt)).scalars().all()
+
+
+async def run_benchmark(receipts: int, users: int, reads: int) -> Dict[str, object]:
+    directory = tempfile.mkdtemp()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/shard0.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    settings = get_settings()
+    original = settings.shards
+    results: Dict[str, object] = {}
+    try:
+        await seed_dataset(engine, users=users, receipts=receipts)
+        moved_ids = await _user_ids(factory, 1, reads)
+        home_ids = await _user_ids(factory, 2, reads)
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            results["unsharded"] = await _latencies(client, moved_ids)
+
+            settings.shards = {1: f"sqlite+aiosqlite:///{directory}/shard1.db"}
+            writer, _ = get_shard_engines(1)
+            async with writer.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            await prepare_shard(writer, 1)
+            async with factory() as session:
+                count = len((await session.execute(select(ReceiptModel.id).where(ReceiptModel.user_id == 1))).all())
+            started = time.perf_counter()
+            stats = await move_user(factory, 1, 1, settle_seconds=0)
+            seconds = time.perf_counter() - started
+            results["move"] = {
+                "receipts": count,
+                "seconds": round(seconds, 3),
+                "receipts_per_second": round(count / seconds),
+                "relocated": stats.relocated,
+            }
+            results["home_shard"] = await _latencies(client, home_ids)
+            results["relocated"] = await _latencies(client, moved_ids)
+    finally:
+        app.dependency_overrides.clear()
+        settings.shards = original
+        shard_map.clear()
+        await dispose_shards()
+        await engine.dispose()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--reads", type=int, default=500)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.users, args.reads)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
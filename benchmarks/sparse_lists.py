@@ -0,0 +1,93 @@
+"""Latency and payload of full, summary and sparse receipt list pages.
+
+Seeds a SQLite file, then multiplies every receipt's items ``--doublings``
+times so baskets are item heavy, and fetches ``--pages`` pages of
+``/receipts?size=100`` three ways: full receipts, ``include_items=false``
+and ``fields=id,created_at,total,payment``. Reports median latency and
+bytes per page for each.
+
+    python -m benchmarks.sparse_lists --receipts 20000 --doublings 3
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.database.connection import get_session
+from app.database.models import ReceiptItemModel
+from benchmarks.load_test import seed_dataset
+from main import app
+
+SHAPES = {
+    "full": {},
+    "summary": {"include_items": "false"},
+    "fields": {"fields": "id,created_at,total,payment"},
+}
+
+
+async def _multiply_items(engine, doublings: int) -> int:
+    async with engine.begin() as conn:
+        for _ in range(doublings):
+            await conn.execute(
+                text(
+                    "INSERT INTO receipt_items (receipt_id, receipt_created_at, name, product_id, price, quantity, total) "
+                    "SELECT receipt_id, receipt_created_at, name, product_id, price, quantity, total FROM receipt_items"
+                )
+            )
+        return (await conn.execute(select(func.count(ReceiptItemModel.id)))).scalar()
+
+
+async def _fetch(client: httpx.AsyncClient, headers: Dict[str, str], pages: int, params: Dict[str, str]):
+    latencies, size = [], 0
+    for page in range(1, pages + 1):
+        started = time.perf_counter()
+        response = await client.get("/receipts", params={"size": 100, "page": page, **params}, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        size += len(response.content)
+    return {"median_ms": round(statistics.median(latencies), 2), "bytes_per_page": size // pages}
+
+
+async def run_benchmark(receipts: int, doublings: int, pages: int, database_url: Optional[str]) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/sparse.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await seed_dataset(engine, users=10, receipts=receipts)
+        items = await _multiply_items(engine, doublings)
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='user1')}"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for params in SHAPES.values():
+                await _fetch(client, headers, 1, params)
+            shapes = {name: await _fetch(client, headers, pages, params) for name, params in SHAPES.items()}
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return {"receipts": receipts, "items_per_receipt": round(items / receipts, 1), "shapes": shapes}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=20_000)
+    parser.add_argument("--doublings", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.doublings, args.pages, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
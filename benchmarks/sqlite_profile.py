@@ -0,0 +1,58 @@
+"""Concurrent reads and writes on SQLite with and without the production profile.
+
+Runs the load-test harness against fresh SQLite files, once with the
+default engine (rollback journal, one pool shared by readers and writers)
+and once with ``SQLITE_PROFILE=production`` (WAL, one writer connection,
+``SQLITE_READERS`` reader connections), for a mixed workload and a
+create-only one, and prints errors, throughput and latency side by side.
+
+    python -m benchmarks.sqlite_profile --concurrency 32 --requests 3000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+from typing import Dict, List, Optional
+
+from benchmarks.load_test import LoadTestConfig, run_load_test
+
+MIXES = {
+    "mixed": {"create": 2, "list": 3, "stats": 1, "public": 1},
+    "create_only": {"create": 1},
+}
+
+
+async def compare(concurrency: int, requests: int, receipts: int, server: bool) -> Dict[str, object]:
+    results: Dict[str, object] = {}
+    for workload, mix in MIXES.items():
+        rows = {}
+        for profile in ("default", "production"):
+            report = await run_load_test(
+                LoadTestConfig(
+                    receipts=receipts,
+                    users=10,
+                    concurrency=concurrency,
+                    requests=requests,
+                    mix=mix,
+                    database_url=f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/profile.db",
+                    server=server,
+                    sqlite_profile=profile,
+                )
+            )
+            rows[profile] = {k: report[k] for k in ("requests", "errors", "throughput_rps", "latency_ms")}
+        results[workload] = rows
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=3_000)
+    parser.add_argument("--receipts", type=int, default=20_000)
+    parser.add_argument("--server", action="store_true", help="drive a real uvicorn process")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(compare(args.concurrency, args.requests, args.receipts, args.server)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Cold-start and first-request latency benchmark.
+
+Each run is a fresh interpreter: it times ``import main``, the lifespan
+startup (when the app defines one) and the first requests served, then
+reports the median across runs as JSON.
+
+    python -m benchmarks.startup --runs 10 --output results/startup.json
+    python -m benchmarks.startup --app-dir ../other-checkout   # compare trees
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.dataset import DatasetSpec, bulk_load
+
+PROBE = r"""
+import asyncio, json, os, sys, time
+import httpx
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def probe():
+    app = main.app
+    timings = {"import_ms": (imported - started) * 1000}
+    async with app.router.lifespan_context(app):
+        timings["startup_ms"] = (time.perf_counter() - imported) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+            for name, path in (("public_receipt", "/public/receipts/1"), ("openapi", "/openapi.json")):
+                t = time.perf_counter()
+                assert (await client.get(path)).status_code == 200
+                timings[f"first_{name}_ms"] = (time.perf_counter() - t) * 1000
+                t = time.perf_counter()
+                await client.get(path)
+                timings[f"second_{name}_ms"] = (time.perf_counter() - t) * 1000
+    timings["heavy_modules_loaded"] = sorted(m for m in ("jose", "passlib") if m in sys.modules)
+    print(json.dumps(timings), flush=True)
+
+asyncio.run(probe())
+# aiosqlite worker threads of the app's engine would otherwise keep the probe alive
+os._exit(0)
+"""
+
+
+def _run_probe(app_dir: str, database_url: str) -> Dict[str, object]:
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONPATH=app_dir)
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=app_dir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_startup_benchmark(runs: int, app_dir: str, database_url: Optional[str] = None) -> Dict[str, object]:
+    if database_url is None:
+        database_url = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/startup.db"
+        engine = create_async_engine(database_url)
+
+        async def seed():
+            try:
+                await bulk_load(engine, DatasetSpec(receipts=1_000, users=5))
+            finally:
+                await engine.dispose()
+
+        asyncio.run(seed())
+
+    samples: List[Dict[str, object]] = [_run_probe(app_dir, database_url) for _ in range(runs)]
+    report = {
+        "runs": runs,
+        "app_dir": os.path.abspath(app_dir),
+        "heavy_modules_loaded": samples[-1]["heavy_modules_loaded"],
+    }
+    for key in samples[0]:
+        if key.endswith("_ms"):
+            report[key] = round(statistics.median(s[key] for s in samples), 2)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--app-dir", default=".")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    report = run_startup_benchmark(args.runs, args.app_dir, args.database_url)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as fh:
+            fh.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
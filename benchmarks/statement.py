@@ -0,0 +1,114 @@
+"""Streamed text statements against one public text request per receipt.
+
+Seeds a SQLite file and builds the statement of user 1 over the last 7, 30
+and 365 days straight from ``stream_statement``, reporting the time to the
+first receipts, the total time, bytes and the peak Python memory allocated
+while streaming (a separate ``tracemalloc`` pass, since tracing slows
+everything down). httpx's ASGI transport buffers whole bodies, so the
+generator is driven directly. For the 30-day range it also times ``GET
+/receipts/statement`` and fetching the same receipts one ``GET
+/public/receipts/{id}/text`` at a time, as clients had to before.
+
+    python -m benchmarks.statement --receipts 100000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.database.connection import get_session
+from app.database.models import ReceiptModel
+from app.services.receipt_formatter import compile_layout
+from app.services.receipt_statement import statement_bounds, stream_statement
+from benchmarks.load_test import seed_dataset
+from main import app
+
+RANGES = (7, 30, 365)
+
+
+async def _stream(engine, date_from: date, date_to: date) -> Dict[str, float]:
+    started = time.perf_counter()
+    first_receipts, size = None, 0
+    async for piece in stream_statement(engine, compile_layout(40), 1, "user1", date_from, date_to):
+        # the first piece is the header
+        if first_receipts is None and size:
+            first_receipts = time.perf_counter() - started
+        size += len(piece)
+    return {
+        "first_receipts_ms": round((first_receipts or 0) * 1000, 1),
+        "seconds": round(time.perf_counter() - started, 3),
+        "bytes": size,
+    }
+
+
+async def run_benchmark(receipts: int, database_url: Optional[str]) -> Dict[str, object]:
+    engine = create_async_engine(database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/statement.db")
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    results: Dict[str, object] = {}
+    try:
+        await seed_dataset(engine, users=10, receipts=receipts)
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='user1')}"}
+        today = datetime.now(timezone.utc).date()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for days in RANGES:
+                date_from = today - timedelta(days=days - 1)
+                params = {"date_from": date_from.isoformat(), "date_to": today.isoformat()}
+                start, end = statement_bounds(date_from, today)
+                async with factory() as session:
+                    ids = (
+                        await session.execute(
+                            select(ReceiptModel.id).where(
+                                ReceiptModel.user_id == 1,
+                                ReceiptModel.created_at >= start,
+                                ReceiptModel.created_at <= end,
+                            )
+                        )
+                    ).scalars().all()
+                row = {"receipts": len(ids), **await _stream(engine, date_from, today)}
+                tracemalloc.start()
+                await _stream(engine, date_from, today)
+                row["peak_memory_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024)
+                tracemalloc.stop()
+
+                if days == 30:
+                    started = time.perf_counter()
+                    response = await client.get("/receipts/statement", params=params, headers=headers)
+                    assert response.status_code == 200
+                    row["statement_request_seconds"] = round(time.perf_counter() - started, 3)
+                    started = time.perf_counter()
+                    for receipt_id in ids:
+                        assert (await client.get(f"/public/receipts/{receipt_id}/text")).status_code == 200
+                    row["public_text_loop_seconds"] = round(time.perf_counter() - started, 3)
+                results[f"{days}_days"] = row
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=100_000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run_benchmark(args.receipts, args.database_url)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
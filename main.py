@@ -1,14 +1,101 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Optional
+
 from fastapi import FastAPI
+from app.config import Settings, configure_settings, get_settings
+from app.database.connection import (
+    dispose_engine,
+    get_engine,
+    get_reader_engine,
+    get_sessionmaker,
+    prime_statements,
+    reset_engine,
+    warm_up_pool,
+)
+from app.database.partitions import ensure_partitions, maintain_partitions, supports_partitioning
+from app.database.queries import hot_statements
+from app.database.shards import dispose_shards, prepare_shards, shard_ids, shard_sessionmaker
+from app.services.idempotency import maintain_idempotency_keys
+from app.services.jobs import start_job_runner, stop_job_runner
+from app.services.outbox import start_outbox, stop_outbox
+from app.services.receipt_events import start_receipt_events, stop_receipt_events
+from app.services.receipt_ingest import start_group_commit, stop_group_commit
+from app.api.compression import CompressionMiddleware
 from app.api.auth import router as auth_router
 from app.api.receipts import router as receipts_router
 from app.api.public import router as public_router
+from app.api.jobs import router as jobs_router
+from app.api.admin import router as admin_router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    engine = get_engine()
+    reader = get_reader_engine()
+    await warm_up_pool(engine, settings.db_warmup_connections)
+    if reader is not engine:
+        await warm_up_pool(reader, settings.sqlite_readers)
+    await prime_statements(reader, hot_statements())
+    await prepare_shards()
+    maintenance = None
+    if supports_partitioning(engine):
+        await ensure_partitions(engine, settings.partition_months_ahead)
+        maintenance = asyncio.create_task(
+            maintain_partitions(engine, settings.partition_months_ahead, settings.partition_maintenance_interval)
+        )
+    if settings.group_commit_enabled:
+        start_group_commit(
+            get_sessionmaker(), settings.group_commit_max_batch, settings.group_commit_max_delay_ms / 1000
+        )
+    await start_receipt_events(settings.receipt_events_backend, engine)
+    if settings.outbox_sink:
+        start_outbox(settings.outbox_sink)
+    await start_job_runner(
+        get_sessionmaker(),
+        settings.jobs_artifact_dir,
+        settings.jobs_concurrency,
+        settings.jobs_duty_cycle,
+        settings.jobs_heartbeat_seconds,
+    )
+    key_cleanups = [
+        asyncio.create_task(
+            maintain_idempotency_keys(shard_sessionmaker(shard_id), settings.idempotency_cleanup_interval)
+        )
+        for shard_id in shard_ids()
+    ]
+    app.openapi()
+    yield
+    await stop_job_runner()
+    await stop_group_commit()
+    await stop_outbox()
+    await stop_receipt_events()
+    for task in (maintenance, *key_cleanups):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    await dispose_shards()
+    await dispose_engine()
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    if settings is not None:
+        configure_settings(settings)
+        reset_engine()
+
+    app = FastAPI(title="Receipt Management API", version="1.0.0", lifespan=lifespan)
+    app.add_middleware(CompressionMiddleware)
+
+    app.include_router(auth_router)
+    app.include_router(receipts_router)
+    app.include_router(public_router)
+    app.include_router(jobs_router)
+    app.include_router(admin_router)
 
-app = FastAPI(title="Receipt Management API", version="1.0.0")
+    @app.get("/")
+    async def health_check():
+        return {"status": "ok"}
 
-app.include_router(auth_router)
-app.include_router(receipts_router)
-app.include_router(public_router)
+    return app
 
-@app.get("/")
-async def health_check():
-    return {"status": "ok"}
+app = create_app()
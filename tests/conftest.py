@@ -7,6 +7,7 @@ from sqlalchemy.orm import sessionmaker
 from app.database.connection import Base, get_session
 from app.database.models import UserModel
 from app.auth.security import hash_password, create_access_token
+from app.services.products import product_cache
 from main import app
 
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -17,6 +18,11 @@ def event_loop():
     yield loop
     loop.close()
 
+@pytest.fixture(autouse=True)
+def clear_product_cache():
+    # cached product ids belong to the previous test's database
+    product_cache.clear()
+
 @pytest.fixture
 async def test_engine():
     engine = create_async_engine(TEST_DATABASE_URL, echo=False)
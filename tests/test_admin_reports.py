@@ -0,0 +1,154 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.admin import router as admin_router
+from app.api.compression import CompressionMiddleware
+from app.auth.security import create_access_token
+from app.config import get_settings
+from app.database.connection import get_session
+from app.database.models import UserModel
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services.admin_reports import REPORTS, ReportParams, ReportSpec, run_report
+from app.services.receipt_ingest import insert_receipts, pending_receipt
+
+NOW = datetime.now(timezone.utc)
+LONG_AGO = NOW - timedelta(days=400)
+
+
+@pytest.fixture
+async def admin_headers(test_session: AsyncSession):
+    admin = UserModel(
+        fullname="Operations", username="ops", email="ops@example.com", password_hash="x", is_admin=True
+    )
+    test_session.add(admin)
+    await test_session.commit()
+    return {"Authorization": f"Bearer {create_access_token(user_id=admin.id, username=admin.username)}"}
+
+
+@pytest.fixture
+async def shoppers(test_session: AsyncSession, monkeypatch):
+    """Five users: recent buyers, a lapsed one, one who never bought and a
+    new account."""
+    monkeypatch.setattr(get_settings(), "admin_report_range_size", 2)
+    # user -> receipts as (age in days, total, payment type)
+    receipts = {
+        "anna": [(1, "10.00", "cash"), (2, "5.00", "cashless")],
+        "boris": [(3, "7.50", "cashless")],
+        "clara": [(200, "3.00", "cash")],
+        "dmitri": [],
+        "eva": [(0, "2.00", "cash")],
+    }
+    users = {}
+    for name in receipts:
+        created_at = NOW if name == "eva" else LONG_AGO
+        users[name] = UserModel(
+            fullname=name, username=name, email=f"{name}@example.com", password_hash="x", created_at=created_at
+        )
+        test_session.add(users[name])
+    await test_session.commit()
+    pending = []
+    for name, rows in receipts.items():
+        for days, total, payment_type in rows:
+            p = pending_receipt(
+                users[name].id,
+                ReceiptCreate(
+                    products=[{"name": "Bread", "price": total, "quantity": 1}],
+                    payment={"type": payment_type, "amount": total},
+                ),
+            )
+            p.receipt["created_at"] = NOW - timedelta(days=days)
+            pending.append(p)
+    await insert_receipts(test_session, pending)
+    await test_session.commit()
+    return users
+
+
+async def _report(client: AsyncClient, headers, kind: str, **params):
+    response = await client.get(f"/admin/reports/{kind}", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestAdminReports:
+    async def test_reports_need_an_admin(self, test_client: AsyncClient, auth_headers):
+        response = await test_client.get("/admin/reports/revenue", headers=auth_headers)
+
+        assert response.status_code == 403
+
+    async def test_revenue_streams_a_partial_per_range(
+        self, test_client: AsyncClient, admin_headers, shoppers
+    ):
+        since = (NOW - timedelta(days=30)).date().isoformat()
+        lines = await _report(test_client, admin_headers, "revenue", date_from=since)
+
+        partials, total = lines[:-1], lines[-1]
+        # 6 users (the admin too) in ranges of 2
+        assert [p["done"] for p in partials] == [1, 2, 3]
+        assert {p["total"] for p in partials} == {3}
+        rows = sorted((r for p in partials for r in p["rows"]), key=lambda r: r["user_id"])
+        assert [(r["username"], r["receipts"], r["revenue"]) for r in rows] == [
+            ("anna", 2, 15.0),
+            ("boris", 1, 7.5),
+            ("eva", 1, 2.0),
+        ]
+        assert total == {"type": "total", "done": 3, "total": 3, "users": 3, "receipts": 4, "revenue": 24.5}
+
+    async def test_reports_are_not_compressed(self, test_session: AsyncSession, admin_headers, shoppers):
+        app = FastAPI()
+        app.add_middleware(CompressionMiddleware, minimum_size=1)
+        app.include_router(admin_router)
+        app.dependency_overrides[get_session] = lambda: test_session
+        client = AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver")
+
+        response = await client.get("/admin/reports/payment_mix", headers={**admin_headers, "Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert json.loads(response.text.splitlines()[-1])["type"] == "total"
+
+    async def test_payment_mix_merges_the_ranges(self, test_client: AsyncClient, admin_headers, shoppers):
+        lines = await _report(test_client, admin_headers, "payment_mix")
+
+        assert lines[-1]["payment_types"] == {
+            "cash": {"receipts": 3, "revenue": 15.0},
+            "cashless": {"receipts": 2, "revenue": 12.5},
+        }
+
+    async def test_inactive_lists_old_accounts_without_recent_receipts(
+        self, test_client: AsyncClient, admin_headers, shoppers
+    ):
+        lines = await _report(test_client, admin_headers, "inactive", inactive_days=90)
+
+        rows = sorted((r for line in lines[:-1] for r in line["rows"]), key=lambda r: r["user_id"])
+        assert [(r["username"], r["last_receipt_day"] is None) for r in rows] == [("clara", False), ("dmitri", True)]
+        assert lines[-1]["users"] == 2
+
+    async def test_closing_the_report_cancels_running_queries(self, test_engine, shoppers, monkeypatch):
+        running, cancelled = [], []
+
+        async def rows(session, shard_id, first, last, params):
+            running.append(first)
+            try:
+                if len(running) > 1:
+                    await asyncio.sleep(60)
+                return []
+            except asyncio.CancelledError:
+                cancelled.append(first)
+                raise
+
+        monkeypatch.setitem(REPORTS, "slow", ReportSpec(rows, dict, lambda summary, rows: None))
+        lines = run_report({0: test_engine}, "slow", ReportParams(), concurrency=2, range_size=1)
+        first = await lines.__anext__()
+        await asyncio.sleep(0)
+        await lines.aclose()
+
+        assert first["done"] == 1
+        # at most two ranges at a time: the finished one's slot went to a third
+        assert len(running) == 3
+        assert sorted(cancelled) == sorted(running[1:])
@@ -0,0 +1,46 @@
+import sys
+import subprocess
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from app.config import Settings, configure_settings, get_settings
+from app.database import connection
+from main import create_app
+
+
+@pytest.fixture
+def file_settings(tmp_path):
+    original = get_settings()
+    yield Settings(database_url=f"sqlite+aiosqlite:///{tmp_path}/factory.db", db_warmup_connections=3)
+    configure_settings(original)
+    connection.reset_engine()
+
+
+class TestAppFactory:
+    async def test_create_app_uses_the_given_settings(self, file_settings):
+        app = create_app(file_settings)
+
+        assert get_settings() is file_settings
+        assert str(connection.get_engine().url) == file_settings.database_url
+        assert app.router.lifespan_context is not None
+
+    async def test_lifespan_warms_pool_and_builds_openapi_once(self, file_settings):
+        app = create_app(file_settings)
+
+        async with app.router.lifespan_context(app):
+            engine = connection.get_engine()
+            assert engine.pool.checkedin() == 3
+            assert app.openapi_schema is not None
+
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://testserver") as client:
+                response = await client.get("/")
+                assert response.json() == {"status": "ok"}
+
+        assert connection._engine is None
+
+    def test_importing_main_does_not_load_jose_or_passlib(self):
+        code = "import sys, main; print(sorted(m for m in ('jose', 'passlib') if m in sys.modules))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+        assert result.stdout.strip() == "[]"
@@ -0,0 +1,109 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import AsyncClient, ASGITransport
+
+from app.api import compression as compression_module
+from app.api.compression import CompressionMiddleware, choose_encoding, compression
+
+BIG = "receipt line " * 200
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    async def big():
+        return {"text": BIG}
+
+    @app.get("/small")
+    async def small():
+        return {"text": "tiny"}
+
+    @app.get("/raw")
+    @compression(False)
+    async def raw():
+        return PlainTextResponse(BIG)
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for n in range(50):
+                yield f"line {n} {BIG[:100]}\n".encode()
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/short-stream")
+    async def short_stream():
+        async def parts():
+            yield b"a" * 100
+            yield b"b" * 100
+
+        return StreamingResponse(parts(), media_type="text/plain")
+
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver")
+
+
+async def _raw_get(client: AsyncClient, path: str, accept: str):
+    async with client.stream("GET", path, headers={"Accept-Encoding": accept}) as response:
+        return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+class TestNegotiation:
+    @pytest.mark.parametrize(
+        "header, expected",
+        [
+            ("gzip, deflate, br", "gzip"),
+            ("zstd;q=0.5, gzip", "zstd"),
+            ("gzip;q=0, zstd;q=0", None),
+            ("*", "zstd"),
+            ("identity", None),
+        ],
+    )
+    def test_prefers_zstd_among_accepted_encodings(self, header, expected):
+        assert choose_encoding(header, ("zstd", "gzip")) == expected
+
+
+class TestCompressionMiddleware:
+    async def test_large_json_is_gzipped(self, client):
+        response, body = await _raw_get(client, "/big", "gzip")
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert int(response.headers["content-length"]) == len(body) < len(BIG)
+        assert gzip.decompress(body).decode() == f'{{"text":"{BIG}"}}'
+
+    async def test_small_bodies_and_opted_out_routes_pass_through(self, client):
+        small, _ = await _raw_get(client, "/small", "gzip")
+        raw, body = await _raw_get(client, "/raw", "gzip")
+
+        assert "content-encoding" not in small.headers
+        assert "content-encoding" not in raw.headers and body.decode() == BIG
+
+    async def test_streams_are_compressed_chunk_by_chunk(self, client):
+        response, body = await _raw_get(client, "/stream", "gzip")
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        text = gzip.decompress(body).decode()
+        assert text.count("\n") == 50 and text.startswith("line 0 ")
+
+    async def test_short_streams_are_sent_as_is(self, client):
+        response, body = await _raw_get(client, "/short-stream", "gzip")
+
+        assert "content-encoding" not in response.headers
+        assert body == b"a" * 100 + b"b" * 100
+
+    async def test_zstd_when_available(self, client):
+        zstandard = pytest.importorskip("zstandard")
+        if compression_module.zstandard is None:
+            pytest.skip("zstandard imported after the middleware")
+
+        response, body = await _raw_get(client, "/stream", "zstd, gzip")
+
+        assert response.headers["content-encoding"] == "zstd"
+        text = zstandard.ZstdDecompressor().decompressobj().decompress(body).decode()
+        assert text.count("\n") == 50
@@ -0,0 +1,90 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.api.etags import etag_matches
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.services.receipt_archive import archive_receipts
+
+BODY = {"products": [{"name": "Milk", "price": 2.5, "quantity": 2}], "payment": {"type": "cash", "amount": 10}}
+
+
+async def _revalidate(client: AsyncClient, url: str, headers, etag: str):
+    return await client.get(url, headers={**headers, "If-None-Match": etag})
+
+
+class TestEtagMatching:
+    @pytest.mark.parametrize(
+        "header, expected",
+        [('"abc"', True), ('W/"abc"', True), ('"x", W/"abc"', True), ("*", True), ('"abd"', False), (None, False)],
+    )
+    def test_weak_comparison(self, header, expected):
+        assert etag_matches(header, '"abc"') is expected
+
+
+class TestConditionalGet:
+    async def test_unchanged_list_and_stats_answer_304(self, test_client: AsyncClient, auth_headers):
+        await test_client.post("/receipts", json=BODY, headers=auth_headers)
+        for url in ("/receipts", "/receipts/stats"):
+            first = await test_client.get(url, headers=auth_headers)
+            again = await _revalidate(test_client, url, auth_headers, first.headers["etag"])
+
+            assert first.status_code == 200 and first.headers["cache-control"] == "private, no-cache"
+            assert again.status_code == 304 and again.content == b""
+            assert again.headers["etag"] == first.headers["etag"]
+
+    async def test_tags_follow_normalized_query_parameters(self, test_client: AsyncClient, auth_headers):
+        plain = (await test_client.get("/receipts", headers=auth_headers)).headers["etag"]
+        explicit = await test_client.get("/receipts?page=1&size=10&sort_by=created_at", headers=auth_headers)
+        explicit = explicit.headers["etag"]
+        other = (await test_client.get("/receipts?size=20", headers=auth_headers)).headers["etag"]
+
+        assert plain == explicit != other
+
+    async def test_receipt_writes_invalidate_tags(self, test_client: AsyncClient, auth_headers):
+        tags = {}
+        for url in ("/receipts", "/receipts/stats"):
+            tags[url] = (await test_client.get(url, headers=auth_headers)).headers["etag"]
+
+        await test_client.post("/receipts", json=BODY, headers=auth_headers)
+
+        for url, etag in tags.items():
+            response = await _revalidate(test_client, url, auth_headers, etag)
+            assert response.status_code == 200 and response.headers["etag"] != etag
+
+    async def test_archiving_invalidates_the_list(
+        self, test_client: AsyncClient, test_session, test_engine, test_user, auth_headers
+    ):
+        created = datetime.now(timezone.utc) - timedelta(days=400)
+        test_session.add(
+            ReceiptModel(
+                user_id=test_user.id,
+                payment_type="cash",
+                payment_amount=Decimal("5.00"),
+                total=Decimal("5.00"),
+                rest=Decimal("0.00"),
+                created_at=created,
+                items=[
+                    ReceiptItemModel(
+                        name="Tea",
+                        price=Decimal("5.00"),
+                        quantity=Decimal("1"),
+                        total=Decimal("5.00"),
+                        receipt_created_at=created,
+                    )
+                ],
+            )
+        )
+        await test_session.commit()
+        etag = (await test_client.get("/receipts", headers=auth_headers)).headers["etag"]
+
+        factory = sessionmaker(bind=test_engine, class_=AsyncSession)
+        await archive_receipts(factory, datetime.now(timezone.utc) - timedelta(days=180))
+        # the test client shares one session across requests; a real request gets a fresh one
+        test_session.expire_all()
+
+        response = await _revalidate(test_client, "/receipts", auth_headers, etag)
+        assert response.status_code == 200 and response.json()["total"] == 0
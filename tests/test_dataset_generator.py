@@ -0,0 +1,101 @@
+import pytest
+from decimal import Decimal
+from datetime import datetime, timezone
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.database.models import ProductModel, ReceiptModel, UserModel
+from benchmarks.dataset import DatasetGenerator, DatasetSpec, bulk_load
+
+SPEC = DatasetSpec(receipts=2_000, users=5, products=200, days=30, seed=7, end=datetime(2025, 6, 30, tzinfo=timezone.utc))
+
+
+class TestDatasetGenerator:
+    def test_generator_is_deterministic_for_the_same_seed(self):
+        first = DatasetGenerator(SPEC).batch(0, 500)
+        second = DatasetGenerator(SPEC).batch(0, 500)
+
+        assert first.receipts == second.receipts
+        assert first.items == second.items
+
+    def test_batches_do_not_depend_on_generation_order(self):
+        generator = DatasetGenerator(SPEC)
+        in_order = list(generator.batches(500))
+
+        assert generator.batch(3, 500).receipts == in_order[3].receipts
+        assert [r[0] for b in in_order for r in b.receipts] == list(range(1, 2_001))
+
+    def test_receipt_totals_match_items_and_payment(self):
+        batch = DatasetGenerator(SPEC).batch(0, 1_000)
+        item_totals = {}
+        for receipt_id, _, _, _, line_total in batch.items:
+            item_totals[receipt_id] = item_totals.get(receipt_id, 0) + line_total
+
+        for receipt_id, _, payment_type, paid, total, rest, _ in batch.receipts:
+            assert item_totals[receipt_id] == total
+            assert paid - total == rest >= 0
+            if payment_type == "cashless":
+                assert rest == 0
+
+    def test_distributions_are_skewed(self):
+        batch = DatasetGenerator(SPEC).batch(0, 2_000)
+        cashless = sum(1 for r in batch.receipts if r[2] == "cashless") / len(batch.receipts)
+        hours = [datetime.fromtimestamp(r[6], timezone.utc).hour for r in batch.receipts]
+
+        assert 0.6 < cashless < 0.76
+        assert sum(1 for h in hours if 17 <= h <= 19) > sum(1 for h in hours if 2 <= h <= 4) * 10
+        assert 2 < len(batch.items) / len(batch.receipts) < 5
+
+
+class TestBulkLoad:
+    async def test_bulk_load_into_sqlite_is_readable_through_the_orm(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/dataset.db")
+        try:
+            stats = await bulk_load(engine, SPEC, batch_size=700)
+            assert (stats.users, stats.receipts) == (5, 2_000)
+
+            session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            async with session_factory() as session:
+                assert (await session.execute(select(func.count(UserModel.id)))).scalar() == 5
+                receipt = (
+                    await session.execute(
+                        select(ReceiptModel).options(selectinload(ReceiptModel.items)).where(ReceiptModel.id == 1)
+                    )
+                ).scalar()
+                assert isinstance(receipt.total, Decimal)
+                assert receipt.total == sum(item.total for item in receipt.items)
+                assert receipt.created_at is not None
+                assert all(item.product_id is not None for item in receipt.items)
+                products = (await session.execute(select(func.count(ProductModel.id)))).scalar()
+                assert products == SPEC.products
+        finally:
+            await engine.dispose()
+
+    async def test_bulk_load_appends_after_existing_rows(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/dataset.db")
+        try:
+            await bulk_load(engine, DatasetSpec(receipts=100, users=2, products=50, seed=1))
+            await bulk_load(engine, DatasetSpec(receipts=100, users=2, products=50, seed=2))
+
+            async with engine.connect() as conn:
+                assert (await conn.execute(select(func.count(ReceiptModel.id)))).scalar() == 200
+                assert (await conn.execute(select(func.count(UserModel.id)))).scalar() == 4
+        finally:
+            await engine.dispose()
+
+    async def test_bulk_load_restores_the_connection_synchronous_setting(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/dataset.db", pool_size=1)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _normal(dbapi_connection, _):
+            dbapi_connection.execute("PRAGMA synchronous = NORMAL")
+
+        try:
+            await bulk_load(engine, DatasetSpec(receipts=100, users=2, products=50, seed=1))
+
+            async with engine.connect() as conn:
+                # 1 is NORMAL; the load runs with OFF
+                assert (await conn.exec_driver_sql("PRAGMA synchronous")).scalar() == 1
+        finally:
+            await engine.dispose()
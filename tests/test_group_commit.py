@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from decimal import Decimal
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.database.connection import Base, get_session
+from app.database.models import ReceiptItemModel, ReceiptModel, UserModel
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services import receipt_ingest
+from app.services.receipt_ingest import GroupCommitWriter, pending_receipt
+from main import app
+
+
+@pytest.fixture
+async def file_sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/group.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        session.add(UserModel(id=1, fullname="Till", username="till", email="till@example.com", password_hash="x"))
+        await session.commit()
+    yield factory
+    await engine.dispose()
+
+
+@pytest.fixture
+async def writer(file_sessions):
+    writer = GroupCommitWriter(file_sessions, max_batch=10, max_delay=0.01)
+    writer.start()
+    yield writer
+    await writer.stop()
+
+
+def _receipt(price: str = "2.50") -> ReceiptCreate:
+    return ReceiptCreate(
+        products=[{"name": "Milk", "price": price, "quantity": 2}, {"name": "Bread", "price": "1.20", "quantity": 1}],
+        payment={"type": "cash", "amount": 20},
+    )
+
+
+async def _count(factory, column) -> int:
+    async with factory() as session:
+        return (await session.execute(select(func.count(column)))).scalar()
+
+
+class TestGroupCommitWriter:
+    async def test_concurrent_receipts_share_commits(self, writer, file_sessions):
+        receipts = await asyncio.gather(*(writer.submit(pending_receipt(1, _receipt())) for _ in range(25)))
+
+        assert len({r.id for r in receipts}) == 25
+        assert [i.name for i in receipts[0].items] == ["Milk", "Bread"]
+        assert receipts[0].total == Decimal("6.20")
+        assert writer.batches < 25 and writer.receipts == 25
+        assert await _count(file_sessions, ReceiptModel.id) == 25
+        assert await _count(file_sessions, ReceiptItemModel.id) == 50
+
+    async def test_a_failing_receipt_does_not_fail_its_group(self, writer, file_sessions):
+        broken = pending_receipt(1, _receipt())
+        broken.receipt["payment_type"] = None
+
+        results = await asyncio.gather(
+            writer.submit(pending_receipt(1, _receipt())),
+            writer.submit(broken),
+            writer.submit(pending_receipt(1, _receipt())),
+            return_exceptions=True,
+        )
+
+        assert isinstance(results[1], IntegrityError)
+        assert all(isinstance(r, ReceiptModel) for r in (results[0], results[2]))
+        assert await _count(file_sessions, ReceiptModel.id) == 2
+        assert await _count(file_sessions, ReceiptItemModel.id) == 4
+
+    async def test_stop_flushes_submitted_receipts(self, file_sessions):
+        writer = GroupCommitWriter(file_sessions, max_batch=100, max_delay=0.05)
+        writer.start()
+        pending = [asyncio.ensure_future(writer.submit(pending_receipt(1, _receipt()))) for _ in range(5)]
+        await asyncio.sleep(0)
+
+        await writer.stop()
+
+        assert all(p.done() and p.result().id for p in pending)
+        with pytest.raises(RuntimeError):
+            await writer.submit(pending_receipt(1, _receipt()))
+
+
+class TestCreateReceiptWithGroupCommit:
+    async def test_endpoint_response_matches_the_direct_path(self, file_sessions):
+        async def override_get_session():
+            async with file_sessions() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='till')}"}
+        body = {"products": [{"name": "Milk", "price": 2.5, "quantity": 2}], "payment": {"type": "cash", "amount": 10}}
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as client:
+                direct = (await client.post("/receipts", json=body, headers=headers)).json()
+                receipt_ingest.start_group_commit(file_sessions, max_batch=10, max_delay=0.001)
+                grouped = (await client.post("/receipts", json=body, headers=headers)).json()
+                fetched = (await client.get(f"/receipts/{grouped['id']}", headers=headers)).json()
+        finally:
+            await receipt_ingest.stop_group_commit()
+            app.dependency_overrides.clear()
+
+        assert receipt_ingest.get_group_writer() is None
+        assert grouped["id"] == direct["id"] + 1
+        assert grouped == fetched
+        assert {k: v for k, v in grouped.items() if k not in ("id", "created_at")} == {
+            k: v for k, v in direct.items() if k not in ("id", "created_at")
+        }
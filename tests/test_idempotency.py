@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.database.connection import Base, get_session
+from app.database.models import IdempotencyKeyModel, ReceiptModel, UserModel
+from app.services import receipt_ingest
+from app.services.idempotency import key_cache, purge_expired_keys
+from main import app
+
+BODY = {"products": [{"name": "Milk", "price": 2.5, "quantity": 2}], "payment": {"type": "cash", "amount": 10}}
+
+
+@pytest.fixture(autouse=True)
+def clear_key_cache():
+    key_cache.clear()
+    yield
+    key_cache.clear()
+
+
+async def _count(session: AsyncSession, column) -> int:
+    return (await session.execute(select(func.count(column)))).scalar()
+
+
+class TestIdempotentCreate:
+    async def test_retry_replays_the_original_receipt(self, test_client: AsyncClient, test_session, auth_headers):
+        headers = {**auth_headers, "Idempotency-Key": "till-7-sale-1"}
+
+        first = await test_client.post("/receipts", json=BODY, headers=headers)
+        cached = await test_client.post("/receipts", json=BODY, headers=headers)
+        key_cache.clear()
+        stored = await test_client.post("/receipts", json=BODY, headers=headers)
+
+        assert first.status_code == cached.status_code == stored.status_code == 201
+        assert "Idempotent-Replayed" not in first.headers
+        assert cached.headers["Idempotent-Replayed"] == stored.headers["Idempotent-Replayed"] == "true"
+        assert first.json() == cached.json() == stored.json()
+        assert await _count(test_session, ReceiptModel.id) == 1
+        assert await _count(test_session, IdempotencyKeyModel.id) == 1
+
+    async def test_reusing_a_key_for_another_request_is_rejected(self, test_client: AsyncClient, auth_headers):
+        headers = {**auth_headers, "Idempotency-Key": "till-7-sale-2"}
+        await test_client.post("/receipts", json=BODY, headers=headers)
+
+        other = {**BODY, "payment": {"type": "cashless", "amount": 5}}
+        response = await test_client.post("/receipts", json=other, headers=headers)
+
+        assert response.status_code == 422
+
+    async def test_expired_keys_are_purged_and_can_be_reused(self, test_client: AsyncClient, test_session, test_engine, auth_headers):
+        headers = {**auth_headers, "Idempotency-Key": "till-7-sale-3"}
+        first = (await test_client.post("/receipts", json=BODY, headers=headers)).json()
+        key_cache.clear()
+        row = (await test_session.execute(select(IdempotencyKeyModel))).scalar()
+        row.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await test_session.commit()
+
+        again = (await test_client.post("/receipts", json=BODY, headers=headers)).json()
+
+        assert again["id"] == first["id"] + 1
+        factory = sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+        assert await purge_expired_keys(factory) == 0
+        row = (await test_session.execute(select(IdempotencyKeyModel))).scalar()
+        row.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await test_session.commit()
+        assert await purge_expired_keys(factory) == 1
+
+
+class TestConcurrentRetries:
+    async def test_simultaneous_retries_create_one_receipt(self, tmp_path):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/keys.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        async with factory() as session:
+            session.add(UserModel(id=1, fullname="Till", username="till", email="till@example.com", password_hash="x"))
+            await session.commit()
+
+        async def override_get_session():
+            async with factory() as session:
+                yield session
+
+        app.dependency_overrides[get_session] = override_get_session
+        headers = {
+            "Authorization": f"Bearer {create_access_token(user_id=1, username='till')}",
+            "Idempotency-Key": "till-1-sale-9",
+        }
+        # both requests miss the key and land in the same group
+        receipt_ingest.start_group_commit(factory, max_batch=10, max_delay=0.05)
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as client:
+                responses = await asyncio.gather(*(client.post("/receipts", json=BODY, headers=headers) for _ in range(2)))
+            async with factory() as session:
+                receipts = await _count(session, ReceiptModel.id)
+        finally:
+            await receipt_ingest.stop_group_commit()
+            app.dependency_overrides.clear()
+            await engine.dispose()
+
+        assert [r.status_code for r in responses] == [201, 201]
+        assert responses[0].json() == responses[1].json()
+        assert sorted(r.headers.get("Idempotent-Replayed", "") for r in responses) == ["", "true"]
+        assert receipts == 1
@@ -0,0 +1,214 @@
+import asyncio
+import csv
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token
+from app.database.connection import Base, get_session
+from app.database.models import JobModel, ReceiptArchiveTotalModel, ReceiptItemModel, ReceiptModel, UserModel
+from app.services import jobs
+from app.services.receipt_archive import archive_receipts, segment_cache
+from main import app
+
+
+@pytest.fixture
+async def job_sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/jobs.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    now = datetime.now(timezone.utc)
+    async with factory() as session:
+        session.add(UserModel(id=1, fullname="Till", username="till", email="till@example.com", password_hash="x"))
+        for n in range(6):
+            created = now - timedelta(days=300 if n < 2 else 1, minutes=n)
+            total = Decimal(n + 1)
+            session.add(
+                ReceiptModel(
+                    id=n + 1,
+                    user_id=1,
+                    payment_type="cash" if n % 2 else "cashless",
+                    payment_amount=Decimal("10.00"),
+                    total=total,
+                    rest=Decimal("10.00") - total,
+                    created_at=created,
+                    items=[
+                        ReceiptItemModel(name="Tea", price=total, quantity=Decimal("1"), total=total, receipt_created_at=created)
+                    ],
+                )
+            )
+        await session.commit()
+    segment_cache.clear()
+    await archive_receipts(factory, now - timedelta(days=180))
+    yield factory
+    await engine.dispose()
+
+
+@pytest.fixture
+async def client(job_sessions):
+    async def override_get_session():
+        async with job_sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_get_session
+    headers = {"Authorization": f"Bearer {create_access_token(user_id=1, username='till')}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver", headers=headers) as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+async def runner(job_sessions, tmp_path):
+    async def start(concurrency: int = 1, duty_cycle: float = 1.0):
+        return await jobs.start_job_runner(job_sessions, str(tmp_path / "artifacts"), concurrency, duty_cycle)
+
+    yield start
+    await jobs.stop_job_runner()
+
+
+class TestJobRunner:
+    async def test_export_covers_hot_and_archived_receipts(self, client: AsyncClient, runner):
+        job = (await client.post("/jobs", json={"kind": "receipt_export"})).json()
+        assert (job["status"], job["priority"]) == ("queued", 10)
+
+        await (await runner()).join()
+
+        job = (await client.get(f"/jobs/{job['id']}")).json()
+        assert (job["status"], job["processed"], job["total"]) == ("succeeded", 6, 6)
+        response = await client.get(job["artifact_url"])
+        rows = list(csv.DictReader(response.text.splitlines()))
+        assert [int(r["receipt_id"]) for r in rows] == [1, 2, 3, 4, 5, 6]
+        assert rows[0]["item_name"] == "Tea" and Decimal(rows[5]["receipt_total"]) == Decimal("6")
+
+    async def test_text_render_matches_the_public_text(self, client: AsyncClient, runner):
+        job = (await client.post("/jobs", json={"kind": "text_render", "params": {"line_width": 40}})).json()
+        await (await runner()).join()
+
+        rendered = (await client.get(f"/jobs/{job['id']}/artifact")).text
+        expected = [(await client.get(f"/public/receipts/{rid}/text")).text for rid in range(1, 7)]
+        assert rendered == "".join(text + "\n\n" for text in expected)
+
+    async def test_stats_rebuild_restores_archive_totals(self, client: AsyncClient, job_sessions, runner):
+        before = (await client.get("/receipts/stats")).json()
+        async with job_sessions() as session:
+            for row in (await session.execute(select(ReceiptArchiveTotalModel))).scalars():
+                row.receipt_count, row.total_amount = 0, Decimal("0")
+            await session.commit()
+
+        await client.post("/jobs", json={"kind": "stats_rebuild"})
+        await (await runner()).join()
+
+        assert (await client.get("/receipts/stats")).json() == before
+
+    async def test_lower_priority_value_runs_first(self, client: AsyncClient, runner):
+        export = (await client.post("/jobs", json={"kind": "receipt_export", "priority": 50})).json()
+        rebuild = (await client.post("/jobs", json={"kind": "stats_rebuild", "priority": 1})).json()
+
+        await (await runner()).join()
+
+        export, rebuild = [(await client.get(f"/jobs/{j['id']}")).json() for j in (export, rebuild)]
+        assert rebuild["finished_at"] <= export["started_at"]
+
+    async def test_bad_params_are_rejected(self, client: AsyncClient):
+        response = await client.post("/jobs", json={"kind": "text_render", "params": {"line_width": 5}})
+
+        assert response.status_code == 422
+
+
+class TestCancellation:
+    async def test_queued_job_never_runs(self, client: AsyncClient, runner):
+        job = (await client.post("/jobs", json={"kind": "receipt_export"})).json()
+
+        cancelled = (await client.post(f"/jobs/{job['id']}/cancel")).json()
+        await (await runner()).join()
+
+        assert cancelled["status"] == "cancelled"
+        job = (await client.get(f"/jobs/{job['id']}")).json()
+        assert (job["status"], job["started_at"], job["artifact_url"]) == ("cancelled", None, None)
+
+    async def test_running_job_stops_at_the_next_chunk(self, client: AsyncClient, runner, monkeypatch):
+        monkeypatch.setattr(jobs, "CHUNK_SIZE", 1)
+        started = await runner(duty_cycle=0.05)
+        job = (await client.post("/jobs", json={"kind": "receipt_export"})).json()
+        while (await client.get(f"/jobs/{job['id']}")).json()["status"] != "running":
+            await asyncio.sleep(0.01)
+
+        assert (await client.post(f"/jobs/{job['id']}/cancel")).json()["cancel_requested"] is True
+        await started.join()
+
+        job = (await client.get(f"/jobs/{job['id']}")).json()
+        assert job["status"] == "cancelled" and job["processed"] < 6
+        assert (await client.get(f"/jobs/{job['id']}/artifact")).status_code == 409
+
+    async def test_cancel_reaches_a_job_through_the_database(
+        self, client: AsyncClient, job_sessions, runner, monkeypatch
+    ):
+        monkeypatch.setattr(jobs, "CHUNK_SIZE", 1)
+        monkeypatch.setattr(jobs, "PROGRESS_INTERVAL", 0)
+        started = await runner(duty_cycle=0.05)
+        job = (await client.post("/jobs", json={"kind": "receipt_export"})).json()
+        while (await client.get(f"/jobs/{job['id']}")).json()["status"] != "running":
+            await asyncio.sleep(0.01)
+
+        # as another process's cancel_job would: the row only, not this runner's set
+        async with job_sessions() as session:
+            await session.execute(update(JobModel).where(JobModel.id == job["id"]).values(cancel_requested=True))
+            await session.commit()
+        await started.join()
+
+        job = (await client.get(f"/jobs/{job['id']}")).json()
+        assert job["status"] == "cancelled" and job["processed"] < 6
+
+
+class TestSharedQueue:
+    def test_duty_cycle_must_be_a_share(self, job_sessions):
+        for duty_cycle in (0, -0.5, 1.5):
+            with pytest.raises(ValueError):
+                jobs.JobRunner(job_sessions, "unused", duty_cycle=duty_cycle)
+
+    async def test_only_one_runner_claims_a_job(self, client: AsyncClient, job_sessions, tmp_path, monkeypatch):
+        runs = []
+
+        async def run(ctx):
+            runs.append(ctx.runner.worker_id)
+            await asyncio.sleep(0.05)
+
+        spec = jobs.JOB_KINDS["stats_rebuild"]
+        monkeypatch.setitem(jobs.JOB_KINDS, "stats_rebuild", jobs.JobKindSpec(run, spec.params, spec.priority))
+        job = (await client.post("/jobs", json={"kind": "stats_rebuild"})).json()
+        first, second = (jobs.JobRunner(job_sessions, str(tmp_path)) for _ in range(2))
+
+        await asyncio.gather(first._run(job["id"]), second._run(job["id"]))
+
+        assert len(runs) == 1
+        assert (await client.get(f"/jobs/{job['id']}")).json()["status"] == "succeeded"
+
+    async def test_start_requeues_only_stale_jobs(self, client: AsyncClient, job_sessions, runner):
+        now = datetime.now(timezone.utc)
+        ids = []
+        async with job_sessions() as session:
+            for heartbeat_at in (now, now - timedelta(minutes=5), None):
+                job = JobModel(
+                    user_id=1,
+                    kind="receipt_export",
+                    status="running",
+                    priority=10,
+                    params={},
+                    processed=3,
+                    worker_id="other:1:alive" if heartbeat_at == now else "other:2:gone",
+                    heartbeat_at=heartbeat_at,
+                )
+                session.add(job)
+                await session.flush()
+                ids.append(job.id)
+            await session.commit()
+
+        await (await runner()).join()
+
+        statuses = [(await client.get(f"/jobs/{i}")).json()["status"] for i in ids]
+        assert statuses == ["running", "succeeded", "succeeded"]
@@ -0,0 +1,141 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.models import ReceiptOutboxModel, UserModel
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services.outbox import FileSink, OutboxDispatcher, open_sink
+from app.services.receipt_ingest import insert_receipts, pending_receipt
+
+
+def _receipt(name: str) -> dict:
+    return {"products": [{"name": name, "price": "3.00", "quantity": 1}], "payment": {"type": "cash", "amount": "10"}}
+
+
+@pytest.fixture
+def outbox_enabled(monkeypatch):
+    monkeypatch.setattr(get_settings(), "outbox_enabled", True)
+
+
+@pytest.fixture
+def sessions(test_engine):
+    return sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class RecordingSink:
+    def __init__(self, failing_users=()):
+        self.failing_users = set(failing_users)
+        self.calls = []
+
+    async def send(self, lines):
+        events = [json.loads(line) for line in lines]
+        if self.failing_users & {e["user_id"] for e in events}:
+            raise ConnectionError("sink unavailable")
+        self.calls.append([(e["user_id"], e["receipt"]["products"][0]["name"]) for e in events])
+
+    async def close(self):
+        pass
+
+
+async def _queue(sessions, user_id: int, *names: str) -> None:
+    async with sessions() as session:
+        await insert_receipts(session, [pending_receipt(user_id, ReceiptCreate(**_receipt(n))) for n in names])
+        await session.commit()
+
+
+async def _outbox(sessions):
+    async with sessions() as session:
+        return (await session.execute(select(ReceiptOutboxModel).order_by(ReceiptOutboxModel.id))).scalars().all()
+
+
+class TestOutbox:
+    async def test_receipt_and_event_are_written_together(
+        self, test_client: AsyncClient, auth_headers, sessions, outbox_enabled
+    ):
+        created = await test_client.post("/receipts", json=_receipt("Tea"), headers=auth_headers)
+
+        rows = await _outbox(sessions)
+        assert [r.receipt_id for r in rows] == [created.json()["id"]]
+        assert json.loads(rows[0].payload) == created.json()
+
+    async def test_disabled_outbox_stays_empty(self, test_client: AsyncClient, auth_headers, sessions):
+        await test_client.post("/receipts", json=_receipt("Tea"), headers=auth_headers)
+
+        assert await _outbox(sessions) == []
+
+    async def test_batches_are_delivered_in_order_and_removed(self, test_user, sessions, outbox_enabled):
+        await _queue(sessions, test_user.id, "Tea", "Jam", "Bread")
+        sink = RecordingSink()
+        dispatcher = OutboxDispatcher(sessions, sink, batch_size=2)
+
+        assert await dispatcher.drain() == 3
+
+        assert sink.calls == [[(test_user.id, "Tea"), (test_user.id, "Jam")], [(test_user.id, "Bread")]]
+        assert await _outbox(sessions) == []
+
+    async def test_failing_user_backs_off_without_holding_up_others(
+        self, test_session, test_user, sessions, outbox_enabled
+    ):
+        other = UserModel(fullname="Other", username="other", email="other@example.com", password_hash="x")
+        test_session.add(other)
+        await test_session.commit()
+        await _queue(sessions, test_user.id, "Tea")
+        await _queue(sessions, other.id, "Milk")
+        sink = RecordingSink(failing_users={test_user.id})
+        dispatcher = OutboxDispatcher(sessions, sink, retry_base=60)
+
+        assert await dispatcher.drain() == 1
+        await _queue(sessions, test_user.id, "Jam")
+        assert await dispatcher.drain() == 0
+
+        waiting = await _outbox(sessions)
+        assert [(r.attempts, r.last_error) for r in waiting] == [(1, "sink unavailable"), (0, None)]
+        assert waiting[0].available_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) + timedelta(seconds=50)
+        assert sink.calls == [[(other.id, "Milk")]]
+
+        sink.failing_users.clear()
+        async with sessions() as session:
+            await session.execute(update(ReceiptOutboxModel).values(available_at=datetime.now(timezone.utc)))
+            await session.commit()
+        assert await dispatcher.drain() == 2
+        assert sink.calls[1] == [(test_user.id, "Tea"), (test_user.id, "Jam")]
+
+    async def test_sink_is_called_with_no_connection_held(self, test_engine, test_user, sessions, outbox_enabled):
+        await _queue(sessions, test_user.id, "Tea")
+        checked_out = [0]
+        pool = test_engine.sync_engine.pool
+        event.listen(pool, "checkout", lambda *args: checked_out.__setitem__(0, checked_out[0] + 1))
+        event.listen(pool, "checkin", lambda *args: checked_out.__setitem__(0, checked_out[0] - 1))
+        held = []
+
+        class WatchingSink(RecordingSink):
+            async def send(self, lines):
+                held.append(checked_out[0])
+                raise ConnectionError("sink unavailable")
+
+        assert await OutboxDispatcher(sessions, WatchingSink()).dispatch_once() == 0
+
+        assert held == [0]
+        assert [r.attempts for r in await _outbox(sessions)] == [1]
+
+    def test_backoff_stops_growing_at_the_maximum(self, sessions):
+        dispatcher = OutboxDispatcher(sessions, RecordingSink(), retry_base=1.0, retry_max=300.0)
+
+        assert dispatcher._backoff(1) == timedelta(seconds=1)
+        assert dispatcher._backoff(4) == timedelta(seconds=8)
+        assert dispatcher._backoff(5000) == timedelta(seconds=300)
+
+    async def test_file_sink_appends_lines(self, tmp_path):
+        sink = open_sink(f"file://{tmp_path}/events.ndjson")
+
+        await sink.send(['{"receipt_id":1}'])
+        await sink.send(['{"receipt_id":2}', '{"receipt_id":3}'])
+
+        assert isinstance(sink, FileSink)
+        lines = (tmp_path / "events.ndjson").read_text().splitlines()
+        assert [json.loads(line)["receipt_id"] for line in lines] == [1, 2, 3]
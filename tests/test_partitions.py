@@ -0,0 +1,84 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.database.partitions import (
+    add_months,
+    ensure_partitions,
+    months_between,
+    partition_ddl,
+    partition_name,
+)
+from app.database.queries import ReceiptFilters, receipt_list_params, receipt_list_statements
+
+
+class TestPartitionHelpers:
+    def test_month_arithmetic_crosses_year_boundaries(self):
+        assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert months_between(date(2025, 11, 17), date(2026, 1, 3)) == [
+            date(2025, 11, 1),
+            date(2025, 12, 1),
+            date(2026, 1, 1),
+        ]
+
+    def test_partition_ddl_moves_default_rows_before_attaching(self):
+        create, move, attach = partition_ddl("receipts", "created_at", date(2025, 12, 1))
+
+        assert partition_name("receipts", date(2025, 12, 1)) == "receipts_y2025m12"
+        assert create.startswith("CREATE TABLE receipts_y2025m12 (LIKE receipts")
+        assert "DELETE FROM receipts_default" in move and "INSERT INTO receipts_y2025m12" in move
+        assert attach.endswith("FROM ('2025-12-01 00:00:00+00') TO ('2026-01-01 00:00:00+00')")
+
+    async def test_ensure_partitions_is_a_no_op_on_sqlite(self, test_engine):
+        assert await ensure_partitions(test_engine, months_ahead=3) == []
+
+
+class TestPruningFriendlyFilters:
+    def test_date_filters_bind_utc_timestamps_on_both_partition_keys(self):
+        filters = ReceiptFilters(date_from=date(2025, 1, 1), date_to=date(2025, 1, 31), search="milk")
+        _, count = receipt_list_statements(filters, "created_at", "desc")
+        params = receipt_list_params(1, filters, 0, 10)
+        sql = str(
+            count.params(**params).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+        )
+
+        assert "receipts.created_at >= '2025-01-01 00:00:00+00:00'" in sql
+        assert "receipt_items.receipt_created_at >= '2025-01-01 00:00:00+00:00'" in sql
+        assert "receipt_items.receipt_created_at <= '2025-01-31 00:00:00+00:00'" in sql
+
+
+class TestItemPartitionKey:
+    async def test_created_items_copy_the_receipt_timestamp(self, test_client: AsyncClient, auth_headers, test_session):
+        response = await test_client.post(
+            "/receipts",
+            json={
+                "products": [{"name": "Milk", "price": 2.5, "quantity": 2}],
+                "payment": {"type": "cash", "amount": 10},
+            },
+            headers=auth_headers,
+        )
+        assert response.status_code == 201
+
+        receipt = await test_session.get(ReceiptModel, response.json()["id"])
+        items = (await test_session.execute(select(ReceiptItemModel))).scalars().all()
+        assert [item.receipt_created_at for item in items] == [receipt.created_at]
+
+    async def test_items_added_without_the_key_take_it_from_their_receipt(self, test_session: AsyncSession, test_user):
+        receipt = ReceiptModel(
+            user_id=test_user.id, payment_type="cash", payment_amount=Decimal("1"), total=Decimal("1"), rest=Decimal("0")
+        )
+        test_session.add(receipt)
+        await test_session.flush()
+        item = ReceiptItemModel(
+            receipt_id=receipt.id, name="Tea", price=Decimal("1"), quantity=Decimal("1"), total=Decimal("1")
+        )
+        test_session.add(item)
+        await test_session.commit()
+        await test_session.refresh(receipt)
+
+        assert item.receipt_created_at == receipt.created_at
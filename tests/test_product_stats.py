@@ -0,0 +1,178 @@
+import pytest
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.models import ProductHeavyHitterModel, ReceiptItemModel, ReceiptModel
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services.product_stats import SpaceSaving, period_bounds, recompute_product_stats
+from app.services.receipt_archive import archive_receipts, segment_cache
+from app.services.receipt_ingest import insert_receipts, pending_receipt
+
+TODAY = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+def _sale(*lines, days_ago: int = 0):
+    return (
+        ReceiptCreate(
+            products=[{"name": name, "price": price, "quantity": quantity} for name, price, quantity in lines],
+            payment={"type": "cashless", "amount": 1000},
+        ),
+        TODAY - timedelta(days=days_ago),
+    )
+
+
+async def _write(session: AsyncSession, user_id: int, sales) -> None:
+    pending = []
+    for receipt_data, created_at in sales:
+        p = pending_receipt(user_id, receipt_data)
+        p.receipt["created_at"] = created_at
+        pending.append(p)
+    await insert_receipts(session, pending)
+    await session.commit()
+
+
+@pytest.fixture
+async def sales(test_session, test_user):
+    await _write(
+        test_session,
+        test_user.id,
+        [
+            _sale(("Milk 1L", "1.20", "3"), ("Coffee", "9.50", "1")),
+            _sale((" milk 1l", "1.20", "2"), ("Bread", "2.00", "1")),
+            _sale(("Coffee", "9.50", "2"), days_ago=TODAY.weekday() + 1),
+        ],
+    )
+
+
+@pytest.fixture
+def heavy_hitters(monkeypatch):
+    monkeypatch.setattr(get_settings(), "product_stats_mode", "heavy_hitters")
+    monkeypatch.setattr(get_settings(), "product_stats_capacity", 2)
+
+
+async def _top(client: AsyncClient, headers, **params):
+    response = await client.get("/receipts/stats/products", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestSpaceSaving:
+    def test_tracked_counts_bound_the_true_totals(self):
+        rng = random.Random(3)
+        stream = [min(int(rng.paretovariate(1.1)), 500) for _ in range(20_000)]
+        truth = Counter(stream)
+        sketch = SpaceSaving(50)
+        for key in stream:
+            sketch.add(key, Decimal(1))
+
+        assert len(sketch.counters) == 50
+        for key, count, error in sketch.top(50):
+            assert count - error <= truth[key] <= count
+        assert all(truth[key] <= sketch.floor for key in truth if key not in sketch.counters)
+        assert [key for key, _, _ in sketch.top(5)] == [key for key, _ in truth.most_common(5)]
+
+    def test_periods_cover_the_calendar_unit(self):
+        assert period_bounds("day", date(2026, 2, 18)) == (date(2026, 2, 18), date(2026, 2, 18))
+        assert period_bounds("week", date(2026, 2, 18)) == (date(2026, 2, 16), date(2026, 2, 22))
+        assert period_bounds("month", date(2026, 2, 18)) == (date(2026, 2, 1), date(2026, 2, 28))
+
+
+class TestExactCounters:
+    async def test_top_products_by_revenue_and_quantity(self, test_client: AsyncClient, auth_headers, sales):
+        by_revenue = await _top(test_client, auth_headers, date=TODAY.date().isoformat())
+        by_quantity = await _top(test_client, auth_headers, date=TODAY.date().isoformat(), by="quantity", limit=1)
+
+        assert by_revenue["exact"] is True
+        assert [(p["name"], p["revenue"], p["quantity"], p["lines"]) for p in by_revenue["products"]] == [
+            ("Coffee", "9.50", "1.000", 1),
+            ("Milk 1L", "6.00", "5.000", 2),
+            ("Bread", "2.00", "1.000", 1),
+        ]
+        assert [p["name"] for p in by_quantity["products"]] == ["Milk 1L"]
+
+    async def test_windows_sum_the_days_they_cover(self, test_client: AsyncClient, auth_headers, sales):
+        week = await _top(test_client, auth_headers, period="week", date=TODAY.date().isoformat())
+        last_week = (TODAY - timedelta(days=TODAY.weekday() + 1)).date().isoformat()
+        earlier = await _top(test_client, auth_headers, period="week", date=last_week)
+
+        assert week["products"][0]["revenue"] == "9.50"
+        assert [(p["name"], p["revenue"]) for p in earlier["products"]] == [("Coffee", "19.00")]
+
+    async def test_new_receipts_change_the_etag(self, test_client: AsyncClient, auth_headers, sales):
+        first = await test_client.get("/receipts/stats/products", headers=auth_headers)
+        cached = await test_client.get(
+            "/receipts/stats/products", headers={**auth_headers, "If-None-Match": first.headers["etag"]}
+        )
+        await test_client.post(
+            "/receipts",
+            json={"products": [{"name": "Tea", "price": 50, "quantity": 1}], "payment": {"type": "cash", "amount": 50}},
+            headers=auth_headers,
+        )
+        fresh = await test_client.get(
+            "/receipts/stats/products", headers={**auth_headers, "If-None-Match": first.headers["etag"]}
+        )
+
+        assert cached.status_code == 304
+        assert fresh.status_code == 200
+        assert fresh.json()["products"][0]["name"] == "Tea"
+
+
+class TestHeavyHitters:
+    async def test_sketches_stay_bounded_and_report_their_error(
+        self, test_client: AsyncClient, test_session, test_user, auth_headers, heavy_hitters
+    ):
+        await _write(
+            test_session,
+            test_user.id,
+            [
+                _sale(("Coffee", "9.50", "4"), ("Milk", "1.00", "1")),
+                _sale(("Bread", "2.00", "1"), ("Tea", "3.00", "1")),
+                _sale(("Coffee", "9.50", "1")),
+            ],
+        )
+
+        rows = (await test_session.execute(select(func.count(ProductHeavyHitterModel.id)))).scalar()
+        top = await _top(test_client, auth_headers, date=TODAY.date().isoformat(), limit=2)
+
+        assert rows == 4  # two products per metric
+        assert top["exact"] is False
+        coffee, runner_up = top["products"]
+        assert (coffee["name"], coffee["revenue"], coffee["error"]) == ("Coffee", "47.50", "0.00")
+        assert coffee["quantity"] is None
+        assert Decimal(runner_up["revenue"]) - Decimal(runner_up["error"]) <= Decimal("3.00")
+
+
+class TestRecompute:
+    async def test_recompute_matches_incremental_counts_and_includes_archived_and_legacy_items(
+        self, test_client: AsyncClient, test_session, test_engine, test_user, auth_headers, sales
+    ):
+        factory = sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+        before = await _top(test_client, auth_headers, period="month", date=TODAY.date().isoformat())
+        # an item written without a product, as before the catalog existed
+        old = TODAY - timedelta(days=400)
+        receipt = ReceiptModel(
+            user_id=test_user.id, payment_type="cash", payment_amount=5, total=5, rest=0, created_at=old
+        )
+        test_session.add(receipt)
+        await test_session.flush()
+        test_session.add(
+            ReceiptItemModel(receipt_id=receipt.id, name="Coffee", price=5, quantity=1, total=5, receipt_created_at=old)
+        )
+        await test_session.commit()
+        segment_cache.clear()
+        await archive_receipts(factory, TODAY - timedelta(days=300))
+
+        assert await recompute_product_stats(factory) == 1
+        test_session.expire_all()
+        after = await _top(test_client, auth_headers, period="month", date=TODAY.date().isoformat())
+        archived = await _top(test_client, auth_headers, period="month", date=old.date().isoformat())
+
+        assert after["products"] == before["products"]
+        assert [(p["name"], p["revenue"]) for p in archived["products"]] == [("Coffee", "5.00")]
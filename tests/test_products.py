@@ -0,0 +1,79 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.connection import Base
+from app.database.models import ProductModel, ReceiptItemModel
+from app.services.products import intern_products, normalize_product_name, product_cache
+
+
+def _body(*names: str):
+    return {
+        "products": [{"name": name, "price": 1.5, "quantity": 1} for name in names],
+        "payment": {"type": "cash", "amount": 100},
+    }
+
+
+@pytest.fixture
+async def factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/products.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+class TestProductCatalog:
+    def test_names_normalize_whitespace_and_case(self):
+        assert normalize_product_name("  Milk   1L ") == normalize_product_name("milk 1l") == "milk 1l"
+
+    async def test_item_spellings_share_one_product(
+        self, test_client: AsyncClient, test_session, auth_headers
+    ):
+        first = await test_client.post("/receipts", json=_body("Milk 1L", "Bread"), headers=auth_headers)
+        second = await test_client.post("/receipts", json=_body(" milk  1L", "Tea"), headers=auth_headers)
+
+        assert [p["name"] for p in first.json()["products"]] == ["Milk 1L", "Bread"]
+        assert [p["name"] for p in second.json()["products"]] == [" milk  1L", "Tea"]
+        items = (await test_session.execute(select(ReceiptItemModel).order_by(ReceiptItemModel.id))).scalars().all()
+        assert items[0].product_id == items[2].product_id
+        assert len({item.product_id for item in items}) == 3
+        products = (await test_session.execute(select(ProductModel.name).order_by(ProductModel.id))).scalars().all()
+        assert products == ["Milk 1L", "Bread", "Tea"]
+
+    async def test_known_names_are_served_from_the_cache(self, factory):
+        async with factory() as session:
+            await intern_products(session, ["Milk"])
+            await session.commit()
+        async with factory() as session:
+            created = await intern_products(session, ["Milk"])
+        statements = []
+        bind = factory.kw["bind"].sync_engine
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(bind, "before_cursor_execute", listener)
+        try:
+            async with factory() as session:
+                cached = await intern_products(session, ["MILK"])
+        finally:
+            event.remove(bind, "before_cursor_execute", listener)
+
+        assert cached == created
+        assert statements == []
+
+    async def test_products_from_rolled_back_transactions_are_not_cached(self, factory):
+        async with factory() as session:
+            await intern_products(session, ["Cheese"])
+            await session.rollback()
+        cached = product_cache.get_many(["cheese"])
+        async with factory() as session:
+            ids = await intern_products(session, ["Cheese"])
+            await session.commit()
+            stored = (await session.execute(select(ProductModel.normalized_name, ProductModel.id))).all()
+
+        assert cached == {}
+        assert dict(stored) == ids
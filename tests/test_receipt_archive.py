@@ -0,0 +1,196 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token, hash_password
+from app.database.models import (
+    ReceiptArchiveEntryModel,
+    ReceiptArchiveSegmentModel,
+    ReceiptItemModel,
+    ReceiptModel,
+    UserModel,
+)
+from app.services import receipt_archive
+from app.services.receipt_archive import (
+    _split_into_segments,
+    archive_receipts,
+    drop_archived_receipts,
+    iter_archived_receipts,
+    pack_records,
+    segment_cache,
+    unpack_records,
+)
+
+
+@pytest.fixture
+def archive_sessions(test_engine):
+    segment_cache.clear()
+    return sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def aged_receipts(test_session: AsyncSession, test_user):
+    now = datetime.now(timezone.utc)
+    ids = []
+    for days_ago, total, payment_type in ((400, "12.50", "cash"), (300, "40.00", "cashless"), (2, "7.25", "cash")):
+        created = now - timedelta(days=days_ago)
+        receipt = ReceiptModel(
+            user_id=test_user.id,
+            payment_type=payment_type,
+            payment_amount=Decimal("50.00"),
+            total=Decimal(total),
+            rest=Decimal("50.00") - Decimal(total),
+            created_at=created,
+        )
+        test_session.add(receipt)
+        await test_session.flush()
+        test_session.add(
+            ReceiptItemModel(
+                receipt_id=receipt.id,
+                name="Coffee",
+                price=Decimal(total),
+                quantity=Decimal("1"),
+                total=Decimal(total),
+                receipt_created_at=created,
+            )
+        )
+        ids.append(receipt.id)
+    await test_session.commit()
+    return ids
+
+
+class _Segment:
+    def __init__(self, first, last):
+        self.first_receipt_id, self.last_receipt_id = first, last
+
+
+class _Receipt:
+    def __init__(self, rid):
+        self.id = rid
+
+
+class TestSegmentLayout:
+    def test_records_round_trip_through_the_compressed_payload(self):
+        records = [[2, 1, "cash", "1.00", "1.00", "0.00", "2025-01-01T00:00:00", [["Tea", "1.00", "1.000", "1.00"]]]]
+
+        assert unpack_records(pack_records(records)) == {2: records[0]}
+
+    def test_new_groups_never_span_an_existing_segment(self):
+        existing = [_Segment(10, 20)]
+        receipts = [_Receipt(i) for i in (5, 8, 15, 25, 30)]
+
+        merges, groups = _split_into_segments(receipts, existing)
+
+        assert [r.id for r in merges[existing[0]]] == [15]
+        assert [[r.id for r in g] for g in groups] == [[5, 8], [25, 30]]
+
+
+class TestArchiveReceipts:
+    async def test_old_receipts_leave_the_hot_tables(self, test_session, archive_sessions, aged_receipts):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=180)
+        stats = await archive_receipts(archive_sessions, cutoff, segment_size=1)
+
+        assert (stats.receipts, stats.items, stats.segments_created) == (2, 2, 2)
+        assert (await test_session.execute(select(func.count(ReceiptModel.id)))).scalar() == 1
+        assert (await test_session.execute(select(func.count(ReceiptItemModel.id)))).scalar() == 1
+        assert await archive_receipts(archive_sessions, cutoff) == type(stats)()
+
+    async def test_later_runs_merge_into_the_covering_segment(self, test_session, archive_sessions, aged_receipts):
+        now = datetime.now(timezone.utc)
+        await archive_receipts(archive_sessions, now - timedelta(days=350))
+        await archive_receipts(archive_sessions, now)
+
+        segments = (await test_session.execute(select(ReceiptArchiveSegmentModel))).scalars().all()
+        assert [(s.first_receipt_id, s.last_receipt_id) for s in segments] == [
+            (aged_receipts[0], aged_receipts[0]),
+            (aged_receipts[1], aged_receipts[2]),
+        ]
+
+
+class TestArchiveEntries:
+    async def test_every_archived_receipt_names_its_segment(self, test_session, archive_sessions, aged_receipts):
+        now = datetime.now(timezone.utc)
+        await archive_receipts(archive_sessions, now - timedelta(days=350))
+        await archive_receipts(archive_sessions, now)
+
+        entries = (await test_session.execute(select(ReceiptArchiveEntryModel))).scalars().all()
+        segments = {
+            s.id: unpack_records(s.payload)
+            for s in (await test_session.execute(select(ReceiptArchiveSegmentModel))).scalars()
+        }
+        assert sorted(e.receipt_id for e in entries) == aged_receipts
+        for entry in entries:
+            assert entry.receipt_id in segments[entry.segment_id]
+        assert {e.total for e in entries} == {Decimal("12.50"), Decimal("40.00"), Decimal("7.25")}
+
+    async def test_user_readers_skip_other_users_segments(
+        self, test_session, archive_sessions, aged_receipts, test_user, monkeypatch
+    ):
+        other = UserModel(
+            fullname="Other", username="other", email="other@example.com", password_hash=hash_password("x")
+        )
+        test_session.add(other)
+        await test_session.flush()
+        old = datetime.now(timezone.utc) - timedelta(days=500)
+        test_session.add(
+            ReceiptModel(
+                user_id=other.id, payment_type="cash", payment_amount=Decimal("1"), total=Decimal("1"), created_at=old
+            )
+        )
+        await test_session.commit()
+        await archive_receipts(archive_sessions, datetime.now(timezone.utc) - timedelta(days=180), segment_size=1)
+        unpacked = []
+        monkeypatch.setattr(
+            receipt_archive, "unpack_records", lambda payload: unpacked.append(payload) or unpack_records(payload)
+        )
+
+        async with archive_sessions() as session:
+            receipts = [r async for r in iter_archived_receipts(session, test_user.id)]
+        assert [r.id for r in receipts] == aged_receipts[:2]
+        assert len(unpacked) == 2
+
+        unpacked.clear()
+        async with archive_sessions() as session:
+            assert await drop_archived_receipts(session, other.id) == 1
+            await session.commit()
+        assert len(unpacked) == 1
+        async with archive_sessions() as session:
+            assert [r.id async for r in iter_archived_receipts(session, other.id)] == []
+            entries = (await session.execute(select(ReceiptArchiveEntryModel.user_id))).scalars().all()
+        assert entries == [test_user.id, test_user.id]
+
+
+class TestTransparentReads:
+    async def test_archived_receipts_read_like_hot_ones(
+        self, test_client: AsyncClient, auth_headers, archive_sessions, aged_receipts
+    ):
+        rid = aged_receipts[0]
+        before = (await test_client.get(f"/receipts/{rid}", headers=auth_headers)).json()
+        text_before = (await test_client.get(f"/public/receipts/{rid}/text")).text
+        stats_before = (await test_client.get("/receipts/stats", headers=auth_headers)).json()
+
+        await archive_receipts(archive_sessions, datetime.now(timezone.utc) - timedelta(days=180))
+
+        assert (await test_client.get(f"/receipts/{rid}", headers=auth_headers)).json() == before
+        assert (await test_client.get(f"/public/receipts/{rid}")).json() == before
+        assert (await test_client.get(f"/public/receipts/{rid}/text")).text == text_before
+        stats = (await test_client.get("/receipts/stats", headers=auth_headers)).json()
+        assert stats["total_receipts"] == stats_before["total_receipts"] == 3
+        assert Decimal(stats["total_amount"]) == Decimal(stats_before["total_amount"])
+        assert Decimal(stats["max_amount"]) == Decimal("40.00")
+        assert Decimal(stats["min_amount"]) == Decimal("7.25")
+
+    async def test_archived_receipts_stay_private(self, test_client: AsyncClient, test_session, archive_sessions, aged_receipts):
+        other = UserModel(fullname="Other", username="other", email="other@example.com", password_hash=hash_password("x"))
+        test_session.add(other)
+        await test_session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(user_id=other.id, username=other.username)}"}
+
+        await archive_receipts(archive_sessions, datetime.now(timezone.utc) - timedelta(days=180))
+
+        response = await test_client.get(f"/receipts/{aged_receipts[0]}", headers=headers)
+        assert response.status_code == 404
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from httpx import AsyncClient
+
+from app.database.models import ReceiptModel
+from app.services.receipt_events import ReceiptEvent, broker, stream_receipts
+
+
+def _receipt(name: str) -> dict:
+    return {"products": [{"name": name, "price": "3.00", "quantity": 1}], "payment": {"type": "cash", "amount": "10"}}
+
+
+@pytest.fixture
+def subscription(test_user):
+    subscription = broker.subscribe(test_user.id, buffer=10)
+    yield subscription
+    broker.unsubscribe(subscription)
+
+
+def _stream(engine, user_id: int, last_event_id=None, buffer: int = 10, heartbeat: float = 5, replay_limit: int = 100):
+    return stream_receipts(engine, user_id, last_event_id, buffer, heartbeat, replay_limit)
+
+
+async def _next(stream) -> str:
+    return await asyncio.wait_for(stream.__anext__(), 1)
+
+
+class TestReceiptEvents:
+    async def test_created_receipts_reach_their_user_once(
+        self, test_client: AsyncClient, auth_headers, test_user, subscription
+    ):
+        other = broker.subscribe(test_user.id + 1, buffer=10)
+        headers = {**auth_headers, "Idempotency-Key": "sale-1"}
+
+        created = await test_client.post("/receipts", json=_receipt("Tea"), headers=headers)
+        replayed = await test_client.post("/receipts", json=_receipt("Tea"), headers=headers)
+        broker.unsubscribe(other)
+
+        assert replayed.headers["idempotent-replayed"] == "true"
+        event = subscription.queue.get_nowait()
+        assert event.receipt_id == created.json()["id"]
+        assert json.loads(event.data) == created.json()
+        assert subscription.queue.empty()
+        assert other.queue.empty()
+
+    async def test_stream_sends_live_receipts_and_keep_alives(self, test_engine, test_user):
+        stream = _stream(test_engine, test_user.id, heartbeat=0.05)
+
+        assert await _next(stream) == "retry: 50\n\n"
+        assert await _next(stream) == ": keep-alive\n\n"
+        broker.deliver(ReceiptEvent(test_user.id, 7, '{"id": 7}'))
+        assert await _next(stream) == 'id: 7\nevent: receipt\ndata: {"id": 7}\n\n'
+        await stream.aclose()
+
+        assert not broker.has_subscribers(test_user.id)
+
+    async def test_slow_consumer_gets_its_buffer_then_is_dropped(self, test_engine, test_user):
+        stream = _stream(test_engine, test_user.id, buffer=2)
+        await _next(stream)
+
+        for receipt_id in (1, 2, 3):
+            broker.deliver(ReceiptEvent(test_user.id, receipt_id, "{}"))
+        pieces = [await _next(stream) for _ in range(3)]
+
+        assert [p.split("\n")[0] for p in pieces] == ["id: 1", "id: 2", "event: dropped"]
+        assert not broker.has_subscribers(test_user.id)
+        with pytest.raises(StopAsyncIteration):
+            await _next(stream)
+
+    async def test_last_event_id_replays_what_was_missed(
+        self, test_client: AsyncClient, auth_headers, test_engine, test_user
+    ):
+        ids = [
+            (await test_client.post("/receipts", json=_receipt(name), headers=auth_headers)).json()["id"]
+            for name in ("Tea", "Jam", "Bread")
+        ]
+
+        stream = _stream(test_engine, test_user.id, last_event_id=ids[0])
+        await _next(stream)
+        replayed = [await _next(stream), await _next(stream)]
+        # committed during the replay, so it arrives live as well
+        broker.deliver(ReceiptEvent(test_user.id, ids[2], "{}"))
+        broker.deliver(ReceiptEvent(test_user.id, 99, "{}"))
+        live = await _next(stream)
+        await stream.aclose()
+        overflow = _stream(test_engine, test_user.id, last_event_id=0, replay_limit=2)
+        pieces = [piece async for piece in overflow]
+
+        assert [p.split("\n")[0] for p in replayed] == [f"id: {ids[1]}", f"id: {ids[2]}"]
+        assert json.loads(replayed[0].split("data: ")[1])["products"][0]["name"] == "Jam"
+        assert live.startswith("id: 99\n")
+        assert pieces[-1] == "event: reset\ndata: {}\n\n"
+        assert len(pieces) == 4
+
+    async def test_resume_catches_receipts_that_committed_out_of_id_order(
+        self, test_session, test_engine, test_user
+    ):
+        seen_at = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+        # id, created_at: 20 reached the client; 10 (say, issued by another
+        # shard, or committed late) was created just before it and not sent
+        for receipt_id, created_at in (
+            (5, seen_at - timedelta(hours=1)),
+            (20, seen_at),
+            (10, seen_at - timedelta(seconds=1)),
+            (30, seen_at + timedelta(seconds=1)),
+        ):
+            test_session.add(
+                ReceiptModel(
+                    id=receipt_id,
+                    user_id=test_user.id,
+                    payment_type="cash",
+                    payment_amount=Decimal("1"),
+                    total=Decimal("1"),
+                    created_at=created_at,
+                )
+            )
+        await test_session.commit()
+
+        stream = _stream(test_engine, test_user.id, last_event_id=20)
+        await _next(stream)
+        replayed = [await _next(stream), await _next(stream)]
+        await stream.aclose()
+
+        assert [p.split("\n")[0] for p in replayed] == ["id: 10", "id: 30"]
+
+    async def test_requires_authentication(self, test_client: AsyncClient):
+        response = await test_client.get("/receipts/stream")
+
+        assert response.status_code in (401, 403)
@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.domain.schemas.receipt import ReceiptResponse
+from app.services.receipt_formatter import (
+    PAPER_WIDTHS,
+    ReceiptFormatter,
+    ReceiptTemplate,
+    compile_layout,
+    format_money,
+)
+
+CREATED = datetime(2026, 3, 4, 5, 6, tzinfo=timezone.utc)
+
+
+def _model(*lines, payment_type="cash", amount="100.00", receipt_id=1):
+    items = [
+        ReceiptItemModel(name=name, price=Decimal(price), quantity=Decimal(quantity), total=Decimal(total))
+        for name, price, quantity, total in lines
+    ]
+    total = sum(i.total for i in items)
+    return ReceiptModel(
+        id=receipt_id,
+        items=items,
+        payment_type=payment_type,
+        payment_amount=Decimal(amount),
+        total=total,
+        rest=Decimal(amount) - total,
+        created_at=CREATED,
+    )
+
+
+class TestReceiptLayout:
+    def test_forty_columns_match_the_original_layout(self):
+        receipt = ReceiptResponse.from_model(
+            _model(("Milk 1L", "1.20", "3.000", "3.60"), ("Coffee", "9.50", "1.000", "9.50"), payment_type="cashless")
+        )
+
+        assert ReceiptFormatter().format_receipt_text(receipt) == "\n".join(
+            [
+                "                RECEIPT                 ",
+                "-" * 40,
+                "                Store #1                ",
+                "-" * 40,
+                "3.00 x $1.20",
+                "Milk 1L                            $3.60",
+                "1.00 x $9.50",
+                "Coffee                             $9.50",
+                "-" * 40,
+                "TOTAL: $13.10",
+                "Card: $100.00",
+                "Change: $86.90",
+                "-" * 40,
+                "            03/04/2026 05:06            ",
+                "      Thank you for your purchase!      ",
+            ]
+        )
+
+    def test_names_are_cut_at_25_characters_as_before(self):
+        receipt = ReceiptResponse.from_model(_model(("Organic Whole Milk 1L Family Pack", "2.40", "1.000", "2.40")))
+
+        lines = ReceiptFormatter().format_receipt_text(receipt).splitlines()
+
+        assert lines[5] == "Organic Whole Milk 1L Fam" + " " * 10 + "$2.40"
+
+    @pytest.mark.parametrize("paper", sorted(PAPER_WIDTHS))
+    def test_paper_widths_fit_every_line(self, paper):
+        receipt = _model(("An extremely long product name that cannot fit", "12345.67", "2.000", "24691.34"))
+        text = ReceiptFormatter(paper=paper).format_receipt_text(ReceiptResponse.from_model(receipt))
+        width = PAPER_WIDTHS[paper]
+
+        assert all(len(line) <= width for line in text.splitlines())
+        assert "An extremely long" in text
+        assert "$24691.34" in text
+        assert text.splitlines()[1] == "-" * width
+
+    def test_money_is_exact_and_rounds_half_up(self):
+        assert format_money(Decimal("1.005")) == "1.01"
+        assert format_money(Decimal("0.125")) == "0.13"
+        assert format_money(Decimal("2")) == "2.00"
+        assert format_money(Decimal("12345678901.99")) == "12345678901.99"
+
+    def test_templates_are_compiled_once_per_width(self):
+        template = ReceiptTemplate(store="Corner Shop", footer="See you soon")
+        layout = compile_layout(32, template)
+
+        assert compile_layout(32, template) is layout
+        assert compile_layout(48, template) is not layout
+        text = layout.render(_model(("Tea", "3.00", "1.000", "3.00")))
+        assert "Corner Shop".center(32) in text
+        assert text.endswith("See you soon".center(32))
+
+    def test_bulk_rendering_matches_single_receipts(self):
+        receipts = [
+            _model(("Bread", "2.00", "1.000", "2.00"), receipt_id=1),
+            _model(("Tea", "3.00", "0.500", "1.50"), ("Cake", "4.25", "2.000", "8.50"), receipt_id=2),
+        ]
+        formatter = ReceiptFormatter(paper="58mm")
+
+        assert formatter.format_many(receipts) == "".join(
+            formatter.format_receipt_text(ReceiptResponse.from_model(r)) + "\n\n" for r in receipts
+        )
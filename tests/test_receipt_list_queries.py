@@ -0,0 +1,211 @@
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.database.queries import (
+    ReceiptFilters,
+    StatementCache,
+    receipt_list_cache,
+    receipt_list_params,
+    receipt_list_statements,
+    statement_cache_info,
+)
+from app.services.receipt_list import extrapolate_count
+
+
+@pytest.fixture
+async def dated_receipts(test_session: AsyncSession, test_user):
+    now = datetime.now(timezone.utc)
+    for days_ago, total, payment_type, name in (
+        (40, "10.00", "cash", "Old Milk"),
+        (5, "20.00", "cashless", "Fresh Bread"),
+        (1, "30.00", "cash", "Fresh Milk"),
+    ):
+        receipt = ReceiptModel(
+            user_id=test_user.id,
+            payment_type=payment_type,
+            payment_amount=Decimal(total),
+            total=Decimal(total),
+            rest=Decimal("0"),
+            created_at=now - timedelta(days=days_ago),
+        )
+        test_session.add(receipt)
+        await test_session.flush()
+        test_session.add(
+            ReceiptItemModel(
+                receipt_id=receipt.id, name=name, price=Decimal(total), quantity=Decimal("1"), total=Decimal(total)
+            )
+        )
+    await test_session.commit()
+
+
+class TestReceiptFilters:
+    def test_active_filters_keep_zero_amounts_and_skip_empty_values(self):
+        filters = ReceiptFilters(min_total=Decimal("0"), payment_type="", search="milk")
+
+        assert filters.active() == ("min_total", "search")
+        assert filters.params() == {"min_total": Decimal("0"), "search": "%milk%"}
+
+    def test_same_shape_reuses_the_cached_statements(self):
+        receipt_list_cache.clear()
+        first = receipt_list_statements(ReceiptFilters(payment_type="cash"), "total", "asc")
+        second = receipt_list_statements(ReceiptFilters(payment_type="cashless"), "total", "asc")
+        other = receipt_list_statements(ReceiptFilters(payment_type="cash"), "total", "desc")
+
+        assert first is second
+        assert other is not first
+        assert statement_cache_info()["receipt_list"] == {"hits": 1, "misses": 2, "size": 2, "maxsize": 256}
+
+    def test_list_params_carry_user_and_paging(self):
+        params = receipt_list_params(7, ReceiptFilters(date_from=date(2025, 1, 1)), 20, 10)
+
+        assert params == {
+            "user_id": 7,
+            "offset": 20,
+            "limit": 10,
+            "date_from": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        }
+
+    def test_statement_cache_evicts_least_recently_used(self):
+        cache = StatementCache(maxsize=2)
+        cache.get("a", lambda: 1)
+        cache.get("b", lambda: 2)
+        cache.get("a", lambda: 1)
+        cache.get("c", lambda: 3)
+
+        assert cache.get("b", lambda: "rebuilt") == "rebuilt"
+        assert cache.info()["misses"] == 4
+
+
+class TestReceiptListEndpointFilters:
+    async def test_date_and_amount_filters(self, test_client: AsyncClient, auth_headers, dated_receipts):
+        date_from = (date.today() - timedelta(days=10)).isoformat()
+        response = await test_client.get(f"/receipts?date_from={date_from}", headers=auth_headers)
+        assert response.json()["total"] == 2
+
+        response = await test_client.get("/receipts?min_total=15&max_total=25", headers=auth_headers)
+        assert [float(r["total"]) for r in response.json()["items"]] == [20.0]
+
+    async def test_search_with_sorting_and_paging(self, test_client: AsyncClient, auth_headers, dated_receipts):
+        response = await test_client.get(
+            "/receipts?search=milk&sort_by=total&sort_order=asc&size=1&page=2", headers=auth_headers
+        )
+        data = response.json()
+
+        assert data["total"] == 2
+        assert [float(r["total"]) for r in data["items"]] == [30.0]
+        assert data["has_prev"] is True and data["has_next"] is False
+
+    async def test_repeated_requests_hit_the_statement_cache(self, test_client: AsyncClient, auth_headers, dated_receipts):
+        receipt_list_cache.clear()
+        for payment_type in ("cash", "cashless", "cash"):
+            response = await test_client.get(f"/receipts?payment_type={payment_type}", headers=auth_headers)
+            assert response.status_code == 200
+
+        assert receipt_list_cache.info()["misses"] == 1
+        assert receipt_list_cache.info()["hits"] == 2
+
+
+@pytest.fixture
+def statements(test_engine):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+async def daily_receipts(test_session: AsyncSession, test_user):
+    now = datetime.now(timezone.utc)
+    for days_ago in range(10):
+        test_session.add(
+            ReceiptModel(
+                user_id=test_user.id,
+                payment_type="cash",
+                payment_amount=Decimal("5"),
+                total=Decimal("5"),
+                rest=Decimal("0"),
+                created_at=now - timedelta(days=days_ago),
+            )
+        )
+    await test_session.commit()
+
+
+class TestReceiptListCount:
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "",
+            "?search=milk&size=1&page=2",
+            "?payment_type=cash&include_items=false",
+            "?fields=id,total&sort_by=total&sort_order=asc",
+            "?page=5",
+        ],
+    )
+    async def test_window_and_separate_counts_agree(
+        self, test_client: AsyncClient, auth_headers, dated_receipts, monkeypatch, query
+    ):
+        responses = {}
+        for strategy in ("window", "separate", "auto"):
+            monkeypatch.setattr(get_settings(), "receipt_list_count", strategy)
+            responses[strategy] = (await test_client.get(f"/receipts{query}", headers=auth_headers)).json()
+
+        assert responses["window"] == responses["separate"] == responses["auto"]
+        assert responses["window"]["total_estimated"] is False
+
+    async def test_window_count_rides_on_the_page_query(
+        self, test_client: AsyncClient, auth_headers, dated_receipts, statements, monkeypatch
+    ):
+        monkeypatch.setattr(get_settings(), "receipt_list_count", "window")
+        response = await test_client.get("/receipts?payment_type=cash&include_items=false", headers=auth_headers)
+        receipt_queries = [s for s in statements if "FROM receipts" in s]
+
+        assert response.json()["total"] == 2
+        assert len(receipt_queries) == 1
+        assert "count(*) OVER ()" in receipt_queries[0]
+
+    async def test_totals_past_the_limit_are_estimated(
+        self, test_client: AsyncClient, auth_headers, daily_receipts, monkeypatch
+    ):
+        monkeypatch.setattr(get_settings(), "receipt_list_count_limit", 4)
+        first = (await test_client.get("/receipts?size=3", headers=auth_headers)).json()
+        last = (await test_client.get("/receipts?size=3&page=4", headers=auth_headers)).json()
+        narrow = (await test_client.get("/receipts?size=3&min_total=6", headers=auth_headers)).json()
+
+        # the newest 5 receipts span 4 days, all 10 span 9
+        assert first["total_estimated"] is True
+        assert first["total"] == 11
+        assert first["has_next"] is True
+        assert len(last["items"]) == 1 and last["has_next"] is False
+        assert narrow["total_estimated"] is False and narrow["total"] == 0
+
+    async def test_auto_counts_only_searches_in_the_page_query(
+        self, test_client: AsyncClient, auth_headers, dated_receipts, statements
+    ):
+        await test_client.get("/receipts?payment_type=cash", headers=auth_headers)
+        plain = [s for s in statements if "FROM receipts" in s]
+        statements.clear()
+        await test_client.get("/receipts?search=milk", headers=auth_headers)
+        search = [s for s in statements if "FROM receipts" in s]
+
+        assert len(plain) == 2 and "OVER ()" not in plain[1]
+        assert len(search) == 1
+
+    def test_extrapolation_averages_the_rates_at_both_ends(self):
+        day = timedelta(days=1)
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        end = start + 30 * day
+
+        # 100 matches a day now, 50 a day at the start
+        assert extrapolate_count(100, end - day, end, start, start + 2 * day) == 2250
+        assert extrapolate_count(100, end, end, start, start + 2 * day) == 1500
+        assert extrapolate_count(100, end, end, start, start) == 100
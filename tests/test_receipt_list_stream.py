@@ -0,0 +1,100 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from httpx import AsyncClient
+
+from app.api import json_stream
+from app.api.json_stream import stream_receipt_list
+from app.database.models import ReceiptItemModel, ReceiptModel
+from app.domain.schemas.receipt import ReceiptListResponse, ReceiptResponse
+
+PAGE = {"total": 42, "page": 2, "size": 3, "total_pages": 14, "has_next": True, "has_prev": True}
+
+
+def _receipt(receipt_id: int, created_at: datetime, names, amount: str = "10.00") -> ReceiptModel:
+    receipt = ReceiptModel(
+        id=receipt_id,
+        payment_type="cashless" if receipt_id % 2 else "cash",
+        payment_amount=Decimal(amount),
+        total=Decimal("7.50"),
+        rest=Decimal("2.50"),
+        created_at=created_at,
+    )
+    receipt.items = [
+        ReceiptItemModel(name=name, price=Decimal("2.50"), quantity=Decimal("3.000"), total=Decimal("7.50"))
+        for name in names
+    ]
+    return receipt
+
+
+def _receipts():
+    return [
+        _receipt(1, datetime(2026, 3, 1, 12, 30, tzinfo=timezone.utc), ['Milk "3.2%"', "Back\\slash"]),
+        _receipt(2, datetime(2026, 3, 1, 12, 30, 0, 123456), ["Молоко", "Café ☕", "tab\tnew\nline\x01"]),
+        _receipt(3, datetime(2026, 3, 2, tzinfo=timezone(timedelta(hours=3))), ["line sep"], "1E+2"),
+        _receipt(2**41 + 5, datetime(2026, 3, 3, 23, 59, 59, tzinfo=timezone.utc), []),
+    ]
+
+
+async def _fastapi_body(receipts, **page) -> bytes:
+    """What FastAPI writes when an endpoint returns ReceiptListResponse."""
+    model = ReceiptListResponse(items=[ReceiptResponse.from_model(r) for r in receipts], **page)
+    field = create_model_field("response", ReceiptListResponse)
+    content = await serialize_response(field=field, response_content=model)
+    return JSONResponse(content).body
+
+
+async def _streamed(receipts, **page) -> bytes:
+    return b"".join([chunk async for chunk in stream_receipt_list(receipts, **page)])
+
+
+class TestReceiptListStream:
+    @pytest.mark.parametrize("total_estimated", [False, True])
+    async def test_bytes_match_fastapi(self, total_estimated):
+        page = {**PAGE, "total_estimated": total_estimated}
+
+        assert await _streamed(_receipts(), **page) == await _fastapi_body(_receipts(), **page)
+
+    async def test_empty_page(self):
+        page = {**PAGE, "total": 0, "total_pages": 0, "has_next": False, "total_estimated": False}
+
+        assert await _streamed([], **page) == await _fastapi_body([], **page)
+
+    async def test_rows_are_released_as_chunks_go_out(self, monkeypatch):
+        monkeypatch.setattr(json_stream, "CHUNK_SIZE", 200)
+        receipts = _receipts()
+        remaining = []
+        chunks = []
+        async for chunk in stream_receipt_list(receipts, **PAGE, total_estimated=False):
+            remaining.append(len(receipts))
+            chunks.append(chunk)
+
+        assert len(chunks) > 2
+        assert remaining == sorted(remaining, reverse=True) and remaining[-1] == 0
+        assert b"".join(chunks) == await _fastapi_body(_receipts(), **PAGE, total_estimated=False)
+
+    async def test_list_endpoint_streams_the_same_json(self, test_client: AsyncClient, auth_headers):
+        for name in ("Tea", "Ünïcödé \"quoted\""):
+            await test_client.post(
+                "/receipts",
+                json={
+                    "products": [{"name": name, "price": "3.10", "quantity": "1.5"}],
+                    "payment": {"type": "cash", "amount": "10"},
+                },
+                headers=auth_headers,
+            )
+        ids = [r["id"] for r in (await test_client.get("/receipts?fields=id", headers=auth_headers)).json()["items"]]
+        receipts = [(await test_client.get(f"/receipts/{i}", headers=auth_headers)).json() for i in ids]
+
+        response = await test_client.get("/receipts", headers=auth_headers)
+        page = {**PAGE, "total": 2, "page": 1, "size": 10, "total_pages": 1, "has_next": False, "has_prev": False}
+        expected = JSONResponse(
+            ReceiptListResponse(items=receipts, **page, total_estimated=False).model_dump(mode="json")
+        )
+
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["etag"]
+        assert response.content == expected.body
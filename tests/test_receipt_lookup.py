@@ -0,0 +1,97 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.security import create_access_token, hash_password
+from app.database.models import ReceiptModel, UserModel
+from app.domain.schemas.receipt import MAX_LOOKUP_IDS
+from app.services.receipt_archive import archive_receipts, segment_cache
+from app.services.receipt_lookup import lookup_receipts
+
+
+def _body(name: str):
+    return {"products": [{"name": name, "price": 2, "quantity": 1}], "payment": {"type": "cash", "amount": 10}}
+
+
+@pytest.fixture
+async def receipt_ids(test_client: AsyncClient, auth_headers):
+    ids = []
+    for name in ("Tea", "Milk", "Bread", "Eggs"):
+        ids.append((await test_client.post("/receipts", json=_body(name), headers=auth_headers)).json()["id"])
+    return ids
+
+
+@pytest.fixture
+def statements(test_engine):
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+
+async def _archive_first_two(test_engine, test_session, receipt_ids):
+    old = datetime.now(timezone.utc) - timedelta(days=400)
+    await test_session.execute(update(ReceiptModel).where(ReceiptModel.id.in_(receipt_ids[:2])).values(created_at=old))
+    await test_session.commit()
+    segment_cache.clear()
+    factory = sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+    await archive_receipts(factory, datetime.now(timezone.utc) - timedelta(days=300))
+    test_session.expire_all()
+
+
+class TestReceiptLookup:
+    async def test_receipts_come_back_in_request_order_with_missing_ids(
+        self, test_client: AsyncClient, test_session, auth_headers, receipt_ids
+    ):
+        stranger = UserModel(fullname="Other", username="other", email="o@example.com", password_hash=hash_password("x" * 8))
+        test_session.add(stranger)
+        await test_session.commit()
+        stranger_headers = {"Authorization": f"Bearer {create_access_token(user_id=stranger.id, username='other')}"}
+        foreign = (await test_client.post("/receipts", json=_body("Cake"), headers=stranger_headers)).json()["id"]
+
+        asked = [receipt_ids[2], 9999, receipt_ids[0], foreign, receipt_ids[2]]
+        response = await test_client.post("/receipts/lookup", json={"ids": asked}, headers=auth_headers)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [r["id"] for r in body["receipts"]] == [receipt_ids[2], receipt_ids[0]]
+        assert [r["products"][0]["name"] for r in body["receipts"]] == ["Bread", "Tea"]
+        assert body["missing"] == [9999, foreign]
+        single = (await test_client.get(f"/receipts/{receipt_ids[2]}", headers=auth_headers)).json()
+        assert body["receipts"][0] == single
+
+    async def test_hot_receipts_take_two_queries(self, test_session, test_user, receipt_ids, statements):
+        statements.clear()
+        receipts, missing = await lookup_receipts(test_session, receipt_ids, test_user.id)
+
+        assert [r.id for r in receipts] == receipt_ids and missing == []
+        assert len(statements) == 2
+
+    async def test_archived_receipts_are_found_in_place(
+        self, test_client: AsyncClient, test_session, test_engine, auth_headers, receipt_ids, statements
+    ):
+        await _archive_first_two(test_engine, test_session, receipt_ids)
+
+        statements.clear()
+        response = await test_client.post("/public/receipts/lookup", json={"ids": receipt_ids[::-1] + [0]})
+
+        assert response.status_code == 200
+        assert [r["id"] for r in response.json()["receipts"]] == receipt_ids[::-1]
+        assert [r["products"][0]["name"] for r in response.json()["receipts"]] == ["Eggs", "Bread", "Milk", "Tea"]
+        assert response.json()["missing"] == [0]
+        # receipts + items, then segment ranges + payloads
+        assert len(statements) == 4
+
+    @pytest.mark.parametrize("ids", [[], list(range(1, MAX_LOOKUP_IDS + 2))])
+    async def test_empty_and_oversized_batches_are_rejected(self, test_client: AsyncClient, ids):
+        response = await test_client.post("/public/receipts/lookup", json={"ids": ids})
+
+        assert response.status_code == 422
+
@@ -1,79 +1,72 @@
+import json
 import pytest
-import time
-from decimal import Decimal
-from httpx import AsyncClient
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.models import UserModel, ReceiptModel, ReceiptItemModel
-from app.auth.security import hash_password, create_access_token
+
+from benchmarks.load_test import LoadTestConfig, percentile, run_load_test, main
+
 
 @pytest.fixture
-async def test_user_with_many_receipts(test_session: AsyncSession):
-    user = UserModel(
-        fullname="Performance Test User",
-        username="perfuser",
-        email="perf@example.com",
-        password_hash=hash_password("perfpassword123")
+def load_test_config(tmp_path):
+    return LoadTestConfig(
+        receipts=200,
+        users=3,
+        concurrency=4,
+        requests=60,
+        database_url=f"sqlite+aiosqlite:///{tmp_path}/load_test.db",
     )
-    test_session.add(user)
-    await test_session.flush()
-    
-    for i in range(50):
-        receipt = ReceiptModel(
-            user_id=user.id,
-            payment_type="cash" if i % 2 == 0 else "cashless",
-            payment_amount=Decimal("100.00"),
-            total=Decimal("85.50"),
-            rest=Decimal("14.50")
-        )
-        test_session.add(receipt)
-        await test_session.flush()
-        
-        item = ReceiptItemModel(
-            receipt_id=receipt.id,
-            name=f"Performance Product {i}",
-            price=Decimal("42.75"),
-            quantity=Decimal("2"),
-            total=Decimal("85.50")
-        )
-        test_session.add(item)
-    
-    await test_session.commit()
-    await test_session.refresh(user)
-    return user
+
 
 class TestReceiptPerformance:
-    async def test_large_list_performance(self, test_client: AsyncClient, test_user_with_many_receipts):
-        user = test_user_with_many_receipts
-        token = create_access_token(user_id=user.id, username=user.username)
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        start_time = time.time()
-        response = await test_client.get("/receipts?size=50", headers=headers)
-        end_time = time.time()
-        
-        assert response.status_code == 200
-        assert end_time - start_time < 2.0
+    async def test_load_test_reports_throughput_and_latency_percentiles(self, load_test_config):
+        report = await run_load_test(load_test_config)
+
+        assert report["requests"] == 60
+        assert report["errors"] == 0
+        assert report["throughput_rps"] > 0
+        latency = report["latency_ms"]
+        assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+        assert report["dataset"] == {
+            "users": 3,
+            "receipts": 200,
+            "seed_seconds": report["dataset"]["seed_seconds"],
+        }
+
+    async def test_load_test_covers_every_operation_in_mix(self, load_test_config):
+        report = await run_load_test(load_test_config)
+
+        assert set(report["operations"]) == {"create", "list", "search", "stats", "public"}
+        assert sum(op["requests"] for op in report["operations"].values()) == report["requests"]
+
+    async def test_load_test_honours_custom_mix(self, load_test_config):
+        load_test_config.mix = {"stats": 1}
+        report = await run_load_test(load_test_config)
+
+        assert set(report["operations"]) == {"stats"}
+        assert report["errors"] == 0
+
+    async def test_load_test_rejects_unknown_operation(self, load_test_config):
+        load_test_config.mix = {"delete": 1}
+        with pytest.raises(ValueError):
+            await run_load_test(load_test_config)
+
+    def test_percentile_uses_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 95) == 95.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 99) == 0.0
 
-    async def test_complex_search_performance(self, test_client: AsyncClient, test_user_with_many_receipts):
-        user = test_user_with_many_receipts
-        token = create_access_token(user_id=user.id, username=user.username)
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        start_time = time.time()
-        response = await test_client.get("/receipts?search=Performance&payment_type=cash&sort_by=total", headers=headers)
-        end_time = time.time()
-        
-        assert response.status_code == 200
-        assert end_time - start_time < 2.0
+    def test_cli_writes_json_report(self, tmp_path):
+        output = tmp_path / "report.json"
+        main([
+            "--receipts", "50",
+            "--users", "2",
+            "--requests", "10",
+            "--concurrency", "2",
+            "--mix", "list=1,public=1",
+            "--database-url", f"sqlite+aiosqlite:///{tmp_path}/cli.db",
+            "--output", str(output),
+        ])
 
-    async def test_stats_performance(self, test_client: AsyncClient, test_user_with_many_receipts):
-        user = test_user_with_many_receipts
-        token = create_access_token(user_id=user.id, username=user.username)
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        start_time = time.time()
-        response = await test_client.get("/receipts/stats", headers=headers)
-        end_time = time.time()
-        
-        assert response.status_code == 200
-        assert end_time - start_time < 1.0
+        report = json.loads(output.read_text())
+        assert report["requests"] == 10
+        assert "p99" in report["latency_ms"]
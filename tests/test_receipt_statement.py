@@ -0,0 +1,119 @@
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services import receipt_statement
+from app.services.receipt_archive import archive_receipts, segment_cache
+from app.services.receipt_formatter import compile_layout
+from app.services.receipt_ingest import insert_receipts, pending_receipt
+from app.services.receipt_statement import stream_statement
+
+MONTH_START = date(2026, 3, 1)
+MONTH_END = date(2026, 3, 31)
+
+
+async def _write(session: AsyncSession, user_id: int, sales) -> None:
+    pending = []
+    for name, amount, payment_type, created_at in sales:
+        p = pending_receipt(
+            user_id,
+            ReceiptCreate(
+                products=[{"name": name, "price": amount, "quantity": 1}],
+                payment={"type": payment_type, "amount": amount},
+            ),
+        )
+        p.receipt["created_at"] = created_at
+        pending.append(p)
+    await insert_receipts(session, pending)
+    await session.commit()
+
+
+def _at(day: date, hour: int = 12) -> datetime:
+    return datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+async def march(test_session, test_user):
+    await _write(
+        test_session,
+        test_user.id,
+        [
+            ("Before", "1.00", "cash", _at(MONTH_START - timedelta(days=1), 23)),
+            ("First Day", "2.50", "cash", _at(MONTH_START, 0)),
+            ("Mid Month", "10.00", "cashless", _at(date(2026, 3, 15))),
+            ("Last Day", "4.00", "cash", _at(MONTH_END, 23)),
+            ("After", "8.00", "cash", _at(MONTH_END + timedelta(days=1), 0)),
+        ],
+    )
+
+
+async def _statement(client: AsyncClient, headers, **params):
+    params = {"date_from": MONTH_START.isoformat(), "date_to": MONTH_END.isoformat(), **params}
+    return await client.get("/receipts/statement", params=params, headers=headers)
+
+
+class TestStatement:
+    async def test_statement_lists_every_receipt_in_range_and_sums_them(
+        self, test_client: AsyncClient, auth_headers, march
+    ):
+        response = await _statement(test_client, auth_headers)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert text.index("First Day") < text.index("Mid Month") < text.index("Last Day")
+        assert "Before" not in text and "After" not in text
+        assert "03/01/2026 - 03/31/2026" in text
+        assert text.count("RECEIPT") == 3
+        footer = text[text.index("STATEMENT SUMMARY") :]
+        assert "Receipts: 3" in footer
+        assert "Cash (2): $6.50" in footer
+        assert "Card (1): $10.00" in footer
+        assert "TOTAL: $16.50" in footer
+
+    async def test_paper_sets_the_width(self, test_client: AsyncClient, auth_headers, march):
+        response = await _statement(test_client, auth_headers, paper="58mm")
+        unknown = await _statement(test_client, auth_headers, paper="A4")
+        reversed_range = await _statement(test_client, auth_headers, date_from="2026-04-01")
+
+        assert max(len(line) for line in response.text.splitlines()) == 32
+        assert unknown.status_code == 422
+        assert reversed_range.status_code == 422
+
+    async def test_archived_receipts_come_first_and_chunks_are_bounded(
+        self, test_engine, test_session, test_user, march, monkeypatch
+    ):
+        factory = sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+        segment_cache.clear()
+        await archive_receipts(factory, _at(date(2026, 3, 10)))
+        monkeypatch.setattr(receipt_statement, "STATEMENT_CHUNK", 1)
+        checked_out = [0]
+        pool = test_engine.sync_engine.pool
+        event.listen(pool, "checkout", lambda *args: checked_out.__setitem__(0, checked_out[0] + 1))
+        event.listen(pool, "checkin", lambda *args: checked_out.__setitem__(0, checked_out[0] - 1))
+
+        pieces = []
+        held = []
+        async for piece in stream_statement(
+            test_engine, compile_layout(40), test_user.id, test_user.fullname, MONTH_START, MONTH_END
+        ):
+            pieces.append(piece)
+            held.append(checked_out[0])
+
+        # header, one archived and two hot chunks of one receipt, footer
+        assert len(pieces) == 5
+        # no connection is held while the client reads a piece
+        assert held == [0] * 5
+        assert "First Day" in pieces[1] and "Mid Month" in pieces[2] and "Last Day" in pieces[3]
+        assert "Receipts: 3" in pieces[4]
+
+    async def test_requires_authentication(self, test_client: AsyncClient):
+        response = await test_client.get(
+            "/receipts/statement", params={"date_from": "2026-03-01", "date_to": "2026-03-31"}
+        )
+
+        assert response.status_code in (401, 403)
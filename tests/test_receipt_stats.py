@@ -0,0 +1,187 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import ReceiptDailyTotalModel
+from app.domain.schemas.receipt import ReceiptCreate
+from app.services import receipt_archive
+from app.services.receipt_archive import archive_receipts, segment_cache
+from app.services.receipt_ingest import insert_receipts, pending_receipt
+from app.services.receipt_stats import recompute_daily_totals
+
+MIDNIGHT = datetime(2026, 3, 10, tzinfo=timezone.utc)
+
+# (created_at, item name, price, payment type)
+RECEIPTS = [
+    (MIDNIGHT - timedelta(days=2, hours=3), "Coffee", "4.00", "cash"),
+    (MIDNIGHT - timedelta(days=1, hours=12), "Tea", "2.50", "cashless"),
+    (MIDNIGHT - timedelta(hours=1), "Coffee beans", "18.00", "cashless"),
+    (MIDNIGHT, "Cake", "6.00", "cash"),
+    (MIDNIGHT + timedelta(hours=9), "Coffee", "4.50", "cash"),
+]
+
+FILTERS = [
+    {"date_from": "2026-03-08"},
+    {"date_to": "2026-03-10"},
+    {"date_from": "2026-03-09", "date_to": "2026-03-10", "payment_type": "cashless"},
+    {"date_from": "2026-03-10", "date_to": "2026-03-10"},
+    {"date_from": "2026-03-11", "date_to": "2026-03-09"},
+    {"payment_type": "cash"},
+    {"search": "coffee", "date_to": "2026-03-10"},
+    {"min_total": "4.50", "payment_type": "cash"},
+    {"max_total": "5"},
+]
+
+
+@pytest.fixture
+def sessions(test_engine):
+    segment_cache.clear()
+    return sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def dated_receipts(test_session: AsyncSession, test_user):
+    pending = []
+    for created_at, name, price, payment_type in RECEIPTS:
+        p = pending_receipt(
+            test_user.id,
+            ReceiptCreate(
+                products=[{"name": name, "price": price, "quantity": 1}],
+                payment={"type": payment_type, "amount": "20"},
+            ),
+        )
+        p.receipt["created_at"] = created_at
+        pending.append(p)
+    await insert_receipts(test_session, pending)
+    await test_session.commit()
+
+
+async def _expected(client: AsyncClient, headers, params) -> dict:
+    """The stats a client would compute from the filtered list."""
+    listed = (await client.get("/receipts", params={**params, "size": 100}, headers=headers)).json()["items"]
+    totals = [Decimal(str(r["total"])) for r in listed]
+    by_type = {}
+    for r in listed:
+        entry = by_type.setdefault(r["payment"]["type"], [0, Decimal("0")])
+        entry[0] += 1
+        entry[1] += Decimal(str(r["total"]))
+    return {
+        "total_receipts": len(listed),
+        "total_amount": sum(totals, Decimal("0")),
+        "max_amount": max(totals, default=Decimal("0")),
+        "min_amount": min(totals, default=Decimal("0")),
+        "payment_type_stats": {t: tuple(v) for t, v in by_type.items()},
+    }
+
+
+def _actual(stats: dict) -> dict:
+    return {
+        "total_receipts": stats["total_receipts"],
+        "total_amount": Decimal(str(stats["total_amount"])),
+        "max_amount": Decimal(str(stats["max_amount"])),
+        "min_amount": Decimal(str(stats["min_amount"])),
+        "payment_type_stats": {
+            p["type"]: (p["count"], Decimal(str(p["total"]))) for p in stats["payment_type_stats"]
+        },
+    }
+
+
+class TestFilteredStats:
+    @pytest.mark.parametrize("params", FILTERS)
+    async def test_stats_agree_with_the_filtered_list(
+        self, test_client: AsyncClient, auth_headers, dated_receipts, params
+    ):
+        stats = await test_client.get("/receipts/stats", params=params, headers=auth_headers)
+
+        assert stats.status_code == 200
+        assert _actual(stats.json()) == await _expected(test_client, auth_headers, params)
+
+    async def test_archived_receipts_are_counted_by_both_paths(
+        self, test_client: AsyncClient, auth_headers, dated_receipts, sessions
+    ):
+        await archive_receipts(sessions, MIDNIGHT - timedelta(hours=2))
+
+        rollup = await test_client.get("/receipts/stats", params={"date_to": "2026-03-10"}, headers=auth_headers)
+        scan = await test_client.get(
+            "/receipts/stats", params={"date_to": "2026-03-10", "search": "coffee"}, headers=auth_headers
+        )
+
+        assert rollup.json()["total_receipts"] == 4
+        assert Decimal(str(rollup.json()["total_amount"])) == Decimal("30.50")
+        assert scan.json()["total_receipts"] == 2
+        assert Decimal(str(scan.json()["total_amount"])) == Decimal("22.00")
+
+    async def test_archived_receipts_are_counted_without_reading_segments(
+        self, test_client: AsyncClient, auth_headers, dated_receipts, sessions, monkeypatch
+    ):
+        filters = [params for params in FILTERS if "search" not in params]
+        before = [
+            (await test_client.get("/receipts/stats", params=params, headers=auth_headers)).json()
+            for params in filters
+        ]
+        await archive_receipts(sessions, MIDNIGHT + timedelta(hours=1))
+        unpacked = []
+        monkeypatch.setattr(receipt_archive, "unpack_records", lambda payload: unpacked.append(payload))
+
+        after = [
+            (await test_client.get("/receipts/stats", params=params, headers=auth_headers)).json()
+            for params in filters
+        ]
+
+        assert [_actual(stats) for stats in after] == [_actual(stats) for stats in before]
+        assert unpacked == []
+
+    async def test_filters_get_their_own_etag(self, test_client: AsyncClient, auth_headers, dated_receipts):
+        whole = await test_client.get("/receipts/stats", headers=auth_headers)
+        cash = await test_client.get("/receipts/stats", params={"payment_type": "cash"}, headers=auth_headers)
+        again = await test_client.get(
+            "/receipts/stats",
+            params={"payment_type": "cash"},
+            headers={**auth_headers, "If-None-Match": cash.headers["etag"]},
+        )
+
+        assert whole.headers["etag"] != cash.headers["etag"]
+        assert again.status_code == 304
+
+    async def test_average_is_rounded_the_same_with_or_without_filters(
+        self, test_client: AsyncClient, auth_headers, dated_receipts
+    ):
+        # 37.00 over 7 receipts does not come out even
+        gum = {
+            "products": [{"name": "Gum", "price": "1.00", "quantity": 1}],
+            "payment": {"type": "cash", "amount": "1"},
+        }
+        for _ in range(2):
+            created = await test_client.post("/receipts", json=gum, headers=auth_headers)
+            assert created.status_code == 201
+
+        whole = await test_client.get("/receipts/stats", headers=auth_headers)
+        since = await test_client.get("/receipts/stats", params={"date_from": "2020-01-01"}, headers=auth_headers)
+
+        assert str(whole.json()["average_amount"]) == str(since.json()["average_amount"]) == "5.29"
+
+    async def test_recompute_matches_incremental_totals(self, test_user, dated_receipts, sessions):
+        async def rows():
+            async with sessions() as session:
+                result = await session.execute(
+                    select(
+                        ReceiptDailyTotalModel.day,
+                        ReceiptDailyTotalModel.payment_type,
+                        ReceiptDailyTotalModel.receipt_count,
+                        ReceiptDailyTotalModel.total_amount,
+                        ReceiptDailyTotalModel.min_total,
+                        ReceiptDailyTotalModel.max_total,
+                    ).order_by(ReceiptDailyTotalModel.day, ReceiptDailyTotalModel.payment_type)
+                )
+                return result.all()
+
+        incremental = await rows()
+        await archive_receipts(sessions, MIDNIGHT)
+
+        assert await recompute_daily_totals(sessions, [test_user.id]) == 1
+        assert await rows() == incremental
+        assert len(incremental) == 4
@@ -0,0 +1,113 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.config import get_settings
+from app.database.connection import Base
+from app.database.models import ReceiptArchiveSegmentModel, ReceiptModel, ReceiptRelocationModel, UserModel
+from app.database.shards import (
+    dispose_shards,
+    get_shard_engines,
+    home_shard,
+    prepare_shard,
+    receipt_id_base,
+    shard_map,
+    shard_sessionmaker,
+)
+from app.services import products
+from app.services.receipt_archive import archive_receipts
+from app.services.shard_moves import move_user
+
+
+@pytest.fixture
+async def shard_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "shards", {1: f"sqlite+aiosqlite:///{tmp_path}/shard1.db"})
+    writer, _ = get_shard_engines(1)
+    async with writer.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await prepare_shard(writer, 1)
+    shard_map.clear()
+    yield shard_sessionmaker(1)
+    await dispose_shards()
+    shard_map.clear()
+    products._shard_caches.clear()
+
+
+@pytest.fixture
+def directory(test_engine):
+    return sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _receipt(name: str, price: str = "5.00") -> dict:
+    return {"products": [{"name": name, "price": price, "quantity": 1}], "payment": {"type": "cash", "amount": "100"}}
+
+
+async def _receipt_ids(factory, user_id: int):
+    async with factory() as session:
+        query = select(ReceiptModel.id).where(ReceiptModel.user_id == user_id).order_by(ReceiptModel.id)
+        return (await session.execute(query)).scalars().all()
+
+
+class TestReceiptIds:
+    def test_ids_name_the_shard_that_issued_them(self):
+        assert home_shard(41) == 0
+        assert home_shard(receipt_id_base(3)) == 3
+        assert home_shard(receipt_id_base(4) - 1) == 3
+
+
+class TestShardedReceipts:
+    async def test_a_user_on_shard_one_writes_and_reads_there(
+        self, test_client: AsyncClient, auth_headers, test_user, directory, shard_one
+    ):
+        await move_user(directory, test_user.id, 1, settle_seconds=0)
+
+        created = await test_client.post("/receipts", json=_receipt("Tea"), headers=auth_headers)
+        listed = await test_client.get("/receipts", headers=auth_headers)
+        receipt_id = created.json()["id"]
+        public = await test_client.get(f"/public/receipts/{receipt_id}")
+        lookup = await test_client.post("/public/receipts/lookup", json={"ids": [receipt_id, 7]})
+
+        assert created.status_code == 201
+        assert home_shard(receipt_id) == 1
+        assert [r["id"] for r in listed.json()["items"]] == [receipt_id]
+        assert await _receipt_ids(directory, test_user.id) == []
+        assert await _receipt_ids(shard_one, test_user.id) == [receipt_id]
+        assert public.json()["products"][0]["name"] == "Tea"
+        assert [r["id"] for r in lookup.json()["receipts"]] == [receipt_id]
+        assert lookup.json()["missing"] == [7]
+
+    async def test_move_keeps_ids_and_routes_public_reads_through_relocations(
+        self, test_client: AsyncClient, auth_headers, test_user, directory, shard_one
+    ):
+        for name in ("Old", "Bread", "Milk"):
+            await test_client.post("/receipts", json=_receipt(name), headers=auth_headers)
+        ids = await _receipt_ids(directory, test_user.id)
+        await archive_receipts(directory, datetime.now(timezone.utc) + timedelta(days=1), limit=1)
+        before = await test_client.get("/receipts", headers=auth_headers)
+
+        stats = await move_user(directory, test_user.id, 1, settle_seconds=0)
+
+        after = await test_client.get(
+            "/receipts", headers={**auth_headers, "If-None-Match": before.headers["etag"]}
+        )
+        public = await test_client.get(f"/public/receipts/{ids[0]}/text")
+        created = await test_client.post("/receipts", json=_receipt("Jam"), headers=auth_headers)
+        top = await test_client.get("/receipts/stats/products", headers=auth_headers)
+        async with directory() as session:
+            segments = (await session.execute(select(func.count(ReceiptArchiveSegmentModel.id)))).scalar()
+            relocated = (await session.execute(select(ReceiptRelocationModel.receipt_id))).scalars().all()
+            shard_id = (await session.execute(select(UserModel.shard_id))).scalar()
+
+        assert (stats.archived, stats.receipts, stats.relocated) == (1, 2, 3)
+        assert shard_id == 1
+        assert await _receipt_ids(directory, test_user.id) == []
+        assert segments == 0
+        assert sorted(relocated) == ids
+        assert after.status_code == 200
+        assert sorted(r["id"] for r in after.json()["items"]) == ids
+        assert "Old" in public.text
+        assert home_shard(created.json()["id"]) == 1
+        assert {p["name"] for p in top.json()["products"]} == {"Old", "Bread", "Milk", "Jam"}
@@ -0,0 +1,90 @@
+import pytest
+from decimal import Decimal
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from app.database.models import ReceiptItemModel, ReceiptModel
+
+
+def _body(items: int):
+    return {
+        "products": [{"name": f"Item {n}", "price": 1.5, "quantity": 1} for n in range(items)],
+        "payment": {"type": "cash", "amount": 100},
+    }
+
+
+@pytest.fixture
+async def receipts(test_client: AsyncClient, test_session, test_user, auth_headers):
+    for items in (1, 3, 5):
+        await test_client.post("/receipts", json=_body(items), headers=auth_headers)
+    # the ORM path fills receipt_created_at from the before_insert hook
+    test_session.add(
+        ReceiptModel(
+            user_id=test_user.id,
+            payment_type="cashless",
+            payment_amount=Decimal("4.00"),
+            total=Decimal("4.00"),
+            rest=Decimal("0.00"),
+            items=[
+                ReceiptItemModel(name="Tea", price=Decimal("2.00"), quantity=Decimal("1"), total=Decimal("2.00")),
+                ReceiptItemModel(name="Cake", price=Decimal("2.00"), quantity=Decimal("1"), total=Decimal("2.00")),
+            ],
+        )
+    )
+    await test_session.commit()
+
+
+@pytest.fixture
+def statements(test_engine):
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+    yield seen
+    event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+
+
+class TestSummaryMode:
+    async def test_summaries_count_items_in_sql_and_load_none(
+        self, test_client: AsyncClient, auth_headers, receipts, statements
+    ):
+        full = (await test_client.get("/receipts?sort_by=total", headers=auth_headers)).json()
+        statements.clear()
+        summary = (await test_client.get("/receipts?sort_by=total&include_items=false", headers=auth_headers)).json()
+
+        assert not any("receipt_items.name" in s for s in statements)
+        assert [r["item_count"] for r in summary["items"]] == [len(r["products"]) for r in full["items"]]
+        for short, long in zip(summary["items"], full["items"]):
+            assert set(short) == {"id", "payment", "total", "rest", "created_at", "item_count"}
+            assert {k: v for k, v in short.items() if k != "item_count"} == {
+                k: v for k, v in long.items() if k != "products"
+            }
+        assert {k: v for k, v in summary.items() if k != "items"} == {k: v for k, v in full.items() if k != "items"}
+
+
+class TestFieldSelection:
+    async def test_only_selected_fields_are_returned(self, test_client: AsyncClient, auth_headers, receipts):
+        page = (await test_client.get("/receipts?fields=id,total,item_count", headers=auth_headers)).json()
+        with_items = (await test_client.get("/receipts?fields=id,products,item_count", headers=auth_headers)).json()
+
+        assert [set(r) for r in page["items"]] == [{"id", "total", "item_count"}] * 4
+        assert [r["item_count"] for r in with_items["items"]] == [len(r["products"]) for r in with_items["items"]]
+        assert [r["item_count"] for r in page["items"]] == [r["item_count"] for r in with_items["items"]]
+
+    @pytest.mark.parametrize(
+        "query", ["fields=id,nope", "fields=,", "fields=products&include_items=false"]
+    )
+    async def test_invalid_selections_are_rejected(self, test_client: AsyncClient, auth_headers, query):
+        response = await test_client.get(f"/receipts?{query}", headers=auth_headers)
+
+        assert response.status_code == 422
+
+    async def test_each_shape_has_its_own_etag(self, test_client: AsyncClient, auth_headers, receipts):
+        tags = {
+            (await test_client.get(f"/receipts{q}", headers=auth_headers)).headers["etag"]
+            for q in ("", "?include_items=false", "?fields=id,total", "?fields=total,id")
+        }
+
+        assert len(tags) == 3
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from sqlalchemy import event, select, text
+
+from app.config import Settings, configure_settings, get_settings
+from app.database import connection
+from app.database.connection import Base, create_engines, create_sessionmaker
+from app.database.models import UserModel
+from main import create_app
+
+
+@pytest.fixture
+def production_settings(tmp_path):
+    original = get_settings()
+    yield Settings(
+        database_url=f"sqlite+aiosqlite:///{tmp_path}/edge.db",
+        sqlite_profile="production",
+        sqlite_readers=3,
+        sqlite_busy_timeout_ms=1234,
+    )
+    configure_settings(original)
+    connection.reset_engine()
+
+
+@pytest.fixture
+async def engines(production_settings):
+    writer, reader = create_engines(production_settings)
+    async with writer.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield writer, reader
+    await reader.dispose()
+    await writer.dispose()
+
+
+def _user(n: int) -> UserModel:
+    return UserModel(fullname=f"User {n}", username=f"user{n}", email=f"user{n}@example.com", password_hash="x")
+
+
+def _record(engine, seen):
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement.split()[0].upper())
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+
+
+class TestSqliteProductionProfile:
+    async def test_connections_get_wal_and_pragmas_and_readers_cannot_write(self, engines):
+        writer, reader = engines
+        async with writer.connect() as conn:
+            pragmas = [
+                (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout", "query_only")
+            ]
+        async with reader.connect() as conn:
+            query_only = (await conn.execute(text("PRAGMA query_only"))).scalar()
+            with pytest.raises(Exception, match="readonly"):
+                await conn.execute(text("DELETE FROM users"))
+
+        assert pragmas == ["wal", 1, 1234, 0]
+        assert query_only == 1
+        assert writer.pool.size() == 1 and reader.pool.size() == 3
+
+    async def test_reads_use_readers_until_the_transaction_writes(self, engines):
+        writer, reader = engines
+        written, read = [], []
+        _record(writer, written)
+        _record(reader, read)
+
+        async with create_sessionmaker(writer, reader)() as session:
+            await session.execute(select(UserModel))
+            session.add(_user(1))
+            # autoflushes on the writer, then reads its own insert there
+            user = (await session.execute(select(UserModel).where(UserModel.username == "user1"))).scalar_one()
+            await session.commit()
+            assert (await session.execute(select(UserModel.id))).scalars().all() == [user.id]
+
+        assert written == ["INSERT", "SELECT"]
+        assert read == ["SELECT", "SELECT"]
+
+    async def test_concurrent_writers_queue_for_the_single_connection(self, engines):
+        factory = create_sessionmaker(*engines)
+
+        async def write(n: int) -> None:
+            async with factory() as session:
+                session.add(_user(n))
+                await session.commit()
+
+        async def read() -> int:
+            async with factory() as session:
+                return len((await session.execute(select(UserModel))).scalars().all())
+
+        await asyncio.gather(*(write(n) for n in range(20)), *(read() for _ in range(20)))
+
+        assert await read() == 20
+
+    async def test_lifespan_warms_both_pools(self, production_settings):
+        app = create_app(production_settings)
+
+        async with app.router.lifespan_context(app):
+            assert connection.get_engine().pool.checkedin() == 1
+            assert connection.get_reader_engine().pool.checkedin() == 3
+
+        assert connection._reader_engine is None
+
+    def test_memory_databases_keep_a_single_engine(self):
+        writer, reader = create_engines(Settings(database_url="sqlite+aiosqlite:///:memory:", sqlite_profile="production"))
+
+        assert writer is reader